@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Benchmark: address normalization before geocoding
+
+Builds a sample corpus where each address appears in the spellings seen
+in real feeds (full-width digits, stray whitespace, repeated prefixes,
+號 for 号, ...), then replays it in GEOCODE_BATCH_SIZE batches through a
+geocode cache keyed the old way (width folding and whitespace only) and by
+address_key(). Reports cache hit rate, addresses sent to the API, batch
+requests and normalization throughput. Variants that normalization cannot
+merge (a dropped province) are kept in the corpus on purpose.
+
+Usage:
+    python benchmarks/bench_address.py --records 100000 --addresses 5000
+"""
+
+import argparse
+import random
+import sys
+import time
+import unicodedata
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'scripts'))
+
+from __init__ import GEOCODE_BATCH_SIZE, chunked
+from address import address_key
+
+
+AREAS = [
+    ('北京市', '', '朝阳区'), ('北京市', '', '海淀区'), ('上海市', '', '浦东新区'),
+    ('上海市', '', '徐汇区'), ('广东省', '深圳市', '南山区'), ('广东省', '广州市', '天河区'),
+    ('浙江省', '杭州市', '西湖区'), ('江苏省', '苏州市', '昆山市'), ('四川省', '成都市', '武侯区'),
+    ('湖北省', '武汉市', '洪山区'),
+]
+STREETS = ['阜通东大街', '中关村大街', '世纪大道', '科技园南路', '天河路', '文三路', '人民南路', '珞喻路']
+
+FULL_WIDTH = str.maketrans('0123456789', '０１２３４５６７８９')
+
+
+def spell(province: str, city: str, district: str, street: str, number: int) -> str:
+    """One spelling of an address, with each feed quirk applied at random."""
+    prefix = [province, city, district]
+    if random.random() < 0.1 and city:
+        prefix = prefix[1:]                             # dropped province
+    if random.random() < 0.15:
+        prefix.insert(1, prefix[0])                     # repeated prefix
+    if random.random() < 0.1 and province.rstrip('市') in ('北京', '上海'):
+        prefix[0] = province.rstrip('市')               # 北京朝阳区
+    text = ''.join(prefix) + f"{street}{number}号"
+    if random.random() < 0.2:
+        text = text.translate(FULL_WIDTH)
+    if random.random() < 0.2:
+        text = text.replace('号', '號')
+    if random.random() < 0.2:
+        text = text.replace(district, f" {district} ").replace(street, f"{street}，")
+    if random.random() < 0.05:
+        text = '中国' + text
+    return text
+
+
+def legacy_key(address: str, city: str = None) -> tuple[str, str]:
+    """Cache key used before address normalization."""
+    def normalize(text):
+        return ' '.join(unicodedata.normalize('NFKC', text or '').split())
+
+    return normalize(address), normalize(city)
+
+
+def replay(records: list, key, dedupe: bool) -> tuple[float, int, int]:
+    """Feed records through a cache in batches; return hit rate, sent, requests."""
+    cache = set()
+    hits = sent = requests = 0
+    for batch in chunked(records, GEOCODE_BATCH_SIZE):
+        keys = [key(address) for address in batch]
+        pending = [k for k in keys if k not in cache]
+        hits += len(keys) - len(pending)
+        if dedupe:
+            pending = list(dict.fromkeys(pending))
+        if pending:
+            sent += len(pending)
+            requests += -(-len(pending) // GEOCODE_BATCH_SIZE)
+            cache.update(pending)
+    return hits / len(records), sent, requests
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark address normalization and dedup')
+    parser.add_argument('--records', type=int, default=100_000,
+                        help='Records in the corpus (default: 100000)')
+    parser.add_argument('--addresses', type=int, default=5000,
+                        help='Distinct addresses behind the records (default: 5000)')
+    args = parser.parse_args()
+
+    random.seed(0)
+    places = [(*random.choice(AREAS), random.choice(STREETS), random.randint(1, 999))
+              for _ in range(args.addresses)]
+    # Popular addresses recur, as in delivery and order feeds
+    weights = [1 / (rank + 1) for rank in range(len(places))]
+    truth = random.choices(range(len(places)), weights, k=args.records)
+    records = [spell(*places[i]) for i in truth]
+    distinct = len(set(places[i] for i in truth))
+
+    start = time.perf_counter()
+    keys = [address_key(address) for address in records]
+    elapsed = time.perf_counter() - start
+
+    merged = {}
+    for key, i in zip(keys, truth):
+        merged.setdefault(key, set()).add(places[i])
+    false_merges = sum(len(owners) > 1 for owners in merged.values())
+
+    print(f"{args.records} records, {distinct} distinct addresses, "
+          f"{len(set(records))} distinct spellings")
+    print(f"normalization: {args.records / elapsed / 1e3:.0f} k addresses/s, "
+          f"{len(merged)} keys, {false_merges} keys merging different addresses")
+    for name, key, dedupe in [('legacy key', legacy_key, False),
+                              ('normalized + dedup', address_key, True)]:
+        hit_rate, sent, requests = replay(records, key, dedupe)
+        print(f"{name:<20} hit rate {hit_rate:6.1%}   addresses sent {sent:7d}   "
+              f"batch requests {requests:6d}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Benchmark: serial AmapClient vs bounded-concurrency AsyncAmapClient
+
+Fans out the same batch of geocodes against the local stub server with a
+simulated per-request server latency.
+
+Usage:
+    python benchmarks/bench_async.py --requests 500 --concurrency 50 --latency 0.01
+"""
+
+import argparse
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'scripts'))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from __init__ import AmapClient
+from async_client import AsyncAmapClient
+from stub_server import serve
+
+
+def bench_serial(base_url: str, addresses: list) -> float:
+    start = time.perf_counter()
+    with AmapClient(api_key='stub', base_url=base_url) as client:
+        for address in addresses:
+            client.geocode(address)
+    return time.perf_counter() - start
+
+
+async def bench_async(base_url: str, addresses: list, concurrency: int) -> float:
+    start = time.perf_counter()
+    async with AsyncAmapClient(api_key='stub', max_concurrency=concurrency,
+                               base_url=base_url) as client:
+        await asyncio.gather(*(client.geocode(address) for address in addresses))
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark AsyncAmapClient fan-out')
+    parser.add_argument('--requests', type=int, default=500, help='Number of geocodes (default: 500)')
+    parser.add_argument('--concurrency', type=int, default=50, help='Async concurrency limit (default: 50)')
+    parser.add_argument('--latency', type=float, default=0.01,
+                        help='Simulated server latency per request in seconds (default: 0.01)')
+
+    args = parser.parse_args()
+
+    addresses = [f"北京市朝阳区阜通东大街{i}号" for i in range(args.requests)]
+    server = serve(latency=args.latency)
+    try:
+        serial = bench_serial(server.base_url, addresses)
+        concurrent = asyncio.run(bench_async(server.base_url, addresses, args.concurrency))
+        print(f"{args.requests} geocodes, {args.latency * 1000:.0f} ms server latency")
+        print(f"AmapClient (serial)        {serial:7.2f} s  ({args.requests / serial:8.1f} req/s)")
+        print(f"AsyncAmapClient (limit {args.concurrency:>3}) {concurrent:7.2f} s  "
+              f"({args.requests / concurrent:8.1f} req/s)")
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Benchmark: per-call requests.get vs pooled AmapClient
+
+Issues the same geocode request repeatedly against the local stub server,
+once opening a fresh connection per call (the old make_api_request
+behaviour) and once over the keep-alive pool of AmapClient.
+
+Usage:
+    python benchmarks/bench_client.py --requests 500 --connect-delay 0.002
+"""
+
+import argparse
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'scripts'))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from __init__ import AmapClient, build_api_url
+from stub_server import serve
+
+
+def summarize(name: str, samples: list) -> str:
+    """Format latency samples (seconds) as a one-line summary in ms."""
+    ms = sorted(s * 1000 for s in samples)
+    p95 = ms[int(len(ms) * 0.95) - 1]
+    return (f"{name:<22} mean {statistics.mean(ms):7.3f} ms   "
+            f"p50 {statistics.median(ms):7.3f} ms   p95 {p95:7.3f} ms")
+
+
+def bench_requests_get(base_url: str, n: int) -> list:
+    import requests
+
+    url = build_api_url('/geocode/geo', {'address': '北京市朝阳区阜通东大街6号'}, base_url)
+    samples = []
+    for _ in range(n):
+        start = time.perf_counter()
+        response = requests.get(f"{url}&key=stub", timeout=10)
+        response.raise_for_status()
+        response.json()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def bench_client(base_url: str, n: int) -> list:
+    samples = []
+    with AmapClient(api_key='stub', base_url=base_url) as client:
+        for _ in range(n):
+            start = time.perf_counter()
+            client.geocode('北京市朝阳区阜通东大街6号')
+            samples.append(time.perf_counter() - start)
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark pooled AmapClient against requests.get')
+    parser.add_argument('--requests', type=int, default=500, help='Requests per variant (default: 500)')
+    parser.add_argument('--connect-delay', type=float, default=0.002,
+                        help='Simulated handshake cost per new connection in seconds (default: 0.002)')
+
+    args = parser.parse_args()
+
+    server = serve(connect_delay=args.connect_delay)
+    try:
+        print(f"{args.requests} geocode requests against {server.base_url} "
+              f"(connect delay {args.connect_delay * 1000:.1f} ms)")
+        print(summarize('requests.get', bench_requests_get(server.base_url, args.requests)))
+        print(summarize('AmapClient (pooled)', bench_client(server.base_url, args.requests)))
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
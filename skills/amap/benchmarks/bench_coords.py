@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Benchmark: vectorized vs scalar coordinate transforms
+
+Converts the same random points inside China with one NumPy call and with
+a Python loop over the scalar path, and checks that both agree.
+
+Usage:
+    python benchmarks/bench_coords.py --points 1000000
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'scripts'))
+
+import numpy as np
+
+from coords import transform
+
+
+CONVERSIONS = [('wgs84', 'gcj02'), ('gcj02', 'wgs84'), ('wgs84', 'bd09')]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark vectorized coordinate transforms')
+    parser.add_argument('--points', type=int, default=1_000_000,
+                        help='Points per conversion (default: 1000000)')
+    parser.add_argument('--scalar-points', type=int, default=100_000,
+                        help='Points for the scalar loop, extrapolated (default: 100000)')
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    lon = rng.uniform(73.5, 134.8, args.points)
+    lat = rng.uniform(18.2, 53.5, args.points)
+    n = min(args.scalar_points, args.points)
+    scalar_lon, scalar_lat = lon[:n].tolist(), lat[:n].tolist()
+
+    print(f"{args.points} points vectorized, {n} points scalar")
+    for src, dst in CONVERSIONS:
+        start = time.perf_counter()
+        vec_lon, vec_lat = transform(lon, lat, src, dst)
+        vectorized = time.perf_counter() - start
+
+        start = time.perf_counter()
+        scalar = [transform(x, y, src, dst) for x, y in zip(scalar_lon, scalar_lat)]
+        looped = time.perf_counter() - start
+
+        error = max(np.abs(vec_lon[:n] - [p[0] for p in scalar]).max(),
+                    np.abs(vec_lat[:n] - [p[1] for p in scalar]).max())
+        vec_rate = args.points / vectorized
+        scalar_rate = n / looped
+        print(f"{src} -> {dst:<6} numpy {vec_rate / 1e6:7.2f} M pts/s   "
+              f"scalar {scalar_rate / 1e6:6.3f} M pts/s   "
+              f"speedup {vec_rate / scalar_rate:5.1f}x   max diff {error:.1e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Benchmark: CLI invocations with and without the Amap daemon
+
+Runs scripts/geocoding.py end to end as a subprocess, once building its own
+client every time (AMAP_NO_DAEMON=1) and once forwarding to a running
+amap_daemon.py. Every invocation geocodes a distinct address so neither
+variant is served from cache. The stub's connect delay stands in for the
+TCP/TLS handshake a cold client pays on every run.
+
+Usage:
+    python benchmarks/bench_daemon.py --runs 30 --connect-delay 0.05
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from bench_client import summarize
+from stub_server import serve
+
+SCRIPTS = Path(__file__).resolve().parent.parent / 'scripts'
+
+
+def run_cli(env: dict, runs: int, tag: str) -> list:
+    samples = []
+    for i in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, str(SCRIPTS / 'geocoding.py'),
+                        '--address', f'北京市朝阳区{tag}路{i}号'],
+                       env=env, check=True, stdout=subprocess.DEVNULL)
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def wait_for_socket(path: Path, timeout: float = 10) -> None:
+    deadline = time.monotonic() + timeout
+    while not path.exists():
+        if time.monotonic() > deadline:
+            raise RuntimeError("Daemon did not start")
+        time.sleep(0.05)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark CLI latency with and without the daemon')
+    parser.add_argument('--runs', type=int, default=30, help='CLI runs per variant (default: 30)')
+    parser.add_argument('--latency', type=float, default=0.0,
+                        help='Simulated server latency in seconds (default: 0)')
+    parser.add_argument('--connect-delay', type=float, default=0.05,
+                        help='Simulated handshake delay per new connection (default: 0.05)')
+    args = parser.parse_args()
+
+    server = serve('127.0.0.1', 0, latency=args.latency, connect_delay=args.connect_delay)
+    with tempfile.TemporaryDirectory() as cache_dir:
+        socket = Path(cache_dir) / 'daemon.sock'
+        env = dict(os.environ, AMAP_BASE_URL=server.base_url, AMAP_API_KEY='stub',
+                   AMAP_CACHE_DIR=cache_dir, AMAP_DAEMON_SOCKET=str(socket))
+
+        cold = run_cli(dict(env, AMAP_NO_DAEMON='1'), args.runs, 'cold')
+
+        daemon = subprocess.Popen([sys.executable, str(SCRIPTS / 'amap_daemon.py'), 'serve'],
+                                  env=env, stderr=subprocess.DEVNULL)
+        try:
+            wait_for_socket(socket)
+            warm = run_cli(env, args.runs, 'warm')
+        finally:
+            daemon.terminate()
+            daemon.wait()
+    server.shutdown()
+
+    print(f"{args.runs} CLI runs per variant, connect delay {args.connect_delay * 1000:.0f} ms, "
+          f"latency {args.latency * 1000:.0f} ms")
+    print(summarize('standalone CLI', cold))
+    print(summarize('via daemon', warm))
+
+
+if __name__ == "__main__":
+    main()
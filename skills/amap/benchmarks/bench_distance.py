@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Benchmark: per-pair route planning vs a tiled /distance matrix
+
+Times an N x N origin-destination matrix against the local stub server
+three ways: one plan_route call per pair (timed on a sample and
+extrapolated), distance_matrix on one thread, and distance_matrix with
+concurrent tiles. Request counts come from the stub's own counters.
+
+Usage:
+    python benchmarks/bench_distance.py --size 200 --workers 8 --latency 0.05
+"""
+
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'scripts'))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from __init__ import AmapClient
+from stub_server import serve
+
+
+def random_points(count: int) -> list:
+    return [f"{random.uniform(116.2, 116.6):.6f},{random.uniform(39.8, 40.05):.6f}"
+            for _ in range(count)]
+
+
+def bench_pairs(base_url: str, pairs: list) -> float:
+    start = time.perf_counter()
+    with AmapClient(api_key='stub', base_url=base_url) as client:
+        for origin, destination in pairs:
+            client.plan_route(origin, destination, 'driving')
+    return time.perf_counter() - start
+
+
+def bench_matrix(base_url: str, origins: list, destinations: list, workers: int):
+    start = time.perf_counter()
+    with AmapClient(api_key='stub', base_url=base_url) as client:
+        result = client.distance_matrix(origins, destinations, max_workers=workers)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark distance_matrix against per-pair routes')
+    parser.add_argument('--size', type=int, default=200,
+                        help='Origins and destinations each (default: 200)')
+    parser.add_argument('--workers', type=int, default=8,
+                        help='Concurrent tiles (default: 8)')
+    parser.add_argument('--sample', type=int, default=100,
+                        help='Per-pair routes actually timed (default: 100)')
+    parser.add_argument('--latency', type=float, default=0.05,
+                        help='Simulated server latency per request in seconds (default: 0.05)')
+    args = parser.parse_args()
+
+    random.seed(0)
+    origins, destinations = random_points(args.size), random_points(args.size)
+    pairs = args.size * args.size
+    server = serve(latency=args.latency)
+    try:
+        sample = [(random.choice(origins), random.choice(destinations)) for _ in range(args.sample)]
+        per_pair = bench_pairs(server.base_url, sample) / len(sample) * pairs
+
+        server.requests.clear()
+        _, serial = bench_matrix(server.base_url, origins, destinations, 1)
+        requests = server.requests.get('/distance', 0)
+        result, concurrent = bench_matrix(server.base_url, origins, destinations, args.workers)
+
+        print(f"{args.size} x {args.size} matrix ({pairs} pairs), "
+              f"{args.latency * 1000:.0f} ms server latency")
+        print(f"plan_route per pair         {per_pair:8.1f} s  ({pairs} requests, "
+              f"extrapolated from {len(sample)})")
+        print(f"distance_matrix (1 thread)  {serial:8.1f} s  ({requests} requests)")
+        print(f"distance_matrix ({args.workers:>2} tiles) {concurrent:8.1f} s  "
+              f"({per_pair / concurrent:.0f}x faster than per pair)")
+
+        distance = result['distance']
+        missing = sum(value is None or value != value for row in distance for value in row)
+        print(f"matrix {len(distance)} x {len(distance[0])}, {missing} cells without a result")
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
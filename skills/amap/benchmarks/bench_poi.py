@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Benchmark: POI dicts vs PoiTable
+
+Generates a city-sized set of POIs shaped like /place/around and
+/place/text responses (extensions=base), then compares the JSON-parsed
+list of dicts with a PoiTable: memory held (tracemalloc), load time,
+a radius query over all coordinates and reading one text field from
+every row. Also checks that every row converts back to its source dict,
+minus the empty fields.
+
+Usage:
+    python benchmarks/bench_poi.py --pois 200000
+"""
+
+import argparse
+import json
+import math
+import random
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'scripts'))
+
+from cache import METERS_PER_DEGREE
+from poi import PoiTable
+
+
+TYPES = [
+    ('餐饮服务;中餐厅;中餐厅', '050100'), ('餐饮服务;快餐厅;肯德基', '050301'),
+    ('餐饮服务;咖啡厅;星巴克咖啡', '050501'), ('住宿服务;宾馆酒店;宾馆酒店', '100100'),
+    ('购物服务;便民商店/便利店;便民商店/便利店', '060200'), ('生活服务;生活服务场所;生活服务场所', '070000'),
+]
+DISTRICTS = [('朝阳区', '110105'), ('海淀区', '110108'), ('东城区', '110101'), ('西城区', '110102'),
+             ('丰台区', '110106'), ('通州区', '110112')]
+AREAS = ['望京', '三里屯', '国贸', '中关村', '五道口', '西单', '王府井', '亦庄']
+
+
+def make_poi(i: int) -> dict:
+    """One synthetic POI with the fields Amap returns for extensions=base."""
+    ptype, typecode = random.choice(TYPES)
+    district, adcode = random.choice(DISTRICTS)
+    lon, lat = random.uniform(116.2, 116.6), random.uniform(39.8, 40.05)
+    return {
+        "id": f"B0FFH{i:07d}", "parent": [], "childtype": [],
+        "name": f"{random.choice(['老北京', '金鼎', '小院', '悦来'])}{ptype.split(';')[-1]}({i % 997}店)",
+        "type": ptype, "typecode": typecode, "biz_type": [],
+        "address": f"{random.choice(AREAS)}路{random.randint(1, 300)}号{random.randint(1, 30)}层",
+        "location": f"{lon:.6f},{lat:.6f}",
+        "tel": f"010-{random.randint(10_000_000, 99_999_999)}" if random.random() < 0.7 else [],
+        "distance": str(random.randint(0, 3000)),
+        "pcode": "110000", "pname": "北京市", "citycode": "010", "cityname": "北京市",
+        "adcode": adcode, "adname": district, "importance": [], "shopid": [], "shopinfo": "0",
+        "poiweight": [], "gridcode": str(random.randint(5_000_000_000, 5_999_999_999)),
+        "navi_poiid": f"H50F0{random.randint(10_000_000, 99_999_999)}",
+        "entr_location": f"{lon + 0.0001:.6f},{lat:.6f}",
+        "business_area": random.choice(AREAS), "match": "0", "recommend": "0",
+        "timestamp": [], "alias": [], "indoor_map": "0",
+        "indoor_data": {"cpid": [], "floor": [], "truefloor": [], "cmsid": []},
+        "groupbuy_num": "0", "discount_num": "0",
+        "biz_ext": {"rating": f"{random.uniform(3, 5):.1f}", "cost": []}, "event": [],
+        "children": [], "photos": []
+    }
+
+
+def measure(build):
+    """Result of build(), the memory it holds and the time it took untraced."""
+    start = time.perf_counter()
+    build()
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    result = build()
+    held = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, held, elapsed
+
+
+def within_dicts(pois: list, lon: float, lat: float, radius: float) -> int:
+    scale = math.cos(math.radians(lat)) * METERS_PER_DEGREE
+    count = 0
+    for poi in pois:
+        x, y = (float(v) for v in poi['location'].split(','))
+        count += math.hypot((x - lon) * scale, (y - lat) * METERS_PER_DEGREE) <= radius
+    return count
+
+
+def within_table(table: PoiTable, lon: float, lat: float, radius: float) -> int:
+    scale = math.cos(math.radians(lat)) * METERS_PER_DEGREE
+    return sum(math.hypot((x - lon) * scale, (y - lat) * METERS_PER_DEGREE) <= radius
+               for x, y in zip(table.lons, table.lats))
+
+
+def within_numpy(table: PoiTable, lon: float, lat: float, radius: float) -> int:
+    import numpy as np
+
+    points = table.coordinates()
+    scale = math.cos(math.radians(lat)) * METERS_PER_DEGREE
+    distance = np.hypot((points[:, 0] - lon) * scale, (points[:, 1] - lat) * METERS_PER_DEGREE)
+    return int((distance <= radius).sum())
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark POI dicts against PoiTable')
+    parser.add_argument('--pois', type=int, default=200_000,
+                        help='POIs to generate (default: 200000)')
+    args = parser.parse_args()
+
+    random.seed(0)
+    lines = [json.dumps(make_poi(i), ensure_ascii=False) for i in range(args.pois)]
+    print(f"{args.pois} POIs, {sum(map(len, lines)) / 1e6:.0f} M characters of JSON")
+
+    dicts, dict_bytes, dict_load = measure(lambda: [json.loads(line) for line in lines])
+    table, table_bytes, table_load = measure(lambda: PoiTable(json.loads(line) for line in lines))
+    print(f"{'dicts':<10} {dict_bytes / 2**20:7.1f} MB   load {dict_load:5.2f} s")
+    print(f"{'PoiTable':<10} {table_bytes / 2**20:7.1f} MB   load {table_load:5.2f} s   "
+          f"({dict_bytes / table_bytes:.1f}x smaller)")
+
+    query = (116.45, 39.92, 2000.0)
+    expected, dict_scan = timed(within_dicts, dicts, *query)
+    count, table_scan = timed(within_table, table, *query)
+    assert count == expected
+    line = f"radius query: dicts {dict_scan * 1e3:6.0f} ms   PoiTable {table_scan * 1e3:6.0f} ms"
+    try:
+        within_numpy(table, *query)  # import NumPy outside the timing
+        count, numpy_scan = timed(within_numpy, table, *query)
+        assert count == expected
+        line += f"   NumPy {numpy_scan * 1e3:6.1f} ms"
+    except ImportError:
+        pass
+    print(line + f"   ({expected} POIs within {query[2]:.0f} m)")
+
+    _, dict_read = timed(lambda: [poi['name'] for poi in dicts])
+    _, row_read = timed(lambda: [poi['name'] for poi in table])
+    _, column_read = timed(table.column, 'name')
+    print(f"read name:    dicts {dict_read * 1e3:6.0f} ms   PoiTable rows {row_read * 1e3:6.0f} ms   "
+          f"column {column_read * 1e3:6.0f} ms")
+
+    empty = ('', [], None)
+    sample = random.sample(range(args.pois), min(args.pois, 10_000))
+    mismatches = sum(table[i].to_dict() != {key: value for key, value in dicts[i].items()
+                                            if value not in empty}
+                     for i in sample)
+    print(f"round trip: {mismatches} of {len(sample)} sampled rows differ from their source")
+
+
+if __name__ == "__main__":
+    main()
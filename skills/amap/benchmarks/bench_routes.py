@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Benchmark: route cache hit rate and footprint
+
+Replays simulated ride-hailing trips through RouteCache at several grid
+precisions. Trips run between hotspots (stations, malls, office parks),
+each with a few pick-up spots, and every endpoint carries GPS noise, so
+trips between nearby points repeat constantly. For each precision it
+reports the hit rate, lookup cost and how far a hit's cached endpoints
+lie from the requested ones, then compares the disk footprint of full
+and summary-only driving routes.
+
+Usage:
+    python benchmarks/bench_routes.py --trips 10000 --noise 15
+"""
+
+import argparse
+import math
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'scripts'))
+
+from cache import METERS_PER_DEGREE, RouteCache
+
+
+PRECISIONS = (25, 50, 100, 200)
+SPOTS_PER_HOTSPOT = 3
+
+# A weekday noon: every trip lands in the same time-of-day bucket
+NOON = time.mktime((2026, 6, 3, 12, 0, 0, 0, 0, -1))
+
+
+def offset(lon: float, lat: float, sigma: float) -> tuple[float, float]:
+    """Point scattered around (lon, lat) with a normal spread of sigma meters."""
+    dx, dy = random.gauss(0, sigma), random.gauss(0, sigma)
+    return (lon + dx / (METERS_PER_DEGREE * math.cos(math.radians(lat))),
+            lat + dy / METERS_PER_DEGREE)
+
+
+def meters(a: str, b: str) -> float:
+    (x1, y1), (x2, y2) = ((float(v) for v in p.split(',')) for p in (a, b))
+    scale = math.cos(math.radians(y1)) * METERS_PER_DEGREE
+    return math.hypot((x2 - x1) * scale, (y2 - y1) * METERS_PER_DEGREE)
+
+
+def make_trips(count: int, hotspots: int, noise: float) -> list:
+    centers = [(random.uniform(116.2, 116.6), random.uniform(39.8, 40.05)) for _ in range(hotspots)]
+    # Pick-up spots (gates, entrances) up to 150 m from the hotspot center
+    spots = [[offset(*center, 75) for _ in range(SPOTS_PER_HOTSPOT)] for center in centers]
+    # A few busy hotspots draw most of the trips
+    weights = [1 / (rank + 1) for rank in range(hotspots)]
+    trips = []
+    for _ in range(count):
+        a, b = (random.choice(hotspot) for hotspot in random.choices(spots, weights, k=2))
+        trips.append(tuple(f"{lon:.6f},{lat:.6f}" for lon, lat in (offset(*a, noise),
+                                                                    offset(*b, noise))))
+    return trips
+
+
+def make_route(origin: str, destination: str) -> dict:
+    """Driving route shaped like /direction/driving: a step per 500 m with a polyline."""
+    length = meters(origin, destination) * 1.3
+    steps = [{
+        "instruction": f"沿第{i}条道路向东行驶{500}米右转", "orientation": "东", "road": f"道路{i}",
+        "distance": "500", "tolls": "0", "toll_distance": "0", "toll_road": [], "duration": "60",
+        "polyline": ";".join(f"{116.4 + j * 1e-4:.6f},{39.9 + j * 1e-4:.6f}" for j in range(10)),
+        "action": "右转", "assistant_action": [], "tmcs": [{"lcode": [], "distance": "500",
+                                                          "status": "畅通", "polyline": ""}]
+    } for i in range(max(1, int(length // 500)))]
+    return {"origin": origin, "destination": destination, "taxi_cost": "30",
+            "paths": [{"distance": str(round(length)), "duration": str(round(length / 8)),
+                       "strategy": "速度最快", "tolls": "0", "toll_distance": "0",
+                       "restriction": "0", "traffic_lights": "10", "steps": steps}]}
+
+
+def replay(cache: RouteCache, trips: list, steps: bool = True) -> tuple[list, float]:
+    """Plan every trip through the cache; returns snap offsets of hits and seconds per lookup."""
+    offsets = []
+    elapsed = 0.0
+    for origin, destination in trips:
+        start = time.perf_counter()
+        route = cache.get('driving', origin, destination, steps=steps, when=NOON)
+        elapsed += time.perf_counter() - start
+        if route is None:
+            cache.put('driving', origin, destination, make_route(origin, destination),
+                      when=NOON, steps=steps)
+        else:
+            offsets.append(max(meters(origin, route['origin']),
+                               meters(destination, route['destination'])))
+    return offsets, elapsed / len(trips)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark RouteCache hit rates')
+    parser.add_argument('--trips', type=int, default=10_000, help='Trips to replay (default: 10000)')
+    parser.add_argument('--hotspots', type=int, default=100, help='Trip hotspots (default: 100)')
+    parser.add_argument('--noise', type=float, default=15.0,
+                        help='GPS noise of trip endpoints in meters (default: 15)')
+    args = parser.parse_args()
+
+    random.seed(0)
+    trips = make_trips(args.trips, args.hotspots, args.noise)
+    print(f"{args.trips} trips between {args.hotspots} hotspots x {SPOTS_PER_HOTSPOT} pick-up "
+          f"spots, {args.noise:.0f} m GPS noise")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for precision in PRECISIONS:
+            cache = RouteCache(Path(tmp) / f"routes-{precision}.sqlite3", precision=precision)
+            offsets, lookup = replay(cache, trips)
+            stats = cache.stats()
+            offsets.sort()
+            p95 = offsets[int(len(offsets) * 0.95)] if offsets else 0.0
+            print(f"grid {precision:>3} m: hit rate {stats['hit_rate']:6.1%}   "
+                  f"lookup {lookup * 1e6:4.0f} us   hit endpoints off by "
+                  f"median {offsets[len(offsets) // 2] if offsets else 0:4.0f} m, p95 {p95:4.0f} m")
+
+        full = RouteCache(Path(tmp) / "full.sqlite3")
+        summary = RouteCache(Path(tmp) / "summary.sqlite3", summary_only=True)
+        replay(full, trips)
+        replay(summary, trips, steps=False)
+        full_bytes, summary_bytes = full.stats()['bytes'], summary.stats()['bytes']
+        print(f"stored routes (50 m grid): full {full_bytes / 2**20:6.1f} MB   "
+              f"summary only {summary_bytes / 2**20:6.2f} MB   "
+              f"({full_bytes / summary_bytes:.0f}x smaller)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Benchmark: spatial reverse geocoding cache
+
+Measures bulk insert and lookup throughput of SpatialCache at millions of
+points, then replays a simulated vehicle trace through it at several
+tolerances. Addresses are modelled as square parcels, so a cached answer
+is correct when the cached point lies in the same parcel as the query;
+this shows the precision traded for each tolerance's hit rate.
+
+Usage:
+    python benchmarks/bench_spatial.py --points 1000000 --parcel 30
+"""
+
+import argparse
+import math
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'scripts'))
+
+from cache import METERS_PER_DEGREE, SpatialCache
+
+
+TOLERANCES = (5, 10, 25, 50)
+
+
+def parcel(lon: float, lat: float, size: float) -> tuple[int, int]:
+    """Ground-truth address of a point: its parcel on a size-meter grid."""
+    meters_lon = lon * METERS_PER_DEGREE * math.cos(math.radians(lat))
+    return math.floor(meters_lon / size), math.floor(lat * METERS_PER_DEGREE / size)
+
+
+def vehicle_trace(n: int, step: float) -> list:
+    """Random walk with a heading drift and steps of about step meters."""
+    lon, lat, heading = 116.4, 39.9, 0.0
+    points = []
+    for _ in range(n):
+        heading += random.gauss(0, 0.3)
+        distance = random.uniform(0, 2 * step)
+        lon += distance * math.cos(heading) / (METERS_PER_DEGREE * math.cos(math.radians(lat)))
+        lat += distance * math.sin(heading) / METERS_PER_DEGREE
+        points.append((lon, lat))
+    return points
+
+
+def bench_throughput(n: int) -> None:
+    points = [(random.uniform(115.4, 117.5), random.uniform(39.4, 41.1)) for _ in range(n)]
+    results = [{'formatted_address': str(i % 100_000)} for i in range(n)]
+    cache = SpatialCache(10, max_points=n)
+
+    start = time.perf_counter()
+    cache.put_many([(lon, lat, result) for (lon, lat), result in zip(points, results)])
+    insert = time.perf_counter() - start
+
+    queries = random.sample(points, min(n, 200_000))
+    start = time.perf_counter()
+    cache.get_many(queries)
+    lookup = time.perf_counter() - start
+
+    print(f"{n} points: insert {n / insert / 1e3:.0f} k pts/s, "
+          f"lookup {len(queries) / lookup / 1e3:.0f} k/s")
+
+
+def bench_trace(points: list, tolerance: float, parcel_size: float) -> str:
+    cache = SpatialCache(tolerance)
+    correct = answered = 0
+    for lon, lat in points:
+        cached = cache.get(lon, lat)
+        truth = parcel(lon, lat, parcel_size)
+        if cached is None:
+            cache.put(lon, lat, truth)
+        else:
+            answered += 1
+            correct += cached == truth
+    precision = correct / answered if answered else 1.0
+    return (f"tolerance {tolerance:3.0f} m   API calls {1 - answered / len(points):6.1%}   "
+            f"hit rate {answered / len(points):6.1%}   precision {precision:6.1%}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the spatial reverse geocoding cache')
+    parser.add_argument('--points', type=int, default=1_000_000,
+                        help='Points for the throughput test (default: 1000000)')
+    parser.add_argument('--trace', type=int, default=50_000,
+                        help='Points in the simulated trace (default: 50000)')
+    parser.add_argument('--step', type=float, default=5.0,
+                        help='Mean distance between trace points in meters (default: 5)')
+    parser.add_argument('--parcel', type=float, default=30.0,
+                        help='Size of an address parcel in meters (default: 30)')
+    args = parser.parse_args()
+
+    random.seed(0)
+    bench_throughput(args.points)
+
+    trace = vehicle_trace(args.trace, args.step)
+    print(f"\n{args.trace}-point trace, {args.step:.0f} m mean step, {args.parcel:.0f} m parcels")
+    for tolerance in TOLERANCES:
+        print(bench_trace(trace, tolerance, args.parcel))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,409 @@
+#!/usr/bin/env python3
+"""
+Local Amap REST API Stub Server
+
+Serves canned Amap responses over HTTP/1.1 keep-alive so the amap scripts
+and clients can be exercised and benchmarked without network access or an
+API key.
+
+Usage:
+    # Run standalone, then point the scripts at it
+    python benchmarks/stub_server.py --port 8765 --latency 0.005
+    AMAP_BASE_URL=http://127.0.0.1:8765/v3 AMAP_API_KEY=stub \\
+        python scripts/geocoding.py --address "北京市朝阳区阜通东大街6号"
+"""
+
+import argparse
+import json
+import math
+import random
+import socket
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+GEOCODE = {
+    "formatted_address": "北京市朝阳区阜通东大街6号",
+    "country": "中国",
+    "province": "北京市",
+    "city": "北京市",
+    "district": "朝阳区",
+    "street": "阜通东大街",
+    "number": "6号",
+    "adcode": "110105",
+    "location": "116.481485,39.990464",
+    "level": "门牌号"
+}
+
+REGEOCODE = {
+    "formatted_address": "北京市朝阳区望京街道阜通东大街6号",
+    "addressComponent": {
+        "province": "北京市",
+        "city": "北京市",
+        "district": "朝阳区",
+        "adcode": "110105",
+        "township": "望京街道",
+        "street": "阜通东大街",
+        "streetNumber": "6号"
+    }
+}
+
+POI = {
+    "id": "B000A85BAA",
+    "name": "肯德基",
+    "type": "餐饮服务;快餐服务",
+    "address": "阜通东大街6号院1号楼",
+    "location": "116.481485,39.990464",
+    "tel": "010-64301234",
+    "distance": "100"
+}
+
+PATH = {
+    "distance": "12000",
+    "duration": "1800",
+    "tolls": "0",
+    "toll_distance": "0",
+    "steps": [
+        {
+            "instruction": "沿阜通东大街向东行驶",
+            "distance": "12000",
+            "duration": "1800",
+            "polyline": "116.481485,39.990464;116.491485,39.990464"
+        }
+    ]
+}
+
+TRANSIT = {
+    "distance": "15000",
+    "duration": "3600",
+    "cost": "5.0",
+    "segments": []
+}
+
+
+def division(adcode: str, name: str, level: str, citycode, center: str, children=()) -> dict:
+    return {"citycode": citycode, "adcode": adcode, "name": name, "center": center,
+            "level": level, "districts": list(children)}
+
+
+# A small /config/district tree, including names shared across provinces
+DISTRICTS = division("100000", "中华人民共和国", "country", [], "116.3683244,39.915085", [
+    division("110000", "北京市", "province", "010", "116.407387,39.904179", [
+        division("110100", "北京城区", "city", "010", "116.405285,39.904989", [
+            division("110105", "朝阳区", "district", "010", "116.443205,39.921506"),
+            division("110108", "海淀区", "district", "010", "116.298056,39.959912"),
+        ]),
+    ]),
+    division("440000", "广东省", "province", [], "113.266887,23.133306", [
+        division("440100", "广州市", "city", "020", "113.264385,23.129112", [
+            division("440106", "天河区", "district", "020", "113.361200,23.124680"),
+        ]),
+        division("440300", "深圳市", "city", "0755", "114.057939,22.543527", [
+            division("440305", "南山区", "district", "0755", "113.930478,22.533191"),
+        ]),
+        division("441900", "东莞市", "city", "0769", "113.751765,23.020536", [
+            division("441900", "东城街道", "street", "0769", "113.754635,23.002896"),
+        ]),
+    ]),
+    division("210000", "辽宁省", "province", [], "123.431382,41.836175", [
+        division("211300", "朝阳市", "city", "0421", "120.450879,41.573734"),
+    ]),
+    division("220000", "吉林省", "province", [], "125.325802,43.896082", [
+        division("220100", "长春市", "city", "0431", "125.323643,43.816996", [
+            division("220104", "朝阳区", "district", "0431", "125.288319,43.833763"),
+        ]),
+    ]),
+    division("450000", "广西壮族自治区", "province", [], "108.327546,22.815478"),
+])
+
+
+# Matches of every /place/text search
+POI_COUNT = 480
+
+# Most results /place/around reports for one circle
+AROUND_MAX_RESULTS = 900
+
+
+def stub_pois(params: dict) -> list:
+    """One page of canned POIs; like Amap, each page repeats the previous page's last POI."""
+    page, offset = int(params.get('page', 1)), int(params.get('offset', 20))
+    start = (page - 1) * offset
+    first = max(start - 1, 0) if page > 1 else start
+    return [{**POI, "id": f"B000{i:06d}", "name": f"{POI['name']}({i})"}
+            for i in range(first, min(start + offset, POI_COUNT))]
+
+
+# POIs served by /place/around: a uniform scatter over central Beijing with
+# a dense cluster, so area crawls have to split tiles
+AROUND_BOUNDS = (116.30, 39.85, 116.55, 40.02)
+AROUND_POI_COUNT = 20_000
+
+
+def _around_pois() -> list:
+    rng = random.Random(0)
+    west, south, east, north = AROUND_BOUNDS
+    points = []
+    for i in range(AROUND_POI_COUNT):
+        if i % 4 == 0:
+            lon, lat = rng.gauss(116.45, 0.004), rng.gauss(39.92, 0.003)
+        else:
+            lon, lat = rng.uniform(west, east), rng.uniform(south, north)
+        points.append((lon, lat, {**POI, "id": f"B0AR{i:06d}", "name": f"{POI['name']}({i})",
+                                  "location": f"{lon:.6f},{lat:.6f}"}))
+    return points
+
+
+AROUND_POIS = _around_pois()
+
+
+def stub_around(params: dict) -> tuple[int, list]:
+    """Total and requested page of AROUND_POIS within the circle, nearest first."""
+    lon, lat = (float(v) for v in params.get('location', '0,0').split(','))
+    radius = float(params.get('radius', 3000))
+    page, offset = int(params.get('page', 1)), int(params.get('offset', 20))
+    scale = math.cos(math.radians(lat))
+    found = []
+    for x, y, poi in AROUND_POIS:
+        distance = math.hypot((x - lon) * scale, y - lat) * 111_320
+        if distance <= radius:
+            found.append((distance, poi))
+    found.sort(key=lambda item: item[0])
+    found = found[:AROUND_MAX_RESULTS]
+    start = (page - 1) * offset
+    return len(found), [{**poi, "distance": str(round(distance))}
+                        for distance, poi in found[start:start + offset]]
+
+
+def stub_distances(params: dict) -> list:
+    """/distance results: straight-line meters, scaled up for roads."""
+    detour, speed = {'0': (1.0, 10.0), '1': (1.3, 10.0), '3': (1.2, 1.3)}.get(
+        params.get('type', '1'), (1.3, 10.0))
+    lon, lat = (float(v) for v in params.get('destination', '0,0').split(','))
+    results = []
+    for i, origin in enumerate(params.get('origins', '').split('|'), 1):
+        x, y = (float(v) for v in origin.split(','))
+        meters = math.hypot((x - lon) * math.cos(math.radians(lat)), y - lat) * 111_320 * detour
+        results.append({"origin_id": str(i), "dest_id": "1", "distance": str(round(meters)),
+                        "duration": str(round(meters / speed))})
+    return results
+
+
+def find_division(division: dict, keyword: str) -> dict:
+    """Division of the stub tree with the given name or adcode."""
+    if keyword in (division['name'], division['adcode']):
+        return division
+    for child in division['districts']:
+        found = find_division(child, keyword)
+        if found:
+            return found
+    return None
+
+
+def stub_boundary(division: dict) -> str:
+    """A star-shaped (non-convex) boundary polyline around a division's center."""
+    lon, lat = (float(v) for v in division['center'].split(','))
+    points = []
+    for i in range(16):
+        angle = 2 * math.pi * i / 16
+        reach = 0.08 if i % 2 == 0 else 0.05
+        points.append(f"{lon + reach * math.cos(angle) / math.cos(math.radians(lat)):.6f},"
+                      f"{lat + reach * math.sin(angle):.6f}")
+    return ';'.join(points)
+
+
+def stub_geocode(address: str) -> dict:
+    """Canned batch geocode entry; addresses containing '不存在' are misses."""
+    if '不存在' in address:
+        return {key: [] for key in GEOCODE}
+    return {**GEOCODE, "formatted_address": address}
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Request handler returning canned Amap JSON responses."""
+
+    protocol_version = 'HTTP/1.1'
+
+    # Tuned on the server instance by serve()
+    latency = 0.0
+    connect_delay = 0.0
+    fail_rate = 0.0
+
+    def setup(self):
+        super().setup()
+        self.server.count_connection()
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        # Simulate per-connection handshake cost (TCP + TLS round-trips)
+        if self.connect_delay:
+            time.sleep(self.connect_delay)
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        parsed = urlparse(self.path)
+        params = {k: v[0] for k, v in parse_qs(parsed.query).items()}
+        endpoint = parsed.path
+        if endpoint.startswith('/v3'):
+            endpoint = endpoint[len('/v3'):]
+
+        self.server.count_request(endpoint)
+        try:
+            if self.latency:
+                time.sleep(self.latency)
+            body = json.dumps(self.respond(endpoint, params), ensure_ascii=False).encode('utf-8')
+        finally:
+            self.server.request_done()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json;charset=UTF-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def respond(self, endpoint: str, params: dict) -> dict:
+        """Build the canned response for an endpoint."""
+        ok = {"status": "1", "info": "OK", "infocode": "10000"}
+
+        key = params.get('key', '')
+        if not key or key.startswith('invalid'):
+            return {"status": "0", "info": "INVALID_USER_KEY", "infocode": "10001"}
+        if key.startswith('exhausted'):
+            return {"status": "0", "info": "DAILY_QUERY_OVER_LIMIT", "infocode": "10003"}
+        if self.fail_rate and random.random() < self.fail_rate:
+            return {"status": "0", "info": "CUQPS_HAS_EXCEEDED_THE_LIMIT", "infocode": "10021"}
+        if '非法' in params.get('address', ''):
+            return {"status": "0", "info": "INVALID_PARAMS", "infocode": "20000"}
+
+        if endpoint == '/geocode/geo':
+            if params.get('batch') == 'true':
+                geocodes = [stub_geocode(address) for address in params.get('address', '').split('|')]
+                return {**ok, "count": str(len(geocodes)), "geocodes": geocodes}
+            return {**ok, "count": "1", "geocodes": [GEOCODE]}
+        if endpoint == '/geocode/regeo':
+            if params.get('batch') == 'true':
+                regeocodes = [REGEOCODE for _ in params.get('location', '').split('|')]
+                return {**ok, "regeocodes": regeocodes}
+            return {**ok, "regeocode": REGEOCODE}
+        if endpoint == '/config/district' and params.get('extensions') == 'all':
+            division = find_division(DISTRICTS, params.get('keywords', ''))
+            if division is None:
+                return {**ok, "count": "0", "districts": []}
+            boundary = {key: value for key, value in division.items() if key != 'districts'}
+            return {**ok, "count": "1", "districts": [{**boundary, "polyline": stub_boundary(division),
+                                                      "districts": []}]}
+        if endpoint == '/config/district':
+            return {**ok, "count": "1", "districts": [DISTRICTS]}
+        if endpoint == '/distance':
+            return {**ok, "count": "1", "results": stub_distances(params)}
+        if endpoint == '/place/around':
+            count, pois = stub_around(params)
+            return {**ok, "count": str(count), "pois": pois}
+        if endpoint == '/place/text':
+            pois = stub_pois(params)
+            return {**ok, "count": str(POI_COUNT if pois else 0), "pois": pois}
+        if endpoint == '/ip':
+            return {**ok, "ip": params.get('ip'), "province": "北京市", "city": "北京市",
+                    "adcode": "110000",
+                    "rectangle": "116.0119343,39.66127144;116.7829835,40.2164962"}
+        if endpoint == '/direction/transit/integrated':
+            return {**ok, "route": {"origin": params.get('origin'),
+                                    "destination": params.get('destination'),
+                                    "transits": [TRANSIT]}}
+        if endpoint.startswith('/direction/'):
+            return {**ok, "route": {"origin": params.get('origin'),
+                                    "destination": params.get('destination'),
+                                    "paths": [PATH]}}
+
+        return {"status": "0", "info": "INVALID_REQUEST", "infocode": "20000"}
+
+
+class StubServer(ThreadingHTTPServer):
+    """Threaded stub server that counts requests per endpoint and in flight."""
+
+    daemon_threads = True
+
+    def __init__(self, address, handler):
+        super().__init__(address, handler)
+        self.requests = {}
+        self.connections = 0
+        self.active = 0
+        self.peak_active = 0
+        self._count_lock = threading.Lock()
+
+    def handle_error(self, request, client_address):
+        # Clients timing out or cancelling mid-response are expected here
+        if isinstance(sys.exc_info()[1], ConnectionError):
+            return
+        super().handle_error(request, client_address)
+
+    def count_connection(self) -> None:
+        with self._count_lock:
+            self.connections += 1
+
+    def count_request(self, endpoint: str) -> None:
+        with self._count_lock:
+            self.requests[endpoint] = self.requests.get(endpoint, 0) + 1
+            self.active += 1
+            self.peak_active = max(self.peak_active, self.active)
+
+    def request_done(self) -> None:
+        with self._count_lock:
+            self.active -= 1
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/v3"
+
+
+def serve(host: str = '127.0.0.1', port: int = 0, latency: float = 0.0,
+          connect_delay: float = 0.0, fail_rate: float = 0.0) -> StubServer:
+    """
+    Start the stub server in a background thread.
+
+    Args:
+        host: Bind address
+        port: Bind port (0 picks a free port)
+        latency: Simulated server processing time per request in seconds
+        connect_delay: Simulated handshake cost per new connection in seconds
+        fail_rate: Fraction of requests answered with a QPS-exceeded error
+
+    Returns:
+        Running StubServer; call shutdown() to stop it
+    """
+    handler = type('ConfiguredStubHandler', (StubHandler,), {
+        'latency': latency,
+        'connect_delay': connect_delay,
+        'fail_rate': fail_rate
+    })
+    server = StubServer((host, port), handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Local Amap REST API stub server')
+    parser.add_argument('--host', type=str, default='127.0.0.1', help='Bind address')
+    parser.add_argument('--port', type=int, default=8765, help='Bind port (default: 8765)')
+    parser.add_argument('--latency', type=float, default=0.0,
+                        help='Simulated processing time per request in seconds')
+    parser.add_argument('--connect-delay', type=float, default=0.0,
+                        help='Simulated handshake cost per new connection in seconds')
+    parser.add_argument('--fail-rate', type=float, default=0.0,
+                        help='Fraction of requests answered with a QPS-exceeded error')
+
+    args = parser.parse_args()
+
+    server = serve(args.host, args.port, args.latency, args.connect_delay, args.fail_rate)
+    print(f"Amap stub listening on {server.base_url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -5,14 +5,82 @@ Shared utilities for Amap (AutoNavi/高德地图) API interactions
 
 import os
 import getpass
-from typing import Optional
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterator, Optional
+from urllib.parse import parse_qsl, urlsplit
 
-AMAP_BASE_URL = "https://restapi.amap.com/v3"
+AMAP_BASE_URL = os.environ.get('AMAP_BASE_URL', "https://restapi.amap.com/v3")
+
+DEFAULT_POOL_SIZE = 10
+DEFAULT_TIMEOUT = 10
+DEFAULT_CONNECT_TIMEOUT = 3.05
+DEFAULT_MAX_WORKERS = 4
+DEFAULT_MAX_RETRIES = 3
+DEFAULT_BACKOFF_BASE = 0.5
+DEFAULT_BACKOFF_MAX = 8.0
+
+# Maximum number of '|'-separated items per batch=true request
+GEOCODE_BATCH_SIZE = 10
+REGEO_BATCH_SIZE = 20
+
+# /distance takes up to 100 origins and one destination per request
+DISTANCE_MAX_ORIGINS = 100
+DISTANCE_TYPES = {
+    'straight': 0,
+    'driving': 1,
+    'walking': 3
+}
+
+# /place/text returns at most 25 POIs per page and 100 pages per query
+POI_PAGE_SIZE = 25
+POI_MAX_PAGES = 100
+
+MODES = {
+    'driving': '/direction/driving',
+    'walking': '/direction/walking',
+    'cycling': '/direction/bicycling',
+    'transit': '/direction/transit/integrated',
+    'ebicycle': '/direction/ebicycling'
+}
+
+
+_key_pool = None
+_key_pool_lock = threading.Lock()
+
+
+def get_key_pool():
+    """
+    Get the shared key pool configured by AMAP_API_KEYS.
+
+    AMAP_DAILY_QUOTA optionally sets the per-key daily request budget.
+
+    Returns:
+        KeyPool, or None if AMAP_API_KEYS is not set
+    """
+    global _key_pool
+    if _key_pool is None:
+        from keypool import KeyPool, keys_from_env
+
+        keys = keys_from_env()
+        if not keys:
+            return None
+        with _key_pool_lock:
+            if _key_pool is None:
+                quota = os.environ.get('AMAP_DAILY_QUOTA')
+                _key_pool = KeyPool(keys, daily_quota=int(quota) if quota else None)
+    return _key_pool
 
 
 def get_api_key() -> str:
     """
-    Get Amap API key from environment variable or prompt user.
+    Get Amap API key from the key pool, environment variable or prompt user.
+
+    When AMAP_API_KEYS is set, each call returns the next healthy key of the
+    shared pool.
 
     Returns:
         API key string
@@ -20,6 +88,10 @@ def get_api_key() -> str:
     Raises:
         ValueError: If API key is empty
     """
+    pool = get_key_pool()
+    if pool is not None:
+        return pool.acquire()
+
     api_key = os.environ.get('AMAP_API_KEY')
 
     if api_key:
@@ -35,20 +107,21 @@ def get_api_key() -> str:
     return api_key
 
 
-def build_api_url(endpoint: str, params: dict) -> str:
+def build_api_url(endpoint: str, params: dict, base_url: str = None) -> str:
     """
     Build Amap API URL with query parameters.
 
     Args:
         endpoint: API endpoint path (e.g., "/geocode/geo")
         params: Query parameters dict
+        base_url: API base URL (defaults to AMAP_BASE_URL)
 
     Returns:
         Full API URL with query string
     """
     from urllib.parse import urlencode
 
-    return f"{AMAP_BASE_URL}{endpoint}?{urlencode(params)}"
+    return f"{base_url or AMAP_BASE_URL}{endpoint}?{urlencode(params)}"
 
 
 def parse_coordinates(location: str) -> Optional[tuple[float, float]]:
@@ -72,43 +145,1567 @@ def parse_coordinates(location: str) -> Optional[tuple[float, float]]:
     return None
 
 
-def make_api_request(url: str, api_key: str, timeout: int = 10) -> dict:
+def add_api_key(url: str, api_key: str) -> str:
     """
-    Make HTTP request to Amap API.
+    Append the key parameter to an Amap API URL.
 
     Args:
         url: Full API URL
         api_key: Amap API key
-        timeout: Request timeout in seconds
 
     Returns:
-        JSON response as dict
+        URL including the key parameter
+    """
+    if '?' in url:
+        return f"{url}&key={api_key}"
+    return f"{url}?key={api_key}"
 
-    Raises:
-        requests.RequestException: If request fails
-        ValueError: If response indicates error
+
+class AmapError(ValueError):
     """
-    import requests
+    Base class for errors reported by the Amap API.
 
-    # Add key parameter to URL
-    if '?' in url:
-        url = f"{url}&key={api_key}"
-    else:
-        url = f"{url}?key={api_key}"
+    Subclasses ValueError so existing `except ValueError` handlers keep
+    working. retryable tells whether repeating the same request later may
+    succeed.
+    """
+
+    retryable = False
+
+    def __init__(self, message: str, infocode: Optional[str] = None, info: Optional[str] = None):
+        super().__init__(message)
+        self.infocode = infocode
+        self.info = info
+
+
+class AmapAuthError(AmapError):
+    """Key invalid, recycled or lacking permission for the service."""
+
+
+class AmapQuotaError(AmapError):
+    """Daily quota exhausted for the key (not retryable until the quota resets)."""
+
+
+class AmapRateLimitError(AmapError):
+    """QPS limit exceeded; safe to retry after backing off."""
+
+    retryable = True
 
-    response = requests.get(url, timeout=timeout)
-    response.raise_for_status()
-    data = response.json()
 
-    # Check Amap API error status
+class AmapServerError(AmapError):
+    """Transient server-side failure (busy, gateway timeout, engine error)."""
+
+    retryable = True
+
+
+class AmapRequestError(AmapError):
+    """Request rejected as invalid (bad or missing parameters)."""
+
+
+class AmapNoResultError(AmapError):
+    """The request succeeded but returned no result."""
+
+
+INFOCODE_ERRORS = {
+    '10001': AmapAuthError,       # INVALID_USER_KEY
+    '10002': AmapAuthError,       # SERVICE_NOT_AVAILABLE
+    '10003': AmapQuotaError,      # DAILY_QUERY_OVER_LIMIT
+    '10004': AmapRateLimitError,  # ACCESS_TOO_FREQUENT
+    '10005': AmapAuthError,       # INVALID_USER_IP
+    '10006': AmapAuthError,       # INVALID_USER_DOMAIN
+    '10007': AmapAuthError,       # INVALID_USER_SIGNATURE
+    '10008': AmapAuthError,       # INVALID_USER_SCODE
+    '10009': AmapAuthError,       # USERKEY_PLAT_NOMATCH
+    '10010': AmapQuotaError,      # IP_QUERY_OVER_LIMIT
+    '10011': AmapRequestError,    # NOT_SUPPORT_HTTPS
+    '10012': AmapAuthError,       # INSUFFICIENT_PRIVILEGES
+    '10013': AmapAuthError,       # USER_KEY_RECYCLED
+    '10014': AmapRateLimitError,  # QPS_HAS_EXCEEDED_THE_LIMIT
+    '10015': AmapServerError,     # GATEWAY_TIMEOUT
+    '10016': AmapServerError,     # SERVER_IS_BUSY
+    '10017': AmapServerError,     # RESOURCE_UNAVAILABLE
+    '10019': AmapRateLimitError,  # CQPS_HAS_EXCEEDED_THE_LIMIT
+    '10020': AmapRateLimitError,  # CKQPS_HAS_EXCEEDED_THE_LIMIT
+    '10021': AmapRateLimitError,  # CUQPS_HAS_EXCEEDED_THE_LIMIT
+    '10026': AmapAuthError,       # INVALID_REQUEST (account blocked)
+    '10029': AmapQuotaError,      # ABROAD_DAILY_QUERY_OVER_LIMIT
+    '10041': AmapAuthError,       # NO_EFFECTIVE_INTERFACE
+    '10044': AmapQuotaError,      # USER_DAILY_QUERY_OVER_LIMIT
+    '10045': AmapQuotaError,      # USER_ABROAD_DAILY_QUERY_OVER_LIMIT
+    '20000': AmapRequestError,    # INVALID_PARAMS
+    '20001': AmapRequestError,    # MISSING_REQUIRED_PARAMS
+    '20002': AmapRequestError,    # ILLEGAL_REQUEST
+    '20003': AmapServerError,     # UNKNOWN_ERROR
+    '20011': AmapAuthError,       # INSUFFICIENT_ABROAD_PRIVILEGES
+    '20012': AmapRequestError,    # ILLEGAL_CONTENT
+    '20800': AmapNoResultError,   # OUT_OF_SERVICE
+    '20801': AmapNoResultError,   # NO_ROADS_NEARBY
+    '20802': AmapNoResultError,   # ROUTE_FAIL
+    '20803': AmapRequestError,    # OVER_DIRECTION_RANGE
+    '40000': AmapServerError,     # Service exception
+}
+
+
+def error_for_infocode(infocode: str, info: str) -> AmapError:
+    """
+    Build the typed exception for an Amap error response.
+
+    Unknown 3xxxx codes are engine response errors and treated as
+    transient; any other unknown code maps to the AmapError base class.
+    """
+    error_class = INFOCODE_ERRORS.get(infocode)
+    if error_class is None:
+        error_class = AmapServerError if infocode.startswith('3') else AmapError
+    return error_class(f"Amap API Error [{infocode}]: {info}", infocode, info)
+
+
+def is_retryable(exc: BaseException, transient_errors: tuple = ()) -> bool:
+    """
+    Decide whether a failed request is worth retrying.
+
+    Args:
+        exc: The raised exception
+        transient_errors: Transport exception types that are always retryable
+            (connection failures, timeouts)
+
+    Returns:
+        True for retryable Amap errors, transient transport errors and
+        HTTP 429/5xx responses
+    """
+    if isinstance(exc, AmapError):
+        return exc.retryable
+    if transient_errors and isinstance(exc, transient_errors):
+        return True
+    # requests.HTTPError carries .response.status_code, aiohttp errors .status
+    response = getattr(exc, 'response', None)
+    status = getattr(response, 'status_code', None) or getattr(exc, 'status', None)
+    return status == 429 or (isinstance(status, int) and status >= 500)
+
+
+def check_api_response(data: dict) -> dict:
+    """
+    Check Amap API error status.
+
+    Args:
+        data: Decoded JSON response
+
+    Returns:
+        The response unchanged if successful
+
+    Raises:
+        AmapError: Subclass matching the response infocode
+    """
     if data.get('status') != '1':
-        error_code = data.get('infocode', 'UNKNOWN')
+        error_code = str(data.get('infocode', 'UNKNOWN'))
         error_msg = data.get('info', 'Unknown error')
-        raise ValueError(f"Amap API Error [{error_code}]: {error_msg}")
+        raise error_for_infocode(error_code, error_msg)
 
     return data
 
 
+def chunked(items: list, size: int) -> list:
+    """Split a list into consecutive chunks of at most size items."""
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+def split_distance_results(data: dict, count: int) -> list:
+    """
+    Map a /distance response back onto its origins.
+
+    Args:
+        data: /distance response
+        count: Number of origins in the request
+
+    Returns:
+        List of (distance in meters, duration in seconds) in origin order,
+        None for origins with no result
+    """
+    results = [None] * count
+    for item in data.get('results') or []:
+        if str(item.get('code') or '0') != '0':
+            continue
+        try:
+            i = int(item['origin_id']) - 1
+            value = (float(item['distance']), float(item.get('duration') or 0))
+        except (KeyError, TypeError, ValueError):
+            continue
+        if 0 <= i < count:
+            results[i] = value
+    return results
+
+
+def distance_tiles(origins: list, destinations: list) -> list:
+    """
+    Split a distance matrix into /distance requests.
+
+    Repeated points are requested once; each request pairs up to
+    DISTANCE_MAX_ORIGINS distinct origins with one distinct destination.
+
+    Returns:
+        List of (origins, destination) tiles
+    """
+    origins = list(dict.fromkeys(origins))
+    return [(chunk, destination)
+            for destination in dict.fromkeys(destinations)
+            for chunk in chunked(origins, DISTANCE_MAX_ORIGINS)]
+
+
+def assemble_distance_matrix(origins: list, destinations: list, tiles: list,
+                             results: list) -> dict:
+    """
+    Build distance and duration matrices from the results of distance_tiles().
+
+    Returns:
+        Dict with the resolved 'origins' and 'destinations' and 'distance'
+        (meters) and 'duration' (seconds) matrices of shape (origins,
+        destinations): NumPy float arrays with NaN where Amap gave no result,
+        or nested lists with None when NumPy is not installed
+    """
+    pairs = {}
+    for (chunk, destination), values in zip(tiles, results):
+        for origin, value in zip(chunk, values):
+            pairs[origin, destination] = value
+    cells = [[pairs.get((origin, destination)) for destination in destinations]
+             for origin in origins]
+
+    try:
+        import numpy as np
+    except ImportError:
+        distance = [[cell and cell[0] for cell in row] for row in cells]
+        duration = [[cell and cell[1] for cell in row] for row in cells]
+    else:
+        matrix = np.full((len(origins), len(destinations), 2), np.nan)
+        for i, row in enumerate(cells):
+            for j, cell in enumerate(row):
+                if cell is not None:
+                    matrix[i, j] = cell
+        distance, duration = matrix[:, :, 0], matrix[:, :, 1]
+    return {'origins': origins, 'destinations': destinations,
+            'distance': distance, 'duration': duration}
+
+
+def _number(value, cast=int):
+    # Amap sends [] for values it cannot fill
+    try:
+        return cast(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def route_summary(route: dict, mode: str) -> dict:
+    """
+    Summarize the first option of a route.
+
+    Returns:
+        Dict with 'distance' (meters) and 'duration' (seconds), plus 'tolls'
+        and 'toll_distance' for driving, or 'cost' and 'walking_distance'
+        for transit
+    """
+    if mode == 'transit':
+        option = (route.get('transits') or [{}])[0]
+        return {
+            'distance': _number(option.get('distance')),
+            'duration': _number(option.get('duration')),
+            'cost': _number(option.get('cost'), float),
+            'walking_distance': _number(option.get('walking_distance'))
+        }
+
+    option = (route.get('paths') or [{}])[0]
+    summary = {
+        'distance': _number(option.get('distance')),
+        'duration': _number(option.get('duration'))
+    }
+    if mode == 'driving':
+        summary['tolls'] = _number(option.get('tolls'), float)
+        summary['toll_distance'] = _number(option.get('toll_distance'))
+    return summary
+
+
+def compare_mode_routes(results: dict) -> list:
+    """
+    Rank the routes of one trip across modes.
+
+    Args:
+        results: Mode to its route dict, or to the exception its request raised
+
+    Returns:
+        One row per mode, fastest first and failed modes last, with 'mode',
+        'distance' (meters), 'duration' (seconds), 'cost' (yuan paid: the
+        transit fare or the driving tolls, 0 otherwise), 'tolls' (driving
+        only) and 'error' (message of a failed mode, else None)
+    """
+    rows = []
+    for mode, result in results.items():
+        if isinstance(result, BaseException):
+            rows.append({'mode': mode, 'distance': None, 'duration': None, 'cost': None,
+                         'tolls': None, 'error': str(result) or type(result).__name__})
+            continue
+        summary = route_summary(result, mode)
+        tolls = summary.get('tolls')
+        rows.append({
+            'mode': mode,
+            'distance': summary['distance'],
+            'duration': summary['duration'],
+            'cost': summary['cost'] if mode == 'transit' else (tolls or 0.0),
+            'tolls': tolls,
+            'error': None
+        })
+    rows.sort(key=lambda row: (row['duration'] is None, row['duration'] or 0))
+    return rows
+
+
+def poi_page_count(data: dict, page_size: int = POI_PAGE_SIZE) -> int:
+    """Number of /place/text pages holding the 'count' POIs of a first page."""
+    count = int(data.get('count') or 0)
+    return min(-(-count // page_size), POI_MAX_PAGES)
+
+
+def unique_pois(pois: list, seen: set) -> list:
+    """POIs whose id is not in seen, adding their ids to it."""
+    fresh = []
+    for poi in pois:
+        poi_id = poi.get('id')
+        if poi_id:
+            if poi_id in seen:
+                continue
+            seen.add(poi_id)
+        fresh.append(poi)
+    return fresh
+
+
+def join_batch_param(values: list) -> str:
+    """Join values into a '|'-separated batch parameter."""
+    return '|'.join(str(v).replace('|', ' ') for v in values)
+
+
+def split_batch_geocodes(data: dict, count: int) -> list:
+    """
+    Map a batch=true geocoding response back onto its input addresses.
+
+    Args:
+        data: Batch geocoding response
+        count: Number of addresses in the request
+
+    Returns:
+        List of geocode dicts in input order, None for addresses with no result
+    """
+    geocodes = data.get('geocodes') or []
+    results = []
+    for i in range(count):
+        item = geocodes[i] if i < len(geocodes) else None
+        # Misses come back as entries whose fields are empty lists
+        if item and isinstance(item.get('location'), str) and item['location']:
+            results.append(item)
+        else:
+            results.append(None)
+    return results
+
+
+def split_batch_regeocodes(data: dict, count: int) -> list:
+    """
+    Map a batch=true reverse geocoding response back onto its input locations.
+
+    Args:
+        data: Batch reverse geocoding response
+        count: Number of locations in the request
+
+    Returns:
+        List of regeocode dicts in input order, None for locations with no result
+    """
+    regeocodes = data.get('regeocodes') or []
+    results = []
+    for i in range(count):
+        item = regeocodes[i] if i < len(regeocodes) else None
+        if item and isinstance(item.get('formatted_address'), str) and item['formatted_address']:
+            results.append(item)
+        else:
+            results.append(None)
+    return results
+
+
+class BaseAmapClient:
+    """Configuration and cache helpers shared by AmapClient and AsyncAmapClient."""
+
+    def __init__(self, api_key: Optional[str] = None, timeout: float = DEFAULT_TIMEOUT,
+                 connect_timeout: float = DEFAULT_CONNECT_TIMEOUT,
+                 base_url: Optional[str] = None, geocode_cache=None,
+                 response_cache=None, refresh_cache: bool = False, rate_limiter=None,
+                 max_retries: int = DEFAULT_MAX_RETRIES,
+                 backoff_base: float = DEFAULT_BACKOFF_BASE,
+                 backoff_max: float = DEFAULT_BACKOFF_MAX, key_pool=None,
+                 coalesce: bool = True, spatial_cache=None, ip_cache=None,
+                 route_cache=None):
+        """
+        Args:
+            api_key: Amap API key (if None, resolved via get_api_key on first use)
+            timeout: Read timeout in seconds
+            connect_timeout: Connect timeout in seconds
+            base_url: API base URL (defaults to AMAP_BASE_URL)
+            geocode_cache: GeocodeCache consulted before geocoding (optional)
+            response_cache: ResponseCache consulted before every request (optional)
+            refresh_cache: Skip cache lookups but still store fresh results
+            rate_limiter: RateLimiter pacing requests per key and endpoint (optional)
+            max_retries: Retries for retryable failures (0 disables retrying)
+            backoff_base: First backoff ceiling in seconds, doubled per retry
+            backoff_max: Upper bound for a single backoff in seconds
+            key_pool: KeyPool to rotate through when no api_key is given (optional)
+            coalesce: Let concurrent identical requests share one in-flight call
+            spatial_cache: SpatialCache answering reverse geocodes from nearby
+                cached points (optional)
+            ip_cache: IPRangeCache answering IP lookups by /24 network (optional)
+            route_cache: RouteCache answering route plans between nearby
+                points (optional)
+        """
+        self.api_key = api_key
+        self.timeout = timeout
+        self.connect_timeout = connect_timeout
+        self.base_url = base_url or AMAP_BASE_URL
+        self.geocode_cache = geocode_cache
+        self.response_cache = response_cache
+        self.refresh_cache = refresh_cache
+        self.rate_limiter = rate_limiter
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.key_pool = key_pool
+        self.coalesce = coalesce
+        self.spatial_cache = spatial_cache
+        self.ip_cache = ip_cache
+        self.route_cache = route_cache
+        self._base_path = urlsplit(self.base_url).path.rstrip('/')
+
+    def _resolve_key(self, api_key: Optional[str] = None) -> str:
+        if api_key:
+            return api_key
+        if not self.api_key:
+            self.api_key = get_api_key()
+        return self.api_key
+
+    def _select_key(self, api_key: Optional[str]) -> str:
+        # An explicit key always wins over the pool
+        if not api_key and self.key_pool is not None:
+            return self.key_pool.acquire()
+        return self._resolve_key(api_key)
+
+    def _report_key(self, api_key: str, error: Optional[BaseException] = None) -> bool:
+        """Report a request outcome to the key pool; True if the key was ejected."""
+        if self.key_pool is None:
+            return False
+        if error is None:
+            self.key_pool.report_success(api_key)
+            return False
+        return self.key_pool.report_failure(api_key, error)
+
+    def _backoff(self, attempt: int) -> float:
+        # Exponential backoff with full jitter
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    def _split_url(self, url: str) -> tuple[str, str]:
+        # Endpoint path relative to the base URL, and the raw query string
+        parts = urlsplit(url)
+        endpoint = parts.path
+        if self._base_path and endpoint.startswith(self._base_path):
+            endpoint = endpoint[len(self._base_path):]
+        return endpoint, parts.query
+
+    def _request_key(self, endpoint: str, query: str) -> tuple:
+        # Identity of a call for caching and coalescing; same form as ResponseCache.make_key
+        return (endpoint, tuple(sorted((k, v) for k, v in dict(parse_qsl(query)).items()
+                                       if k != 'key')))
+
+    def _flight_key(self, request_key: tuple, api_key: Optional[str]) -> tuple:
+        # Calls pinned to different explicit keys may fail differently, so never share them
+        return request_key, api_key
+
+    def _cached_response(self, key: tuple) -> Optional[dict]:
+        if self.response_cache is None or self.refresh_cache:
+            return None
+        return self.response_cache.get(key)
+
+    def _store_response(self, key: tuple, data: dict, size: int) -> None:
+        if self.response_cache is not None:
+            self.response_cache.put(key, data, size)
+
+    def _cached_route(self, mode: str, origin: str, destination: str, options: str,
+                      steps: bool) -> Optional[dict]:
+        if self.route_cache is None or self.refresh_cache:
+            return None
+        return self.route_cache.get(mode, origin, destination, options, steps)
+
+    def _store_route(self, mode: str, origin: str, destination: str, options: str,
+                     route: dict, steps: bool) -> None:
+        if self.route_cache is not None:
+            self.route_cache.put(mode, origin, destination, route, options, steps=steps)
+
+    def _dedupe_addresses(self, addresses: list) -> tuple[list, list]:
+        # Geocode each distinct normalized address once
+        from address import normalize_address
+
+        index = {}
+        owners = [index.setdefault(normalize_address(address), len(index))
+                  for address in addresses]
+        return list(index), owners
+
+    def _cached_ips(self, ips: list) -> list:
+        if self.ip_cache is None or self.refresh_cache:
+            return [None] * len(ips)
+        return self.ip_cache.get_many(ips)
+
+    def _group_ips(self, ips: list) -> tuple[list, list]:
+        # Look up one address per /24 network; without a cache only exact repeats
+        if self.ip_cache is not None:
+            return self.ip_cache.group(ips)
+        index = {}
+        owners = [index.setdefault(ip, len(index)) for ip in ips]
+        return list(index), owners
+
+    def _store_ips(self, ips: list, results: list) -> None:
+        if self.ip_cache is not None:
+            self.ip_cache.put_many([(ip, result) for ip, result in zip(ips, results)
+                                    if isinstance(result, dict)])
+
+    def save_caches(self) -> None:
+        """Persist caches that are written to disk on demand (the IP range cache)."""
+        if self.ip_cache is not None:
+            self.ip_cache.save()
+
+    def _city_adcode(self, city: str) -> str:
+        # Offline adcode for a city name, so Amap need not guess between namesakes
+        from adcode import resolve_adcode
+
+        return resolve_adcode(city) or city
+
+    def _transit_city(self, location: str, coords: str, city: Optional[str]) -> str:
+        # Citycode of a route endpoint, from the explicit city, the address
+        # prefix or the nearest city center, looked up offline
+        from adcode import get_index
+
+        index = get_index()
+        if index is None:
+            return city or '全国'
+        if city:
+            district = index.resolve(city) or index.resolve_address(city)
+        else:
+            district = index.resolve_address(location) or index.nearest(*parse_coordinates(coords))
+        if district is None or not district.citycode:
+            return city or '全国'
+        return district.citycode
+
+    def _cached_geocodes(self, addresses: list, city: Optional[str]) -> list:
+        if self.geocode_cache is None or self.refresh_cache:
+            return [None] * len(addresses)
+        return self.geocode_cache.get_many([(address, city) for address in addresses])
+
+    def _store_geocodes(self, addresses: list, city: Optional[str], results: list) -> None:
+        if self.geocode_cache is not None:
+            self.geocode_cache.put_many([(address, city, result)
+                                         for address, result in zip(addresses, results)
+                                         if isinstance(result, dict)])
+
+    def _cached_regeocodes(self, locations: list) -> list:
+        if self.spatial_cache is None or self.refresh_cache:
+            return [None] * len(locations)
+        return self.spatial_cache.get_many(locations)
+
+    def _cluster_locations(self, locations: list) -> tuple[list, list]:
+        # Resolve one location per group of points within the cache tolerance
+        if self.spatial_cache is None:
+            return locations, list(range(len(locations)))
+        return self.spatial_cache.cluster(locations)
+
+    def _store_regeocodes(self, locations: list, results: list) -> None:
+        if self.spatial_cache is not None:
+            self.spatial_cache.put_many([(lon, lat, result)
+                                         for (lon, lat), result in zip(locations, results)
+                                         if isinstance(result, dict)])
+
+
+class AmapClient(BaseAmapClient):
+    """
+    Reusable Amap API client backed by a pooled keep-alive HTTP session.
+
+    Connections to the Amap host are kept open between calls, so repeated
+    geocoding, POI and route requests skip the TCP/TLS handshake.
+
+    Usage:
+        with AmapClient(pool_size=20, timeout=5) as client:
+            client.geocode("北京市朝阳区阜通东大街6号", city="北京市")
+    """
+
+    def __init__(self, api_key: Optional[str] = None, pool_size: int = DEFAULT_POOL_SIZE,
+                 **kwargs):
+        """
+        Args:
+            api_key: Amap API key (if None, resolved via get_api_key on first use)
+            pool_size: Maximum number of pooled keep-alive connections
+            **kwargs: Timeouts, base_url and caches, see BaseAmapClient
+        """
+        from singleflight import SingleFlight
+
+        super().__init__(api_key, **kwargs)
+        self.pool_size = pool_size
+        self.flights = SingleFlight() if self.coalesce else None
+        self._session = None
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    @property
+    def session(self):
+        """Pooled requests session, created lazily on first request."""
+        if self._session is None:
+            with self._lock:
+                if self._session is None:
+                    self._session = self._create_session()
+        return self._session
+
+    def _create_session(self):
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=self.pool_size,
+                              pool_maxsize=self.pool_size)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        return session
+
+    def close(self) -> None:
+        """Close all pooled connections."""
+        with self._lock:
+            if self._session is not None:
+                self._session.close()
+                self._session = None
+
+    def get_json(self, url: str, api_key: Optional[str] = None,
+                 timeout: Optional[float] = None) -> dict:
+        """
+        Make HTTP request to a full Amap API URL over the pooled session.
+
+        Successful responses are served from the response cache when one is
+        configured; cached dicts are shared and must not be mutated.
+        Concurrent identical calls share a single in-flight request.
+        Retryable failures (QPS exceeded, server busy, timeouts, HTTP 429/5xx)
+        are retried up to max_retries times with jittered exponential backoff.
+
+        Args:
+            url: Full API URL
+            api_key: Amap API key (defaults to the client key)
+            timeout: Read timeout in seconds (defaults to the client timeout)
+
+        Returns:
+            JSON response as dict
+
+        Raises:
+            requests.RequestException: If request fails
+            AmapError: If response indicates error
+        """
+        endpoint, query = self._split_url(url)
+        request_key = self._request_key(endpoint, query)
+        cached = self._cached_response(request_key)
+        if cached is not None:
+            return cached
+
+        def fetch():
+            data, size = self._fetch_json(url, endpoint, api_key, timeout)
+            self._store_response(request_key, data, size)
+            return data
+
+        if self.flights is None:
+            return fetch()
+        return self.flights.do(self._flight_key(request_key, api_key), fetch)
+
+    def _fetch_json(self, url: str, endpoint: str, api_key: Optional[str],
+                    timeout: Optional[float]) -> tuple[dict, int]:
+        # Send the request with retries; returns the checked response and its body size
+        import requests
+
+        read_timeout = self.timeout if timeout is None else timeout
+        transient_errors = (requests.ConnectionError, requests.Timeout)
+
+        attempt = 0
+        while True:
+            key = self._select_key(api_key)
+            if self.rate_limiter is not None:
+                self.rate_limiter.acquire(key, endpoint)
+            try:
+                response = self.session.get(add_api_key(url, key),
+                                            timeout=(self.connect_timeout, read_timeout))
+                response.raise_for_status()
+                data = check_api_response(response.json())
+                self._report_key(key)
+                return data, len(response.content)
+            except Exception as e:
+                # A key ejected from the pool is retried at once on the next key
+                rotated = self._report_key(key, e)
+                if attempt >= self.max_retries or not (rotated or is_retryable(e, transient_errors)):
+                    raise
+                if not rotated:
+                    time.sleep(self._backoff(attempt))
+                attempt += 1
+
+    def request(self, endpoint: str, params: dict, api_key: Optional[str] = None) -> dict:
+        """
+        Call an Amap API endpoint.
+
+        Args:
+            endpoint: API endpoint path (e.g., "/geocode/geo")
+            params: Query parameters dict (without key)
+            api_key: Amap API key (defaults to the client key)
+
+        Returns:
+            JSON response as dict
+        """
+        url = build_api_url(endpoint, params, base_url=self.base_url)
+        return self.get_json(url, api_key)
+
+    def geocode(self, address: str, city: Optional[str] = None,
+                api_key: Optional[str] = None) -> dict:
+        """
+        Convert address to coordinates.
+
+        Args:
+            address: Address string
+            city: City name (optional, improves accuracy)
+            api_key: Amap API key (defaults to the client key)
+
+        Returns:
+            Geocoding result dict with coordinates
+        """
+        from address import normalize_address
+
+        address = normalize_address(address)
+        cached = self._cached_geocodes([address], city)[0]
+        if cached is not None:
+            return cached
+
+        params = {'address': address}
+        if city:
+            params['city'] = city
+
+        data = self.request('/geocode/geo', params, api_key)
+
+        geocodes = data.get('geocodes', [])
+        if not geocodes:
+            raise AmapNoResultError("No results found for the given address")
+
+        self._store_geocodes([address], city, geocodes[:1])
+        return geocodes[0]
+
+    def _run_isolated(self, fetch, chunk: list, return_exceptions: bool) -> list:
+        """
+        Run one batch request, isolating failures to the items they affect.
+
+        With return_exceptions, a failed batch yields its exception in place
+        of each item instead of raising; a batch rejected as invalid is split
+        and retried item by item so one bad input cannot fail its neighbours.
+        Authentication errors always propagate.
+        """
+        try:
+            return fetch(chunk)
+        except AmapAuthError:
+            raise
+        except Exception as e:
+            if not return_exceptions:
+                raise
+            if len(chunk) > 1 and isinstance(e, AmapRequestError):
+                return [self._run_isolated(fetch, [item], True)[0] for item in chunk]
+            return [e] * len(chunk)
+
+    def geocode_many(self, addresses: list, city: Optional[str] = None,
+                     max_workers: int = DEFAULT_MAX_WORKERS,
+                     api_key: Optional[str] = None, return_exceptions: bool = False) -> list:
+        """
+        Geocode many addresses using batch=true requests.
+
+        Addresses are normalized and deduplicated first, so spellings of the
+        same address are requested once. They are sent GEOCODE_BATCH_SIZE at
+        a time and the batches run concurrently on up to max_workers threads.
+
+        Args:
+            addresses: Address strings
+            city: City name applied to every address (optional)
+            max_workers: Maximum number of concurrent batch requests
+            api_key: Amap API key (defaults to the client key)
+            return_exceptions: Put the exception in place of items whose batch
+                failed instead of raising
+
+        Returns:
+            List of geocode dicts in input order, None for addresses with no result
+        """
+        addresses, owners = self._dedupe_addresses(list(addresses))
+        results = self._cached_geocodes(addresses, city)
+        pending = [i for i, result in enumerate(results) if result is None]
+        chunks = chunked([addresses[i] for i in pending], GEOCODE_BATCH_SIZE)
+
+        def fetch(chunk):
+            return self._geocode_batch(chunk, city, api_key)
+
+        def run(chunk):
+            return self._run_isolated(fetch, chunk, return_exceptions)
+
+        if len(chunks) <= 1 or max_workers <= 1:
+            fetched = [run(chunk) for chunk in chunks]
+        else:
+            with ThreadPoolExecutor(max_workers=min(max_workers, len(chunks))) as executor:
+                fetched = list(executor.map(run, chunks))
+
+        fetched = [item for chunk in fetched for item in chunk]
+        for i, result in zip(pending, fetched):
+            results[i] = result
+        self._store_geocodes([addresses[i] for i in pending], city, fetched)
+
+        return [results[owner] for owner in owners]
+
+    def _geocode_batch(self, addresses: list, city: Optional[str],
+                       api_key: Optional[str]) -> list:
+        params = {'address': join_batch_param(addresses), 'batch': 'true'}
+        if city:
+            params['city'] = city
+
+        data = self.request('/geocode/geo', params, api_key)
+        return split_batch_geocodes(data, len(addresses))
+
+    def reverse_geocode(self, longitude: float, latitude: float,
+                        api_key: Optional[str] = None) -> dict:
+        """
+        Convert coordinates to address.
+
+        Args:
+            longitude: Longitude
+            latitude: Latitude
+            api_key: Amap API key (defaults to the client key)
+
+        Returns:
+            Reverse geocoding result dict with address info; with a spatial
+            cache, possibly the cached result of a point within its tolerance
+        """
+        cached = self._cached_regeocodes([(longitude, latitude)])[0]
+        if cached is not None:
+            return cached
+
+        params = {
+            'location': f'{longitude},{latitude}',
+            'extensions': 'base'  # Use 'all' for detailed info
+        }
+
+        data = self.request('/geocode/regeo', params, api_key)
+
+        regeocode = data.get('regeocode')
+        if not regeocode:
+            raise AmapNoResultError("No results found for the given coordinates")
+
+        self._store_regeocodes([(longitude, latitude)], [regeocode])
+        return regeocode
+
+    def reverse_geocode_many(self, locations: list, max_workers: int = DEFAULT_MAX_WORKERS,
+                             api_key: Optional[str] = None,
+                             return_exceptions: bool = False) -> list:
+        """
+        Reverse geocode many coordinates using batch=true requests.
+
+        Locations are sent REGEO_BATCH_SIZE at a time and the batches run
+        concurrently on up to max_workers threads. With a spatial cache,
+        locations near a cached point are answered locally and of several
+        uncached locations within tolerance of each other only one is sent.
+
+        Args:
+            locations: (longitude, latitude) pairs
+            max_workers: Maximum number of concurrent batch requests
+            api_key: Amap API key (defaults to the client key)
+            return_exceptions: Put the exception in place of items whose batch
+                failed instead of raising
+
+        Returns:
+            List of regeocode dicts in input order, None for locations with no result
+        """
+        locations = list(locations)
+        results = self._cached_regeocodes(locations)
+        pending = [i for i, result in enumerate(results) if result is None]
+        representatives, owners = self._cluster_locations([locations[i] for i in pending])
+        chunks = chunked(representatives, REGEO_BATCH_SIZE)
+
+        def fetch(chunk):
+            return self._reverse_geocode_batch(chunk, api_key)
+
+        def run(chunk):
+            return self._run_isolated(fetch, chunk, return_exceptions)
+
+        if len(chunks) <= 1 or max_workers <= 1:
+            fetched = [run(chunk) for chunk in chunks]
+        else:
+            with ThreadPoolExecutor(max_workers=min(max_workers, len(chunks))) as executor:
+                fetched = list(executor.map(run, chunks))
+
+        fetched = [item for chunk in fetched for item in chunk]
+        for i, owner in zip(pending, owners):
+            results[i] = fetched[owner]
+        self._store_regeocodes(representatives, fetched)
+
+        return results
+
+    def _reverse_geocode_batch(self, locations: list, api_key: Optional[str]) -> list:
+        params = {
+            'location': join_batch_param(f'{lon},{lat}' for lon, lat in locations),
+            'extensions': 'base',
+            'batch': 'true'
+        }
+
+        data = self.request('/geocode/regeo', params, api_key)
+        return split_batch_regeocodes(data, len(locations))
+
+    def search_poi(self, keywords: str, city: str, longitude: Optional[float] = None,
+                   latitude: Optional[float] = None, radius: int = 1000,
+                   api_key: Optional[str] = None, page: int = 1,
+                   offset: Optional[int] = None) -> dict:
+        """
+        Search for Points of Interest.
+
+        Returns one page of results; use iter_pois() for all of them.
+
+        Args:
+            keywords: Search keywords
+            city: City name or adcode (required); names are sent as adcodes
+                when the offline adcode index knows them
+            longitude: Center longitude (optional, defaults to city center)
+            latitude: Center latitude (optional, defaults to city center)
+            radius: Search radius in meters (default: 1000)
+            api_key: Amap API key (defaults to the client key)
+            page: Page number, from 1
+            offset: POIs per page, at most POI_PAGE_SIZE (default: Amap's 20)
+
+        Returns:
+            POI search result dict; 'count' is the total over all pages
+        """
+        params = {
+            'keywords': keywords,
+            'city': self._city_adcode(city),
+            'radius': radius
+        }
+
+        if longitude is not None and latitude is not None:
+            params['location'] = f'{longitude},{latitude}'
+        if page != 1:
+            params['page'] = page
+        if offset is not None:
+            params['offset'] = offset
+
+        data = self.request('/place/text', params, api_key)
+
+        pois = data.get('pois', [])
+        if not pois:
+            raise AmapNoResultError("No POIs found")
+
+        return data
+
+    def iter_pois(self, keywords: str, city: str, longitude: Optional[float] = None,
+                  latitude: Optional[float] = None, radius: int = 1000,
+                  limit: Optional[int] = None, max_workers: int = DEFAULT_MAX_WORKERS,
+                  api_key: Optional[str] = None, totals: Optional[dict] = None) -> Iterator[dict]:
+        """
+        Yield every POI of a search, fetching pages concurrently.
+
+        The first page gives the total count; later pages are then requested
+        on up to max_workers threads, never more pages ahead than limit still
+        needs. POIs are yielded in page order as each page arrives, once per
+        POI id. Closing the generator early cancels pages not yet requested.
+
+        Args:
+            keywords: Search keywords
+            city: City name or adcode (required)
+            longitude: Center longitude (optional, defaults to city center)
+            latitude: Center latitude (optional, defaults to city center)
+            radius: Search radius in meters (default: 1000)
+            limit: Stop after this many POIs (default: all, at most
+                POI_PAGE_SIZE * POI_MAX_PAGES)
+            max_workers: Maximum number of pages in flight
+            api_key: Amap API key (defaults to the client key)
+            totals: Dict that receives the search's total 'count' from the
+                first page, for reporting how many POIs were not fetched
+
+        Yields:
+            POI dicts; nothing if the search has no results
+        """
+        def fetch(page):
+            try:
+                return self.search_poi(keywords, city, longitude, latitude, radius,
+                                       api_key=api_key, page=page, offset=POI_PAGE_SIZE)
+            except AmapNoResultError:
+                return {'pois': []}
+
+        if limit is not None and limit <= 0:
+            return
+        data = fetch(1)
+        if totals is not None:
+            totals['count'] = int(data.get('count') or 0)
+        pages = poi_page_count(data)
+        seen = set()
+        remaining = limit
+        next_page = 2
+        in_flight = deque()
+        executor = ThreadPoolExecutor(max_workers=max(1, max_workers))
+        try:
+            while True:
+                pois = unique_pois(data.get('pois') or [], seen)
+                if remaining is not None:
+                    pois = pois[:remaining]
+                    remaining -= len(pois)
+                # Amap's count overshoots; a short or empty page is the real end
+                if len(data.get('pois') or []) < POI_PAGE_SIZE:
+                    pages = 0
+                ahead = pages if remaining is None else -(-remaining // POI_PAGE_SIZE)
+                while next_page <= pages and len(in_flight) < min(max_workers, ahead):
+                    in_flight.append(executor.submit(fetch, next_page))
+                    next_page += 1
+
+                yield from pois
+                if not in_flight or remaining == 0:
+                    return
+                data = in_flight.popleft().result()
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def search_around(self, longitude: float, latitude: float, radius: int = 3000,
+                      keywords: Optional[str] = None, types: Optional[str] = None,
+                      api_key: Optional[str] = None, page: int = 1,
+                      offset: Optional[int] = None) -> dict:
+        """
+        Search for Points of Interest within a circle, nearest first.
+
+        Unlike search_poi, an empty result is not an error: area crawls probe
+        many circles that hold nothing.
+
+        Args:
+            longitude: Center longitude
+            latitude: Center latitude
+            radius: Search radius in meters (at most 50000)
+            keywords: Search keywords (optional)
+            types: POI type codes or names, '|'-separated (optional)
+            api_key: Amap API key (defaults to the client key)
+            page: Page number, from 1
+            offset: POIs per page, at most POI_PAGE_SIZE (default: Amap's 20)
+
+        Returns:
+            POI search result dict; 'count' is the total over all pages
+        """
+        params = {
+            'location': f'{longitude},{latitude}',
+            'radius': radius,
+            'sortrule': 'distance'
+        }
+
+        if keywords:
+            params['keywords'] = keywords
+        if types:
+            params['types'] = types
+        if page != 1:
+            params['page'] = page
+        if offset is not None:
+            params['offset'] = offset
+
+        return self.request('/place/around', params, api_key)
+
+    def get_ip_location(self, ip: str, api_key: Optional[str] = None) -> dict:
+        """
+        Get geographic location from IP address.
+
+        With an IP cache, any address of a /24 network located before is
+        answered locally.
+
+        Args:
+            ip: IP address to locate
+            api_key: Amap API key (defaults to the client key)
+
+        Returns:
+            IP location result dict
+        """
+        cached = self._cached_ips([ip])[0]
+        if cached is not None:
+            return cached
+
+        data = self.request('/ip', {'ip': ip}, api_key)
+        self._store_ips([ip], [data])
+        return data
+
+    def get_ip_location_many(self, ips: list, max_workers: int = DEFAULT_MAX_WORKERS,
+                             api_key: Optional[str] = None,
+                             return_exceptions: bool = False) -> list:
+        """
+        Locate many IP addresses.
+
+        Cached addresses are answered locally and of the remaining ones only
+        one address per /24 network is requested, on up to max_workers
+        threads.
+
+        Args:
+            ips: IP addresses
+            max_workers: Maximum number of concurrent requests
+            api_key: Amap API key (defaults to the client key)
+            return_exceptions: Put the exception in place of addresses whose
+                lookup failed instead of raising
+
+        Returns:
+            List of IP location dicts in input order
+        """
+        ips = list(ips)
+        results = self._cached_ips(ips)
+        pending = [i for i, result in enumerate(results) if result is None]
+        representatives, owners = self._group_ips([ips[i] for i in pending])
+
+        def fetch(chunk):
+            return [self.request('/ip', {'ip': chunk[0]}, api_key)]
+
+        def run(ip):
+            return self._run_isolated(fetch, [ip], return_exceptions)[0]
+
+        if len(representatives) <= 1 or max_workers <= 1:
+            fetched = [run(ip) for ip in representatives]
+        else:
+            with ThreadPoolExecutor(max_workers=min(max_workers, len(representatives))) as executor:
+                fetched = list(executor.map(run, representatives))
+
+        for i, owner in zip(pending, owners):
+            result = fetched[owner]
+            results[i] = {**result, 'ip': ips[i]} if isinstance(result, dict) else result
+        self._store_ips(representatives, fetched)
+
+        return results
+
+    def resolve_location(self, location: str, api_key: Optional[str] = None) -> str:
+        """
+        Resolve location to coordinates if it's an address.
+
+        Args:
+            location: Location string (address or "lon,lat")
+            api_key: Amap API key (defaults to the client key)
+
+        Returns:
+            Coordinate string "lon,lat"
+        """
+        coords = parse_coordinates(location)
+        if coords:
+            return f"{coords[0]},{coords[1]}"
+
+        # Geocode the address
+        try:
+            result = self.geocode(location, api_key=api_key)
+            return result['location']
+        except Exception as e:
+            raise ValueError(f"Failed to resolve location '{location}': {e}")
+
+    def resolve_locations(self, locations: list, max_workers: int = DEFAULT_MAX_WORKERS,
+                          api_key: Optional[str] = None) -> list:
+        """
+        Resolve many locations to coordinates, geocoding the addresses in batches.
+
+        Args:
+            locations: Location strings (addresses or "lon,lat")
+            max_workers: Maximum number of concurrent geocoding batches
+            api_key: Amap API key (defaults to the client key)
+
+        Returns:
+            List of "lon,lat" strings in input order
+
+        Raises:
+            ValueError: If an address cannot be resolved or its geocoding failed
+        """
+        locations = list(locations)
+        coords = [parse_coordinates(location) for location in locations]
+        addresses = [location for location, point in zip(locations, coords) if point is None]
+        try:
+            geocodes = iter(self.geocode_many(addresses, max_workers=max_workers, api_key=api_key)
+                            if addresses else [])
+        except AmapError as e:
+            names = ', '.join(f"'{address}'" for address in addresses)
+            raise ValueError(f"Failed to resolve location {names}: {e}")
+
+        resolved = []
+        for location, point in zip(locations, coords):
+            if point is not None:
+                resolved.append(f"{point[0]},{point[1]}")
+                continue
+            result = next(geocodes)
+            if result is None:
+                raise ValueError(f"Failed to resolve location '{location}': No results found")
+            resolved.append(result['location'])
+        return resolved
+
+    def distance_matrix(self, origins: list, destinations: list, mode: str = 'driving',
+                        max_workers: int = DEFAULT_MAX_WORKERS,
+                        api_key: Optional[str] = None) -> dict:
+        """
+        Distances and durations from every origin to every destination.
+
+        All locations are resolved once up front. The matrix is then split
+        into /distance requests of up to DISTANCE_MAX_ORIGINS origins and one
+        destination (see distance_tiles), which run on up to max_workers
+        threads.
+
+        Args:
+            origins: Origin locations (addresses or "lon,lat")
+            destinations: Destination locations (addresses or "lon,lat")
+            mode: 'driving', 'walking' or 'straight' (straight-line distance)
+            max_workers: Maximum number of concurrent requests
+            api_key: Amap API key (defaults to the client key)
+
+        Returns:
+            Dict with the resolved 'origins' and 'destinations' and the
+            'distance' (meters) and 'duration' (seconds) matrices, see
+            assemble_distance_matrix
+        """
+        if mode not in DISTANCE_TYPES:
+            raise ValueError(f"Invalid mode '{mode}'. Must be one of: {', '.join(DISTANCE_TYPES)}")
+
+        origins, destinations = list(origins), list(destinations)
+        points = self.resolve_locations(origins + destinations, max_workers, api_key)
+        origins, destinations = points[:len(origins)], points[len(origins):]
+        tiles = distance_tiles(origins, destinations)
+
+        def fetch(tile):
+            chunk, destination = tile
+            params = {
+                'origins': join_batch_param(chunk),
+                'destination': destination,
+                'type': DISTANCE_TYPES[mode]
+            }
+            return split_distance_results(self.request('/distance', params, api_key), len(chunk))
+
+        if len(tiles) <= 1 or max_workers <= 1:
+            results = [fetch(tile) for tile in tiles]
+        else:
+            with ThreadPoolExecutor(max_workers=min(max_workers, len(tiles))) as executor:
+                results = list(executor.map(fetch, tiles))
+
+        return assemble_distance_matrix(origins, destinations, tiles, results)
+
+    def plan_route(self, origin: str, destination: str, mode: str,
+                   api_key: Optional[str] = None, city: Optional[str] = None,
+                   cityd: Optional[str] = None, steps: bool = True) -> dict:
+        """
+        Plan route between two locations.
+
+        Address endpoints are geocoded in a single batch request (or from
+        the cache), so a route costs at most two round trips. With a route
+        cache, a route already planned between the same grid cells (in the
+        same time-of-day bucket for driving and transit) is returned
+        without any route request.
+
+        For transit, the origin and destination cities default to the
+        divisions named in the addresses, else the city whose center is
+        nearest, from the offline adcode index; without an index they fall
+        back to '全国'.
+
+        Args:
+            origin: Start location (address or "lon,lat")
+            destination: End location (address or "lon,lat")
+            mode: Transportation mode: driving, walking, cycling, ebicycle, transit
+            api_key: Amap API key (defaults to the client key)
+            city: Transit origin city name or citycode (optional)
+            cityd: Transit destination city name or citycode (optional)
+            steps: Whether turn-by-turn steps are needed; False also accepts
+                cached routes stored as summaries only
+
+        Returns:
+            Route planning result dict
+        """
+        if mode not in MODES:
+            raise ValueError(f"Invalid mode '{mode}'. Must be one of: {', '.join(MODES.keys())}")
+
+        # Resolve both endpoints together: addresses share one batch geocode
+        origin_coords, dest_coords = self.resolve_locations([origin, destination],
+                                                            api_key=api_key)
+
+        params = {
+            'origin': origin_coords,
+            'destination': dest_coords
+        }
+
+        # Add mode-specific parameters
+        if mode == 'transit':
+            params['city'] = self._transit_city(origin, origin_coords, city)
+            params['cityd'] = self._transit_city(destination, dest_coords, cityd)
+
+        options = f"{params['city']}|{params['cityd']}" if mode == 'transit' else ''
+        cached = self._cached_route(mode, origin_coords, dest_coords, options, steps)
+        if cached is not None:
+            return cached
+
+        data = self.request(MODES[mode], params, api_key)
+
+        route = data.get('route', {})
+        if not route.get('transits' if mode == 'transit' else 'paths'):
+            raise AmapNoResultError("No route found")
+
+        self._store_route(mode, origin_coords, dest_coords, options, route, steps)
+        return route
+
+    def compare_modes(self, origin: str, destination: str, modes: Optional[list] = None,
+                      api_key: Optional[str] = None, city: Optional[str] = None,
+                      cityd: Optional[str] = None) -> list:
+        """
+        Plan one trip in several modes at once and rank them.
+
+        Both endpoints (and the transit cities) are resolved once, then the
+        route requests of all modes run concurrently, so the comparison
+        costs about one route request of latency.
+
+        Args:
+            origin: Start location (address or "lon,lat")
+            destination: End location (address or "lon,lat")
+            modes: Modes to compare (default: all of MODES)
+            api_key: Amap API key (defaults to the client key)
+            city: Transit origin city name or citycode (optional)
+            cityd: Transit destination city name or citycode (optional)
+
+        Returns:
+            Comparison rows, fastest first, see compare_mode_routes
+        """
+        modes = list(dict.fromkeys(modes or MODES))
+        for mode in modes:
+            if mode not in MODES:
+                raise ValueError(f"Invalid mode '{mode}'. Must be one of: {', '.join(MODES.keys())}")
+
+        origin_coords, dest_coords = self.resolve_locations([origin, destination],
+                                                            api_key=api_key)
+        if 'transit' in modes:
+            city = self._transit_city(origin, origin_coords, city)
+            cityd = self._transit_city(destination, dest_coords, cityd)
+
+        def plan(mode):
+            try:
+                return self.plan_route(origin_coords, dest_coords, mode, api_key, city, cityd,
+                                       steps=False)
+            except (ValueError, OSError) as e:
+                # AmapError is a ValueError; requests errors (timeouts,
+                # connection failures) and daemon disconnects are OSErrors
+                return e
+
+        with ThreadPoolExecutor(max_workers=len(modes)) as executor:
+            results = dict(zip(modes, executor.map(plan, modes)))
+        return compare_mode_routes(results)
+
+
+_default_client = None
+_default_client_lock = threading.Lock()
+
+
+def get_default_client():
+    """
+    Get the process-wide shared client.
+
+    If an Amap daemon is running (see amap_daemon.py), calls are forwarded
+    to it; otherwise a local AmapClient is created with create_default_client.
+
+    Returns:
+        Shared AmapClient or DaemonClient instance
+    """
+    global _default_client
+    if _default_client is None:
+        with _default_client_lock:
+            if _default_client is None:
+                _default_client = connect_daemon() or create_default_client()
+    return _default_client
+
+
+def create_default_client() -> AmapClient:
+    """
+    Create an AmapClient wired to the shared caches, rate limiter and key pool.
+
+    Pool size and timeouts can be tuned with the AMAP_POOL_SIZE and
+    AMAP_TIMEOUT environment variables.
+
+    Returns:
+        New AmapClient instance
+    """
+    return AmapClient(
+        pool_size=int(os.environ.get('AMAP_POOL_SIZE', DEFAULT_POOL_SIZE)),
+        timeout=float(os.environ.get('AMAP_TIMEOUT', DEFAULT_TIMEOUT)),
+        geocode_cache=open_geocode_cache(),
+        response_cache=open_response_cache(),
+        rate_limiter=open_rate_limiter(),
+        key_pool=get_key_pool(),
+        spatial_cache=open_spatial_cache(),
+        ip_cache=open_ip_cache(),
+        route_cache=open_route_cache()
+    )
+
+
+def connect_daemon():
+    """
+    Connect to a running Amap daemon.
+
+    Returns:
+        DaemonClient, or None if no daemon is listening or AMAP_NO_DAEMON=1
+    """
+    if os.environ.get('AMAP_NO_DAEMON') == '1':
+        return None
+
+    from amap_daemon import DaemonClient, socket_path
+
+    path = socket_path()
+    if not path.exists():
+        return None
+    try:
+        return DaemonClient.connect(path)
+    except OSError:
+        return None
+
+
+def open_geocode_cache():
+    """
+    Open the shared on-disk geocode cache.
+
+    Returns:
+        GeocodeCache, or None if disabled with AMAP_NO_CACHE=1
+    """
+    if os.environ.get('AMAP_NO_CACHE') == '1':
+        return None
+
+    from cache import GeocodeCache
+
+    return GeocodeCache()
+
+
+def open_response_cache():
+    """
+    Create an in-memory response cache.
+
+    Returns:
+        ResponseCache, or None if disabled with AMAP_NO_CACHE=1
+    """
+    if os.environ.get('AMAP_NO_CACHE') == '1':
+        return None
+
+    from cache import ResponseCache
+
+    return ResponseCache()
+
+
+def open_spatial_cache():
+    """
+    Create an in-memory spatial cache for reverse geocoding.
+
+    The match radius defaults to 10 meters and can be set with
+    AMAP_REGEO_TOLERANCE; AMAP_REGEO_TOLERANCE=0 disables the cache.
+
+    Returns:
+        SpatialCache, or None if disabled (also with AMAP_NO_CACHE=1)
+    """
+    from cache import DEFAULT_REGEO_TOLERANCE, SpatialCache
+
+    tolerance = float(os.environ.get('AMAP_REGEO_TOLERANCE', DEFAULT_REGEO_TOLERANCE))
+    if tolerance <= 0 or os.environ.get('AMAP_NO_CACHE') == '1':
+        return None
+
+    return SpatialCache(tolerance)
+
+
+def open_ip_cache():
+    """
+    Open the shared on-disk IP range cache.
+
+    Returns:
+        IPRangeCache, or None if disabled with AMAP_NO_CACHE=1
+    """
+    if os.environ.get('AMAP_NO_CACHE') == '1':
+        return None
+
+    from cache import IPRangeCache
+
+    return IPRangeCache()
+
+
+def open_route_cache():
+    """
+    Open the shared on-disk route cache.
+
+    Endpoints are snapped to a 50 meter grid by default, configurable with
+    AMAP_ROUTE_PRECISION (meters; 0 disables the cache). AMAP_ROUTE_BUCKET
+    sets the time-of-day bucket width in seconds (default one hour), and
+    AMAP_ROUTE_SUMMARY_ONLY=1 stores driving routes planned with
+    steps=False without their steps.
+
+    Returns:
+        RouteCache, or None if disabled (also with AMAP_NO_CACHE=1)
+    """
+    from cache import DEFAULT_ROUTE_BUCKET, DEFAULT_ROUTE_PRECISION, RouteCache
+
+    precision = float(os.environ.get('AMAP_ROUTE_PRECISION', DEFAULT_ROUTE_PRECISION))
+    if precision <= 0 or os.environ.get('AMAP_NO_CACHE') == '1':
+        return None
+
+    return RouteCache(precision=precision,
+                      bucket=float(os.environ.get('AMAP_ROUTE_BUCKET', DEFAULT_ROUTE_BUCKET)),
+                      summary_only=os.environ.get('AMAP_ROUTE_SUMMARY_ONLY') == '1')
+
+
+def open_rate_limiter():
+    """
+    Create the client-side rate limiter.
+
+    The per-endpoint QPS limit defaults to the documented 100 and can be set
+    with AMAP_QPS; AMAP_QPS=0 disables rate limiting.
+
+    Returns:
+        RateLimiter, or None if disabled
+    """
+    from ratelimit import DEFAULT_QPS, RateLimiter
+
+    qps = float(os.environ.get('AMAP_QPS', DEFAULT_QPS))
+    if qps <= 0:
+        return None
+
+    return RateLimiter(default_qps=qps)
+
+
+def add_cache_arguments(parser) -> None:
+    """Add --no-cache and --refresh options to a script's argument parser."""
+    parser.add_argument('--no-cache', action='store_true',
+                        help='Bypass the local cache entirely')
+    parser.add_argument('--refresh', action='store_true',
+                        help='Ignore cached results but store fresh ones')
+
+
+def apply_cache_arguments(args) -> None:
+    """Apply --no-cache / --refresh to the default client."""
+    client = get_default_client()
+    if not isinstance(client, BaseAmapClient):
+        # Forwarded calls carry the options to the daemon
+        client.no_cache = args.no_cache
+        client.refresh_cache = args.refresh
+        return
+    if args.no_cache:
+        client.geocode_cache = None
+        client.response_cache = None
+        client.spatial_cache = None
+        client.ip_cache = None
+        client.route_cache = None
+    client.refresh_cache = args.refresh
+
+
+def make_api_request(url: str, api_key: str, timeout: int = 10) -> dict:
+    """
+    Make HTTP request to Amap API.
+
+    Args:
+        url: Full API URL
+        api_key: Amap API key
+        timeout: Request timeout in seconds
+
+    Returns:
+        JSON response as dict
+
+    Raises:
+        requests.RequestException: If request fails
+        ValueError: If response indicates error
+    """
+    return get_default_client().get_json(url, api_key, timeout=timeout)
+
+
 def format_address(address_components: dict) -> str:
     """
     Format Amap address components into readable string.
@@ -119,13 +1716,9 @@ def format_address(address_components: dict) -> str:
     Returns:
         Formatted address string
     """
-    parts = [
-        address_components.get('province', ''),
-        address_components.get('city', ''),
-        address_components.get('district', ''),
-        address_components.get('street', ''),
-        address_components.get('number', '')
-    ]
+    from address import ADDRESS_COMPONENTS
+
+    parts = [address_components.get(name, '') for name in ADDRESS_COMPONENTS]
     return ''.join([p for p in parts if p])
 
 
@@ -141,18 +1734,4 @@ def geocode(address: str, city: str = None, api_key: str = None) -> dict:
     Returns:
         Geocoding result dict with coordinates
     """
-    if api_key is None:
-        api_key = get_api_key()
-
-    params = {'address': address}
-    if city:
-        params['city'] = city
-
-    url = build_api_url('/geocode/geo', params)
-    data = make_api_request(url, api_key)
-
-    geocodes = data.get('geocodes', [])
-    if not geocodes:
-        raise ValueError("No results found for the given address")
-
-    return geocodes[0]
+    return get_default_client().geocode(address, city, api_key=api_key)
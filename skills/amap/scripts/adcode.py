@@ -0,0 +1,505 @@
+#!/usr/bin/env python3
+"""
+Amap Administrative Division Index
+
+Offline lookup of Amap administrative divisions (province, city, district)
+by name, alias, pinyin or adcode, returning the adcode, parent, citycode
+and center. The index is a compact binary file built once from the
+/config/district API and memory-mapped on first use, so importing this
+module costs nothing and lookups never touch the network.
+
+Usage:
+    # Build the index (one /config/district request)
+    python scripts/adcode.py build
+
+    # Build from a saved /config/district response instead
+    python scripts/adcode.py build --input districts.json
+
+    # Look up a division, optionally within a parent
+    python scripts/adcode.py lookup 朝阳 --parent 辽宁
+    python scripts/adcode.py prefix shenz
+
+File layout (little-endian): a header, then fixed-size records sorted by
+adcode, then keys sorted by their UTF-8 bytes, then a string pool:
+    header  magic, record count, key count, string pool size
+    record  adcode, parent record, lon/lat in 1e-6 degrees, name and
+            citycode offsets and lengths, level
+    key     key offset and length, record
+"""
+
+import argparse
+import json
+import math
+import mmap
+import os
+import re
+import struct
+import sys
+import threading
+import unicodedata
+from bisect import bisect_left
+from pathlib import Path
+from typing import NamedTuple, Optional
+
+# Add scripts directory to path for imports
+sys.path.insert(0, __file__.rsplit('/', 1)[0])
+
+from address import parse_address
+
+
+MAGIC = b'AMAPADC1'
+LEVELS = ('country', 'province', 'city', 'district')
+
+DEFAULT_INDEX_PATH = Path(__file__).resolve().parent.parent / 'data' / 'adcode.bin'
+
+# Cell size of the grid nearest() buckets division centers on
+GRID_DEGREES = 0.5
+
+_HEADER = struct.Struct('<8sIII')
+_RECORD = struct.Struct('<IiiiIIBBBx')
+_KEY = struct.Struct('<IHI')
+
+# Suffixes dropped to form aliases: 广西壮族自治区 -> 广西, 朝阳区 -> 朝阳
+_ALIAS = re.compile(r'^(.{2,}?)(?:[一-鿿]{1,4}族|维吾尔)*'
+                    r'(?:特别行政区|自治区|自治州|自治县|自治旗|地区|林区|省|市|区|县|盟|旗)$')
+
+
+class District(NamedTuple):
+    """One administrative division."""
+    adcode: str
+    name: str
+    level: str
+    citycode: Optional[str]
+    center: Optional[tuple]
+    parent: Optional[str]
+
+
+def normalize_key(text: str) -> str:
+    """Lookup form of a name: half-width, lower case, no whitespace."""
+    return ''.join(unicodedata.normalize('NFKC', text).lower().split())
+
+
+def alias_for(name: str) -> Optional[str]:
+    """Short form of a division name, or None if it has none."""
+    match = _ALIAS.match(name)
+    return match.group(1) if match else None
+
+
+class _Column:
+    # Sequence view over one field of a packed table, for bisect
+    def __init__(self, count: int, get):
+        self.count = count
+        self.get = get
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, i):
+        return self.get(i)
+
+
+class AdcodeIndex:
+    """
+    Read-only, memory-mapped adcode index.
+
+    Exact and prefix lookups are binary searches over the sorted keys;
+    adcode lookups are binary searches over the sorted records. Nearest
+    center lookups scan a per-level grid built on first use.
+    """
+
+    def __init__(self, path: Path):
+        """
+        Args:
+            path: Index file written by build_index()
+
+        Raises:
+            ValueError: If the file is not an adcode index
+        """
+        self.path = Path(path)
+        with open(self.path, 'rb') as f:
+            self._buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self._count, key_count, _ = _HEADER.unpack_from(self._buf, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{self.path} is not an adcode index")
+        self._records = _HEADER.size
+        self._keys = self._records + self._count * _RECORD.size
+        self._strings = self._keys + key_count * _KEY.size
+        self._adcodes = _Column(self._count, self._adcode)
+        self._key_column = _Column(key_count, self._key_bytes)
+        self._grids = {}
+        self._grid_lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return self._count
+
+    def close(self) -> None:
+        self._buf.close()
+
+    def _string(self, offset: int, length: int) -> str:
+        start = self._strings + offset
+        return self._buf[start:start + length].decode('utf-8')
+
+    def _adcode(self, i: int) -> int:
+        return _RECORD.unpack_from(self._buf, self._records + i * _RECORD.size)[0]
+
+    def _key_bytes(self, i: int) -> bytes:
+        offset, length, _ = _KEY.unpack_from(self._buf, self._keys + i * _KEY.size)
+        start = self._strings + offset
+        return self._buf[start:start + length]
+
+    def _key_record(self, i: int) -> int:
+        return _KEY.unpack_from(self._buf, self._keys + i * _KEY.size)[2]
+
+    def _district(self, i: int) -> District:
+        (adcode, parent, lon, lat, name_offset, citycode_offset,
+         name_length, citycode_length, level) = _RECORD.unpack_from(
+            self._buf, self._records + i * _RECORD.size)
+        return District(
+            adcode=f'{adcode:06d}',
+            name=self._string(name_offset, name_length),
+            level=LEVELS[level],
+            citycode=self._string(citycode_offset, citycode_length) or None,
+            center=(lon / 1e6, lat / 1e6) if lon or lat else None,
+            parent=f'{self._adcode(parent):06d}' if parent >= 0 else None
+        )
+
+    def get(self, adcode: str) -> Optional[District]:
+        """Return the division with an adcode, or None."""
+        if not str(adcode).isdigit():
+            return None
+        i = bisect_left(self._adcodes, int(adcode))
+        if i < self._count and self._adcode(i) == int(adcode):
+            return self._district(i)
+        return None
+
+    def lookup(self, name: str) -> list:
+        """Return every division whose name, alias or pinyin equals name."""
+        key = normalize_key(name).encode('utf-8')
+        i = bisect_left(self._key_column, key)
+        records = []
+        while i < len(self._key_column) and self._key_bytes(i) == key:
+            records.append(self._key_record(i))
+            i += 1
+        return [self._district(r) for r in dict.fromkeys(records)]
+
+    def prefix(self, text: str, limit: int = 10) -> list:
+        """Return up to limit divisions with a name, alias or pinyin starting with text."""
+        key = normalize_key(text).encode('utf-8')
+        i = bisect_left(self._key_column, key)
+        records = {}
+        while (i < len(self._key_column) and len(records) < limit
+               and self._key_bytes(i).startswith(key)):
+            records.setdefault(self._key_record(i))
+            i += 1
+        return [self._district(r) for r in records]
+
+    def ancestors(self, district: District) -> list:
+        """Return the parent chain of a division, nearest first."""
+        chain = []
+        while district.parent:
+            district = self.get(district.parent)
+            chain.append(district)
+        return chain
+
+    def resolve(self, name: str, parent: Optional[str] = None) -> Optional[District]:
+        """
+        Resolve a name or adcode to a single division.
+
+        Ambiguous names prefer an exact name over an alias, then the higher
+        level: 朝阳 is 朝阳市 rather than one of the 朝阳区.
+
+        Args:
+            name: Division name, alias, pinyin or adcode
+            parent: Name or adcode of a containing division (optional)
+
+        Returns:
+            Best matching District, or None
+        """
+        if name.isdigit():
+            return self.get(name)
+        candidates = self.lookup(name)
+        if parent:
+            scope = self.resolve(parent)
+            if scope is None:
+                return None
+            candidates = [d for d in candidates
+                          if scope.adcode in {a.adcode for a in self.ancestors(d)}]
+        if not candidates:
+            return None
+        key = normalize_key(name)
+        return min(candidates, key=lambda d: (d.name != key, LEVELS.index(d.level)))
+
+    def resolve_address(self, address: str) -> Optional[District]:
+        """Return the most specific division named by an address's prefix, or None."""
+        components = parse_address(address)
+        found = None
+        for level in ('province', 'city', 'district'):
+            if level in components:
+                district = self.resolve(components[level], found.adcode if found else None)
+                if district is not None:
+                    found = district
+        return found
+
+    def _grid(self, rank: int) -> tuple:
+        # Cells of GRID_DEGREES holding (lon, lat, record) of one level's centers
+        grid = self._grids.get(rank)
+        if grid is None:
+            with self._grid_lock:
+                grid = self._grids.get(rank)
+                if grid is None:
+                    cells = {}
+                    for i in range(self._count):
+                        fields = _RECORD.unpack_from(self._buf, self._records + i * _RECORD.size)
+                        if fields[8] != rank or not (fields[2] or fields[3]):
+                            continue
+                        lon, lat = fields[2] / 1e6, fields[3] / 1e6
+                        cell = (math.floor(lon / GRID_DEGREES), math.floor(lat / GRID_DEGREES))
+                        cells.setdefault(cell, []).append((lon, lat, i))
+                    grid = self._grids[rank] = (cells, [
+                        (min(c[axis] for c in cells), max(c[axis] for c in cells)) if cells else (0, 0)
+                        for axis in (0, 1)])
+        return grid
+
+    def nearest(self, longitude: float, latitude: float, level: str = 'city') -> Optional[District]:
+        """Return the division of a level whose center is closest to a point."""
+        cells, ((x_min, x_max), (y_min, y_max)) = self._grid(LEVELS.index(level))
+        if not cells:
+            return None
+        scale = max(math.cos(math.radians(latitude)), 1e-3)
+        x, y = math.floor(longitude / GRID_DEGREES), math.floor(latitude / GRID_DEGREES)
+        rings = max(abs(x - x_min), abs(x - x_max), abs(y - y_min), abs(y - y_max))
+        best, best_distance = None, float('inf')
+        # Scan square rings of cells outwards; a center in ring r is at least
+        # r - 1 cells away, so stop once that bound exceeds the best distance
+        for r in range(rings + 1):
+            bound = max(r - 1, 0) * GRID_DEGREES * scale
+            if bound * bound > best_distance:
+                break
+            if 8 * r > len(cells):
+                # Rings now span more cells than are occupied, so check the
+                # occupied cells not scanned yet directly
+                for (i, j), entries in cells.items():
+                    if max(abs(i - x), abs(j - y)) >= r:
+                        for lon, lat, record in entries:
+                            dx = (lon - longitude) * scale
+                            dy = lat - latitude
+                            distance = dx * dx + dy * dy
+                            if distance < best_distance:
+                                best, best_distance = record, distance
+                break
+            for i in range(x - r, x + r + 1):
+                for j in range(y - r, y + r + 1):
+                    if r and abs(i - x) != r and abs(j - y) != r:
+                        continue
+                    for lon, lat, record in cells.get((i, j), ()):
+                        dx = (lon - longitude) * scale
+                        dy = lat - latitude
+                        distance = dx * dx + dy * dy
+                        if distance < best_distance:
+                            best, best_distance = record, distance
+        return self._district(best) if best is not None else None
+
+
+def index_path() -> Path:
+    """Index file, from AMAP_ADCODE_INDEX or bundled with the skill."""
+    return Path(os.environ.get('AMAP_ADCODE_INDEX', DEFAULT_INDEX_PATH))
+
+
+_index = None
+_index_loaded = False
+_index_lock = threading.Lock()
+
+
+def get_index() -> Optional[AdcodeIndex]:
+    """
+    Return the shared index, loading it on first use.
+
+    The index is not bundled with the skill; if it was never built, a
+    warning is printed once and None is returned, so offline lookups
+    fall back to the API.
+    """
+    global _index, _index_loaded
+    if not _index_loaded:
+        with _index_lock:
+            if not _index_loaded:
+                path = index_path()
+                if path.exists():
+                    _index = AdcodeIndex(path)
+                else:
+                    print(f"Warning: no adcode index at {path}, offline adcode lookups are "
+                          f"disabled; run 'python scripts/adcode.py build'", file=sys.stderr)
+                _index_loaded = True
+    return _index
+
+
+def resolve_adcode(name: str) -> Optional[str]:
+    """Adcode for a division name, the adcode itself, or None if unknown."""
+    if name.isdigit() and len(name) == 6:
+        return name
+    index = get_index()
+    district = index.resolve(name) if index is not None else None
+    return district.adcode if district is not None else None
+
+
+def _flatten(districts: list, parent: Optional[str], rows: dict) -> None:
+    for district in districts:
+        level = district.get('level')
+        adcode = district.get('adcode', '')
+        if level == 'country':
+            _flatten(district.get('districts', []), None, rows)
+            continue
+        if level not in LEVELS or not adcode.isdigit():
+            continue
+        # Streets of cities without districts repeat their city's adcode
+        if adcode not in rows:
+            citycode = district.get('citycode')
+            center = district.get('center')
+            rows[adcode] = {
+                'name': district['name'],
+                'level': LEVELS.index(level),
+                'citycode': citycode if isinstance(citycode, str) else '',
+                'center': center.split(',') if isinstance(center, str) and center else None,
+                'parent': parent
+            }
+        _flatten(district.get('districts', []), adcode, rows)
+
+
+def _pinyin(text: str) -> Optional[str]:
+    try:
+        from pypinyin import lazy_pinyin
+    except ImportError:
+        return None
+    return ''.join(lazy_pinyin(text))
+
+
+def build_index(districts: list, path: Path) -> int:
+    """
+    Write an index file from a /config/district district tree.
+
+    Keys cover each division's name, its alias (name without the level
+    suffix) and, when pypinyin is installed, the alias's pinyin.
+
+    Returns:
+        Number of divisions written
+    """
+    rows = {}
+    _flatten(districts, None, rows)
+    adcodes = sorted(rows, key=int)
+    positions = {adcode: i for i, adcode in enumerate(adcodes)}
+
+    strings = bytearray()
+    interned = {}
+
+    def intern(text):
+        data = text.encode('utf-8')
+        if data not in interned:
+            interned[data] = len(strings)
+            strings.extend(data)
+        return interned[data], len(data)
+
+    records = bytearray()
+    keys = set()
+    for i, adcode in enumerate(adcodes):
+        row = rows[adcode]
+        name_offset, name_length = intern(row['name'])
+        citycode_offset, citycode_length = intern(row['citycode'])
+        lon, lat = (round(float(v) * 1e6) for v in row['center']) if row['center'] else (0, 0)
+        records += _RECORD.pack(int(adcode), positions.get(row['parent'], -1), lon, lat,
+                                name_offset, citycode_offset, name_length, citycode_length,
+                                row['level'])
+
+        alias = alias_for(row['name'])
+        for key in (row['name'], alias, _pinyin(alias or row['name'])):
+            if key:
+                keys.add((normalize_key(key).encode('utf-8'), i))
+
+    packed_keys = bytearray()
+    for key, record in sorted(keys):
+        offset, length = intern(key.decode('utf-8'))
+        packed_keys += _KEY.pack(offset, length, record)
+
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + '.tmp')
+    with open(tmp, 'wb') as f:
+        f.write(_HEADER.pack(MAGIC, len(adcodes), len(keys), len(strings)))
+        f.write(records)
+        f.write(packed_keys)
+        f.write(strings)
+    os.replace(tmp, path)
+    return len(adcodes)
+
+
+def fetch_districts(api_key: Optional[str] = None) -> list:
+    """Download the province/city/district tree from /config/district."""
+    from __init__ import get_default_client
+
+    params = {'keywords': '中国', 'subdistrict': 3, 'extensions': 'base'}
+    data = get_default_client().request('/config/district', params, api_key)
+    return data.get('districts', [])
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Amap adcode index - Offline administrative division lookup',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  # Build the index from the Amap API
+  python scripts/adcode.py build
+
+  # Resolve a name, an alias or pinyin
+  python scripts/adcode.py lookup 深圳
+  python scripts/adcode.py lookup 朝阳 --parent 吉林
+
+  # Names starting with a prefix
+  python scripts/adcode.py prefix 广
+        """
+    )
+    parser.add_argument('command', choices=['build', 'lookup', 'prefix'])
+    parser.add_argument('name', nargs='?', help='Name, alias, pinyin or adcode to look up')
+    parser.add_argument('--parent', type=str, help='Containing division for lookup')
+    parser.add_argument('--input', type=str,
+                        help='Build from a saved /config/district JSON response')
+    parser.add_argument('--output', type=str,
+                        help='Index file (default: $AMAP_ADCODE_INDEX or data/adcode.bin)')
+    parser.add_argument('--limit', type=int, default=10, help='Maximum prefix matches (default: 10)')
+
+    args = parser.parse_args()
+    path = Path(args.output) if args.output else index_path()
+
+    if args.command == 'build':
+        try:
+            if args.input:
+                with open(args.input, 'r', encoding='utf-8') as f:
+                    districts = json.load(f).get('districts', [])
+            else:
+                districts = fetch_districts()
+            count = build_index(districts, path)
+        except (ValueError, OSError) as e:
+            print(f"Error: {e}", file=sys.stderr)
+            sys.exit(1)
+        print(f"Indexed {count} divisions into {path} ({path.stat().st_size} bytes)")
+        return
+
+    if not args.name:
+        parser.error(f"{args.command} requires a name")
+    if not path.exists():
+        print(f"Error: no adcode index at {path}; run 'python scripts/adcode.py build'",
+              file=sys.stderr)
+        sys.exit(1)
+
+    index = AdcodeIndex(path)
+    if args.command == 'lookup':
+        district = index.resolve(args.name, args.parent)
+        if district is None:
+            print(f"Error: no division named '{args.name}'", file=sys.stderr)
+            sys.exit(1)
+        print(json.dumps(district._asdict(), ensure_ascii=False))
+    else:
+        for district in index.prefix(args.name, args.limit):
+            print(json.dumps(district._asdict(), ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
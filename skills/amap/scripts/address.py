@@ -0,0 +1,129 @@
+"""
+Amap Address Normalization
+
+Canonical form for Chinese address strings, so that spellings of the same
+place share one geocode request and one cache entry:
+
+- full-width digits, letters and punctuation are folded to half-width
+- whitespace and list separators are dropped
+- traditional variants common in addresses (號, 區, 縣, ...) are simplified
+- a leading 中国 is dropped and 北京/上海/天津/重庆 gain their 市 suffix
+- repeated province/city/district prefixes are collapsed
+
+The result keeps the province, city, district, street order used by
+format_address().
+"""
+
+import re
+import unicodedata
+from typing import Optional
+
+
+# Component order of Amap addresses, shared with format_address()
+ADDRESS_COMPONENTS = ('province', 'city', 'district', 'street', 'number')
+
+MUNICIPALITIES = ('北京', '上海', '天津', '重庆')
+
+_VARIANTS = {
+    '號': '号', '區': '区', '縣': '县', '鎮': '镇', '鄉': '乡', '莊': '庄',
+    '東': '东', '門': '门', '樓': '楼', '棟': '栋', '層': '层', '單': '单',
+    '廣': '广', '開': '开', '園': '园', '灣': '湾', '華': '华', '國': '国',
+    '陽': '阳', '興': '兴', '龍': '龙', '橋': '桥', '廈': '厦', '場': '场',
+    '寧': '宁', '嶺': '岭', '豐': '丰', '雲': '云', '蘇': '苏', '遼': '辽',
+    '黃': '黄', '廠': '厂', '衛': '卫', '車': '车', '電': '电', '館': '馆',
+    '#': '号',
+}
+_SEPARATORS = ',;、。'
+
+_TRANSLATION = str.maketrans({**_VARIANTS, **{c: None for c in _SEPARATORS}})
+
+# Spaces only matter between two ASCII words ("Tower A")
+_INNER_SPACE = re.compile(r' (?![0-9A-Za-z])|(?<![0-9A-Za-z]) ')
+
+# Characters that never occur in an administrative area name
+_NAME = r'[^\dA-Za-z 省市区县旗盟路街巷号弄楼栋室]'
+
+# Administrative prefixes in ADDRESS_COMPONENTS order
+_LEVELS = (
+    ('province', re.compile(rf'(?:{"|".join(MUNICIPALITIES)})市|{_NAME}{{1,8}}?(?:省|自治区|特别行政区)')),
+    ('city', re.compile(rf'{_NAME}{{1,10}}?(?:市|自治州|地区|盟)')),
+    ('district', re.compile(rf'{_NAME}{{1,10}}?(?:区|县|市|旗)')),
+)
+_PROVINCE = _LEVELS[0][1]
+_DISTRICT = _LEVELS[2][1]
+
+
+def clean_address(text: str) -> str:
+    """Fold width, variants, separators and whitespace out of an address."""
+    text = unicodedata.normalize('NFKC', text or '').translate(_TRANSLATION)
+    return _INNER_SPACE.sub('', ' '.join(text.split()))
+
+
+def parse_address(address: str) -> dict:
+    """
+    Split an address into its leading administrative components.
+
+    Prefixes repeating an earlier component are dropped. Whatever follows
+    the last recognized component is returned as 'street'.
+
+    Returns:
+        Dict with the recognized province/city/district keys and 'street'
+    """
+    text = clean_address(address)
+    # 中国北京市... -> 北京市..., but keep 中国人民大学
+    if text.startswith('中国') and (_PROVINCE.match(text, 2) or text[2:4] in MUNICIPALITIES):
+        text = text[2:]
+    for name in MUNICIPALITIES:
+        # 北京朝阳区 -> 北京市朝阳区, but leave 北京路 alone
+        if text.startswith(name) and not text.startswith('市', 2) and _DISTRICT.match(text, 2):
+            text = f"{name}市{text[2:]}"
+            break
+
+    components = {}
+    pos = 0
+    for level, pattern in _LEVELS:
+        pos = _skip_repeats(text, pos, components)
+        match = pattern.match(text, pos)
+        if match:
+            components[level] = match.group()
+            pos = match.end()
+    components['street'] = text[_skip_repeats(text, pos, components):]
+    return components
+
+
+def _skip_repeats(text: str, pos: int, components: dict) -> int:
+    repeated = True
+    while repeated:
+        repeated = False
+        for segment in components.values():
+            if text.startswith(segment, pos):
+                pos += len(segment)
+                repeated = True
+    return pos
+
+
+def normalize_address(address: str) -> str:
+    """
+    Canonical form of an address string.
+
+    Examples:
+        >>> normalize_address('中国 北京 北京市朝阳区阜通东大街６號')
+        '北京市朝阳区阜通东大街6号'
+    """
+    components = parse_address(address)
+    return ''.join(components.get(name, '') for name in ADDRESS_COMPONENTS)
+
+
+def address_key(address: str, city: Optional[str] = None) -> tuple[str, str]:
+    """
+    Normalize an (address, city) pair into a deduplication and cache key.
+
+    The city hint is dropped when the address already starts with it.
+    """
+    address = normalize_address(address)
+    city = normalize_address(city) if city else ''
+    if city in MUNICIPALITIES:
+        city += '市'
+    if city and address.startswith(city):
+        city = ''
+    return address, city
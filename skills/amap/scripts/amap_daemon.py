@@ -0,0 +1,457 @@
+#!/usr/bin/env python3
+"""
+Amap Daemon
+
+Long-running process that keeps one warm AmapClient (keep-alive connections,
+response and geocode caches, rate limiter, key pool) behind a Unix socket.
+While it runs, get_default_client() in every script returns a DaemonClient
+that forwards calls to it, so each CLI invocation skips the requests import,
+cache setup and connection handshake.
+
+Usage:
+    python scripts/amap_daemon.py serve     # run in the foreground
+    python scripts/amap_daemon.py status    # show uptime and cache counters
+    python scripts/amap_daemon.py stop
+
+Protocol: newline-delimited JSON over the socket, one response per request:
+    {"method": "geocode", "args": [...], "kwargs": {...}, "options": {...}}
+    {"result": ...} or {"error": {"type": ..., "message": ..., ...}}
+"""
+
+import argparse
+import copy
+import errno
+import json
+import os
+import socket
+import socketserver
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Optional
+
+# Add scripts directory to path for imports
+sys.path.insert(0, __file__.rsplit('/', 1)[0])
+
+from cache import CACHE_DIR
+
+
+# AmapClient methods callable through the daemon
+FORWARDED_METHODS = (
+    'get_json',
+    'request',
+    'geocode',
+    'geocode_many',
+    'reverse_geocode',
+    'reverse_geocode_many',
+    'search_poi',
+    'search_around',
+    'get_ip_location',
+    'get_ip_location_many',
+    'resolve_location',
+    'resolve_locations',
+    'plan_route',
+    'compare_modes'
+)
+
+
+# Seconds between writes of the IP range cache after IP lookups
+CACHE_SAVE_INTERVAL = 60
+
+
+def socket_path() -> Path:
+    """Daemon socket path, from AMAP_DAEMON_SOCKET or under the cache directory."""
+    return Path(os.environ.get('AMAP_DAEMON_SOCKET', CACHE_DIR / "daemon.sock"))
+
+
+def encode_error(error: BaseException) -> dict:
+    """Serialize an exception for the wire."""
+    return {
+        'type': type(error).__name__,
+        'message': str(error),
+        'infocode': getattr(error, 'infocode', None),
+        'info': getattr(error, 'info', None)
+    }
+
+
+def decode_error(data: dict) -> Exception:
+    """Rebuild an exception sent by the daemon."""
+    import __init__ as amap
+
+    cls = getattr(amap, data['type'], None)
+    if isinstance(cls, type) and issubclass(cls, amap.AmapError):
+        return cls(data['message'], data.get('infocode'), data.get('info'))
+    if data['type'] == 'ValueError':
+        return ValueError(data['message'])
+    return RuntimeError(f"{data['type']}: {data['message']}")
+
+
+def _encode_result(result):
+    # return_exceptions=True batches carry exceptions in their results
+    if isinstance(result, list):
+        return [{'__error__': encode_error(item)} if isinstance(item, BaseException) else item
+                for item in result]
+    return result
+
+
+def _decode_result(result):
+    if isinstance(result, list):
+        return [decode_error(item['__error__'])
+                if isinstance(item, dict) and '__error__' in item else item
+                for item in result]
+    return result
+
+
+class DaemonClient:
+    """
+    Stand-in for AmapClient that forwards calls to a running daemon.
+
+    Each thread keeps its own connection to the daemon. Errors raised by the
+    daemon's client are re-raised locally with the same AmapError subclass.
+    If the daemon goes away, calls continue on a local AmapClient.
+    """
+
+    # Caches live in the daemon
+    geocode_cache = None
+    response_cache = None
+    spatial_cache = None
+    ip_cache = None
+    route_cache = None
+
+    def __init__(self, path: Optional[Path] = None):
+        """
+        Args:
+            path: Daemon socket (defaults to socket_path())
+        """
+        self.path = str(path or socket_path())
+        self.no_cache = False
+        self.refresh_cache = False
+        self._local = threading.local()
+        self._fallback = None
+        self._fallback_lock = threading.Lock()
+
+    @classmethod
+    def connect(cls, path: Optional[Path] = None) -> 'DaemonClient':
+        """
+        Connect to the daemon.
+
+        Raises:
+            OSError: If no daemon is listening on the socket
+        """
+        client = cls(path)
+        client._connection()
+        return client
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                sock.connect(self.path)
+            except OSError:
+                sock.close()
+                raise
+            conn = self._local.conn = (sock, sock.makefile('rb'))
+        return conn
+
+    def call(self, method: str, *args, **kwargs):
+        """
+        Invoke a method in the daemon.
+
+        Once the daemon has gone away, forwarded methods run on a local
+        client instead (see fallback_client).
+
+        Raises:
+            ConnectionError: If the daemon went away during a daemon-only call
+            AmapError: If the daemon's client raised one
+        """
+        line = b''
+        if self._fallback is None:
+            message = {
+                'method': method,
+                'args': args,
+                'kwargs': kwargs,
+                'options': {'no_cache': self.no_cache, 'refresh': self.refresh_cache}
+            }
+            try:
+                sock, reader = self._connection()
+                sock.sendall(json.dumps(message).encode('utf-8') + b'\n')
+                line = reader.readline()
+            except OSError:
+                pass
+        if not line:
+            self.close()
+            if method not in FORWARDED_METHODS:
+                raise ConnectionError(f"Amap daemon at {self.path} closed the connection")
+            # Calls are read-only API lookups, so repeating one the daemon
+            # may have started is harmless
+            return getattr(self.fallback_client(), method)(*args, **kwargs)
+
+        response = json.loads(line)
+        if 'error' in response:
+            raise decode_error(response['error'])
+        return _decode_result(response['result'])
+
+    def fallback_client(self):
+        """
+        Local AmapClient used after the daemon went away, created on first use
+        with this client's --no-cache/--refresh options.
+        """
+        if self._fallback is None:
+            with self._fallback_lock:
+                if self._fallback is None:
+                    from __init__ import create_default_client
+
+                    print(f"Warning: Amap daemon at {self.path} went away, "
+                          f"continuing with a local client", file=sys.stderr)
+                    client = create_default_client()
+                    if self.no_cache:
+                        client.geocode_cache = None
+                        client.response_cache = None
+                        client.spatial_cache = None
+                        client.ip_cache = None
+                        client.route_cache = None
+                    client.refresh_cache = self.refresh_cache
+                    self._fallback = client
+        return self._fallback
+
+    def save_caches(self) -> None:
+        """The daemon persists its own caches; a local fallback client saves its own."""
+        if self._fallback is not None:
+            self._fallback.save_caches()
+
+    def iter_pois(self, *args, **kwargs):
+        """Page through a POI search, forwarding each page's search_poi call."""
+        from __init__ import AmapClient
+
+        return AmapClient.iter_pois(self, *args, **kwargs)
+
+    def distance_matrix(self, *args, **kwargs) -> dict:
+        """Build a distance matrix locally, forwarding each /distance request."""
+        from __init__ import AmapClient
+
+        return AmapClient.distance_matrix(self, *args, **kwargs)
+
+    def __getattr__(self, name: str):
+        if name not in FORWARDED_METHODS:
+            raise AttributeError(name)
+        return lambda *args, **kwargs: self.call(name, *args, **kwargs)
+
+    def close(self) -> None:
+        """Close this thread's connection to the daemon."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn[1].close()
+            conn[0].close()
+            self._local.conn = None
+
+
+class DaemonHandler(socketserver.StreamRequestHandler):
+    """Serves newline-delimited JSON calls on one connection."""
+
+    def handle(self):
+        for line in self.rfile:
+            try:
+                message = json.loads(line)
+                result = self.server.dispatch(message.get('method'), message.get('args', []),
+                                              message.get('kwargs', {}),
+                                              message.get('options', {}))
+                response = {'result': _encode_result(result)}
+            except Exception as e:
+                response = {'error': encode_error(e)}
+            try:
+                self.wfile.write(json.dumps(response, ensure_ascii=False).encode('utf-8') + b'\n')
+            except OSError:
+                return
+
+
+class DaemonServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """Unix socket server around one shared AmapClient."""
+
+    daemon_threads = True
+
+    def __init__(self, path: Path, client):
+        """
+        Args:
+            path: Socket path; a stale socket file is replaced
+            client: AmapClient shared by all connections
+
+        Raises:
+            OSError: If another daemon is already listening on the socket
+        """
+        self.path = Path(path)
+        self.client = client
+        self.started = time.time()
+        self.calls = 0
+        self._variants = {}
+        self._saved = time.monotonic()
+        self._lock = threading.Lock()
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        if self.path.exists():
+            probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                probe.connect(str(self.path))
+            except (ConnectionRefusedError, FileNotFoundError):
+                # Nobody is listening: the socket was left by a daemon that died
+                self.path.unlink(missing_ok=True)
+            else:
+                raise OSError(errno.EADDRINUSE,
+                              f"An Amap daemon is already listening on {self.path}")
+            finally:
+                probe.close()
+        # Only the owner may spend the daemon's API keys
+        umask = os.umask(0o177)
+        try:
+            super().__init__(str(self.path), DaemonHandler)
+        finally:
+            os.umask(umask)
+
+    def client_for(self, options: dict):
+        """
+        Client honouring a call's --no-cache/--refresh options.
+
+        Variants are shallow copies, so they share the connection pool, rate
+        limiter, key pool and coalescing with the main client.
+        """
+        no_cache, refresh = bool(options.get('no_cache')), bool(options.get('refresh'))
+        if not (no_cache or refresh):
+            return self.client
+        with self._lock:
+            variant = self._variants.get((no_cache, refresh))
+            if variant is None:
+                self.client.session  # create the pool before it is shared
+                variant = copy.copy(self.client)
+                if no_cache:
+                    variant.geocode_cache = None
+                    variant.response_cache = None
+                    variant.spatial_cache = None
+                    variant.ip_cache = None
+                    variant.route_cache = None
+                variant.refresh_cache = refresh
+                self._variants[(no_cache, refresh)] = variant
+        return variant
+
+    def dispatch(self, method: str, args: list, kwargs: dict, options: dict):
+        """Run one call and return its result."""
+        with self._lock:
+            self.calls += 1
+        if method == 'status':
+            return self.status()
+        if method == 'shutdown':
+            threading.Thread(target=self.shutdown, daemon=True).start()
+            return True
+        if method not in FORWARDED_METHODS:
+            raise ValueError(f"Unknown daemon method '{method}'")
+        result = getattr(self.client_for(options), method)(*args, **kwargs)
+        if method.startswith('get_ip_location'):
+            self._save_caches()
+        return result
+
+    def _save_caches(self) -> None:
+        # Persist the IP range cache at most once per CACHE_SAVE_INTERVAL
+        now = time.monotonic()
+        with self._lock:
+            if now - self._saved < CACHE_SAVE_INTERVAL:
+                return
+            self._saved = now
+        self.client.save_caches()
+
+    def status(self) -> dict:
+        """Return uptime, call count and cache/coalescing counters."""
+        client = self.client
+        status = {
+            'pid': os.getpid(),
+            'uptime': time.time() - self.started,
+            'calls': self.calls
+        }
+        if client.response_cache is not None:
+            status['response_cache'] = client.response_cache.stats()
+        if client.geocode_cache is not None:
+            status['geocode_cache'] = client.geocode_cache.stats()
+        if client.spatial_cache is not None:
+            status['spatial_cache'] = client.spatial_cache.stats()
+        if client.ip_cache is not None:
+            status['ip_cache'] = client.ip_cache.stats()
+        if client.route_cache is not None:
+            status['route_cache'] = client.route_cache.stats()
+        if client.flights is not None:
+            status['flights'] = client.flights.stats()
+        if client.rate_limiter is not None:
+            status['rate_limiter'] = client.rate_limiter.snapshot()
+        if client.key_pool is not None:
+            status['keys'] = client.key_pool.snapshot()
+        return status
+
+    def server_close(self):
+        super().server_close()
+        if self.path.exists():
+            self.path.unlink()
+
+
+def serve(path: Optional[Path] = None) -> None:
+    """Run the daemon in the foreground until stopped."""
+    from __init__ import create_default_client
+
+    path = Path(path or socket_path())
+    client = create_default_client()
+    client.session  # warm up the requests import and the pool
+
+    with DaemonServer(path, client) as server:
+        print(f"Amap daemon listening on {path} (pid {os.getpid()})", file=sys.stderr)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            client.save_caches()
+            client.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Amap Daemon - Keep a warm Amap client for the CLI scripts',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  # Start the daemon in the background
+  nohup python scripts/amap_daemon.py serve > /tmp/amap-daemon.log 2>&1 &
+
+  # Show uptime and cache counters
+  python scripts/amap_daemon.py status
+
+  # Stop the daemon
+  python scripts/amap_daemon.py stop
+        """
+    )
+    parser.add_argument('command', choices=['serve', 'status', 'stop'])
+    parser.add_argument('--socket', type=str,
+                        help='Socket path (default: $AMAP_DAEMON_SOCKET or ~/.cache/amap/daemon.sock)')
+
+    args = parser.parse_args()
+    path = Path(args.socket) if args.socket else socket_path()
+
+    if args.command == 'serve':
+        try:
+            serve(path)
+        except OSError as e:
+            print(f"Error: {e}", file=sys.stderr)
+            sys.exit(1)
+        return
+
+    try:
+        client = DaemonClient.connect(path)
+    except OSError:
+        print(f"Error: no Amap daemon listening on {path}", file=sys.stderr)
+        sys.exit(1)
+
+    if args.command == 'status':
+        print(json.dumps(client.call('status'), ensure_ascii=False, indent=2))
+    else:
+        client.call('shutdown')
+        print("Amap daemon stopped")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,604 @@
+"""
+Amap Async API Client
+
+asyncio counterpart of AmapClient for calling Amap from inside an event loop.
+Requests share one aiohttp connection pool and are bounded by a semaphore, so
+fanning out hundreds of geocodes or routes never exceeds max_concurrency
+in-flight calls.
+
+Usage:
+    async with AsyncAmapClient(max_concurrency=20) as client:
+        results = await asyncio.gather(*(client.geocode(a) for a in addresses))
+"""
+
+import asyncio
+import json
+import sys
+from collections import deque
+from typing import AsyncIterator, Optional
+
+# Add scripts directory to path for imports
+sys.path.insert(0, __file__.rsplit('/', 1)[0])
+
+from __init__ import (
+    DEFAULT_MAX_WORKERS,
+    DISTANCE_TYPES,
+    GEOCODE_BATCH_SIZE,
+    MODES,
+    POI_PAGE_SIZE,
+    REGEO_BATCH_SIZE,
+    AmapAuthError,
+    AmapError,
+    AmapNoResultError,
+    AmapRequestError,
+    BaseAmapClient,
+    add_api_key,
+    assemble_distance_matrix,
+    build_api_url,
+    check_api_response,
+    chunked,
+    compare_mode_routes,
+    distance_tiles,
+    is_retryable,
+    join_batch_param,
+    parse_coordinates,
+    poi_page_count,
+    split_batch_geocodes,
+    split_batch_regeocodes,
+    split_distance_results,
+    unique_pois
+)
+from address import normalize_address
+from singleflight import AsyncSingleFlight
+
+
+DEFAULT_MAX_CONCURRENCY = 10
+
+
+class AsyncAmapClient(BaseAmapClient):
+    """
+    Async Amap API client with bounded concurrency.
+
+    Cancelling a task awaiting any method aborts its HTTP request and releases
+    its concurrency slot immediately, unless other tasks are waiting on the
+    same coalesced request.
+
+    The geocode and route caches are SQLite files, so their lookups and
+    writes run on worker threads (asyncio.to_thread) instead of blocking the
+    event loop; the in-memory response, spatial and IP caches are used inline.
+    """
+
+    def __init__(self, api_key: Optional[str] = None,
+                 max_concurrency: int = DEFAULT_MAX_CONCURRENCY, **kwargs):
+        """
+        Args:
+            api_key: Amap API key (if None, resolved via get_api_key on first use)
+            max_concurrency: Maximum number of in-flight requests
+            **kwargs: Timeouts, base_url and caches, see BaseAmapClient
+        """
+        super().__init__(api_key, **kwargs)
+        self.max_concurrency = max_concurrency
+        self.flights = AsyncSingleFlight() if self.coalesce else None
+        self._session = None
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    def _get_session(self):
+        if self._session is None or self._session.closed:
+            import aiohttp
+
+            connector = aiohttp.TCPConnector(limit=self.max_concurrency)
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=self.timeout,
+                                              connect=self.connect_timeout)
+            )
+        return self._session
+
+    async def close(self) -> None:
+        """Close the underlying connection pool."""
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def _cached_geocodes_async(self, addresses: list, city: Optional[str]) -> list:
+        if self.geocode_cache is None or self.refresh_cache:
+            return [None] * len(addresses)
+        return await asyncio.to_thread(self._cached_geocodes, addresses, city)
+
+    async def _store_geocodes_async(self, addresses: list, city: Optional[str],
+                                    results: list) -> None:
+        if self.geocode_cache is not None:
+            await asyncio.to_thread(self._store_geocodes, addresses, city, results)
+
+    async def _cached_route_async(self, *key) -> Optional[dict]:
+        if self.route_cache is None or self.refresh_cache:
+            return None
+        return await asyncio.to_thread(self._cached_route, *key)
+
+    async def _store_route_async(self, *entry) -> None:
+        if self.route_cache is not None:
+            await asyncio.to_thread(self._store_route, *entry)
+
+    async def get_json(self, url: str, api_key: Optional[str] = None,
+                       timeout: Optional[float] = None) -> dict:
+        """
+        Make HTTP request to a full Amap API URL.
+
+        Args:
+            url: Full API URL
+            api_key: Amap API key (defaults to the client key)
+            timeout: Per-request timeout in seconds (defaults to the client timeout)
+
+        Returns:
+            JSON response as dict
+
+        Retryable failures are retried with jittered exponential backoff and
+        concurrent identical calls share one request, see AmapClient.get_json.
+
+        Raises:
+            aiohttp.ClientError: If request fails
+            asyncio.TimeoutError: If the request exceeds its timeout
+            AmapError: If response indicates error
+        """
+        endpoint, query = self._split_url(url)
+        request_key = self._request_key(endpoint, query)
+        cached = self._cached_response(request_key)
+        if cached is not None:
+            return cached
+
+        async def fetch():
+            data, size = await self._fetch_json(url, endpoint, api_key, timeout)
+            self._store_response(request_key, data, size)
+            return data
+
+        if self.flights is None:
+            return await fetch()
+        return await self.flights.do(self._flight_key(request_key, api_key), fetch)
+
+    async def _fetch_json(self, url: str, endpoint: str, api_key: Optional[str],
+                          timeout: Optional[float]) -> tuple[dict, int]:
+        # Send the request with retries; returns the checked response and its body size
+        import aiohttp
+
+        session = self._get_session()
+        request_timeout = None
+        if timeout is not None:
+            request_timeout = aiohttp.ClientTimeout(total=timeout, connect=self.connect_timeout)
+
+        transient_errors = (aiohttp.ClientConnectionError, asyncio.TimeoutError)
+
+        attempt = 0
+        while True:
+            key = self._select_key(api_key)
+            try:
+                # Time spent waiting for a slot does not count against the timeout
+                async with self._semaphore:
+                    if self.rate_limiter is not None:
+                        await self.rate_limiter.acquire_async(key, endpoint)
+                    async with session.get(add_api_key(url, key),
+                                           timeout=request_timeout) as response:
+                        response.raise_for_status()
+                        body = await response.read()
+                data = check_api_response(json.loads(body))
+                self._report_key(key)
+                return data, len(body)
+            except Exception as e:
+                rotated = self._report_key(key, e)
+                if attempt >= self.max_retries or not (rotated or is_retryable(e, transient_errors)):
+                    raise
+                if not rotated:
+                    await asyncio.sleep(self._backoff(attempt))
+                attempt += 1
+
+    async def request(self, endpoint: str, params: dict, api_key: Optional[str] = None,
+                      timeout: Optional[float] = None) -> dict:
+        """
+        Call an Amap API endpoint.
+
+        Args:
+            endpoint: API endpoint path (e.g., "/geocode/geo")
+            params: Query parameters dict (without key)
+            api_key: Amap API key (defaults to the client key)
+            timeout: Per-request timeout in seconds (defaults to the client timeout)
+
+        Returns:
+            JSON response as dict
+        """
+        url = build_api_url(endpoint, params, base_url=self.base_url)
+        return await self.get_json(url, api_key, timeout)
+
+    async def geocode(self, address: str, city: Optional[str] = None,
+                      api_key: Optional[str] = None) -> dict:
+        """Convert address to coordinates. See AmapClient.geocode."""
+        address = normalize_address(address)
+        cached = (await self._cached_geocodes_async([address], city))[0]
+        if cached is not None:
+            return cached
+
+        params = {'address': address}
+        if city:
+            params['city'] = city
+
+        data = await self.request('/geocode/geo', params, api_key)
+
+        geocodes = data.get('geocodes', [])
+        if not geocodes:
+            raise AmapNoResultError("No results found for the given address")
+
+        await self._store_geocodes_async([address], city, geocodes[:1])
+        return geocodes[0]
+
+    async def _run_isolated(self, fetch, chunk: list, return_exceptions: bool) -> list:
+        """Run one batch request, isolating failures. See AmapClient._run_isolated."""
+        try:
+            return await fetch(chunk)
+        except AmapAuthError:
+            raise
+        except Exception as e:
+            if not return_exceptions:
+                raise
+            if len(chunk) > 1 and isinstance(e, AmapRequestError):
+                return [(await self._run_isolated(fetch, [item], True))[0] for item in chunk]
+            return [e] * len(chunk)
+
+    async def geocode_many(self, addresses: list, city: Optional[str] = None,
+                           api_key: Optional[str] = None,
+                           return_exceptions: bool = False) -> list:
+        """
+        Geocode many addresses using batch=true requests. See AmapClient.geocode_many.
+
+        Batches run concurrently, bounded by max_concurrency.
+        """
+        addresses, owners = self._dedupe_addresses(list(addresses))
+        results = await self._cached_geocodes_async(addresses, city)
+        pending = [i for i, result in enumerate(results) if result is None]
+        chunks = chunked([addresses[i] for i in pending], GEOCODE_BATCH_SIZE)
+
+        def fetch(chunk):
+            return self._geocode_batch(chunk, city, api_key)
+
+        fetched = await asyncio.gather(*(self._run_isolated(fetch, chunk, return_exceptions)
+                                         for chunk in chunks))
+
+        fetched = [item for chunk in fetched for item in chunk]
+        for i, result in zip(pending, fetched):
+            results[i] = result
+        await self._store_geocodes_async([addresses[i] for i in pending], city, fetched)
+
+        return [results[owner] for owner in owners]
+
+    async def _geocode_batch(self, addresses: list, city: Optional[str],
+                             api_key: Optional[str]) -> list:
+        params = {'address': join_batch_param(addresses), 'batch': 'true'}
+        if city:
+            params['city'] = city
+
+        data = await self.request('/geocode/geo', params, api_key)
+        return split_batch_geocodes(data, len(addresses))
+
+    async def reverse_geocode(self, longitude: float, latitude: float,
+                              api_key: Optional[str] = None) -> dict:
+        """Convert coordinates to address. See AmapClient.reverse_geocode."""
+        cached = self._cached_regeocodes([(longitude, latitude)])[0]
+        if cached is not None:
+            return cached
+
+        params = {
+            'location': f'{longitude},{latitude}',
+            'extensions': 'base'
+        }
+
+        data = await self.request('/geocode/regeo', params, api_key)
+
+        regeocode = data.get('regeocode')
+        if not regeocode:
+            raise AmapNoResultError("No results found for the given coordinates")
+
+        self._store_regeocodes([(longitude, latitude)], [regeocode])
+        return regeocode
+
+    async def reverse_geocode_many(self, locations: list, api_key: Optional[str] = None,
+                                   return_exceptions: bool = False) -> list:
+        """
+        Reverse geocode many coordinates using batch=true requests.
+        See AmapClient.reverse_geocode_many.
+        """
+        locations = list(locations)
+        results = self._cached_regeocodes(locations)
+        pending = [i for i, result in enumerate(results) if result is None]
+        representatives, owners = self._cluster_locations([locations[i] for i in pending])
+        chunks = chunked(representatives, REGEO_BATCH_SIZE)
+
+        def fetch(chunk):
+            return self._reverse_geocode_batch(chunk, api_key)
+
+        fetched = await asyncio.gather(*(self._run_isolated(fetch, chunk, return_exceptions)
+                                         for chunk in chunks))
+
+        fetched = [item for chunk in fetched for item in chunk]
+        for i, owner in zip(pending, owners):
+            results[i] = fetched[owner]
+        self._store_regeocodes(representatives, fetched)
+
+        return results
+
+    async def _reverse_geocode_batch(self, locations: list, api_key: Optional[str]) -> list:
+        params = {
+            'location': join_batch_param(f'{lon},{lat}' for lon, lat in locations),
+            'extensions': 'base',
+            'batch': 'true'
+        }
+
+        data = await self.request('/geocode/regeo', params, api_key)
+        return split_batch_regeocodes(data, len(locations))
+
+    async def search_poi(self, keywords: str, city: str, longitude: Optional[float] = None,
+                         latitude: Optional[float] = None, radius: int = 1000,
+                         api_key: Optional[str] = None, page: int = 1,
+                         offset: Optional[int] = None) -> dict:
+        """Search for Points of Interest. See AmapClient.search_poi."""
+        params = {
+            'keywords': keywords,
+            'city': self._city_adcode(city),
+            'radius': radius
+        }
+
+        if longitude is not None and latitude is not None:
+            params['location'] = f'{longitude},{latitude}'
+        if page != 1:
+            params['page'] = page
+        if offset is not None:
+            params['offset'] = offset
+
+        data = await self.request('/place/text', params, api_key)
+
+        pois = data.get('pois', [])
+        if not pois:
+            raise AmapNoResultError("No POIs found")
+
+        return data
+
+    async def iter_pois(self, keywords: str, city: str, longitude: Optional[float] = None,
+                        latitude: Optional[float] = None, radius: int = 1000,
+                        limit: Optional[int] = None, prefetch: int = DEFAULT_MAX_WORKERS,
+                        api_key: Optional[str] = None,
+                        totals: Optional[dict] = None) -> AsyncIterator[dict]:
+        """
+        Yield every POI of a search. See AmapClient.iter_pois.
+
+        At most prefetch pages are requested ahead of the consumer, within
+        max_concurrency.
+        """
+        async def fetch(page):
+            try:
+                return await self.search_poi(keywords, city, longitude, latitude, radius,
+                                             api_key=api_key, page=page, offset=POI_PAGE_SIZE)
+            except AmapNoResultError:
+                return {'pois': []}
+
+        if limit is not None and limit <= 0:
+            return
+        data = await fetch(1)
+        if totals is not None:
+            totals['count'] = int(data.get('count') or 0)
+        pages = poi_page_count(data)
+        seen = set()
+        remaining = limit
+        next_page = 2
+        in_flight = deque()
+        try:
+            while True:
+                pois = unique_pois(data.get('pois') or [], seen)
+                if remaining is not None:
+                    pois = pois[:remaining]
+                    remaining -= len(pois)
+                # Amap's count overshoots; a short or empty page is the real end
+                if len(data.get('pois') or []) < POI_PAGE_SIZE:
+                    pages = 0
+                ahead = pages if remaining is None else -(-remaining // POI_PAGE_SIZE)
+                while next_page <= pages and len(in_flight) < min(prefetch, ahead):
+                    in_flight.append(asyncio.ensure_future(fetch(next_page)))
+                    next_page += 1
+
+                for poi in pois:
+                    yield poi
+                if not in_flight or remaining == 0:
+                    return
+                data = await in_flight.popleft()
+        finally:
+            for task in in_flight:
+                task.cancel()
+
+    async def search_around(self, longitude: float, latitude: float, radius: int = 3000,
+                            keywords: Optional[str] = None, types: Optional[str] = None,
+                            api_key: Optional[str] = None, page: int = 1,
+                            offset: Optional[int] = None) -> dict:
+        """Search for Points of Interest within a circle. See AmapClient.search_around."""
+        params = {
+            'location': f'{longitude},{latitude}',
+            'radius': radius,
+            'sortrule': 'distance'
+        }
+
+        if keywords:
+            params['keywords'] = keywords
+        if types:
+            params['types'] = types
+        if page != 1:
+            params['page'] = page
+        if offset is not None:
+            params['offset'] = offset
+
+        return await self.request('/place/around', params, api_key)
+
+    async def get_ip_location(self, ip: str, api_key: Optional[str] = None) -> dict:
+        """Get geographic location from IP address. See AmapClient.get_ip_location."""
+        cached = self._cached_ips([ip])[0]
+        if cached is not None:
+            return cached
+
+        data = await self.request('/ip', {'ip': ip}, api_key)
+        self._store_ips([ip], [data])
+        return data
+
+    async def get_ip_location_many(self, ips: list, api_key: Optional[str] = None,
+                                   return_exceptions: bool = False) -> list:
+        """
+        Locate many IP addresses. See AmapClient.get_ip_location_many.
+
+        Lookups run concurrently, bounded by max_concurrency.
+        """
+        ips = list(ips)
+        results = self._cached_ips(ips)
+        pending = [i for i, result in enumerate(results) if result is None]
+        representatives, owners = self._group_ips([ips[i] for i in pending])
+
+        async def fetch(chunk):
+            return [await self.request('/ip', {'ip': chunk[0]}, api_key)]
+
+        fetched = await asyncio.gather(*(self._run_isolated(fetch, [ip], return_exceptions)
+                                         for ip in representatives))
+
+        fetched = [chunk[0] for chunk in fetched]
+        for i, owner in zip(pending, owners):
+            result = fetched[owner]
+            results[i] = {**result, 'ip': ips[i]} if isinstance(result, dict) else result
+        self._store_ips(representatives, fetched)
+
+        return results
+
+    async def resolve_location(self, location: str, api_key: Optional[str] = None) -> str:
+        """Resolve location to coordinates if it's an address. See AmapClient.resolve_location."""
+        coords = parse_coordinates(location)
+        if coords:
+            return f"{coords[0]},{coords[1]}"
+
+        try:
+            result = await self.geocode(location, api_key=api_key)
+            return result['location']
+        except Exception as e:
+            raise ValueError(f"Failed to resolve location '{location}': {e}")
+
+    async def resolve_locations(self, locations: list, api_key: Optional[str] = None) -> list:
+        """Resolve many locations to coordinates. See AmapClient.resolve_locations."""
+        locations = list(locations)
+        coords = [parse_coordinates(location) for location in locations]
+        addresses = [location for location, point in zip(locations, coords) if point is None]
+        try:
+            geocodes = iter(await self.geocode_many(addresses, api_key=api_key) if addresses else [])
+        except AmapError as e:
+            names = ', '.join(f"'{address}'" for address in addresses)
+            raise ValueError(f"Failed to resolve location {names}: {e}")
+
+        resolved = []
+        for location, point in zip(locations, coords):
+            if point is not None:
+                resolved.append(f"{point[0]},{point[1]}")
+                continue
+            result = next(geocodes)
+            if result is None:
+                raise ValueError(f"Failed to resolve location '{location}': No results found")
+            resolved.append(result['location'])
+        return resolved
+
+    async def distance_matrix(self, origins: list, destinations: list, mode: str = 'driving',
+                              api_key: Optional[str] = None) -> dict:
+        """
+        Distances and durations from every origin to every destination.
+        See AmapClient.distance_matrix.
+
+        Requests run concurrently, bounded by max_concurrency.
+        """
+        if mode not in DISTANCE_TYPES:
+            raise ValueError(f"Invalid mode '{mode}'. Must be one of: {', '.join(DISTANCE_TYPES)}")
+
+        origins, destinations = list(origins), list(destinations)
+        points = await self.resolve_locations(origins + destinations, api_key)
+        origins, destinations = points[:len(origins)], points[len(origins):]
+        tiles = distance_tiles(origins, destinations)
+
+        async def fetch(tile):
+            chunk, destination = tile
+            params = {
+                'origins': join_batch_param(chunk),
+                'destination': destination,
+                'type': DISTANCE_TYPES[mode]
+            }
+            return split_distance_results(await self.request('/distance', params, api_key),
+                                          len(chunk))
+
+        results = await asyncio.gather(*(fetch(tile) for tile in tiles))
+        return assemble_distance_matrix(origins, destinations, tiles, results)
+
+    async def plan_route(self, origin: str, destination: str, mode: str,
+                         api_key: Optional[str] = None, city: Optional[str] = None,
+                         cityd: Optional[str] = None, steps: bool = True) -> dict:
+        """
+        Plan route between two locations. See AmapClient.plan_route.
+
+        Address endpoints are geocoded together in one batch request.
+        """
+        if mode not in MODES:
+            raise ValueError(f"Invalid mode '{mode}'. Must be one of: {', '.join(MODES.keys())}")
+
+        origin_coords, dest_coords = await self.resolve_locations([origin, destination], api_key)
+
+        params = {
+            'origin': origin_coords,
+            'destination': dest_coords
+        }
+
+        if mode == 'transit':
+            params['city'] = self._transit_city(origin, origin_coords, city)
+            params['cityd'] = self._transit_city(destination, dest_coords, cityd)
+
+        options = f"{params['city']}|{params['cityd']}" if mode == 'transit' else ''
+        cached = await self._cached_route_async(mode, origin_coords, dest_coords, options, steps)
+        if cached is not None:
+            return cached
+
+        data = await self.request(MODES[mode], params, api_key)
+
+        route = data.get('route', {})
+        if not route.get('transits' if mode == 'transit' else 'paths'):
+            raise AmapNoResultError("No route found")
+
+        await self._store_route_async(mode, origin_coords, dest_coords, options, route, steps)
+        return route
+
+    async def compare_modes(self, origin: str, destination: str, modes: Optional[list] = None,
+                            api_key: Optional[str] = None, city: Optional[str] = None,
+                            cityd: Optional[str] = None) -> list:
+        """
+        Plan one trip in several modes at once and rank them. See AmapClient.compare_modes.
+        """
+        modes = list(dict.fromkeys(modes or MODES))
+        for mode in modes:
+            if mode not in MODES:
+                raise ValueError(f"Invalid mode '{mode}'. Must be one of: {', '.join(MODES.keys())}")
+
+        origin_coords, dest_coords = await self.resolve_locations([origin, destination], api_key)
+        if 'transit' in modes:
+            city = self._transit_city(origin, origin_coords, city)
+            cityd = self._transit_city(destination, dest_coords, cityd)
+
+        import aiohttp
+
+        # A mode that fails (no route, or a transport error after retries)
+        # is ranked last instead of aborting the comparison
+        failures = (ValueError, OSError, aiohttp.ClientError, asyncio.TimeoutError)
+        results = await asyncio.gather(
+            *(self.plan_route(origin_coords, dest_coords, mode, api_key, city, cityd, steps=False)
+              for mode in modes),
+            return_exceptions=True
+        )
+        for result in results:
+            if isinstance(result, BaseException) and not isinstance(result, failures):
+                raise result
+        return compare_mode_routes(dict(zip(modes, results)))
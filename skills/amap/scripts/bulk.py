@@ -0,0 +1,507 @@
+"""
+Amap Bulk Input/Output Helpers
+
+Streaming readers and writers for CSV, JSON lines and plain text files used
+by the bulk modes of the amap scripts, and a resumable concurrent pipeline
+around them. Records are read lazily so inputs of any size are processed in
+constant memory.
+"""
+
+import csv
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from itertools import islice
+from pathlib import Path
+from typing import Callable, Iterable, Iterator, Optional
+
+
+FORMATS = ('csv', 'jsonl', 'txt')
+
+EXTENSIONS = {
+    '.csv': 'csv',
+    '.jsonl': 'jsonl',
+    '.ndjson': 'jsonl',
+    '.json': 'jsonl',
+    '.txt': 'txt'
+}
+
+# Seconds between checkpoint writes and between progress reports
+CHECKPOINT_INTERVAL = 1.0
+PROGRESS_INTERVAL = 5.0
+
+LONGITUDE_FIELDS = ('longitude', 'lon', 'lng')
+LATITUDE_FIELDS = ('latitude', 'lat')
+
+
+def detect_format(path: str, fmt: Optional[str] = None, default: str = 'jsonl') -> str:
+    """
+    Determine the record format of a file.
+
+    Args:
+        path: File path ('-' for stdin)
+        fmt: Explicit format, 'csv', 'jsonl' or 'txt' (optional)
+        default: Format for stdin and unrecognized extensions
+
+    Returns:
+        'csv', 'jsonl' or 'txt'
+    """
+    if fmt:
+        if fmt not in FORMATS:
+            raise ValueError(f"Invalid format '{fmt}'. Must be one of: {', '.join(FORMATS)}")
+        return fmt
+    return EXTENSIONS.get(os.path.splitext(path)[1].lower(), default)
+
+
+def open_input(path: str):
+    """Open a text input file ('-' for stdin)."""
+    if path == '-':
+        return sys.stdin
+    return open(path, 'r', encoding='utf-8', newline='')
+
+
+@contextmanager
+def rereadable_input(path: str) -> Iterator[str]:
+    """
+    Path of an input that can be read more than once.
+
+    Files are yielded as-is; stdin is copied to a temporary file, removed
+    on exit, so multi-pass jobs stream it from disk instead of memory.
+    """
+    if path != '-':
+        yield path
+        return
+    fd, tmp = tempfile.mkstemp(prefix='amap-stdin-')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8', newline='') as f:
+            shutil.copyfileobj(sys.stdin, f)
+        yield tmp
+    finally:
+        os.unlink(tmp)
+
+
+def open_output(path: Optional[str], append: bool = False):
+    """Open a text output file (None or '-' for stdout)."""
+    if not path or path == '-':
+        return sys.stdout
+    return open(path, 'a' if append else 'w', encoding='utf-8')
+
+
+def iter_records(path: str, fmt: Optional[str] = None, text_field: str = 'address',
+                 default: str = 'jsonl') -> Iterator[dict]:
+    """
+    Lazily read records from a CSV (with header), JSON lines or plain text file.
+
+    Args:
+        path: File path ('-' for stdin)
+        fmt: Record format, inferred from the extension if omitted
+        text_field: Field holding each non-empty line of a plain text file
+        default: Format for stdin and unrecognized extensions
+
+    Yields:
+        One dict per row
+    """
+    fmt = detect_format(path, fmt, default)
+    f = open_input(path)
+    try:
+        if fmt == 'csv':
+            yield from csv.DictReader(f)
+        elif fmt == 'txt':
+            for line in f:
+                line = line.strip()
+                if line:
+                    yield {text_field: line}
+        else:
+            for line in f:
+                line = line.strip()
+                if line:
+                    yield json.loads(line)
+    finally:
+        if f is not sys.stdin:
+            f.close()
+
+
+def iter_batches(items: Iterable, size: int) -> Iterator[list]:
+    """Group an iterable into lists of at most size items without materializing it."""
+    iterator = iter(items)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+def _first_field(record: dict, names: tuple):
+    for name in names:
+        value = record.get(name)
+        if value not in (None, ''):
+            return value
+    return None
+
+
+def record_coordinates(record: dict) -> tuple[float, float]:
+    """
+    Extract (longitude, latitude) from a record.
+
+    Accepts longitude/lon/lng and latitude/lat fields, or a single
+    "lon,lat" location field.
+
+    Raises:
+        ValueError: If the record has no usable coordinates
+    """
+    lon = _first_field(record, LONGITUDE_FIELDS)
+    lat = _first_field(record, LATITUDE_FIELDS)
+    if lon is None or lat is None:
+        location = record.get('location')
+        if isinstance(location, str) and ',' in location:
+            lon, lat = location.split(',', 1)
+    if lon is None or lat is None:
+        raise ValueError("Record has no longitude/latitude fields")
+    return float(lon), float(lat)
+
+
+def write_jsonl(f, record: dict) -> None:
+    """Write one record as a JSON line."""
+    f.write(json.dumps(record, ensure_ascii=False))
+    f.write('\n')
+
+
+def write_json_atomic(path: Path, state: dict) -> None:
+    """Write a JSON file through a temporary file, so readers never see half of it."""
+    tmp = path.with_name(path.name + '.tmp')
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(state, f)
+    os.replace(tmp, path)
+
+
+def count_records(path: str, fmt: Optional[str] = None, default: str = 'jsonl') -> Optional[int]:
+    """
+    Estimate the number of records in a file by counting lines.
+
+    Returns:
+        Line count (minus the CSV header), or None for stdin
+    """
+    if path == '-':
+        return None
+    count = 0
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            count += block.count(b'\n')
+    if detect_format(path, fmt, default) == 'csv':
+        count -= 1
+    return max(count, 0)
+
+
+class Checkpoint:
+    """
+    Progress of a resumable bulk job.
+
+    Input is processed in fixed-size chunks numbered from zero. The
+    checkpoint keeps the number of leading chunks that are finished, the
+    finished chunks beyond them (possible when output is unordered) and the
+    size of the output file when it was saved. On resume the output is
+    truncated back to that size, so no row is written twice.
+    """
+
+    def __init__(self, path: str, chunk_size: int):
+        """
+        Args:
+            path: Checkpoint file
+            chunk_size: Records per chunk
+        """
+        self.path = Path(path)
+        self.chunk_size = chunk_size
+        self.done = 0
+        self.completed = set()
+        self.offset = 0
+
+    @classmethod
+    def load(cls, path: str, chunk_size: int) -> 'Checkpoint':
+        """
+        Load a checkpoint, or start a new one if the file does not exist.
+
+        Raises:
+            ValueError: If the checkpoint was written with another chunk size
+        """
+        checkpoint = cls(path, chunk_size)
+        if checkpoint.path.exists():
+            with open(checkpoint.path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+            if state['chunk_size'] != chunk_size:
+                raise ValueError(f"Checkpoint {path} was written with chunk size "
+                                 f"{state['chunk_size']}, not {chunk_size}")
+            checkpoint.done = state['done']
+            checkpoint.completed = set(state['completed'])
+            checkpoint.offset = state['offset']
+        return checkpoint
+
+    def is_finished(self, index: int) -> bool:
+        """True if a chunk was finished in an earlier run."""
+        return index < self.done or index in self.completed
+
+    def mark(self, index: int) -> None:
+        """Record a finished chunk."""
+        self.completed.add(index)
+        while self.done in self.completed:
+            self.completed.remove(self.done)
+            self.done += 1
+
+    def save(self, offset: int) -> None:
+        """Atomically write the checkpoint for an output file of offset bytes."""
+        self.offset = offset
+        write_json_atomic(self.path, {
+            'chunk_size': self.chunk_size,
+            'done': self.done,
+            'completed': sorted(self.completed),
+            'offset': offset
+        })
+
+
+class StageMetrics:
+    """
+    Thread-safe record counts and busy time per pipeline stage.
+
+    A stage's capacity is the records per second it could sustain if it
+    never waited for its neighbours: records divided by busy time per
+    worker. The stage with the lowest capacity is the bottleneck.
+    """
+
+    def __init__(self, workers: dict):
+        """
+        Args:
+            workers: Stage name -> number of workers running it, in pipeline order
+        """
+        self.workers = dict(workers)
+        self.started = time.monotonic()
+        self._records = dict.fromkeys(self.workers, 0)
+        self._busy = dict.fromkeys(self.workers, 0.0)
+        self._lock = threading.Lock()
+
+    def add(self, stage: str, records: int, seconds: float) -> None:
+        """Record that a stage handled records in seconds of busy time."""
+        with self._lock:
+            self._records[stage] += records
+            self._busy[stage] += seconds
+
+    def timed(self, stage: str, items: Iterable[list]) -> Iterator[list]:
+        """Yield chunks from items, counting the time spent producing each one."""
+        iterator = iter(items)
+        while True:
+            start = time.perf_counter()
+            try:
+                chunk = next(iterator)
+            except StopIteration:
+                return
+            self.add(stage, len(chunk), time.perf_counter() - start)
+            yield chunk
+
+    def snapshot(self) -> dict:
+        """Return records, busy seconds, capacity and utilization per stage."""
+        elapsed = max(time.monotonic() - self.started, 1e-9)
+        with self._lock:
+            stages = {}
+            for stage, workers in self.workers.items():
+                records, busy = self._records[stage], self._busy[stage]
+                stages[stage] = {
+                    'records': records,
+                    'busy': busy,
+                    'capacity': records * workers / busy if busy > 0 else float('inf'),
+                    'utilization': busy / (elapsed * workers)
+                }
+        return stages
+
+    def summary(self) -> str:
+        """One line with each stage's capacity and utilization and the bottleneck."""
+        stages = self.snapshot()
+        parts = [f"{stage} {_format_rate(s['capacity'])}/s ({s['utilization']:.0%} busy)"
+                 for stage, s in stages.items()]
+        bottleneck = min(stages, key=lambda stage: stages[stage]['capacity'])
+        return "  stages: " + ", ".join(parts) + f"; bottleneck: {bottleneck}"
+
+
+def _format_rate(rate: float) -> str:
+    if rate == float('inf'):
+        return "-"
+    if rate >= 1e4:
+        return f"{rate / 1e3:.0f}k"
+    return f"{rate:.0f}"
+
+
+class Progress:
+    """Periodic throughput and ETA reports on stderr."""
+
+    def __init__(self, total: Optional[int] = None, skipped: int = 0,
+                 interval: float = PROGRESS_INTERVAL, stream=None,
+                 metrics: Optional[StageMetrics] = None):
+        """
+        Args:
+            total: Expected number of records (None if unknown)
+            skipped: Records already finished by an earlier run
+            interval: Seconds between reports
+            stream: Output stream (default: stderr)
+            metrics: Per-stage metrics to report with each line (optional)
+        """
+        self.total = total
+        self.skipped = skipped
+        self.count = 0
+        self.interval = interval
+        self.stream = stream or sys.stderr
+        self.metrics = metrics
+        self.started = time.monotonic()
+        self._reported = self.started
+
+    def update(self, count: int) -> None:
+        """Add processed records and report if the interval has passed."""
+        self.count += count
+        now = time.monotonic()
+        if now - self._reported >= self.interval:
+            self._reported = now
+            self.report()
+
+    def rate(self) -> float:
+        """Records per second processed by this run."""
+        elapsed = time.monotonic() - self.started
+        return self.count / elapsed if elapsed > 0 else 0.0
+
+    def report(self, final: bool = False) -> None:
+        """Print processed records, throughput and the estimated time left."""
+        done = self.skipped + self.count
+        rate = self.rate()
+        line = f"{done}" + (f"/{self.total}" if self.total else "") + f" records, {rate:.1f}/s"
+        if final:
+            line += f", {time.monotonic() - self.started:.1f}s"
+        elif self.total and rate > 0:
+            line += f", ETA {_format_duration(max(self.total - done, 0) / rate)}"
+        if self.metrics is not None:
+            line += "\n" + self.metrics.summary()
+        print(line, file=self.stream, flush=True)
+
+
+def _format_duration(seconds: float) -> str:
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}:{minutes:02d}:{seconds:02d}"
+
+
+def run_pipeline(records: Iterable[dict], process: Callable[[list], list],
+                 output: Optional[str] = None, workers: int = 4, chunk_size: int = 10,
+                 ordered: bool = True, checkpoint: Optional[str] = None,
+                 total: Optional[int] = None, progress: bool = True,
+                 metrics: Optional[StageMetrics] = None) -> int:
+    """
+    Process a record stream in chunks on a worker pool and write JSON lines.
+
+    At most twice as many chunks as workers are in flight, so memory stays
+    bounded however long the input is. Output records are written as their
+    chunk completes: in input order when ordered, otherwise as soon as any
+    chunk finishes.
+
+    Args:
+        records: Input records
+        process: Function mapping a chunk of records to output records
+        output: Output file (None or '-' for stdout)
+        workers: Concurrent chunks
+        chunk_size: Records per chunk
+        ordered: Keep output in input order
+        checkpoint: Checkpoint file; an existing one resumes the job where it
+            stopped (requires an output file)
+        total: Expected number of records, for the ETA
+        progress: Report throughput and ETA on stderr
+        metrics: StageMetrics with 'read', 'process' and 'write' stages,
+            filled in as the pipeline runs and included in progress reports
+
+    Returns:
+        Number of records processed by this run
+
+    Raises:
+        ValueError: If checkpointing without an output file
+    """
+    state = None
+    if checkpoint:
+        if not output or output == '-':
+            raise ValueError("Checkpointing requires an output file")
+        state = Checkpoint.load(checkpoint, chunk_size)
+
+    resuming = state is not None and state.offset > 0
+    out = open_output(output, append=resuming)
+    if resuming:
+        out.truncate(state.offset)
+
+    skipped = 0
+    if state is not None:
+        skipped = (state.done + len(state.completed)) * chunk_size
+        if total is not None:
+            skipped = min(skipped, total)
+    tracker = Progress(total, skipped, metrics=metrics) if progress else None
+    in_flight = deque()
+    saved = time.monotonic()
+    processed = 0
+
+    def run(chunk: list) -> list:
+        start = time.perf_counter()
+        results = process(chunk)
+        metrics.add('process', len(chunk), time.perf_counter() - start)
+        return results
+
+    def finish(future, index: int, count: int) -> None:
+        nonlocal saved, processed
+        results = future.result()
+        start = time.perf_counter()
+        for record in results:
+            write_jsonl(out, record)
+        if metrics is not None:
+            metrics.add('write', count, time.perf_counter() - start)
+        processed += count
+        if tracker is not None:
+            tracker.update(count)
+        if state is not None:
+            state.mark(index)
+            now = time.monotonic()
+            if now - saved >= CHECKPOINT_INTERVAL:
+                out.flush()
+                state.save(out.tell())
+                saved = now
+
+    def drain(limit: int) -> None:
+        while len(in_flight) > limit:
+            if ordered:
+                finish(*in_flight.popleft())
+                continue
+            done, _ = wait([entry[0] for entry in in_flight], return_when=FIRST_COMPLETED)
+            for entry in [entry for entry in in_flight if entry[0] in done]:
+                in_flight.remove(entry)
+                finish(*entry)
+
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            try:
+                chunks = iter_batches(records, chunk_size)
+                if metrics is not None:
+                    chunks = metrics.timed('read', chunks)
+                task = run if metrics is not None else process
+                for index, chunk in enumerate(chunks):
+                    if state is not None and state.is_finished(index):
+                        continue
+                    in_flight.append((executor.submit(task, chunk), index, len(chunk)))
+                    drain(2 * workers - 1)
+                drain(0)
+            finally:
+                for future, _, _ in in_flight:
+                    future.cancel()
+    finally:
+        out.flush()
+        if state is not None:
+            state.save(out.tell())
+        if out is not sys.stdout:
+            out.close()
+
+    if tracker is not None:
+        tracker.report(final=True)
+    return processed
@@ -0,0 +1,993 @@
+"""
+Amap Result Caches
+
+Persistent on-disk geocode cache shared by every script and process, an
+in-memory response cache for long-running workers, an in-memory spatial
+cache answering reverse geocodes from nearby previously resolved points,
+a persistent IP range cache answering IP lookups by /24 network, and a
+persistent route cache answering route plans between nearby points.
+"""
+
+import json
+import math
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from array import array
+from bisect import bisect_right
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional
+
+from address import address_key
+
+
+CACHE_DIR = Path(os.environ.get('AMAP_CACHE_DIR', Path.home() / ".cache" / "amap"))
+
+DEFAULT_GEOCODE_TTL = 30 * 24 * 3600
+DEFAULT_MAX_ENTRIES = 500_000
+
+# Check the entry count once per this many writes
+EVICT_CHECK_INTERVAL = 1000
+
+# Response cache lifetimes in seconds, matched by endpoint prefix
+ENDPOINT_TTLS = {
+    '/geocode/': 24 * 3600,
+    '/config/district': 24 * 3600,
+    '/ip': 3600,
+    '/place/': 3600,
+    '/weather/': 600,
+    '/direction/': 300,
+    '/distance': 300,
+}
+DEFAULT_RESPONSE_TTL = 60
+DEFAULT_RESPONSE_MAX_ENTRIES = 10_000
+DEFAULT_RESPONSE_MAX_BYTES = 64 * 1024 * 1024
+
+DEFAULT_REGEO_TOLERANCE = 10.0
+DEFAULT_SPATIAL_MAX_POINTS = 2_000_000
+
+# Meters per degree of latitude (and of longitude at the equator)
+METERS_PER_DEGREE = 111_320.0
+
+DEFAULT_IP_TTL = 7 * 24 * 3600
+
+# Route cache grid size in meters and time-of-day bucket width in seconds
+DEFAULT_ROUTE_PRECISION = 50.0
+DEFAULT_ROUTE_BUCKET = 3600
+DEFAULT_ROUTE_MAX_ENTRIES = 200_000
+
+# Route lifetimes in seconds per mode; driving routes planned in peak hours
+# follow live traffic and expire sooner
+ROUTE_TTLS = {
+    'walking': 30 * 24 * 3600,
+    'cycling': 30 * 24 * 3600,
+    'ebicycle': 30 * 24 * 3600,
+    'transit': 24 * 3600,
+    'driving': 24 * 3600,
+}
+DEFAULT_ROUTE_TTL = 3600
+DRIVING_PEAK_TTL = 15 * 60
+PEAK_HOURS = ((7, 10), (17, 20))
+
+# Modes whose routes depend on the time of day (traffic, timetables)
+TIMED_MODES = ('driving', 'transit')
+
+# Grid cells are keyed by column * _CELL_STRIDE + row, unique for rows below 2**31
+_CELL_STRIDE = 1 << 32
+
+
+def cache_key(address: str, city: Optional[str] = None) -> tuple[str, str]:
+    """
+    Normalize an (address, city) pair into a cache key.
+
+    Spellings that normalize_address() maps to one canonical address share
+    one entry.
+    """
+    return address_key(address, city)
+
+
+def ip_network(ip: str) -> Optional[int]:
+    """The /24 network of an IPv4 address as an integer, or None if ip is not IPv4."""
+    parts = ip.strip().split('.')
+    if len(parts) != 4 or not all(part.isdigit() and int(part) < 256 for part in parts):
+        return None
+    a, b, c, _ = map(int, parts)
+    return (a << 16) | (b << 8) | c
+
+
+class GeocodeCache:
+    """
+    SQLite-backed geocode cache keyed by normalized (address, city).
+
+    The database runs in WAL mode so concurrent CLI processes can read and
+    write it safely. Entries expire after ttl seconds and the least recently
+    used entries are evicted once max_entries is exceeded.
+    """
+
+    def __init__(self, path: Optional[str] = None, ttl: float = DEFAULT_GEOCODE_TTL,
+                 max_entries: int = DEFAULT_MAX_ENTRIES):
+        """
+        Args:
+            path: Database file (defaults to $AMAP_CACHE_DIR/geocode.sqlite3)
+            ttl: Entry lifetime in seconds
+            max_entries: Maximum number of cached entries
+        """
+        self.path = Path(path) if path else CACHE_DIR / "geocode.sqlite3"
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._writes = 0
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        conn = self._connect()
+        with conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS geocodes ("
+                " address TEXT NOT NULL,"
+                " city TEXT NOT NULL,"
+                " result TEXT NOT NULL,"
+                " created REAL NOT NULL,"
+                " accessed REAL NOT NULL,"
+                " PRIMARY KEY (address, city))"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS geocodes_accessed ON geocodes (accessed)")
+
+    def _connect(self) -> sqlite3.Connection:
+        # sqlite3 connections must not be shared across threads
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(str(self.path), timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _count(self, hits: int, misses: int) -> None:
+        with self._lock:
+            self.hits += hits
+            self.misses += misses
+
+    def get(self, address: str, city: Optional[str] = None) -> Optional[dict]:
+        """Return the cached geocode for an address, or None."""
+        return self.get_many([(address, city)])[0]
+
+    def get_many(self, items: list) -> list:
+        """
+        Look up many (address, city) pairs.
+
+        Returns:
+            Cached geocode dicts in input order, None for misses
+        """
+        conn = self._connect()
+        now = time.time()
+        results = []
+        touched = []
+        for address, city in items:
+            key = cache_key(address, city)
+            row = conn.execute(
+                "SELECT result, created FROM geocodes WHERE address = ? AND city = ?", key
+            ).fetchone()
+            if row and now - row[1] < self.ttl:
+                results.append(json.loads(row[0]))
+                touched.append((now, *key))
+            else:
+                results.append(None)
+
+        if touched:
+            with conn:
+                conn.executemany(
+                    "UPDATE geocodes SET accessed = ? WHERE address = ? AND city = ?", touched
+                )
+
+        self._count(len(touched), len(results) - len(touched))
+        return results
+
+    def put(self, address: str, city: Optional[str], result: dict) -> None:
+        """Store a geocode result."""
+        self.put_many([(address, city, result)])
+
+    def put_many(self, items: list) -> None:
+        """Store many (address, city, result) entries in one transaction."""
+        if not items:
+            return
+        conn = self._connect()
+        now = time.time()
+        rows = [(*cache_key(address, city), json.dumps(result, ensure_ascii=False), now, now)
+                for address, city, result in items]
+        with conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO geocodes (address, city, result, created, accessed)"
+                " VALUES (?, ?, ?, ?, ?)", rows
+            )
+
+        with self._lock:
+            before = self._writes
+            self._writes += len(rows)
+            check = before // EVICT_CHECK_INTERVAL != self._writes // EVICT_CHECK_INTERVAL
+        if check:
+            self.evict()
+
+    def evict(self) -> int:
+        """
+        Drop expired entries and trim to max_entries by least recent access.
+
+        Returns:
+            Number of entries removed
+        """
+        conn = self._connect()
+        with conn:
+            removed = conn.execute(
+                "DELETE FROM geocodes WHERE created < ?", (time.time() - self.ttl,)
+            ).rowcount
+            excess = conn.execute("SELECT COUNT(*) FROM geocodes").fetchone()[0] - self.max_entries
+            if excess > 0:
+                removed += conn.execute(
+                    "DELETE FROM geocodes WHERE rowid IN"
+                    " (SELECT rowid FROM geocodes ORDER BY accessed LIMIT ?)", (excess,)
+                ).rowcount
+        return removed
+
+    def clear(self) -> None:
+        """Remove all entries."""
+        conn = self._connect()
+        with conn:
+            conn.execute("DELETE FROM geocodes")
+
+    def stats(self) -> dict:
+        """Return hit/miss counters for this process and the current entry count."""
+        entries = self._connect().execute("SELECT COUNT(*) FROM geocodes").fetchone()[0]
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'entries': entries
+        }
+
+
+class ResponseCache:
+    """
+    Thread-safe in-memory TTL/LRU cache of decoded API responses.
+
+    Keys are the endpoint plus its sorted query parameters (excluding the
+    API key). Responses are stored already decoded, so a hit returns the
+    cached dict without touching JSON; callers must treat it as read-only.
+    Memory is bounded by both entry count and the total size of the raw
+    response bodies.
+    """
+
+    def __init__(self, ttls: Optional[dict] = None, default_ttl: float = DEFAULT_RESPONSE_TTL,
+                 max_entries: int = DEFAULT_RESPONSE_MAX_ENTRIES,
+                 max_bytes: int = DEFAULT_RESPONSE_MAX_BYTES):
+        """
+        Args:
+            ttls: Endpoint prefix to lifetime in seconds (defaults to ENDPOINT_TTLS)
+            default_ttl: Lifetime for endpoints not matched by ttls
+            max_entries: Maximum number of cached responses
+            max_bytes: Maximum total size of cached response bodies
+        """
+        self.ttls = dict(ENDPOINT_TTLS if ttls is None else ttls)
+        self.default_ttl = default_ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.size = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(endpoint: str, params: dict) -> tuple:
+        """Canonical cache key for an endpoint call, ignoring the API key."""
+        return (endpoint, tuple(sorted((k, str(v)) for k, v in params.items() if k != 'key')))
+
+    def ttl_for(self, endpoint: str) -> float:
+        """Lifetime for an endpoint, using the longest matching prefix."""
+        best = None
+        for prefix in self.ttls:
+            if endpoint.startswith(prefix) and (best is None or len(prefix) > len(best)):
+                best = prefix
+        return self.ttls[best] if best is not None else self.default_ttl
+
+    def get(self, key: tuple) -> Optional[dict]:
+        """Return the cached response for a key, or None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    self._remove(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key: tuple, data: dict, size: int = 0) -> None:
+        """
+        Store a decoded response.
+
+        Args:
+            key: Key from make_key
+            data: Decoded response
+            size: Size of the raw response body in bytes
+        """
+        ttl = self.ttl_for(key[0])
+        if ttl <= 0:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (time.monotonic() + ttl, data, size)
+            self.size += size
+            while self._entries and (len(self._entries) > self.max_entries
+                                     or self.size > self.max_bytes):
+                self._remove(next(iter(self._entries)))
+
+    def _remove(self, key: tuple) -> None:
+        _, _, size = self._entries.pop(key)
+        self.size -= size
+
+    def clear(self) -> None:
+        """Remove all entries."""
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+    def stats(self) -> dict:
+        """Return hit/miss counters and current footprint."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'entries': len(self._entries),
+                'bytes': self.size
+            }
+
+
+class SpatialCache:
+    """
+    Thread-safe in-memory nearest-neighbour cache of reverse geocoding results.
+
+    Points are bucketed on a grid whose cells are tolerance meters tall. A
+    lookup scans the cells within tolerance of the query point and returns
+    the result of the nearest cached point at most tolerance meters away.
+    The tolerance trades precision for hit rate: a larger radius answers
+    more lookups from cache but may return the neighbouring address.
+
+    Coordinates are packed into per-cell float arrays and results sharing a
+    formatted_address are stored once, so millions of points fit in memory.
+    Whole cells are evicted oldest first once max_points is exceeded.
+    """
+
+    def __init__(self, tolerance: float = DEFAULT_REGEO_TOLERANCE,
+                 max_points: int = DEFAULT_SPATIAL_MAX_POINTS):
+        """
+        Args:
+            tolerance: Maximum distance in meters between a query and a cached point
+            max_points: Maximum number of cached points
+        """
+        if tolerance <= 0:
+            raise ValueError("Spatial cache tolerance must be positive")
+        self.tolerance = tolerance
+        self.max_points = max_points
+        self.hits = 0
+        self.misses = 0
+        self.size = 0
+        self._cell_size = tolerance / METERS_PER_DEGREE
+        self._cells = OrderedDict()
+        self._interned = {}
+        self._lock = threading.Lock()
+
+    def _nearest(self, lon: float, lat: float):
+        size = self._cell_size
+        x, y = math.floor(lon / size), math.floor(lat / size)
+        # A degree of longitude shrinks with latitude, so scan more columns
+        scale = max(math.cos(math.radians(lat)), 1e-3)
+        columns = math.ceil(1 / scale)
+        best = None
+        best_distance = (self.tolerance / METERS_PER_DEGREE) ** 2
+        cells = self._cells
+        for i in range(x - columns, x + columns + 1):
+            for j in range(y - 1, y + 2):
+                cell = cells.get(i * _CELL_STRIDE + j)
+                if cell is None:
+                    continue
+                coords, results = cell
+                for cell_lon, cell_lat, result in zip(coords[0::2], coords[1::2], results):
+                    dx = (cell_lon - lon) * scale
+                    dy = cell_lat - lat
+                    distance = dx * dx + dy * dy
+                    if distance <= best_distance:
+                        best, best_distance = result, distance
+        return best
+
+    def get(self, longitude: float, latitude: float):
+        """Return the result cached nearest to a point within tolerance, or None."""
+        return self.get_many([(longitude, latitude)])[0]
+
+    def get_many(self, points: list) -> list:
+        """
+        Look up many (longitude, latitude) points.
+
+        Returns:
+            Cached results in input order, None for misses
+        """
+        with self._lock:
+            results = [self._nearest(float(lon), float(lat)) for lon, lat in points]
+            hits = sum(result is not None for result in results)
+            self.hits += hits
+            self.misses += len(results) - hits
+        return results
+
+    def put(self, longitude: float, latitude: float, result) -> None:
+        """Cache the result for a point."""
+        self.put_many([(longitude, latitude, result)])
+
+    def put_many(self, items: list) -> None:
+        """Cache many (longitude, latitude, result) entries; None results are skipped."""
+        size = self._cell_size
+        cells = self._cells
+        interned = self._interned
+        with self._lock:
+            for lon, lat, result in items:
+                if result is None:
+                    continue
+                if isinstance(result, dict) and result.get('formatted_address'):
+                    result = interned.setdefault(result['formatted_address'], result)
+                lon, lat = float(lon), float(lat)
+                key = math.floor(lon / size) * _CELL_STRIDE + math.floor(lat / size)
+                cell = cells.get(key)
+                if cell is None:
+                    cells[key] = (array('d', (lon, lat)), [result])
+                else:
+                    cell[0].extend((lon, lat))
+                    cell[1].append(result)
+                self.size += 1
+
+            if self.size > self.max_points:
+                while self.size > self.max_points and cells:
+                    _, (_, results) = cells.popitem(last=False)
+                    self.size -= len(results)
+                # Forget the interned results so evicted ones can be freed
+                interned.clear()
+
+    def cluster(self, points: list) -> tuple[list, list]:
+        """
+        Group points lying within tolerance of each other.
+
+        Used to resolve only one point per group when a batch contains many
+        points close together. Points sharing another's result count as
+        hits, since they are answered without a request of their own.
+
+        Returns:
+            (representatives, owners): the first point of each group, and for
+            every input point the index of its group's representative
+        """
+        index = SpatialCache(self.tolerance, max_points=len(points) + 1)
+        representatives = []
+        owners = []
+        for lon, lat in points:
+            owner = index._nearest(float(lon), float(lat))
+            if owner is None:
+                owner = len(representatives)
+                representatives.append((lon, lat))
+                index.put_many([(lon, lat, owner)])
+            owners.append(owner)
+
+        shared = len(points) - len(representatives)
+        with self._lock:
+            self.hits += shared
+            self.misses -= min(shared, self.misses)
+        return representatives, owners
+
+    def clear(self) -> None:
+        """Remove all entries."""
+        with self._lock:
+            self._cells.clear()
+            self._interned.clear()
+            self.size = 0
+
+    def stats(self) -> dict:
+        """Return hit/miss counters and current footprint."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'points': self.size,
+                'cells': len(self._cells),
+                'results': len(self._interned)
+            }
+
+
+class IPRangeCache:
+    """
+    Thread-safe IP location cache keyed by /24 network, persisted as JSON.
+
+    Addresses in one /24 are assumed to share a location, so a lookup for
+    any of them answers the whole network. Adjacent networks with the same
+    location are merged into one range; ranges live in sorted arrays and a
+    lookup is one bisect. Ranges expire after ttl seconds.
+
+    The file is read on first use and written by save(), so processes that
+    never look up an IP pay nothing for it. Saving merges the networks
+    cached since the last save into the file's current contents, so
+    processes sharing the file keep each other's ranges.
+    """
+
+    def __init__(self, path: Optional[str] = None, ttl: float = DEFAULT_IP_TTL):
+        """
+        Args:
+            path: JSON file (defaults to $AMAP_CACHE_DIR/ip_ranges.json)
+            ttl: Range lifetime in seconds
+        """
+        self.path = Path(path) if path else CACHE_DIR / "ip_ranges.json"
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._starts = array('I')
+        self._ends = array('I')
+        self._values = array('I')
+        self._created = array('d')
+        self._results = []
+        self._interned = {}
+        self._loaded = False
+        # Networks put since the last save: network -> (result, created)
+        self._pending = {}
+        self._cleared = False
+        self._lock = threading.RLock()
+
+    def _read(self) -> Optional[dict]:
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _restore(self, state: Optional[dict]) -> None:
+        # Replace the in-memory ranges with a saved state
+        for column in (self._starts, self._ends, self._values, self._created):
+            del column[:]
+        self._results.clear()
+        self._interned.clear()
+        if state is None:
+            return
+        for result in state['results']:
+            self._intern(result)
+        for start, end, value, created in state['ranges']:
+            self._starts.append(start)
+            self._ends.append(end)
+            self._values.append(value)
+            self._created.append(created)
+
+    def _load(self) -> None:
+        self._loaded = True
+        self._restore(self._read())
+
+    def _intern(self, result: dict) -> int:
+        key = json.dumps(result, sort_keys=True, ensure_ascii=False)
+        value = self._interned.get(key)
+        if value is None:
+            value = self._interned[key] = len(self._results)
+            self._results.append(result)
+        return value
+
+    def _find(self, network: int) -> int:
+        # Index of the range containing network, or -1
+        i = bisect_right(self._starts, network) - 1
+        return i if i >= 0 and self._ends[i] >= network else -1
+
+    def get(self, ip: str) -> Optional[dict]:
+        """Return the cached location of an IP address, or None."""
+        return self.get_many([ip])[0]
+
+    def get_many(self, ips: list) -> list:
+        """
+        Look up many IP addresses.
+
+        Returns:
+            Cached location dicts (with 'ip' set to the queried address) in
+            input order, None for misses
+        """
+        now = time.time()
+        results = []
+        with self._lock:
+            if not self._loaded:
+                self._load()
+            for ip in ips:
+                network = ip_network(ip)
+                i = self._find(network) if network is not None else -1
+                if i >= 0 and now - self._created[i] < self.ttl:
+                    results.append({**self._results[self._values[i]], 'ip': ip})
+                else:
+                    results.append(None)
+            hits = sum(result is not None for result in results)
+            self.hits += hits
+            self.misses += len(results) - hits
+        return results
+
+    def put(self, ip: str, result: dict) -> None:
+        """Cache the location of an IP address for its whole /24 network."""
+        self.put_many([(ip, result)])
+
+    def put_many(self, items: list) -> None:
+        """Cache many (ip, result) entries; non-IPv4 addresses and None results are skipped."""
+        now = time.time()
+        with self._lock:
+            if not self._loaded:
+                self._load()
+            for ip, result in items:
+                network = ip_network(ip)
+                if network is None or result is None:
+                    continue
+                result = {k: v for k, v in result.items() if k != 'ip'}
+                self._insert(network, self._intern(result), now)
+                self._pending[network] = (result, now)
+
+    def _insert(self, network: int, value: int, created: float) -> None:
+        starts, ends, values, stamps = self._starts, self._ends, self._values, self._created
+
+        i = self._find(network)
+        if i >= 0:
+            if values[i] == value:
+                stamps[i] = created
+                return
+            # Cut network out of the range holding a stale location
+            start, end, old, stamp = starts[i], ends[i], values[i], stamps[i]
+            self._remove(i)
+            if network < end:
+                self._place(i, network + 1, end, old, stamp)
+            if start < network:
+                self._place(i, start, network - 1, old, stamp)
+
+        i = bisect_right(starts, network)
+        # Extend a neighbour with the same location instead of adding a range
+        left = i > 0 and ends[i - 1] == network - 1 and values[i - 1] == value
+        right = i < len(starts) and starts[i] == network + 1 and values[i] == value
+        if left and right:
+            ends[i - 1] = ends[i]
+            stamps[i - 1] = min(stamps[i - 1], stamps[i])
+            self._remove(i)
+        elif left:
+            ends[i - 1] = network
+        elif right:
+            starts[i] = network
+        else:
+            self._place(i, network, network, value, created)
+
+    def _remove(self, i: int) -> None:
+        for column in (self._starts, self._ends, self._values, self._created):
+            del column[i]
+
+    def _place(self, i: int, start: int, end: int, value: int, created: float) -> None:
+        self._starts.insert(i, start)
+        self._ends.insert(i, end)
+        self._values.insert(i, value)
+        self._created.insert(i, created)
+
+    def group(self, ips: list) -> tuple[list, list]:
+        """
+        Group IP addresses by /24 network.
+
+        Used to look up one address per network when a batch contains many
+        addresses of the same network. Addresses sharing another's result
+        count as hits, since they are answered without a request of their
+        own; non-IPv4 addresses are only grouped with identical ones.
+
+        Returns:
+            (representatives, owners): the first address of each group, and
+            for every input address the index of its group's representative
+        """
+        groups = {}
+        representatives = []
+        owners = []
+        for ip in ips:
+            network = ip_network(ip)
+            key = network if network is not None else ip
+            owner = groups.get(key)
+            if owner is None:
+                owner = groups[key] = len(representatives)
+                representatives.append(ip)
+            owners.append(owner)
+
+        shared = len(ips) - len(representatives)
+        with self._lock:
+            self.hits += shared
+            self.misses -= min(shared, self.misses)
+        return representatives, owners
+
+    def save(self) -> None:
+        """
+        Atomically write the ranges to disk if anything changed.
+
+        Under an exclusive lock on a sidecar .lock file, the file is read
+        again and the networks cached since the last save are merged in,
+        unless another process saved a newer result for them. After clear()
+        the file is overwritten instead.
+        """
+        import fcntl
+
+        with self._lock:
+            if not (self._pending or self._cleared):
+                return
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path.with_name(self.path.name + '.lock'), 'a') as lock:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+                if not self._cleared:
+                    self._restore(self._read())
+                    for network, (result, created) in self._pending.items():
+                        i = self._find(network)
+                        if i < 0 or self._created[i] <= created:
+                            self._insert(network, self._intern(result), created)
+                state = {
+                    'results': self._results,
+                    'ranges': [list(row) for row in zip(self._starts, self._ends,
+                                                        self._values, self._created)]
+                }
+                fd, tmp = tempfile.mkstemp(prefix=self.path.name + '.', suffix='.tmp',
+                                           dir=self.path.parent)
+                try:
+                    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                        json.dump(state, f, ensure_ascii=False, separators=(',', ':'))
+                    os.replace(tmp, self.path)
+                except BaseException:
+                    os.unlink(tmp)
+                    raise
+            self._pending.clear()
+            self._cleared = False
+
+    def clear(self) -> None:
+        """Remove all entries."""
+        with self._lock:
+            for column in (self._starts, self._ends, self._values, self._created):
+                del column[:]
+            self._results.clear()
+            self._interned.clear()
+            self._pending.clear()
+            self._loaded = True
+            self._cleared = True
+
+    def stats(self) -> dict:
+        """Return hit/miss counters and current footprint."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'ranges': len(self._starts),
+                'networks': sum(end - start + 1 for start, end in zip(self._starts, self._ends)),
+                'results': len(self._results)
+            }
+
+
+def summarize_route(route: dict) -> dict:
+    """Copy of a route without turn-by-turn steps: totals, tolls and costs only."""
+    summary = dict(route)
+    for option in ('paths', 'transits'):
+        if isinstance(route.get(option), list):
+            summary[option] = [{k: v for k, v in item.items() if k not in ('steps', 'segments')}
+                               for item in route[option]]
+    return summary
+
+
+class RouteCache:
+    """
+    SQLite-backed route cache keyed by (mode, snapped origin, snapped
+    destination, time-of-day bucket).
+
+    Origins and destinations are snapped to a grid of precision meters, so
+    trips between nearby points share one cached route; a larger grid
+    raises the hit rate but may return a route starting up to a cell away.
+    Driving and transit routes are also bucketed by the time of day they
+    were planned at, so a route planned in the morning peak only answers
+    morning-peak requests. Each mode has its own lifetime (see ROUTE_TTLS);
+    driving routes planned in PEAK_HOURS expire after DRIVING_PEAK_TTL.
+
+    With summary_only, driving routes planned for callers that ask for no
+    steps are stored without them, since steps are most of a route's size;
+    such entries only answer callers that ask for no steps. Routes planned
+    for callers that want steps are stored in full.
+    """
+
+    def __init__(self, path: Optional[str] = None, precision: float = DEFAULT_ROUTE_PRECISION,
+                 bucket: float = DEFAULT_ROUTE_BUCKET, ttls: Optional[dict] = None,
+                 peak_ttl: float = DRIVING_PEAK_TTL, summary_only: bool = False,
+                 max_entries: int = DEFAULT_ROUTE_MAX_ENTRIES):
+        """
+        Args:
+            path: Database file (defaults to $AMAP_CACHE_DIR/routes.sqlite3)
+            precision: Snapping grid size in meters
+            bucket: Width of the time-of-day buckets in seconds
+            ttls: Mode to lifetime in seconds (defaults to ROUTE_TTLS)
+            peak_ttl: Lifetime of driving routes planned in peak hours
+            summary_only: Store driving routes without their steps when
+                the caller did not ask for them
+            max_entries: Maximum number of cached routes
+        """
+        if precision <= 0:
+            raise ValueError("Route cache precision must be positive")
+        self.path = Path(path) if path else CACHE_DIR / "routes.sqlite3"
+        self.precision = precision
+        self.bucket_width = bucket
+        self.ttls = dict(ROUTE_TTLS if ttls is None else ttls)
+        self.peak_ttl = peak_ttl
+        self.summary_only = summary_only
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._writes = 0
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        conn = self._connect()
+        with conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS routes ("
+                " mode TEXT NOT NULL,"
+                " origin TEXT NOT NULL,"
+                " destination TEXT NOT NULL,"
+                " bucket TEXT NOT NULL,"
+                " options TEXT NOT NULL,"
+                " summary INTEGER NOT NULL,"
+                " route TEXT NOT NULL,"
+                " expires REAL NOT NULL,"
+                " accessed REAL NOT NULL,"
+                " PRIMARY KEY (mode, origin, destination, bucket, options))"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS routes_accessed ON routes (accessed)")
+
+    def _connect(self) -> sqlite3.Connection:
+        # sqlite3 connections must not be shared across threads
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(str(self.path), timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def snap(self, location: str) -> str:
+        """Grid cell of a "lon,lat" location, tagged with the grid size."""
+        lon, lat = (float(v) for v in location.split(','))
+        step = self.precision / METERS_PER_DEGREE
+        row = math.floor(lat / step)
+        # Cells are precision meters wide at the latitude of their row
+        width = step / max(math.cos(math.radians((row + 0.5) * step)), 1e-6)
+        return f"{self.precision:g}:{math.floor(lon / width)}:{row}"
+
+    def bucket(self, mode: str, when: Optional[float] = None) -> str:
+        """Time-of-day bucket of a route planned at when; '' for untimed modes."""
+        if mode not in TIMED_MODES:
+            return ''
+        now = time.localtime(time.time() if when is None else when)
+        seconds = now.tm_hour * 3600 + now.tm_min * 60 + now.tm_sec
+        return f"{self.bucket_width:g}:{int(seconds // self.bucket_width)}"
+
+    def ttl_for(self, mode: str, when: Optional[float] = None) -> float:
+        """Lifetime of a route of mode planned at when."""
+        if mode == 'driving':
+            hour = time.localtime(time.time() if when is None else when).tm_hour
+            if any(start <= hour < end for start, end in PEAK_HOURS):
+                return min(self.peak_ttl, self.ttls.get(mode, DEFAULT_ROUTE_TTL))
+        return self.ttls.get(mode, DEFAULT_ROUTE_TTL)
+
+    def _key(self, mode: str, origin: str, destination: str, options: str,
+             when: Optional[float]) -> tuple:
+        return (mode, self.snap(origin), self.snap(destination), self.bucket(mode, when), options)
+
+    def get(self, mode: str, origin: str, destination: str, options: str = '',
+            steps: bool = True, when: Optional[float] = None) -> Optional[dict]:
+        """
+        Return a cached route between the cells of origin and destination, or None.
+
+        Args:
+            mode: Transportation mode
+            origin: Start "lon,lat"
+            destination: End "lon,lat"
+            options: Other request parameters the route depends on
+            steps: Whether the caller needs steps; if so, summary-only
+                entries count as misses
+            when: Planning time (defaults to now)
+        """
+        key = self._key(mode, origin, destination, options, when)
+        conn = self._connect()
+        now = time.time()
+        row = conn.execute(
+            "SELECT route, summary, expires FROM routes WHERE mode = ? AND origin = ?"
+            " AND destination = ? AND bucket = ? AND options = ?", key
+        ).fetchone()
+        hit = row is not None and row[2] > now and not (steps and row[1])
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+        if not hit:
+            return None
+
+        with conn:
+            conn.execute("UPDATE routes SET accessed = ? WHERE mode = ? AND origin = ?"
+                         " AND destination = ? AND bucket = ? AND options = ?", (now, *key))
+        return json.loads(row[0])
+
+    def put(self, mode: str, origin: str, destination: str, route: dict, options: str = '',
+            when: Optional[float] = None, steps: bool = True) -> None:
+        """
+        Store a route planned at when (defaults to now); its lifetime starts now.
+
+        Args:
+            steps: Whether the caller asked for steps; with summary_only,
+                driving routes planned without are stored as summaries
+        """
+        now = time.time()
+        ttl = self.ttl_for(mode, when)
+        if ttl <= 0:
+            return
+        summary = self.summary_only and mode == 'driving' and not steps
+        if summary:
+            route = summarize_route(route)
+        key = self._key(mode, origin, destination, options, when)
+        conn = self._connect()
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO routes (mode, origin, destination, bucket, options,"
+                " summary, route, expires, accessed) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (*key, int(summary), json.dumps(route, ensure_ascii=False, separators=(',', ':')),
+                 now + ttl, now)
+            )
+
+        with self._lock:
+            self._writes += 1
+            check = self._writes % EVICT_CHECK_INTERVAL == 0
+        if check:
+            self.evict()
+
+    def evict(self) -> int:
+        """
+        Drop expired routes and trim to max_entries by least recent access.
+
+        Returns:
+            Number of routes removed
+        """
+        conn = self._connect()
+        with conn:
+            removed = conn.execute("DELETE FROM routes WHERE expires <= ?",
+                                   (time.time(),)).rowcount
+            excess = conn.execute("SELECT COUNT(*) FROM routes").fetchone()[0] - self.max_entries
+            if excess > 0:
+                removed += conn.execute(
+                    "DELETE FROM routes WHERE rowid IN"
+                    " (SELECT rowid FROM routes ORDER BY accessed LIMIT ?)", (excess,)
+                ).rowcount
+        return removed
+
+    def clear(self) -> None:
+        """Remove all entries."""
+        conn = self._connect()
+        with conn:
+            conn.execute("DELETE FROM routes")
+
+    def stats(self) -> dict:
+        """Return hit/miss counters for this process and the current entry count and size."""
+        entries, size = self._connect().execute(
+            "SELECT COUNT(*), COALESCE(SUM(LENGTH(CAST(route AS BLOB))), 0) FROM routes").fetchone()
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'entries': entries,
+                'bytes': size
+            }
@@ -0,0 +1,238 @@
+"""
+Amap Coordinate Reference Systems
+
+Conversions between the three datums used with Chinese map services:
+
+- wgs84: GPS coordinates
+- gcj02: the obfuscated datum Amap requires and returns
+- bd09:  Baidu's datum, a further offset of GCJ-02
+
+transform() converts scalars in pure Python and whole arrays at once with
+NumPy when it is installed, falling back to a scalar loop otherwise.
+Points outside mainland China are not offset between WGS-84 and GCJ-02.
+"""
+
+import math
+from itertools import islice
+from types import SimpleNamespace
+from typing import Iterable, Optional
+
+
+CRS = ('wgs84', 'gcj02', 'bd09')
+
+# Response fields holding "lon,lat" points or ';'-separated polylines
+COORDINATE_FIELDS = ('location', 'origin', 'destination', 'polyline')
+
+# Krasovsky 1940 ellipsoid used by the GCJ-02 offset
+_A = 6378245.0
+_EE = 0.00669342162296594323
+
+_X_PI = math.pi * 3000.0 / 180.0
+
+# Fixed-point iterations when inverting the forward offsets (error < 1e-9 degrees)
+INVERSE_ITERATIONS = 4
+
+_SCALAR = SimpleNamespace(
+    sin=math.sin, cos=math.cos, sqrt=math.sqrt, atan2=math.atan2,
+    where=lambda condition, a, b: a if condition else b
+)
+
+
+def _numpy():
+    try:
+        import numpy
+    except ImportError:
+        return None
+    return numpy
+
+
+def _vector():
+    np = _numpy()
+    return SimpleNamespace(sin=np.sin, cos=np.cos, sqrt=np.sqrt, atan2=np.arctan2,
+                           where=np.where)
+
+
+def _outside_china(lon, lat):
+    return (lon < 72.004) | (lon > 137.8347) | (lat < 0.8293) | (lat > 55.8271)
+
+
+def _offset(lon, lat, xp):
+    x, y = lon - 105.0, lat - 35.0
+    shared = (20.0 * xp.sin(6.0 * x * math.pi) + 20.0 * xp.sin(2.0 * x * math.pi)) * 2.0 / 3.0
+
+    dlat = -100.0 + 2.0 * x + 3.0 * y + 0.2 * y * y + 0.1 * x * y + 0.2 * xp.sqrt(abs(x))
+    dlat += shared
+    dlat += (20.0 * xp.sin(y * math.pi) + 40.0 * xp.sin(y / 3.0 * math.pi)) * 2.0 / 3.0
+    dlat += (160.0 * xp.sin(y / 12.0 * math.pi) + 320.0 * xp.sin(y * math.pi / 30.0)) * 2.0 / 3.0
+
+    dlon = 300.0 + x + 2.0 * y + 0.1 * x * x + 0.1 * x * y + 0.1 * xp.sqrt(abs(x))
+    dlon += shared
+    dlon += (20.0 * xp.sin(x * math.pi) + 40.0 * xp.sin(x / 3.0 * math.pi)) * 2.0 / 3.0
+    dlon += (150.0 * xp.sin(x / 12.0 * math.pi) + 300.0 * xp.sin(x / 30.0 * math.pi)) * 2.0 / 3.0
+
+    radlat = lat / 180.0 * math.pi
+    magic = 1 - _EE * xp.sin(radlat) ** 2
+    sqrtmagic = xp.sqrt(magic)
+    dlat = (dlat * 180.0) / ((_A * (1 - _EE)) / (magic * sqrtmagic) * math.pi)
+    dlon = (dlon * 180.0) / (_A / sqrtmagic * xp.cos(radlat) * math.pi)
+
+    outside = _outside_china(lon, lat)
+    return xp.where(outside, 0.0, dlon), xp.where(outside, 0.0, dlat)
+
+
+def _wgs84_to_gcj02(lon, lat, xp):
+    dlon, dlat = _offset(lon, lat, xp)
+    return lon + dlon, lat + dlat
+
+
+def _invert(forward, lon, lat, guess_lon, guess_lat, xp):
+    # Refine the guess until forward(guess) == (lon, lat)
+    for _ in range(INVERSE_ITERATIONS):
+        flon, flat = forward(guess_lon, guess_lat, xp)
+        guess_lon, guess_lat = guess_lon - (flon - lon), guess_lat - (flat - lat)
+    return guess_lon, guess_lat
+
+
+def _gcj02_to_wgs84(lon, lat, xp):
+    # The offset has no closed-form inverse
+    return _invert(_wgs84_to_gcj02, lon, lat, lon, lat, xp)
+
+
+def _gcj02_to_bd09(lon, lat, xp):
+    z = xp.sqrt(lon * lon + lat * lat) + 0.00002 * xp.sin(lat * _X_PI)
+    theta = xp.atan2(lat, lon) + 0.000003 * xp.cos(lon * _X_PI)
+    return z * xp.cos(theta) + 0.0065, z * xp.sin(theta) + 0.006
+
+
+def _bd09_to_gcj02(lon, lat, xp):
+    # The usual closed form is only accurate to ~5 cm, so refine it
+    x, y = lon - 0.0065, lat - 0.006
+    z = xp.sqrt(x * x + y * y) - 0.00002 * xp.sin(y * _X_PI)
+    theta = xp.atan2(y, x) - 0.000003 * xp.cos(x * _X_PI)
+    return _invert(_gcj02_to_bd09, lon, lat, z * xp.cos(theta), z * xp.sin(theta), xp)
+
+
+_TO_GCJ02 = {'wgs84': _wgs84_to_gcj02, 'bd09': _bd09_to_gcj02}
+_FROM_GCJ02 = {'wgs84': _gcj02_to_wgs84, 'bd09': _gcj02_to_bd09}
+
+
+def _check_crs(crs: str) -> None:
+    if crs not in CRS:
+        raise ValueError(f"Invalid CRS '{crs}'. Must be one of: {', '.join(CRS)}")
+
+
+def _convert(lon, lat, src: str, dst: str, xp):
+    if src in _TO_GCJ02:
+        lon, lat = _TO_GCJ02[src](lon, lat, xp)
+    if dst in _FROM_GCJ02:
+        lon, lat = _FROM_GCJ02[dst](lon, lat, xp)
+    return lon, lat
+
+
+def transform(lon, lat, src: str, dst: str):
+    """
+    Convert coordinates between datums.
+
+    Args:
+        lon: Longitude, or a sequence/array of longitudes
+        lat: Latitude, or a sequence/array of latitudes
+        src: Source datum: wgs84, gcj02 or bd09
+        dst: Target datum: wgs84, gcj02 or bd09
+
+    Returns:
+        (lon, lat) as floats for scalar input; as NumPy arrays for sequence
+        input, or lists when NumPy is not installed
+
+    Raises:
+        ValueError: If a datum name is unknown
+    """
+    _check_crs(src)
+    _check_crs(dst)
+
+    if isinstance(lon, (int, float)) and isinstance(lat, (int, float)):
+        if src == dst:
+            return float(lon), float(lat)
+        return _convert(float(lon), float(lat), src, dst, _SCALAR)
+
+    np = _numpy()
+    if np is None:
+        pairs = [_convert(float(x), float(y), src, dst, _SCALAR) for x, y in zip(lon, lat)]
+        return [x for x, _ in pairs], [y for _, y in pairs]
+
+    lon = np.asarray(lon, dtype=np.float64)
+    lat = np.asarray(lat, dtype=np.float64)
+    if src == dst:
+        return lon.copy(), lat.copy()
+    return _convert(lon, lat, src, dst, _vector())
+
+
+def transform_points(points: Iterable, src: str, dst: str) -> list:
+    """
+    Convert (lon, lat) pairs between datums in one vectorized pass.
+
+    Returns:
+        List of (lon, lat) float tuples in input order
+    """
+    points = list(points)
+    lons, lats = transform([float(lon) for lon, _ in points],
+                           [float(lat) for _, lat in points], src, dst)
+    return list(zip(map(float, lons), map(float, lats)))
+
+
+def transform_location(location: str, src: str, dst: str) -> str:
+    """
+    Convert a "lon,lat" string between datums.
+
+    Returns:
+        "lon,lat" with six decimals, the precision Amap uses
+    """
+    lon, lat = (float(part) for part in location.split(','))
+    lon, lat = transform(lon, lat, src, dst)
+    return f"{lon:.6f},{lat:.6f}"
+
+
+def transform_response(data, src: str, dst: str, fields: tuple = COORDINATE_FIELDS):
+    """
+    Copy an Amap response with every coordinate field converted between datums.
+
+    Fields named in fields holding "lon,lat" or "lon,lat;lon,lat;..." strings
+    are converted, all points of the response in one vectorized pass. The
+    input is left untouched, so cached responses can be passed safely.
+
+    Returns:
+        Converted copy of data
+    """
+    slots = []
+    points = []
+
+    def copy(node):
+        if isinstance(node, list):
+            return [copy(item) for item in node]
+        if not isinstance(node, dict):
+            return node
+        result = {}
+        for key, value in node.items():
+            parsed = _parse_points(value) if key in fields else None
+            if parsed:
+                slots.append((result, key, len(parsed)))
+                points.extend(parsed)
+                result[key] = value
+            else:
+                result[key] = copy(value)
+        return result
+
+    result = copy(data)
+    converted = iter(transform_points(points, src, dst))
+    for container, key, count in slots:
+        container[key] = ';'.join(f"{lon:.6f},{lat:.6f}" for lon, lat in islice(converted, count))
+    return result
+
+
+def _parse_points(value) -> Optional[list]:
+    if not isinstance(value, str) or not value:
+        return None
+    try:
+        points = [tuple(float(part) for part in point.split(',')) for point in value.split(';')]
+    except ValueError:
+        return None
+    return points if all(len(point) == 2 for point in points) else None
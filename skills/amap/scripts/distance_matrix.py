@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Amap Distance Matrix Script
+
+Distances and travel times from every origin to every destination, using
+/distance requests of up to 100 origins each.
+
+Usage:
+    # Inline locations, '|'-separated
+    python scripts/distance_matrix.py --origins "116.481485,39.990464|北京西站" \\
+        --destinations "116.434446,39.90816" --mode driving
+
+    # Files with one location per line, CSV output
+    python scripts/distance_matrix.py --origins depots.txt --destinations stops.txt \\
+        --output matrix.csv --workers 8
+"""
+
+import argparse
+import csv
+import os
+import sys
+import time
+from typing import Optional
+
+# Add scripts directory to path for imports
+sys.path.insert(0, __file__.rsplit('/', 1)[0])
+
+from __init__ import (
+    DEFAULT_MAX_WORKERS,
+    DISTANCE_TYPES,
+    add_cache_arguments,
+    apply_cache_arguments,
+    distance_tiles,
+    get_default_client
+)
+from bulk import open_output
+
+
+def distance_matrix(origins: list, destinations: list, mode: str = 'driving',
+                    max_workers: int = DEFAULT_MAX_WORKERS,
+                    api_key: Optional[str] = None) -> dict:
+    """
+    Distances and durations from every origin to every destination.
+
+    Args:
+        origins: Origin locations (addresses or "lon,lat")
+        destinations: Destination locations (addresses or "lon,lat")
+        mode: 'driving', 'walking' or 'straight'
+        max_workers: Maximum number of concurrent requests
+        api_key: Amap API key (if None, will prompt)
+
+    Returns:
+        Dict with the resolved 'origins' and 'destinations' and the
+        'distance' (meters) and 'duration' (seconds) matrices
+    """
+    return get_default_client().distance_matrix(origins, destinations, mode,
+                                                max_workers=max_workers, api_key=api_key)
+
+
+def read_locations(value: str) -> list:
+    """Locations from a file with one per line, else from a '|'-separated list."""
+    if os.path.isfile(value):
+        with open(value, 'r', encoding='utf-8') as f:
+            return [line.strip() for line in f if line.strip()]
+    return [location.strip() for location in value.split('|') if location.strip()]
+
+
+def write_matrix_csv(f, result: dict, origins: list, destinations: list) -> None:
+    """Write one CSV row per origin-destination pair; empty cells have no result."""
+    writer = csv.writer(f)
+    writer.writerow(['origin', 'destination', 'origin_location', 'destination_location',
+                     'distance', 'duration'])
+    for i, origin in enumerate(origins):
+        for j, destination in enumerate(destinations):
+            distance, duration = result['distance'][i][j], result['duration'][i][j]
+            missing = distance is None or distance != distance  # None or NaN
+            writer.writerow([origin, destination, result['origins'][i], result['destinations'][j],
+                             '' if missing else f"{distance:.0f}",
+                             '' if missing else f"{duration:.0f}"])
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Amap Distance Matrix - Distances and durations between many locations',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  # Driving distances from two origins to one destination
+  python scripts/distance_matrix.py --origins "116.481485,39.990464|北京西站" --destinations "116.434446,39.90816"
+
+  # 200 x 200 dispatch matrix from files, 8 requests at a time
+  python scripts/distance_matrix.py --origins depots.txt --destinations stops.txt --output matrix.csv --workers 8
+
+  # Straight-line distances
+  python scripts/distance_matrix.py --origins depots.txt --destinations stops.txt --mode straight
+        """
+    )
+
+    parser.add_argument('--origins', type=str, required=True,
+                        help="File with one location per line, or '|'-separated locations")
+    parser.add_argument('--destinations', type=str, required=True,
+                        help="File with one location per line, or '|'-separated locations")
+    parser.add_argument('--mode', type=str, choices=list(DISTANCE_TYPES), default='driving',
+                        help='Distance type (default: driving)')
+    parser.add_argument('--output', type=str,
+                        help='Output CSV file (default: stdout)')
+    parser.add_argument('--workers', type=int, default=DEFAULT_MAX_WORKERS,
+                        help=f'Concurrent requests (default: {DEFAULT_MAX_WORKERS})')
+    add_cache_arguments(parser)
+
+    args = parser.parse_args()
+    apply_cache_arguments(args)
+
+    try:
+        origins = read_locations(args.origins)
+        destinations = read_locations(args.destinations)
+        if not origins or not destinations:
+            parser.error("--origins and --destinations need at least one location each")
+
+        start = time.perf_counter()
+        result = distance_matrix(origins, destinations, args.mode, args.workers)
+        elapsed = time.perf_counter() - start
+
+        out = open_output(args.output)
+        try:
+            write_matrix_csv(out, result, origins, destinations)
+        finally:
+            if out is not sys.stdout:
+                out.close()
+        requests = len(distance_tiles(result['origins'], result['destinations']))
+        print(f"{len(origins)} x {len(destinations)} matrix: {requests} requests "
+              f"in {elapsed:.1f} s", file=sys.stderr)
+
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+    except Exception as e:
+        print(f"Unexpected error: {e}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -10,20 +10,45 @@ Usage:
 
     # Reverse geocoding (coordinates to address)
     python scripts/geocoding.py --longitude 116.481485 --latitude 39.990464
+
+    # Reverse geocoding of GPS (WGS-84) coordinates
+    python scripts/geocoding.py --longitude 116.475 --latitude 39.989 --crs wgs84
+
+    # Batch geocoding (one address per line, JSON lines output)
+    python scripts/geocoding.py --input addresses.txt --city "北京市"
+
+    # Resumable bulk geocoding of a CSV with address (and optional city) columns
+    python scripts/geocoding.py --input shops.csv --output shops.jsonl --checkpoint shops.ckpt
+
+    # Streaming batch reverse geocoding (CSV/JSONL with longitude/latitude fields)
+    python scripts/geocoding.py --reverse --input trace.csv --output addresses.jsonl
 """
 
 import argparse
 import sys
-from typing import Optional
+from typing import Iterable, Iterator, Optional
 
 # Add scripts directory to path for imports
 sys.path.insert(0, __file__.rsplit('/', 1)[0])
 
 from __init__ import (
-    get_api_key,
-    build_api_url,
-    make_api_request,
-    format_address
+    DEFAULT_MAX_WORKERS,
+    GEOCODE_BATCH_SIZE,
+    REGEO_BATCH_SIZE,
+    add_cache_arguments,
+    apply_cache_arguments,
+    get_default_client
+)
+from coords import CRS, transform, transform_points
+from bulk import (
+    FORMATS,
+    count_records,
+    iter_batches,
+    iter_records,
+    open_output,
+    record_coordinates,
+    run_pipeline,
+    write_jsonl
 )
 
 
@@ -39,24 +64,31 @@ def geocode(address: str, city: Optional[str] = None, api_key: Optional[str] = N
     Returns:
         Geocoding result dict with coordinates
     """
-    if api_key is None:
-        api_key = get_api_key()
+    return get_default_client().geocode(address, city, api_key=api_key)
 
-    params = {'address': address}
-    if city:
-        params['city'] = city
 
-    url = build_api_url('/geocode/geo', params)
-    data = make_api_request(url, api_key)
+def geocode_many(addresses: list, city: Optional[str] = None, api_key: Optional[str] = None,
+                 max_workers: int = DEFAULT_MAX_WORKERS, return_exceptions: bool = False) -> list:
+    """
+    Convert many addresses to coordinates with batched requests.
 
-    geocodes = data.get('geocodes', [])
-    if not geocodes:
-        raise ValueError("No results found for the given address")
+    Args:
+        addresses: Address strings
+        city: City name applied to every address (optional)
+        api_key: Amap API key (if None, will prompt)
+        max_workers: Maximum number of concurrent batch requests
+        return_exceptions: Return the exception in place of failed items instead of raising
 
-    return geocodes[0]
+    Returns:
+        List of geocoding result dicts in input order, None where no result was found
+    """
+    return get_default_client().geocode_many(addresses, city, max_workers=max_workers,
+                                             api_key=api_key,
+                                             return_exceptions=return_exceptions)
 
 
-def reverse_geocode(longitude: float, latitude: float, api_key: Optional[str] = None) -> dict:
+def reverse_geocode(longitude: float, latitude: float, api_key: Optional[str] = None,
+                    crs: str = 'gcj02') -> dict:
     """
     Convert coordinates to address.
 
@@ -64,26 +96,61 @@ def reverse_geocode(longitude: float, latitude: float, api_key: Optional[str] =
         longitude: Longitude
         latitude: Latitude
         api_key: Amap API key (if None, will prompt)
+        crs: Datum of the coordinates: gcj02 (Amap), wgs84 (GPS) or bd09
 
     Returns:
         Reverse geocoding result dict with address info
     """
-    if api_key is None:
-        api_key = get_api_key()
+    longitude, latitude = transform(longitude, latitude, crs, 'gcj02')
+    return get_default_client().reverse_geocode(longitude, latitude, api_key=api_key)
 
-    params = {
-        'location': f'{longitude},{latitude}',
-        'extensions': 'base'  # Use 'all' for detailed info
-    }
 
-    url = build_api_url('/geocode/regeo', params)
-    data = make_api_request(url, api_key)
+def reverse_geocode_many(locations: list, api_key: Optional[str] = None,
+                         max_workers: int = DEFAULT_MAX_WORKERS,
+                         return_exceptions: bool = False, crs: str = 'gcj02') -> list:
+    """
+    Convert many coordinates to addresses with batched requests.
 
-    regeocode = data.get('regeocode')
-    if not regeocode:
-        raise ValueError("No results found for the given coordinates")
+    Args:
+        locations: (longitude, latitude) pairs
+        api_key: Amap API key (if None, will prompt)
+        max_workers: Maximum number of concurrent batch requests
+        return_exceptions: Return the exception in place of failed items instead of raising
+        crs: Datum of the coordinates, converted to GCJ-02 in one vectorized pass
+
+    Returns:
+        List of reverse geocoding result dicts in input order, None where no result was found
+    """
+    if crs != 'gcj02':
+        locations = transform_points(locations, crs, 'gcj02')
+    return get_default_client().reverse_geocode_many(locations, max_workers=max_workers,
+                                                     api_key=api_key,
+                                                     return_exceptions=return_exceptions)
+
+
+def reverse_geocode_stream(locations: Iterable, api_key: Optional[str] = None,
+                           max_workers: int = DEFAULT_MAX_WORKERS,
+                           return_exceptions: bool = False,
+                           crs: str = 'gcj02') -> Iterator[tuple]:
+    """
+    Reverse geocode an arbitrarily long stream of coordinates.
+
+    Coordinates are consumed one window (max_workers full batches) at a
+    time, so memory stays constant regardless of input size.
+
+    Args:
+        locations: Iterable of (longitude, latitude) pairs
+        api_key: Amap API key (if None, will prompt)
+        max_workers: Maximum number of concurrent batch requests
+        return_exceptions: Yield the exception in place of failed items instead of raising
+        crs: Datum of the coordinates
 
-    return regeocode
+    Yields:
+        ((longitude, latitude), result) tuples in input order, with the input coordinates
+    """
+    for window in iter_batches(locations, max_workers * REGEO_BATCH_SIZE):
+        yield from zip(window, reverse_geocode_many(window, api_key, max_workers,
+                                                    return_exceptions, crs))
 
 
 def format_geocode_result(result: dict) -> str:
@@ -125,6 +192,129 @@ def format_reverse_geocode_result(result: dict) -> str:
     return '\n'.join(output)
 
 
+def geocode_records(records: list, city: Optional[str] = None, address_field: str = 'address',
+                    city_field: str = 'city', api_key: Optional[str] = None) -> list:
+    """
+    Geocode a chunk of records.
+
+    Records are grouped by their city field (falling back to city) and each
+    group is sent as batch requests.
+
+    Returns:
+        Output records in input order: the input record plus 'result', and
+        'error' when the address is missing or its lookup failed
+    """
+    output = [None] * len(records)
+    groups = {}
+    for i, record in enumerate(records):
+        if not record.get(address_field):
+            output[i] = {**record, 'result': None, 'error': f"missing '{address_field}' field"}
+            continue
+        groups.setdefault(record.get(city_field) or city, []).append(i)
+
+    for group_city, indices in groups.items():
+        addresses = [records[i][address_field] for i in indices]
+        results = geocode_many(addresses, group_city, api_key, max_workers=1,
+                               return_exceptions=True)
+        for i, result in zip(indices, results):
+            if isinstance(result, Exception):
+                output[i] = {**records[i], 'result': None, 'error': str(result)}
+            else:
+                output[i] = {**records[i], 'result': result}
+    return output
+
+
+def geocode_file(path: str, city: Optional[str] = None,
+                 max_workers: int = DEFAULT_MAX_WORKERS, fmt: Optional[str] = None,
+                 output: Optional[str] = None, checkpoint: Optional[str] = None,
+                 ordered: bool = True, address_field: str = 'address') -> None:
+    """
+    Stream addresses from a file and write one JSON line per record.
+
+    Plain text files hold one address per line; CSV and JSONL records take
+    the address from address_field and an optional per-record 'city'.
+    Records are geocoded in batches on max_workers threads and written as
+    they complete, with throughput and ETA reported on stderr.
+
+    Args:
+        path: Input file ('-' for stdin)
+        city: Default city for records without one
+        max_workers: Concurrent batch requests
+        fmt: Input format: csv, jsonl or txt (default: from the extension, else txt)
+        output: Output file (default: stdout)
+        checkpoint: Checkpoint file making the job resumable (requires output)
+        ordered: Write output in input order instead of completion order
+        address_field: Field holding the address in CSV/JSONL records
+    """
+    records = iter_records(path, fmt, text_field=address_field, default='txt')
+    run_pipeline(
+        records,
+        lambda chunk: geocode_records(chunk, city, address_field),
+        output=output,
+        workers=max_workers,
+        chunk_size=GEOCODE_BATCH_SIZE,
+        ordered=ordered,
+        checkpoint=checkpoint,
+        total=count_records(path, fmt, default='txt'),
+        progress=True
+    )
+
+    cache = get_default_client().geocode_cache
+    if cache is not None:
+        stats = cache.stats()
+        print(f"Cache: {stats['hits']} hits, {stats['misses']} misses "
+              f"({stats['hit_rate']:.1%} hit rate)", file=sys.stderr)
+
+
+def reverse_geocode_file(path: str, output: Optional[str] = None, fmt: Optional[str] = None,
+                         max_workers: int = DEFAULT_MAX_WORKERS, crs: str = 'gcj02') -> None:
+    """
+    Stream coordinates from a CSV/JSONL file and write addresses as JSON lines.
+
+    Each output line is the input record plus 'formatted_address' and
+    'addressComponent'. Records without valid coordinates or whose batch
+    failed get an 'error' field instead. Output is flushed after every window.
+    Input coordinates in another datum (crs) are converted a window at a time.
+    """
+    out = open_output(output)
+    try:
+        for window in iter_batches(iter_records(path, fmt), max_workers * REGEO_BATCH_SIZE):
+            locations = []
+            for record in window:
+                try:
+                    locations.append(record_coordinates(record))
+                except (ValueError, TypeError):
+                    locations.append(None)
+
+            valid = [location for location in locations if location is not None]
+            results = iter(reverse_geocode_many(valid, max_workers=max_workers,
+                                                return_exceptions=True, crs=crs))
+
+            for record, location in zip(window, locations):
+                if location is None:
+                    write_jsonl(out, {**record, 'error': 'invalid coordinates'})
+                    continue
+                result = next(results) or {}
+                if isinstance(result, Exception):
+                    write_jsonl(out, {**record, 'error': str(result)})
+                    continue
+                write_jsonl(out, {
+                    **record,
+                    'formatted_address': result.get('formatted_address'),
+                    'addressComponent': result.get('addressComponent')
+                })
+            out.flush()
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+    cache = get_default_client().spatial_cache
+    if cache is not None:
+        stats = cache.stats()
+        print(f"Spatial cache: {stats['hits']} hits, {stats['misses']} misses "
+              f"({stats['hit_rate']:.1%} hit rate)", file=sys.stderr)
+
+
 def main():
     parser = argparse.ArgumentParser(
         description='Amap Geocoding - Convert addresses to coordinates and vice versa',
@@ -136,6 +326,18 @@ Examples:
 
   # Reverse geocoding (coordinates to address)
   python scripts/geocoding.py --longitude 116.481485 --latitude 39.990464
+
+  # Reverse geocoding of GPS (WGS-84) coordinates
+  python scripts/geocoding.py --longitude 116.475 --latitude 39.989 --crs wgs84
+
+  # Batch geocoding (one address per line, JSON lines output)
+  python scripts/geocoding.py --input addresses.txt --city "北京市"
+
+  # Resumable bulk geocoding of a CSV with address (and optional city) columns
+  python scripts/geocoding.py --input shops.csv --output shops.jsonl --checkpoint shops.ckpt
+
+  # Streaming batch reverse geocoding (CSV/JSONL with longitude/latitude fields)
+  python scripts/geocoding.py --reverse --input trace.csv --output addresses.jsonl
         """
     )
 
@@ -146,10 +348,60 @@ Examples:
     # Reverse geocoding parameters
     parser.add_argument('--longitude', type=float, help='Longitude for reverse geocoding')
     parser.add_argument('--latitude', type=float, help='Latitude for reverse geocoding')
+    parser.add_argument('--crs', type=str, choices=CRS, default='gcj02',
+                        help='Datum of the coordinates to reverse geocode (default: gcj02)')
+
+    # Batch geocoding parameters
+    parser.add_argument('--input', type=str,
+                        help="Text file with one address per line, or CSV/JSONL records ('-' for stdin)")
+    parser.add_argument('--reverse', action='store_true',
+                        help='Treat --input as CSV/JSONL coordinates and reverse geocode them')
+    parser.add_argument('--format', type=str, choices=FORMATS,
+                        help='Record format of --input (default: from file extension)')
+    parser.add_argument('--output', type=str,
+                        help='Output file for --input results (default: stdout)')
+    parser.add_argument('--workers', type=int, default=DEFAULT_MAX_WORKERS,
+                        help=f'Concurrent batch requests for --input (default: {DEFAULT_MAX_WORKERS})')
+    parser.add_argument('--checkpoint', type=str,
+                        help='Checkpoint file; rerunning with it resumes an interrupted --input job')
+    parser.add_argument('--unordered', action='store_true',
+                        help='Write --input results as they complete instead of in input order')
+    parser.add_argument('--address-field', type=str, default='address',
+                        help="Address field of CSV/JSONL records (default: 'address')")
+    add_cache_arguments(parser)
 
     args = parser.parse_args()
+    apply_cache_arguments(args)
 
     # Validate arguments
+    if args.input and (args.address or args.longitude is not None or args.latitude is not None):
+        parser.error("--input cannot be combined with --address or coordinates")
+
+    if args.reverse and not args.input:
+        parser.error("--reverse requires --input")
+
+    if args.reverse and (args.checkpoint or args.unordered):
+        parser.error("--checkpoint and --unordered apply to forward geocoding only")
+
+    if args.input:
+        try:
+            if args.reverse:
+                reverse_geocode_file(args.input, args.output, args.format,
+                                     max_workers=args.workers, crs=args.crs)
+            else:
+                geocode_file(args.input, args.city, max_workers=args.workers, fmt=args.format,
+                             output=args.output, checkpoint=args.checkpoint,
+                             ordered=not args.unordered, address_field=args.address_field)
+        except (ValueError, OSError) as e:
+            print(f"Error: {e}", file=sys.stderr)
+            sys.exit(1)
+        except KeyboardInterrupt:
+            if args.checkpoint:
+                print(f"Interrupted; rerun with --checkpoint {args.checkpoint} to resume",
+                      file=sys.stderr)
+            sys.exit(130)
+        return
+
     if args.address and (args.longitude is not None or args.latitude is not None):
         parser.error("Cannot use both address and coordinates. Use either --address OR (--longitude AND --latitude)")
 
@@ -163,7 +415,7 @@ Examples:
             print(format_geocode_result(result))
         else:
             # Reverse geocoding
-            result = reverse_geocode(args.longitude, args.latitude)
+            result = reverse_geocode(args.longitude, args.latitude, crs=args.crs)
             print(format_reverse_geocode_result(result))
 
     except ValueError as e:
@@ -6,21 +6,59 @@ Converts an IP address to its geographic location.
 
 Usage:
     python scripts/ip_location.py --ip 8.8.8.8
+
+    # Bulk lookup (one IP per line, or CSV/JSONL with an 'ip' field)
+    python scripts/ip_location.py --input ips.txt --output locations.jsonl
+
+    # Annotate an nginx access log with province/city
+    python scripts/ip_location.py --log access.log --output access.jsonl
 """
 
 import argparse
+import re
 import sys
-from typing import Optional
+from typing import Iterator, Optional
 
 # Add scripts directory to path for imports
 sys.path.insert(0, __file__.rsplit('/', 1)[0])
 
 from __init__ import (
-    get_api_key,
-    build_api_url,
-    make_api_request
+    DEFAULT_MAX_WORKERS,
+    add_cache_arguments,
+    apply_cache_arguments,
+    get_default_client
+)
+from bulk import (
+    FORMATS,
+    StageMetrics,
+    iter_batches,
+    iter_records,
+    open_output,
+    run_pipeline,
+    write_jsonl
+)
+
+
+# IPs read per window; each /24 network in a window is looked up once
+WINDOW_SIZE = 1000
+
+# Windows of a log resolved at once: one is looked up while the next is parsed
+LOG_PIPELINE_DEPTH = 2
+
+# nginx/Apache "combined" format (the trailing referer and user agent are
+# absent from "common" format lines)
+COMBINED_LOG = re.compile(
+    r'(?P<ip>\S+) \S+ (?P<user>\S+) \[(?P<time>[^\]]*)\] "(?P<request>(?:[^"\\]|\\.)*)" '
+    r'(?P<status>\d{3}) (?P<bytes>\d+|-)'
+    r'(?: "(?P<referer>(?:[^"\\]|\\.)*)" "(?P<user_agent>(?:[^"\\]|\\.)*)")?'
 )
 
+# First IPv4 address on a line, for other log formats
+IPV4 = re.compile(r'(?<![\d.])(?:\d{1,3}\.){3}\d{1,3}(?![\d.])')
+
+# Location fields copied onto each log record
+LOCATION_FIELDS = ('province', 'city', 'adcode')
+
 
 def get_ip_location(ip: str, api_key: Optional[str] = None) -> dict:
     """
@@ -33,15 +71,175 @@ def get_ip_location(ip: str, api_key: Optional[str] = None) -> dict:
     Returns:
         IP location result dict
     """
-    if api_key is None:
-        api_key = get_api_key()
+    return get_default_client().get_ip_location(ip, api_key=api_key)
 
-    params = {'ip': ip}
 
-    url = build_api_url('/ip', params)
-    data = make_api_request(url, api_key)
+def get_ip_location_many(ips: list, api_key: Optional[str] = None,
+                         max_workers: int = DEFAULT_MAX_WORKERS,
+                         return_exceptions: bool = False) -> list:
+    """
+    Locate many IP addresses, one request per uncached /24 network.
+
+    Returns:
+        List of IP location dicts in input order
+    """
+    return get_default_client().get_ip_location_many(ips, max_workers=max_workers,
+                                                     api_key=api_key,
+                                                     return_exceptions=return_exceptions)
 
-    return data
+
+def locate_ip_file(path: str, output: Optional[str] = None, fmt: Optional[str] = None,
+                   max_workers: int = DEFAULT_MAX_WORKERS, ip_field: str = 'ip') -> None:
+    """
+    Stream IP addresses from a file and write one JSON line per record.
+
+    Each output line is the input record plus 'result', or 'error' when the
+    lookup failed. Records are read WINDOW_SIZE at a time; repeated
+    addresses and networks are requested once and answered from the IP
+    range cache afterwards.
+    """
+    out = open_output(output)
+    try:
+        for window in iter_batches(iter_records(path, fmt, text_field=ip_field, default='txt'),
+                                   WINDOW_SIZE):
+            ips = [str(record.get(ip_field) or '').strip() for record in window]
+            results = get_ip_location_many(ips, max_workers=max_workers, return_exceptions=True)
+            for record, ip, result in zip(window, ips, results):
+                if not ip:
+                    write_jsonl(out, {**record, 'result': None, 'error': f"missing '{ip_field}' field"})
+                elif isinstance(result, Exception):
+                    write_jsonl(out, {**record, 'result': None, 'error': str(result)})
+                else:
+                    write_jsonl(out, {**record, 'result': result})
+            out.flush()
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+    client = get_default_client()
+    client.save_caches()
+    if client.ip_cache is not None:
+        stats = client.ip_cache.stats()
+        print(f"IP cache: {stats['hits']} hits, {stats['misses']} misses "
+              f"({stats['hit_rate']:.1%} hit rate), {stats['ranges']} ranges",
+              file=sys.stderr)
+
+
+def parse_log_line(line: str, pattern: Optional[re.Pattern] = None) -> dict:
+    """
+    Parse one access log line into a record with an 'ip' field.
+
+    Args:
+        line: Log line without its newline
+        pattern: Regex whose 'ip' group (or first group) is the client IP;
+            by default combined-format lines are split into their fields and
+            other lines fall back to their first IPv4 address
+
+    Returns:
+        Record dict; 'ip' is None when the line holds no address, and the
+        raw 'line' is kept unless the combined format matched
+    """
+    if pattern is not None:
+        match = pattern.search(line)
+        if match is None:
+            return {'ip': None, 'line': line}
+        ip = match.group('ip') if 'ip' in pattern.groupindex else match.group(1)
+        return {'ip': ip, 'line': line}
+
+    match = COMBINED_LOG.match(line)
+    if match is None:
+        match = IPV4.search(line)
+        return {'ip': match.group() if match else None, 'line': line}
+    record = match.groupdict()
+    record['status'] = int(record['status'])
+    record['bytes'] = int(record['bytes']) if record['bytes'] != '-' else None
+    return record
+
+
+def iter_log_records(path: str, pattern: Optional[re.Pattern] = None) -> Iterator[dict]:
+    """Lazily parse an access log ('-' for stdin), skipping blank lines."""
+    if path == '-':
+        sys.stdin.reconfigure(errors='replace')
+        f = sys.stdin
+    else:
+        # User agents and request lines are not always valid UTF-8
+        f = open(path, 'r', encoding='utf-8', errors='replace')
+    try:
+        for line in f:
+            line = line.rstrip('\r\n')
+            if line:
+                yield parse_log_line(line, pattern)
+    finally:
+        if f is not sys.stdin:
+            f.close()
+
+
+def _annotate_logs(records: list, max_workers: int) -> list:
+    """Add the location fields of each record's IP, or 'error'."""
+    lookups = [(i, record['ip']) for i, record in enumerate(records) if record['ip']]
+    results = get_ip_location_many([ip for _, ip in lookups], max_workers=max_workers,
+                                   return_exceptions=True)
+    located = dict(zip((i for i, _ in lookups), results))
+
+    annotated = []
+    for i, record in enumerate(records):
+        result = located.get(i)
+        if result is None:
+            annotated.append({**record, 'error': 'no IP address'})
+        elif isinstance(result, Exception):
+            annotated.append({**record, 'error': str(result)})
+        else:
+            # Amap returns [] for fields it cannot fill (e.g. foreign IPs)
+            annotated.append({**record, **{field: result.get(field) or None
+                                           for field in LOCATION_FIELDS}})
+    return annotated
+
+
+def locate_log_file(path: str, output: Optional[str] = None,
+                    max_workers: int = DEFAULT_MAX_WORKERS,
+                    pattern: Optional[str] = None) -> int:
+    """
+    Annotate an access log with the province and city of each client IP.
+
+    Lines are parsed lazily and resolved WINDOW_SIZE at a time, so memory
+    stays bounded however large the log is; each window's distinct /24
+    networks are looked up concurrently. One JSON line is written per log
+    line, in log order. Progress reports on stderr show the capacity of the
+    read (parsing), process (IP lookups) and write stages.
+
+    Args:
+        path: Log file ('-' for stdin)
+        output: Output file (default: stdout)
+        max_workers: Concurrent requests per window
+        pattern: Regex extracting the IP (see parse_log_line)
+
+    Returns:
+        Number of log lines written
+
+    Raises:
+        ValueError: If the pattern is not a valid regex
+    """
+    try:
+        regex = re.compile(pattern) if pattern else None
+    except re.error as e:
+        raise ValueError(f"Invalid --ip-pattern: {e}")
+    if regex is not None and regex.groups == 0:
+        raise ValueError("--ip-pattern needs a group capturing the IP")
+
+    metrics = StageMetrics({'read': 1, 'process': LOG_PIPELINE_DEPTH, 'write': 1})
+    count = run_pipeline(iter_log_records(path, regex),
+                         lambda records: _annotate_logs(records, max_workers),
+                         output, workers=LOG_PIPELINE_DEPTH, chunk_size=WINDOW_SIZE,
+                         metrics=metrics)
+
+    client = get_default_client()
+    client.save_caches()
+    if client.ip_cache is not None:
+        stats = client.ip_cache.stats()
+        print(f"IP cache: {stats['hits']} hits, {stats['misses']} misses "
+              f"({stats['hit_rate']:.1%} hit rate), {stats['ranges']} ranges",
+              file=sys.stderr)
+    return count
 
 
 def format_ip_location_result(data: dict) -> str:
@@ -72,16 +270,64 @@ Examples:
 
   # Locate a Chinese IP address
   python scripts/ip_location.py --ip 114.114.114.114
+
+  # Locate every IP in a file, one JSON line per IP
+  python scripts/ip_location.py --input ips.txt --output locations.jsonl --workers 8
+
+  # Annotate an nginx access log, or a log piped on stdin
+  python scripts/ip_location.py --log /var/log/nginx/access.log --output access.jsonl
+  tail -n 100000 access.log | python scripts/ip_location.py --log - > access.jsonl
+
+  # Other log formats: a regex whose first group is the client IP
+  python scripts/ip_location.py --log app.log --ip-pattern 'client=(\S+)'
         """
     )
 
-    parser.add_argument('--ip', type=str, required=True,
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--ip', type=str,
                         help='IP address to locate')
+    source.add_argument('--input', type=str,
+                        help="File of IPs, one per line or CSV/JSONL records ('-' for stdin)")
+    source.add_argument('--log', type=str,
+                        help="Access log to annotate with province/city ('-' for stdin)")
+    parser.add_argument('--format', type=str, choices=FORMATS,
+                        help='--input format (default: from the extension, else txt)')
+    parser.add_argument('--ip-field', type=str, default='ip',
+                        help="IP field of CSV/JSONL records (default: 'ip')")
+    parser.add_argument('--ip-pattern', type=str,
+                        help='Regex whose first group is the IP in --log lines '
+                             '(default: nginx combined format, else the first IPv4 address)')
+    parser.add_argument('--output', type=str,
+                        help='Output file for --input/--log (default: stdout)')
+    parser.add_argument('--workers', type=int, default=DEFAULT_MAX_WORKERS,
+                        help=f'Concurrent requests for --input/--log (default: {DEFAULT_MAX_WORKERS})')
+    add_cache_arguments(parser)
 
     args = parser.parse_args()
+    apply_cache_arguments(args)
+
+    if args.log:
+        try:
+            locate_log_file(args.log, args.output, args.workers, args.ip_pattern)
+        except (ValueError, OSError) as e:
+            print(f"Error: {e}", file=sys.stderr)
+            sys.exit(1)
+        except KeyboardInterrupt:
+            get_default_client().save_caches()
+            sys.exit(130)
+        return
+
+    if args.input:
+        try:
+            locate_ip_file(args.input, args.output, args.format, args.workers, args.ip_field)
+        except (ValueError, OSError) as e:
+            print(f"Error: {e}", file=sys.stderr)
+            sys.exit(1)
+        return
 
     try:
         result = get_ip_location(args.ip)
+        get_default_client().save_caches()
         print(format_ip_location_result(result))
 
     except ValueError as e:
@@ -0,0 +1,173 @@
+"""
+Amap API Key Pool
+
+Spreads requests across several API keys so throughput is not capped by a
+single key's QPS and daily quota. Keys that report quota exhaustion are
+ejected until the quota resets; keys rejected as invalid are ejected for
+the rest of the process.
+
+Configure with a comma-separated AMAP_API_KEYS environment variable:
+
+    export AMAP_API_KEYS=key1,key2,key3
+"""
+
+import os
+import threading
+import time
+from typing import Optional
+
+
+# Amap daily quotas reset at midnight China Standard Time (UTC+8)
+QUOTA_RESET_UTC_OFFSET = 8 * 3600
+
+
+def next_quota_reset(now: Optional[float] = None) -> float:
+    """Epoch timestamp of the next daily quota reset."""
+    now = time.time() if now is None else now
+    day = (now + QUOTA_RESET_UTC_OFFSET) // 86400
+    return (day + 1) * 86400 - QUOTA_RESET_UTC_OFFSET
+
+
+def keys_from_env() -> list:
+    """Read the pool keys from AMAP_API_KEYS, ignoring blanks and duplicates."""
+    keys = []
+    for key in os.environ.get('AMAP_API_KEYS', '').split(','):
+        key = key.strip()
+        if key and key not in keys:
+            keys.append(key)
+    return keys
+
+
+class KeyHealth:
+    """Per-key usage counters and ejection state."""
+
+    __slots__ = ('key', 'requests', 'successes', 'rate_limited', 'quota_errors',
+                 'auth_errors', 'used_today', 'day', 'ejected_until')
+
+    def __init__(self, key: str):
+        self.key = key
+        self.requests = 0
+        self.successes = 0
+        self.rate_limited = 0
+        self.quota_errors = 0
+        self.auth_errors = 0
+        self.used_today = 0
+        self.day = None
+        self.ejected_until = 0.0
+
+
+class KeyPool:
+    """
+    Thread-safe round-robin pool of Amap API keys with health tracking.
+    """
+
+    def __init__(self, keys: list, daily_quota: Optional[int] = None):
+        """
+        Args:
+            keys: API keys
+            daily_quota: Requests per key per day; a key reaching it is skipped
+                until the quota resets (optional, counted per process)
+
+        Raises:
+            ValueError: If no keys are given
+        """
+        if not keys:
+            raise ValueError("Key pool needs at least one API key")
+        self.daily_quota = daily_quota
+        self._health = [KeyHealth(key) for key in keys]
+        self._by_key = {health.key: health for health in self._health}
+        self._next = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._health)
+
+    @property
+    def keys(self) -> list:
+        return [health.key for health in self._health]
+
+    def _available(self, health: KeyHealth, now: float) -> bool:
+        if health.ejected_until > now:
+            return False
+        if self.daily_quota is not None:
+            day = (now + QUOTA_RESET_UTC_OFFSET) // 86400
+            if health.day != day:
+                health.day = day
+                health.used_today = 0
+            if health.used_today >= self.daily_quota:
+                return False
+        return True
+
+    def acquire(self) -> str:
+        """
+        Pick the next healthy key.
+
+        Returns:
+            API key
+
+        Raises:
+            AmapQuotaError: If every key is ejected or over quota
+        """
+        with self._lock:
+            now = time.time()
+            for offset in range(len(self._health)):
+                health = self._health[(self._next + offset) % len(self._health)]
+                if self._available(health, now):
+                    self._next = (self._next + offset + 1) % len(self._health)
+                    health.requests += 1
+                    health.used_today += 1
+                    return health.key
+
+        from __init__ import AmapQuotaError
+
+        raise AmapQuotaError("All API keys in the pool are exhausted or disabled")
+
+    def report_success(self, key: str) -> None:
+        """Record a successful request for a key."""
+        health = self._by_key.get(key)
+        if health is not None:
+            with self._lock:
+                health.successes += 1
+
+    def report_failure(self, key: str, error: BaseException) -> bool:
+        """
+        Record a failed request and eject the key if the error is key-specific.
+
+        Returns:
+            True if the key was ejected, so the request should move to another key
+        """
+        from __init__ import AmapAuthError, AmapQuotaError, AmapRateLimitError
+
+        health = self._by_key.get(key)
+        if health is None:
+            return False
+        with self._lock:
+            if isinstance(error, AmapQuotaError):
+                health.quota_errors += 1
+                health.ejected_until = next_quota_reset()
+                return len(self._health) > 1
+            if isinstance(error, AmapAuthError):
+                health.auth_errors += 1
+                health.ejected_until = float('inf')
+                return len(self._health) > 1
+            if isinstance(error, AmapRateLimitError):
+                health.rate_limited += 1
+        return False
+
+    def snapshot(self) -> list:
+        """Return usage counters and availability for every key."""
+        from ratelimit import key_preview
+
+        with self._lock:
+            now = time.time()
+            return [{
+                'key': key_preview(health.key),
+                'available': self._available(health, now),
+                'requests': health.requests,
+                'successes': health.successes,
+                'rate_limited': health.rate_limited,
+                'quota_errors': health.quota_errors,
+                'auth_errors': health.auth_errors,
+                'used_today': health.used_today,
+                'ejected_until': health.ejected_until if health.ejected_until > now else None
+            } for health in self._health]
@@ -13,40 +13,55 @@ Usage:
 
     # Address to coordinate
     python scripts/path_planning.py --origin "北京市" --destination "121.473701,31.230416" --mode driving
+
+    # GPS (WGS-84) coordinates in and out
+    python scripts/path_planning.py --origin "116.475,39.989" --destination "116.479,39.988" --mode walking --crs wgs84
+
+    # Compare all modes for one trip in a single round of concurrent requests
+    python scripts/path_planning.py --origin "北京市天安门" --destination "北京首都国际机场" --compare
+
+    # Bulk: one route summary per origin/destination record of a CSV/JSONL file
+    python scripts/path_planning.py --input trips.csv --mode driving --output routes.jsonl --checkpoint routes.ckpt
 """
 
 import argparse
 import sys
-from typing import Optional
+from typing import Iterable, Optional
 
 # Add scripts directory to path for imports
 sys.path.insert(0, __file__.rsplit('/', 1)[0])
 
 from __init__ import (
-    get_api_key,
-    build_api_url,
-    make_api_request,
+    DEFAULT_MAX_WORKERS,
+    MODES,
+    add_cache_arguments,
+    apply_cache_arguments,
+    get_default_client,
     parse_coordinates,
-    geocode
+    route_summary
 )
-
-
-MODES = {
-    'driving': '/direction/driving',
-    'walking': '/direction/walking',
-    'cycling': '/direction/bicycling',
-    'transit': '/direction/transit/integrated',
-    'ebicycle': '/direction/ebicycling'
-}
+from bulk import (
+    FORMATS,
+    count_records,
+    detect_format,
+    iter_records,
+    rereadable_input,
+    run_pipeline
+)
+from coords import CRS, transform, transform_response
 
 
 MODE_NAMES = {
     'driving': 'Driving',
     'walking': 'Walking',
     'cycling': 'Cycling',
+    'ebicycle': 'E-bicycle',
     'transit': 'Transit'
 }
 
+# Routes per chunk of a bulk job; chunks are the unit of checkpointing
+ROUTE_CHUNK_SIZE = 10
+
 
 def resolve_location(location: str, api_key: str) -> str:
     """
@@ -59,19 +74,21 @@ def resolve_location(location: str, api_key: str) -> str:
     Returns:
         Coordinate string "lon,lat"
     """
-    coords = parse_coordinates(location)
-    if coords:
-        return f"{coords[0]},{coords[1]}"
+    return get_default_client().resolve_location(location, api_key=api_key)
 
-    # Geocode the address
-    try:
-        result = geocode(location, api_key=api_key)
-        return result['location']
-    except Exception as e:
-        raise ValueError(f"Failed to resolve location '{location}': {e}")
+
+def to_gcj02(location: str, crs: str) -> str:
+    """Convert a "lon,lat" location from crs to GCJ-02; addresses pass through unchanged."""
+    coords = parse_coordinates(location)
+    if coords is None or crs == 'gcj02':
+        return location
+    lon, lat = transform(coords[0], coords[1], crs, 'gcj02')
+    return f"{lon:.6f},{lat:.6f}"
 
 
-def plan_route(origin: str, destination: str, mode: str, api_key: Optional[str] = None) -> dict:
+def plan_route(origin: str, destination: str, mode: str, api_key: Optional[str] = None,
+               crs: str = 'gcj02', city: Optional[str] = None,
+               cityd: Optional[str] = None) -> dict:
     """
     Plan route between two locations.
 
@@ -80,43 +97,197 @@ def plan_route(origin: str, destination: str, mode: str, api_key: Optional[str]
         destination: End location (address or "lon,lat")
         mode: Transportation mode: driving, walking, cycling, transit
         api_key: Amap API key (if None, will prompt)
+        crs: Datum of coordinate inputs and of every coordinate in the result:
+            gcj02 (Amap), wgs84 (GPS) or bd09
+        city: Transit origin city (default: looked up from the origin)
+        cityd: Transit destination city (default: looked up from the destination)
 
     Returns:
         Route planning result dict
     """
-    if mode not in MODES:
-        raise ValueError(f"Invalid mode '{mode}'. Must be one of: {', '.join(MODES.keys())}")
+    route = get_default_client().plan_route(to_gcj02(origin, crs), to_gcj02(destination, crs),
+                                            mode, api_key=api_key, city=city, cityd=cityd)
+    if crs != 'gcj02':
+        route = transform_response(route, 'gcj02', crs)
+    return route
 
-    if api_key is None:
-        api_key = get_api_key()
 
-    # Resolve locations to coordinates
-    origin_coords = resolve_location(origin, api_key)
-    dest_coords = resolve_location(destination, api_key)
+def _endpoint(record: dict, field: str, crs: str) -> str:
+    return to_gcj02(str(record.get(field) or '').strip(), crs)
 
-    params = {
-        'origin': origin_coords,
-        'destination': dest_coords
-    }
 
-    # Add mode-specific parameters
-    if mode == 'transit':
-        params['city'] = '全国'  # Can be overridden
-        params['cityd'] = '全国'
+def resolve_endpoints(records: Iterable[dict], origin_field: str = 'origin',
+                      destination_field: str = 'destination', crs: str = 'gcj02',
+                      max_workers: int = DEFAULT_MAX_WORKERS) -> dict:
+    """
+    Geocode every distinct address endpoint of an OD file once.
 
-    url = build_api_url(MODES[mode], params)
-    data = make_api_request(url, api_key)
+    Addresses are collected from both fields of all records and sent as
+    batch geocodes (which also merge different spellings of one address),
+    so a depot shared by thousands of trips costs one lookup.
 
-    if mode == 'transit':
-        route = data.get('route', {})
-        if not route.get('transits'):
-            raise ValueError("No route found")
-    else:
-        route = data.get('route', {})
-        if not route.get('paths'):
-            raise ValueError("No route found")
+    Returns:
+        Dict mapping each address to its "lon,lat", or to the exception
+        raised by its batch, or None when Amap found nothing
+    """
+    addresses = {}
+    for record in records:
+        for field in (origin_field, destination_field):
+            location = _endpoint(record, field, crs)
+            if location and parse_coordinates(location) is None:
+                addresses[location] = None
+    if not addresses:
+        return {}
+
+    results = get_default_client().geocode_many(list(addresses), max_workers=max_workers,
+                                                return_exceptions=True)
+    for address, result in zip(list(addresses), results):
+        addresses[address] = result['location'] if isinstance(result, dict) else result
+    return addresses
+
+
+def _resolved_endpoint(record: dict, field: str, crs: str, endpoints: dict) -> str:
+    location = _endpoint(record, field, crs)
+    if not location:
+        raise ValueError(f"missing '{field}' field")
+    if parse_coordinates(location) is not None:
+        return location
+    resolved = endpoints.get(location)
+    if not isinstance(resolved, str):
+        raise ValueError(f"Failed to resolve location '{location}': "
+                         f"{resolved or 'No results found'}")
+    return resolved
+
+
+def plan_route_records(records: list, mode: str, endpoints: dict,
+                       origin_field: str = 'origin', destination_field: str = 'destination',
+                       crs: str = 'gcj02', city: Optional[str] = None,
+                       cityd: Optional[str] = None, api_key: Optional[str] = None) -> list:
+    """
+    Plan the routes of a chunk of OD records.
 
-    return route
+    Endpoints are looked up in the result of resolve_endpoints, so each
+    route is a single request. Records may carry their own transit 'city'
+    and 'cityd'.
+
+    Returns:
+        Output records in input order: the input record plus route_summary()
+        fields, or plus 'error' when an endpoint or the route failed,
+        including transport errors left after the client's retries
+    """
+    client = get_default_client()
+    output = []
+    for record in records:
+        try:
+            origin, destination = (_resolved_endpoint(record, field, crs, endpoints)
+                                   for field in (origin_field, destination_field))
+            route = client.plan_route(origin, destination, mode, api_key=api_key,
+                                      city=record.get('city') or city,
+                                      cityd=record.get('cityd') or cityd, steps=False)
+            output.append({**record, **route_summary(route, mode)})
+        except (ValueError, OSError) as e:
+            output.append({**record, 'error': str(e)})
+    return output
+
+
+def plan_route_file(path: str, mode: str, output: Optional[str] = None,
+                    fmt: Optional[str] = None, max_workers: int = DEFAULT_MAX_WORKERS,
+                    checkpoint: Optional[str] = None, ordered: bool = True,
+                    crs: str = 'gcj02', city: Optional[str] = None,
+                    cityd: Optional[str] = None, origin_field: str = 'origin',
+                    destination_field: str = 'destination') -> None:
+    """
+    Plan a route for every origin/destination record of a CSV/JSONL file.
+
+    A first pass geocodes the distinct address endpoints of the whole file
+    (see resolve_endpoints); the routes are then planned on max_workers
+    threads and written as JSON line summaries, with throughput and ETA on
+    stderr. With a checkpoint an interrupted job resumes where it stopped;
+    its endpoints come back from the geocode cache.
+
+    Args:
+        path: Input file ('-' for stdin)
+        mode: Transportation mode
+        output: Output file (default: stdout)
+        fmt: Input format: csv or jsonl (default: from the extension, else jsonl)
+        max_workers: Concurrent route requests
+        checkpoint: Checkpoint file making the job resumable (requires output)
+        ordered: Write output in input order instead of completion order
+        crs: Datum of coordinate endpoints
+        city: Default transit origin city
+        cityd: Default transit destination city
+        origin_field: Field holding the origin (address or "lon,lat")
+        destination_field: Field holding the destination
+    """
+    if mode not in MODES:
+        raise ValueError(f"Invalid mode '{mode}'. Must be one of: {', '.join(MODES.keys())}")
+
+    # Endpoints and routes are two passes over the input: spill stdin to disk
+    fmt = detect_format(path, fmt)
+    with rereadable_input(path) as path:
+        endpoints = resolve_endpoints(iter_records(path, fmt), origin_field, destination_field,
+                                      crs, max_workers)
+        failed = sum(not isinstance(location, str) for location in endpoints.values())
+        print(f"Resolved {len(endpoints) - failed} of {len(endpoints)} distinct addresses",
+              file=sys.stderr)
+
+        run_pipeline(
+            iter_records(path, fmt),
+            lambda chunk: plan_route_records(chunk, mode, endpoints, origin_field,
+                                             destination_field, crs, city, cityd),
+            output=output,
+            workers=max_workers,
+            chunk_size=ROUTE_CHUNK_SIZE,
+            ordered=ordered,
+            checkpoint=checkpoint,
+            total=count_records(path, fmt),
+            progress=True
+        )
+
+    cache = get_default_client().route_cache
+    if cache is not None:
+        stats = cache.stats()
+        print(f"Route cache: {stats['hits']} hits, {stats['misses']} misses "
+              f"({stats['hit_rate']:.1%} hit rate), {stats['entries']} routes stored",
+              file=sys.stderr)
+
+
+def compare_modes(origin: str, destination: str, modes: Optional[list] = None,
+                  api_key: Optional[str] = None, crs: str = 'gcj02',
+                  city: Optional[str] = None, cityd: Optional[str] = None) -> list:
+    """
+    Plan a trip in several modes concurrently and rank them, fastest first.
+
+    Args:
+        origin: Start location (address or "lon,lat")
+        destination: End location (address or "lon,lat")
+        modes: Modes to compare (default: all)
+        api_key: Amap API key (if None, will prompt)
+        crs: Datum of coordinate inputs
+        city: Transit origin city (default: looked up from the origin)
+        cityd: Transit destination city (default: looked up from the destination)
+
+    Returns:
+        List of comparison rows: mode, distance, duration, cost, tolls, error
+    """
+    return get_default_client().compare_modes(to_gcj02(origin, crs), to_gcj02(destination, crs),
+                                              modes, api_key=api_key, city=city, cityd=cityd)
+
+
+def format_comparison(rows: list) -> str:
+    """Format compare_modes rows as a table."""
+    output = [f"{'#':>2}  {'Mode':<10} {'Distance':>10} {'Duration':>10} {'Cost':>8} {'Tolls':>8}"]
+    for rank, row in enumerate(rows, 1):
+        name = MODE_NAMES.get(row['mode'], row['mode'])
+        if row['error']:
+            output.append(f"{'-':>2}  {name:<10} {row['error']}")
+            continue
+        distance, duration = row['distance'] or 0, row['duration'] or 0
+        cost = f"¥{row['cost']:.2f}" if row['cost'] is not None else '-'
+        tolls = f"¥{row['tolls']:.2f}" if row['tolls'] is not None else '-'
+        output.append(f"{rank:>2}  {name:<10} {distance / 1000:>8.2f}km "
+                      f"{duration // 60:>6}m {duration % 60:>2}s {cost:>8} {tolls:>8}")
+    return '\n'.join(output)
 
 
 def format_driving_result(result: dict) -> str:
@@ -224,6 +395,18 @@ Examples:
   # Address to coordinate
   python scripts/path_planning.py --origin "北京市" --destination "121.473701,31.230416" --mode driving
 
+  # GPS (WGS-84) coordinates in and out
+  python scripts/path_planning.py --origin "116.475,39.989" --destination "116.479,39.988" --mode walking --crs wgs84
+
+  # Compare every mode for one trip, fastest first
+  python scripts/path_planning.py --origin "北京市天安门" --destination "北京首都国际机场" --compare
+
+  # Compare only some modes
+  python scripts/path_planning.py --origin "北京市天安门" --destination "北京市王府井" --compare walking cycling transit
+
+  # Route summaries for every origin/destination record, resumable
+  python scripts/path_planning.py --input trips.csv --mode driving --output routes.jsonl --checkpoint routes.ckpt --workers 8
+
 Available modes:
   driving   - Driving route
   walking   - Walking route
@@ -233,19 +416,93 @@ Available modes:
         """
     )
 
-    parser.add_argument('--origin', type=str, required=True,
+    parser.add_argument('--origin', type=str,
                         help='Start location (address or "longitude,latitude")')
-    parser.add_argument('--destination', type=str, required=True,
+    parser.add_argument('--destination', type=str,
                         help='End location (address or "longitude,latitude")')
-    parser.add_argument('--mode', type=str, required=True, choices=list(MODES.keys()),
+    parser.add_argument('--mode', type=str, choices=list(MODES.keys()),
                         help='Transportation mode')
+    parser.add_argument('--compare', type=str, nargs='*', choices=list(MODES.keys()),
+                        metavar='MODE',
+                        help='Compare modes side by side instead of planning one (default: all modes)')
+    parser.add_argument('--crs', type=str, choices=CRS, default='gcj02',
+                        help='Datum of coordinate inputs and route coordinates (default: gcj02)')
+    parser.add_argument('--city', type=str,
+                        help='Transit origin city (default: looked up offline from the origin)')
+    parser.add_argument('--cityd', type=str,
+                        help='Transit destination city (default: looked up offline from the destination)')
+
+    # Bulk route planning
+    parser.add_argument('--input', type=str,
+                        help="CSV/JSONL file of origin/destination records ('-' for stdin)")
+    parser.add_argument('--format', type=str, choices=[fmt for fmt in FORMATS if fmt != 'txt'],
+                        help='Record format of --input (default: from file extension)')
+    parser.add_argument('--output', type=str,
+                        help='Output file for --input route summaries (default: stdout)')
+    parser.add_argument('--workers', type=int, default=DEFAULT_MAX_WORKERS,
+                        help=f'Concurrent route requests for --input (default: {DEFAULT_MAX_WORKERS})')
+    parser.add_argument('--checkpoint', type=str,
+                        help='Checkpoint file; rerunning with it resumes an interrupted --input job')
+    parser.add_argument('--unordered', action='store_true',
+                        help='Write --input results as they complete instead of in input order')
+    parser.add_argument('--origin-field', type=str, default='origin',
+                        help="Origin field of --input records (default: 'origin')")
+    parser.add_argument('--destination-field', type=str, default='destination',
+                        help="Destination field of --input records (default: 'destination')")
+    add_cache_arguments(parser)
 
     args = parser.parse_args()
+    apply_cache_arguments(args)
+
+    if args.input and (args.origin or args.destination):
+        parser.error("--input cannot be combined with --origin or --destination")
+    if args.compare is not None and (args.mode or args.input):
+        parser.error("--compare cannot be combined with --mode or --input")
+    if args.compare is None and not args.mode:
+        parser.error("--mode or --compare is required")
+    if not args.input and not (args.origin and args.destination):
+        parser.error("--origin and --destination are required without --input")
+
+    if args.input:
+        try:
+            plan_route_file(args.input, args.mode, output=args.output, fmt=args.format,
+                            max_workers=args.workers, checkpoint=args.checkpoint,
+                            ordered=not args.unordered, crs=args.crs, city=args.city,
+                            cityd=args.cityd, origin_field=args.origin_field,
+                            destination_field=args.destination_field)
+        except (ValueError, OSError) as e:
+            print(f"Error: {e}", file=sys.stderr)
+            sys.exit(1)
+        except KeyboardInterrupt:
+            if args.checkpoint:
+                print(f"Interrupted; rerun with --checkpoint {args.checkpoint} to resume",
+                      file=sys.stderr)
+            sys.exit(130)
+        return
+
+    if args.compare is not None:
+        try:
+            rows = compare_modes(args.origin, args.destination, args.compare, crs=args.crs,
+                                 city=args.city, cityd=args.cityd)
+            print("\nMode Comparison (fastest first):")
+            print("=" * 50)
+            print(format_comparison(rows))
+        except ValueError as e:
+            print(f"Error: {e}", file=sys.stderr)
+            sys.exit(1)
+        except Exception as e:
+            print(f"Unexpected error: {e}", file=sys.stderr)
+            sys.exit(1)
+        return
 
     try:
-        result = plan_route(args.origin, args.destination, args.mode)
+        result = plan_route(args.origin, args.destination, args.mode, crs=args.crs,
+                            city=args.city, cityd=args.cityd)
         print(f"\n{MODE_NAMES[args.mode]} Route Result:")
         print("=" * 50)
+        if args.crs != 'gcj02':
+            print(f"Origin: {result.get('origin')}  Destination: {result.get('destination')} "
+                  f"({args.crs})\n")
         print(format_route_result(result, args.mode))
 
     except ValueError as e:
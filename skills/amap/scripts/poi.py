@@ -0,0 +1,293 @@
+"""
+Amap POI Table
+
+Compact columnar storage for large POI result sets. A POI parsed from JSON
+is a dict of some twenty strings (and empty lists for missing fields), so
+a city-wide crawl of 100k+ POIs costs hundreds of MB. PoiTable keeps:
+
+- coordinates and distance as floats in array('d'), parsed once
+- unique text (id, name, address, tel, ...) joined into one string per
+  block of rows, sliced out on access
+- repetitive text (type, province, city, district, ...) dictionary-encoded
+  as array('I') codes into a list of distinct values
+- any other non-empty field in a per-row JSON blob, decoded on access
+
+Rows are read through Poi views, which hold no data of their own and
+answer get()/[] with the same strings a POI dict from Amap would.
+"""
+
+import json
+import math
+from array import array
+from itertools import chain
+from typing import Iterable, Iterator
+
+
+# Fields with mostly distinct values
+TEXT_FIELDS = ('id', 'name', 'address', 'tel', 'entr_location', 'gridcode', 'navi_poiid')
+
+# Fields repeated across many POIs
+CATEGORY_FIELDS = ('type', 'typecode', 'pcode', 'pname', 'citycode', 'cityname',
+                   'adcode', 'adname', 'business_area', 'shopinfo', 'match', 'recommend',
+                   'indoor_map', 'groupbuy_num', 'discount_num')
+
+COLUMN_FIELDS = ('location', 'distance') + TEXT_FIELDS + CATEGORY_FIELDS
+
+# Rows per joined string of a text column
+TEXT_BLOCK = 1024
+
+
+def _text(value) -> str:
+    # Amap sends [] for fields it cannot fill
+    return value if isinstance(value, str) else ''
+
+
+class _TextColumn:
+    """Strings joined back to back in blocks of TEXT_BLOCK rows, with end offsets."""
+
+    def __init__(self):
+        self._blocks = []
+        self._pending = []
+        self._ends = array('I')
+        self._size = 0
+
+    def append(self, value: str) -> None:
+        self._pending.append(value)
+        self._size += len(value)
+        self._ends.append(self._size)
+        if len(self._pending) == TEXT_BLOCK:
+            self._blocks.append(''.join(self._pending))
+            self._pending = []
+            self._size = 0
+
+    def __getitem__(self, index: int) -> str:
+        block, row = divmod(index, TEXT_BLOCK)
+        if block == len(self._blocks):
+            return self._pending[row]
+        start = self._ends[index - 1] if row else 0
+        return self._blocks[block][start:self._ends[index]]
+
+    def values(self) -> list:
+        values = []
+        ends = self._ends
+        for block, text in enumerate(self._blocks):
+            first = block * TEXT_BLOCK
+            starts = chain((0,), ends[first:first + TEXT_BLOCK - 1])
+            values.extend(text[start:end] for start, end in zip(starts, ends[first:first + TEXT_BLOCK]))
+        values.extend(self._pending)
+        return values
+
+
+class _CategoryColumn:
+    """Dictionary-encoded strings: a code per row into the distinct values."""
+
+    def __init__(self):
+        self.values = ['']
+        self._codes = {'': 0}
+        self.codes = array('I')
+
+    def append(self, value: str) -> None:
+        code = self._codes.get(value)
+        if code is None:
+            code = self._codes[value] = len(self.values)
+            self.values.append(value)
+        self.codes.append(code)
+
+    def __getitem__(self, index: int) -> str:
+        return self.values[self.codes[index]]
+
+    def decode(self) -> list:
+        values = self.values
+        return [values[code] for code in self.codes]
+
+
+class Poi:
+    """
+    Read-only view of one PoiTable row.
+
+    Behaves like the Amap POI dict for get(), [] and 'in', with lon, lat
+    and distance as floats (NaN when missing).
+    """
+
+    __slots__ = ('_table', '_index')
+
+    def __init__(self, table: 'PoiTable', index: int):
+        self._table = table
+        self._index = index
+
+    @property
+    def lon(self) -> float:
+        return self._table.lons[self._index]
+
+    @property
+    def lat(self) -> float:
+        return self._table.lats[self._index]
+
+    @property
+    def distance(self) -> float:
+        return self._table.distances[self._index]
+
+    def get(self, field: str, default=None):
+        """Field value as Amap returns it, or default when empty or absent."""
+        value = self._table.value(self._index, field)
+        return default if value in ('', None) else value
+
+    def __getitem__(self, field: str):
+        value = self.get(field)
+        if value is None:
+            raise KeyError(field)
+        return value
+
+    def __contains__(self, field: str) -> bool:
+        return self.get(field) is not None
+
+    def to_dict(self) -> dict:
+        """The POI as an Amap-style dict of its non-empty fields."""
+        return self._table.row_dict(self._index)
+
+    def __repr__(self) -> str:
+        return f"Poi({self.get('id')!r}, {self.get('name')!r})"
+
+
+class PoiTable:
+    """
+    Columnar, append-only table of POIs.
+
+    Examples:
+        >>> table = PoiTable(iter_pois('餐厅', '北京市'))
+        >>> table[0].get('name'), table.lons[0]
+    """
+
+    def __init__(self, pois: Iterable[dict] = ()):
+        """
+        Args:
+            pois: POI dicts (or Poi views) to load
+        """
+        self.lons = array('d')
+        self.lats = array('d')
+        self.distances = array('d')
+        self._text = {field: _TextColumn() for field in TEXT_FIELDS}
+        self._categories = {field: _CategoryColumn() for field in CATEGORY_FIELDS}
+        self._extra = _TextColumn()
+        self.extend(pois)
+
+    def append(self, poi: dict) -> None:
+        """Add a POI dict; fields outside the columns are kept as JSON."""
+        if isinstance(poi, Poi):
+            poi = poi.to_dict()
+        lon = lat = math.nan
+        location = _text(poi.get('location'))
+        if location:
+            lon_text, _, lat_text = location.partition(',')
+            try:
+                lon, lat = float(lon_text), float(lat_text)
+            except ValueError:
+                pass
+        self.lons.append(lon)
+        self.lats.append(lat)
+        try:
+            self.distances.append(float(poi.get('distance')))
+        except (TypeError, ValueError):
+            self.distances.append(math.nan)
+
+        for field, column in self._text.items():
+            column.append(_text(poi.get(field)))
+        for field, column in self._categories.items():
+            column.append(_text(poi.get(field)))
+
+        extra = {key: value for key, value in poi.items()
+                 if key not in COLUMN_FIELDS and value not in ('', [], None)}
+        self._extra.append(json.dumps(extra, ensure_ascii=False, separators=(',', ':'))
+                           if extra else '')
+
+    def extend(self, pois: Iterable[dict]) -> None:
+        """Add POI dicts."""
+        for poi in pois:
+            self.append(poi)
+
+    def __len__(self) -> int:
+        return len(self.lons)
+
+    def __getitem__(self, index: int) -> Poi:
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        return Poi(self, index)
+
+    def __iter__(self) -> Iterator[Poi]:
+        return (Poi(self, index) for index in range(len(self)))
+
+    def value(self, index: int, field: str):
+        """
+        One field of one row, formatted as in the Amap response.
+
+        Returns:
+            The field value; '' for an empty column field, None for an
+            absent other field
+        """
+        if field == 'location':
+            lon, lat = self.lons[index], self.lats[index]
+            return '' if math.isnan(lon) else f"{lon:.6f},{lat:.6f}"
+        if field == 'distance':
+            distance = self.distances[index]
+            if math.isnan(distance):
+                return ''
+            return str(int(distance)) if distance.is_integer() else str(distance)
+        column = self._text.get(field)
+        if column is None:
+            column = self._categories.get(field)
+        if column is not None:
+            return column[index]
+        extra = self._extra[index]
+        return json.loads(extra).get(field) if extra else None
+
+    def column(self, field: str) -> list:
+        """All values of a field, in row order; faster than reading row by row."""
+        if field in self._text:
+            return self._text[field].values()
+        if field in self._categories:
+            return self._categories[field].decode()
+        return [self.value(index, field) for index in range(len(self))]
+
+    def row_dict(self, index: int) -> dict:
+        """One row as an Amap-style dict of its non-empty fields."""
+        row = {field: self.value(index, field) for field in COLUMN_FIELDS}
+        row = {field: value for field, value in row.items() if value}
+        extra = self._extra[index]
+        if extra:
+            row.update(json.loads(extra))
+        return row
+
+    def to_dicts(self) -> Iterator[dict]:
+        """Yield every row as a dict."""
+        return (self.row_dict(index) for index in range(len(self)))
+
+    def coordinates(self):
+        """
+        Coordinates as an (n, 2) NumPy array of longitude, latitude.
+
+        Raises:
+            ImportError: If NumPy is not installed
+        """
+        import numpy as np
+
+        return np.column_stack((np.frombuffer(self.lons, dtype=np.float64),
+                                np.frombuffer(self.lats, dtype=np.float64)))
+
+    @classmethod
+    def from_jsonl(cls, path: str) -> 'PoiTable':
+        """Load POIs from a JSON-lines file, such as poi_crawl.py output."""
+        table = cls()
+        with open(path, 'r', encoding='utf-8') as f:
+            table.extend(json.loads(line) for line in f if line.strip())
+        return table
+
+    def write_jsonl(self, path: str) -> None:
+        """Write every row as a JSON line."""
+        from bulk import write_jsonl
+
+        with open(path, 'w', encoding='utf-8') as f:
+            for row in self.to_dicts():
+                write_jsonl(f, row)
+
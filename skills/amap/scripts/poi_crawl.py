@@ -0,0 +1,547 @@
+#!/usr/bin/env python3
+"""
+Amap Area POI Crawler
+
+Enumerates every POI of a category inside a district, polygon or bounding
+box. A single search stops at a capped number of results, so the area is
+covered with a grid of square tiles, each searched with the /place/around
+circle drawn around it. A tile whose result count reaches --max-results is
+split into four and its quarters searched instead, down to MIN_TILE_SIZE.
+Tiles run in parallel; only POIs lying inside their own tile and inside
+the area are kept, and each POI id is written once.
+
+Usage:
+    # Every restaurant (type 050000) in a district
+    python scripts/poi_crawl.py --district 朝阳区 --types 050000 --output restaurants.jsonl
+
+    # Hotels in a bounding box, resumable
+    python scripts/poi_crawl.py --bbox "116.40,39.90;116.50,39.98" --keywords 酒店 \\
+        --output hotels.jsonl --checkpoint hotels.ckpt
+"""
+
+import argparse
+import hashlib
+import json
+import math
+import sys
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from pathlib import Path
+from typing import Optional
+
+# Add scripts directory to path for imports
+sys.path.insert(0, __file__.rsplit('/', 1)[0])
+
+from __init__ import (
+    DEFAULT_MAX_WORKERS,
+    POI_MAX_PAGES,
+    POI_PAGE_SIZE,
+    AmapNoResultError,
+    add_cache_arguments,
+    apply_cache_arguments,
+    get_default_client,
+    parse_coordinates,
+    poi_page_count
+)
+from bulk import (
+    CHECKPOINT_INTERVAL,
+    PROGRESS_INTERVAL,
+    open_output,
+    write_json_atomic,
+    write_jsonl
+)
+from cache import METERS_PER_DEGREE
+
+
+# Side of the initial grid tiles in meters
+DEFAULT_TILE_SIZE = 3000
+
+# Tiles are not split below this side in meters
+MIN_TILE_SIZE = 25
+
+# Result count at which a tile is split; well below what /place/around
+# pages through, so no tile needs more than a few serial pages
+DEFAULT_MAX_RESULTS = 200
+
+# Largest radius /place/around accepts, in meters
+MAX_AROUND_RADIUS = 50000
+
+
+def parse_bbox(text: str) -> list:
+    """
+    Parse a "lon,lat;lon,lat" bounding box into a rectangular ring.
+
+    Raises:
+        ValueError: If the box is malformed or empty
+    """
+    corners = [parse_coordinates(point) for point in text.split(';')]
+    if len(corners) != 2 or None in corners:
+        raise ValueError(f"Invalid bounding box '{text}'. Expected 'lon,lat;lon,lat'")
+    (x1, y1), (x2, y2) = corners
+    west, east, south, north = min(x1, x2), max(x1, x2), min(y1, y2), max(y1, y2)
+    if west == east or south == north:
+        raise ValueError(f"Bounding box '{text}' has no area")
+    return [[(west, south), (east, south), (east, north), (west, north)]]
+
+
+def parse_polygon(text: str) -> list:
+    """
+    Parse an Amap polyline ("lon,lat;lon,lat;...", rings separated by '|').
+
+    Raises:
+        ValueError: If a point is malformed or a ring has fewer than 3 points
+    """
+    rings = []
+    for part in text.split('|'):
+        ring = [parse_coordinates(point) for point in part.split(';') if point.strip()]
+        if None in ring:
+            raise ValueError(f"Invalid polygon point in '{part[:60]}'")
+        if len(ring) < 3:
+            raise ValueError("Each polygon ring needs at least 3 points")
+        rings.append(ring)
+    return rings
+
+
+def fetch_boundary(name: str, api_key: Optional[str] = None) -> list:
+    """
+    Download the boundary rings of an administrative division.
+
+    Raises:
+        AmapNoResultError: If Amap has no boundary for the name
+    """
+    client = get_default_client()
+    from adcode import resolve_adcode
+
+    params = {'keywords': resolve_adcode(name) or name, 'subdistrict': 0, 'extensions': 'all'}
+    data = client.request('/config/district', params, api_key)
+    districts = data.get('districts') or []
+    if not districts or not districts[0].get('polyline'):
+        raise AmapNoResultError(f"No boundary found for '{name}'")
+    return parse_polygon(districts[0]['polyline'])
+
+
+def _segment_hits_rect(edge: tuple, west: float, south: float, east: float,
+                       north: float) -> bool:
+    # Liang-Barsky clipping of the segment against the rectangle
+    x1, y1, x2, y2 = edge
+    dx, dy = x2 - x1, y2 - y1
+    t0, t1 = 0.0, 1.0
+    for p, q in ((-dx, x1 - west), (dx, east - x1), (-dy, y1 - south), (dy, north - y1)):
+        if p == 0:
+            if q < 0:
+                return False
+        else:
+            t = q / p
+            if p < 0:
+                t0 = max(t0, t)
+            else:
+                t1 = min(t1, t)
+            if t0 > t1:
+                return False
+    return True
+
+
+class Area:
+    """
+    Polygon to crawl, possibly with several rings (islands or holes).
+
+    Edges are bucketed into horizontal bands, so a point-in-polygon test
+    only scans the edges of one band and finding the edges through a tile
+    only those of the bands it spans. Tiles no edge passes through are
+    wholly inside or outside, so only POIs of boundary tiles are tested.
+    """
+
+    def __init__(self, rings: list, bands: int = 256):
+        """
+        Args:
+            rings: Lists of (lon, lat) points; insideness is even-odd
+            bands: Number of horizontal edge buckets
+        """
+        self.rings = rings
+        self.edges = [(*ring[i - 1], *ring[i]) for ring in rings for i in range(len(ring))]
+        lons = [lon for ring in rings for lon, _ in ring]
+        lats = [lat for ring in rings for _, lat in ring]
+        self.bounds = (min(lons), min(lats), max(lons), max(lats))
+
+        self._south = self.bounds[1]
+        self._band_height = (self.bounds[3] - self._south) / bands or 1.0
+        self._bands = [[] for _ in range(bands)]
+        for edge in self.edges:
+            first, last = sorted((self._band(edge[1]), self._band(edge[3])))
+            for band in range(first, last + 1):
+                self._bands[band].append(edge)
+
+    def _band(self, lat: float) -> int:
+        return min(max(int((lat - self._south) / self._band_height), 0), len(self._bands) - 1)
+
+    def fingerprint(self) -> str:
+        """Digest of the rings, to match a checkpoint with its area."""
+        return hashlib.sha1(json.dumps(self.rings).encode('utf-8')).hexdigest()
+
+    def contains(self, lon: float, lat: float) -> bool:
+        """Even-odd point-in-polygon test over all rings."""
+        inside = False
+        for x1, y1, x2, y2 in self._bands[self._band(lat)]:
+            if (y1 > lat) != (y2 > lat) and lon < x1 + (lat - y1) * (x2 - x1) / (y2 - y1):
+                inside = not inside
+        return inside
+
+    def edges_in(self, tile: tuple, edges: Optional[list] = None) -> list:
+        """Edges passing through a tile, from edges (default: all)."""
+        if edges is None:
+            bands = self._bands[self._band(tile[1]):self._band(tile[3]) + 1]
+            edges = list(dict.fromkeys(edge for band in bands for edge in band))
+        return [edge for edge in edges if _segment_hits_rect(edge, *tile)]
+
+
+class TileCheckpoint:
+    """
+    Progress of a resumable crawl: the tiles still to search, the size of
+    the output file and the counters when it was saved. On resume the
+    output is truncated back to that size and the POI ids already written
+    are read back from it, so no POI is written twice.
+    """
+
+    def __init__(self, path: str, query: dict):
+        """
+        Args:
+            path: Checkpoint file
+            query: Crawl parameters the checkpoint belongs to
+        """
+        self.path = Path(path)
+        self.query = query
+        self.pending = None
+        self.offset = 0
+        self.stats = {}
+
+    @classmethod
+    def load(cls, path: str, query: dict) -> 'TileCheckpoint':
+        """
+        Load a checkpoint, or start a new one if the file does not exist.
+
+        Raises:
+            ValueError: If the checkpoint was written for another crawl
+        """
+        checkpoint = cls(path, query)
+        if checkpoint.path.exists():
+            with open(checkpoint.path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+            if state['query'] != query:
+                raise ValueError(f"Checkpoint {path} belongs to another crawl")
+            checkpoint.pending = [tuple(tile) for tile in state['pending']]
+            checkpoint.offset = state['offset']
+            checkpoint.stats = state['stats']
+        return checkpoint
+
+    def save(self, pending: list, offset: int, stats: dict) -> None:
+        """Atomically write the checkpoint for an output file of offset bytes."""
+        write_json_atomic(self.path, {
+            'query': self.query,
+            'pending': pending,
+            'offset': offset,
+            'stats': stats
+        })
+
+
+def tile_grid(bounds: tuple, size: float) -> list:
+    """Tiles of about size meters covering bounds, as (west, south, east, north)."""
+    west, south, east, north = bounds
+    step_lat = size / METERS_PER_DEGREE
+    step_lon = size / (METERS_PER_DEGREE * math.cos(math.radians((south + north) / 2)))
+    columns = max(1, math.ceil((east - west) / step_lon))
+    rows = max(1, math.ceil((north - south) / step_lat))
+    lons = [west + i * step_lon for i in range(columns + 1)]
+    lats = [south + j * step_lat for j in range(rows + 1)]
+    return [(lons[i], lats[j], lons[i + 1], lats[j + 1])
+            for j in range(rows) for i in range(columns)]
+
+
+def split_tile(tile: tuple) -> list:
+    """The four quarters of a tile."""
+    west, south, east, north = tile
+    lon, lat = (west + east) / 2, (south + north) / 2
+    return [(west, south, lon, lat), (lon, south, east, lat),
+            (west, lat, lon, north), (lon, lat, east, north)]
+
+
+def tile_circle(tile: tuple) -> tuple[float, float, int]:
+    """Center and radius in meters of the circle around a tile."""
+    west, south, east, north = tile
+    lon, lat = (west + east) / 2, (south + north) / 2
+    width = (east - west) * METERS_PER_DEGREE * math.cos(math.radians(lat))
+    height = (north - south) * METERS_PER_DEGREE
+    return round(lon, 6), round(lat, 6), math.ceil(math.hypot(width, height) / 2) + 1
+
+
+def tile_size(tile: tuple) -> float:
+    """Longest side of a tile in meters."""
+    west, south, east, north = tile
+    lat = (south + north) / 2
+    return max((east - west) * METERS_PER_DEGREE * math.cos(math.radians(lat)),
+               (north - south) * METERS_PER_DEGREE)
+
+
+def search_tile(tile: tuple, keywords: Optional[str] = None, types: Optional[str] = None,
+                max_results: int = DEFAULT_MAX_RESULTS,
+                api_key: Optional[str] = None) -> dict:
+    """
+    Search the circle around a tile.
+
+    Only the first page is fetched when the tile is to be split.
+
+    Returns:
+        Dict with 'split' (True if the tile holds too many results), 'pois',
+        'requests' and 'truncated' (True if a minimum-size tile still
+        reached max_results)
+    """
+    client = get_default_client()
+    lon, lat, radius = tile_circle(tile)
+
+    def fetch(page):
+        return client.search_around(lon, lat, radius, keywords, types, api_key=api_key,
+                                    page=page, offset=POI_PAGE_SIZE)
+
+    data = fetch(1)
+    count = int(data.get('count') or 0)
+    can_split = tile_size(tile) >= 2 * MIN_TILE_SIZE
+    if count >= max_results and can_split:
+        return {'split': True, 'pois': [], 'requests': 1, 'truncated': False}
+
+    pois = list(data.get('pois') or [])
+    requests = 1
+    for page in range(2, poi_page_count(data) + 1):
+        data = fetch(page)
+        requests += 1
+        if not data.get('pois'):
+            break
+        pois.extend(data['pois'])
+    return {'split': False, 'pois': pois, 'requests': requests,
+            'truncated': count >= max_results}
+
+
+def crawl_area(area: Area, keywords: Optional[str] = None, types: Optional[str] = None,
+               output: Optional[str] = None, max_workers: int = DEFAULT_MAX_WORKERS,
+               size: float = DEFAULT_TILE_SIZE, max_results: int = DEFAULT_MAX_RESULTS,
+               checkpoint: Optional[str] = None, api_key: Optional[str] = None,
+               progress: bool = True) -> dict:
+    """
+    Write every POI inside an area as JSON lines.
+
+    Args:
+        area: Area to cover
+        keywords: Search keywords (optional)
+        types: POI type codes or names, '|'-separated (optional)
+        output: Output file (None or '-' for stdout)
+        max_workers: Tiles searched concurrently
+        size: Side of the initial grid tiles in meters
+        max_results: Result count at which a tile is split
+        checkpoint: Checkpoint file; an existing one resumes the crawl where
+            it stopped (requires an output file)
+        api_key: Amap API key (defaults to the client key)
+        progress: Report tiles, POIs and requests on stderr
+
+    Returns:
+        Counters: tiles, splits, truncated, requests, pois, duplicates, outside
+
+    Raises:
+        ValueError: If a parameter is out of range, or checkpointing without
+            an output file
+    """
+    if not MIN_TILE_SIZE * 2 <= size <= MAX_AROUND_RADIUS * math.sqrt(2):
+        raise ValueError(f"Tile size must be between {MIN_TILE_SIZE * 2} and "
+                         f"{int(MAX_AROUND_RADIUS * math.sqrt(2))} meters")
+    if not 1 <= max_results <= POI_PAGE_SIZE * POI_MAX_PAGES:
+        raise ValueError(f"max_results must be between 1 and {POI_PAGE_SIZE * POI_MAX_PAGES}")
+
+    state = None
+    if checkpoint:
+        if not output or output == '-':
+            raise ValueError("Checkpointing requires an output file")
+        query = {'area': area.fingerprint(), 'keywords': keywords, 'types': types,
+                 'size': size, 'max_results': max_results}
+        state = TileCheckpoint.load(checkpoint, query)
+
+    stats = dict.fromkeys(('tiles', 'splits', 'truncated', 'requests',
+                           'pois', 'duplicates', 'outside'), 0)
+    seen = set()
+    resuming = state is not None and state.pending is not None
+    if resuming:
+        stats.update(state.stats)
+        out = open_output(output, append=True)
+        out.truncate(state.offset)
+        with open(output, 'r', encoding='utf-8') as f:
+            seen.update(json.loads(line).get('id') for line in f)
+        pending = state.pending
+    else:
+        out = open_output(output)
+        pending = tile_grid(area.bounds, size)
+
+    # Boundary edges crossing each queued tile; None for tiles wholly inside
+    edges = {}
+    queue = deque()
+
+    def enqueue(tile: tuple, candidates: Optional[list] = None) -> None:
+        crossing = area.edges_in(tile, candidates)
+        if crossing:
+            edges[tile] = crossing
+        elif area.contains((tile[0] + tile[2]) / 2, (tile[1] + tile[3]) / 2):
+            edges[tile] = None
+        else:
+            return
+        queue.append(tile)
+
+    for tile in pending:
+        enqueue(tile)
+
+    def keep(tile: tuple, poi: dict) -> bool:
+        # Each POI belongs to the one tile holding it, and must lie in the area
+        point = parse_coordinates(poi.get('location') or '')
+        if point is None:
+            return False
+        lon, lat = point
+        west, south, east, north = tile
+        if not (west <= lon < east and south <= lat < north):
+            return False
+        crossing = edges[tile]
+        return crossing is None or area.contains(lon, lat)
+
+    active = set()
+    saved = reported = time.monotonic()
+
+    def report(final: bool = False) -> None:
+        line = (f"{stats['tiles']} tiles ({stats['splits']} split), {len(queue) + len(active)} pending, "
+                f"{stats['pois']} POIs, {stats['requests']} requests")
+        if final:
+            line = "Done: " + line
+            if stats['truncated']:
+                line += (f"; {stats['truncated']} tiles of {MIN_TILE_SIZE} m still reached "
+                         f"{max_results} results and may be incomplete")
+        print(line, file=sys.stderr, flush=True)
+
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            in_flight = {}
+            try:
+                while queue or in_flight:
+                    while queue and len(in_flight) < max_workers:
+                        tile = queue.popleft()
+                        active.add(tile)
+                        future = executor.submit(search_tile, tile, keywords, types,
+                                                 max_results, api_key)
+                        in_flight[future] = tile
+                    done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        tile = in_flight.pop(future)
+                        result = future.result()
+                        stats['tiles'] += 1
+                        stats['requests'] += result['requests']
+                        stats['truncated'] += result['truncated']
+                        if result['split']:
+                            stats['splits'] += 1
+                            for child in split_tile(tile):
+                                enqueue(child, edges[tile])
+                        for poi in result['pois']:
+                            if not keep(tile, poi):
+                                stats['outside'] += 1
+                            elif poi.get('id') in seen:
+                                stats['duplicates'] += 1
+                            else:
+                                seen.add(poi.get('id'))
+                                write_jsonl(out, poi)
+                                stats['pois'] += 1
+                        del edges[tile]
+                        active.discard(tile)
+
+                    now = time.monotonic()
+                    if state is not None and now - saved >= CHECKPOINT_INTERVAL:
+                        out.flush()
+                        state.save([*active, *queue], out.tell(), stats)
+                        saved = now
+                    if progress and now - reported >= PROGRESS_INTERVAL:
+                        report()
+                        reported = now
+            finally:
+                for future in in_flight:
+                    future.cancel()
+    finally:
+        out.flush()
+        if state is not None:
+            state.save([*active, *queue], out.tell(), stats)
+        if out is not sys.stdout:
+            out.close()
+
+    if progress:
+        report(final=True)
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Amap POI Crawler - Enumerate every POI inside an area',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  # Every restaurant in a district
+  python scripts/poi_crawl.py --district 朝阳区 --types 050000 --output restaurants.jsonl
+
+  # Every hotel in a city, 16 tiles at a time, resumable
+  python scripts/poi_crawl.py --district 北京市 --types 100000 --output hotels.jsonl \\
+      --checkpoint hotels.ckpt --workers 16
+
+  # Keyword search inside a bounding box or polygon
+  python scripts/poi_crawl.py --bbox "116.40,39.90;116.50,39.98" --keywords 咖啡
+  python scripts/poi_crawl.py --polygon "116.40,39.90;116.50,39.90;116.45,39.98" --keywords 咖啡
+        """
+    )
+
+    area = parser.add_mutually_exclusive_group(required=True)
+    area.add_argument('--district', type=str,
+                      help='Province, city or district name or adcode; its boundary is downloaded')
+    area.add_argument('--bbox', type=str,
+                      help='Bounding box "lon,lat;lon,lat"')
+    area.add_argument('--polygon', type=str,
+                      help='Polygon "lon,lat;lon,lat;...", rings separated by "|"')
+    parser.add_argument('--keywords', type=str,
+                        help='Search keywords')
+    parser.add_argument('--types', type=str,
+                        help='POI type codes or names, "|"-separated (e.g. 050000 for restaurants)')
+    parser.add_argument('--output', type=str,
+                        help='Output JSONL file (default: stdout)')
+    parser.add_argument('--checkpoint', type=str,
+                        help='Checkpoint file; rerun with the same file to resume (requires --output)')
+    parser.add_argument('--workers', type=int, default=DEFAULT_MAX_WORKERS,
+                        help=f'Tiles searched concurrently (default: {DEFAULT_MAX_WORKERS})')
+    parser.add_argument('--tile-size', type=float, default=DEFAULT_TILE_SIZE,
+                        help=f'Side of the initial tiles in meters (default: {DEFAULT_TILE_SIZE})')
+    parser.add_argument('--max-results', type=int, default=DEFAULT_MAX_RESULTS,
+                        help=f'Split tiles with this many results (default: {DEFAULT_MAX_RESULTS})')
+    add_cache_arguments(parser)
+
+    args = parser.parse_args()
+    apply_cache_arguments(args)
+
+    if not (args.keywords or args.types):
+        parser.error("At least one of --keywords and --types is required")
+
+    try:
+        if args.district:
+            rings = fetch_boundary(args.district)
+        elif args.bbox:
+            rings = parse_bbox(args.bbox)
+        else:
+            rings = parse_polygon(args.polygon)
+        crawl_area(Area(rings), args.keywords, args.types, args.output, args.workers,
+                   args.tile_size, args.max_results, args.checkpoint)
+    except (ValueError, OSError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+    except KeyboardInterrupt:
+        if args.checkpoint:
+            print(f"Interrupted; rerun with --checkpoint {args.checkpoint} to resume",
+                  file=sys.stderr)
+        sys.exit(130)
+
+
+if __name__ == "__main__":
+    main()
@@ -10,20 +10,30 @@ Usage:
 
     # Search around specific coordinates
     python scripts/poi_search.py --keywords "加油站" --longitude 116.481485 --latitude 39.990464 --city "北京市" --radius 500
+
+    # Stream every matching POI to a JSONL file
+    python scripts/poi_search.py --keywords "餐厅" --city "北京市" --output pois.jsonl
 """
 
 import argparse
 import sys
-from typing import Optional
+from typing import Iterator, Optional
 
 # Add scripts directory to path for imports
 sys.path.insert(0, __file__.rsplit('/', 1)[0])
 
 from __init__ import (
-    get_api_key,
-    build_api_url,
-    make_api_request
+    DEFAULT_MAX_WORKERS,
+    add_cache_arguments,
+    apply_cache_arguments,
+    get_default_client
 )
+from bulk import open_output, write_jsonl
+from poi import PoiTable
+
+
+# POIs shown by default when printing to the terminal
+DISPLAY_LIMIT = 10
 
 
 def search_poi(keywords: str, city: str, longitude: Optional[float] = None,
@@ -34,7 +44,7 @@ def search_poi(keywords: str, city: str, longitude: Optional[float] = None,
 
     Args:
         keywords: Search keywords
-        city: City name (required)
+        city: City name or adcode (required)
         longitude: Center longitude (optional, defaults to city center)
         latitude: Center latitude (optional, defaults to city center)
         radius: Search radius in meters (default: 1000)
@@ -43,48 +53,57 @@ def search_poi(keywords: str, city: str, longitude: Optional[float] = None,
     Returns:
         POI search result dict
     """
-    if api_key is None:
-        api_key = get_api_key()
-
-    params = {
-        'keywords': keywords,
-        'city': city,
-        'radius': radius
-    }
+    return get_default_client().search_poi(keywords, city, longitude, latitude,
+                                           radius, api_key=api_key)
 
-    if longitude is not None and latitude is not None:
-        params['location'] = f'{longitude},{latitude}'
 
-    url = build_api_url('/place/text', params)
-    data = make_api_request(url, api_key)
+def iter_pois(keywords: str, city: str, longitude: Optional[float] = None,
+              latitude: Optional[float] = None, radius: int = 1000,
+              limit: Optional[int] = None, max_workers: int = DEFAULT_MAX_WORKERS,
+              api_key: Optional[str] = None, totals: Optional[dict] = None) -> Iterator[dict]:
+    """
+    Yield every POI of a search, fetching pages concurrently.
 
-    pois = data.get('pois', [])
-    if not pois:
-        raise ValueError("No POIs found")
+    Args:
+        keywords: Search keywords
+        city: City name or adcode (required)
+        longitude: Center longitude (optional, defaults to city center)
+        latitude: Center latitude (optional, defaults to city center)
+        radius: Search radius in meters (default: 1000)
+        limit: Stop after this many POIs (default: all)
+        max_workers: Maximum number of pages in flight
+        api_key: Amap API key (if None, will prompt)
+        totals: Dict that receives the search's total 'count'
 
-    return data
+    Yields:
+        POI dicts in result order, each POI id once
+    """
+    return get_default_client().iter_pois(keywords, city, longitude, latitude, radius,
+                                           limit=limit, max_workers=max_workers,
+                                           api_key=api_key, totals=totals)
 
 
-def format_poi_result(data: dict, limit: int = 10) -> str:
+def format_poi_result(data: dict, limit: int = DISPLAY_LIMIT) -> str:
     """
     Format POI search result for display.
 
     Args:
-        data: POI search result data
+        data: POI search result data; 'pois' may be a list of dicts or a PoiTable
         limit: Maximum number of results to display
 
     Returns:
         Formatted result string
     """
     pois = data.get('pois', [])
-    count = int(data.get('count', 0))
-    total = min(count, len(pois))
+    count = max(int(data.get('count') or 0), len(pois))
+    shown = min(len(pois), limit)
 
     output = []
-    output.append(f"Found {count} POIs (showing {min(total, limit)}):")
+    output.append(f"Found {count} POIs (showing {shown}):")
     output.append("=" * 60)
 
-    for i, poi in enumerate(pois[:limit], 1):
+    for i in range(1, shown + 1):
+        poi = pois[i - 1]
         name = poi.get('name', 'N/A')
         address = poi.get('address', 'N/A')
         location = poi.get('location', 'N/A')
@@ -101,8 +120,10 @@ def format_poi_result(data: dict, limit: int = 10) -> str:
         if ptype:
             output.append(f"   Type: {ptype}")
 
-    if count > limit:
-        output.append(f"\n... and {count - limit} more results")
+    if len(pois) > shown:
+        output.append(f"\n... and {len(pois) - shown} more results")
+    if count > len(pois):
+        output.append(f"\n{count - len(pois)} more POIs not fetched (raise --limit to page through them)")
 
     return '\n'.join(output)
 
@@ -121,37 +142,72 @@ Examples:
 
   # Search with keywords and type
   python scripts/poi_search.py --keywords "星巴克" --city "上海市" --radius 1000
+
+  # Stream every matching POI to a JSONL file, 8 pages at a time
+  python scripts/poi_search.py --keywords "加油站" --city "上海市" --output pois.jsonl --workers 8
         """
     )
 
     parser.add_argument('--keywords', type=str, required=True,
                         help='Search keywords')
     parser.add_argument('--city', type=str, required=True,
-                        help='City name (required)')
+                        help='City name or adcode (required)')
     parser.add_argument('--longitude', type=float,
                         help='Center longitude (optional, defaults to city center)')
     parser.add_argument('--latitude', type=float,
                         help='Center latitude (optional, defaults to city center)')
     parser.add_argument('--radius', type=int, default=1000,
                         help='Search radius in meters (default: 1000)')
-    parser.add_argument('--limit', type=int, default=10,
-                        help='Maximum number of results to display (default: 10)')
+    parser.add_argument('--limit', type=int,
+                        help=f'Maximum number of POIs to fetch (default: {DISPLAY_LIMIT}, '
+                             'or all with --output)')
+    parser.add_argument('--output', type=str,
+                        help="Write POIs as JSON lines to this file ('-' for stdout)")
+    parser.add_argument('--workers', type=int, default=DEFAULT_MAX_WORKERS,
+                        help=f'Pages fetched concurrently (default: {DEFAULT_MAX_WORKERS})')
+    add_cache_arguments(parser)
 
     args = parser.parse_args()
+    apply_cache_arguments(args)
 
     # Validate coordinates
     if (args.longitude is not None) != (args.latitude is not None):
         parser.error("Both --longitude and --latitude must be provided together")
 
+    limit = args.limit
+    if limit is None and not args.output:
+        limit = DISPLAY_LIMIT
+
+    totals = {}
     try:
-        result = search_poi(
+        pois = iter_pois(
             keywords=args.keywords,
             city=args.city,
             longitude=args.longitude,
             latitude=args.latitude,
-            radius=args.radius
+            radius=args.radius,
+            limit=limit,
+            max_workers=args.workers,
+            totals=totals
         )
-        print(format_poi_result(result, limit=args.limit))
+        if args.output:
+            out = open_output(args.output)
+            count = 0
+            try:
+                for poi in pois:
+                    write_jsonl(out, poi)
+                    count += 1
+            finally:
+                if out is not sys.stdout:
+                    out.close()
+            print(f"Wrote {count} POIs", file=sys.stderr)
+        else:
+            pois = PoiTable(pois)
+            if not len(pois):
+                print("Error: No POIs found", file=sys.stderr)
+                sys.exit(1)
+            print(format_poi_result({'pois': pois, 'count': totals.get('count')},
+                                    limit=len(pois)))
 
     except ValueError as e:
         print(f"Error: {e}", file=sys.stderr)
@@ -0,0 +1,165 @@
+"""
+Amap Client-Side Rate Limiting
+
+Token buckets that pace requests to just under Amap's per-key, per-service
+QPS limits instead of tripping 10021 (CUQPS_HAS_EXCEEDED_THE_LIMIT) and
+10004 (ACCESS_TOO_FREQUENT) errors.
+
+A bucket hands out reservations rather than blocking itself: reserve()
+returns how long the caller must wait before sending, so the same bucket
+paces threads (time.sleep) and asyncio tasks (asyncio.sleep) alike.
+"""
+
+import asyncio
+import threading
+import time
+from typing import Optional
+
+
+# Documented per-service QPS limit (see references/api_reference.md)
+DEFAULT_QPS = 100
+
+# Fraction of the documented limit actually used
+DEFAULT_HEADROOM = 0.9
+
+
+def key_preview(api_key: str) -> str:
+    """Shorten an API key for display."""
+    return api_key[:4] + "..." if api_key else ""
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket.
+
+    Tokens refill continuously at rate per second up to capacity. When the
+    bucket is empty, each reservation is queued 1/rate seconds after the
+    previous one, so concurrent callers are spread evenly.
+    """
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        """
+        Args:
+            rate: Sustained requests per second
+            capacity: Burst size in tokens (default: a tenth of a second's worth, at least 1)
+        """
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate / 10)
+        self.tokens = self.capacity
+        self.acquired = 0
+        self.delayed = 0
+        self.total_wait = 0.0
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, tokens: float = 1) -> float:
+        """
+        Reserve tokens.
+
+        Returns:
+            Seconds the caller must wait before sending (0 if available now)
+        """
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            # Going negative queues this caller behind earlier reservations
+            self.tokens -= tokens
+            self.acquired += 1
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+            if wait:
+                self.delayed += 1
+                self.total_wait += wait
+            return wait
+
+    def acquire(self, tokens: float = 1) -> None:
+        """Block the current thread until tokens are available."""
+        wait = self.reserve(tokens)
+        if wait:
+            time.sleep(wait)
+
+    async def acquire_async(self, tokens: float = 1) -> None:
+        """Suspend the current task until tokens are available."""
+        wait = self.reserve(tokens)
+        if wait:
+            await asyncio.sleep(wait)
+
+    def snapshot(self) -> dict:
+        """Return the bucket configuration, current level and counters."""
+        with self._lock:
+            now = time.monotonic()
+            tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+            return {
+                'rate': self.rate,
+                'capacity': self.capacity,
+                'tokens': tokens,
+                'acquired': self.acquired,
+                'delayed': self.delayed,
+                'total_wait': self.total_wait
+            }
+
+
+class RateLimiter:
+    """
+    Per-key, per-endpoint collection of token buckets.
+
+    Each (api_key, endpoint) pair gets its own bucket, created on first use,
+    whose rate is the configured QPS for the endpoint scaled by headroom.
+    """
+
+    def __init__(self, limits: Optional[dict] = None, default_qps: float = DEFAULT_QPS,
+                 headroom: float = DEFAULT_HEADROOM):
+        """
+        Args:
+            limits: Endpoint prefix to QPS limit, e.g. {'/direction/': 50}
+            default_qps: QPS limit for endpoints not matched by limits
+            headroom: Fraction of each limit to use
+        """
+        self.limits = dict(limits or {})
+        self.default_qps = default_qps
+        self.headroom = headroom
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def qps_for(self, endpoint: str) -> float:
+        """QPS limit for an endpoint, using the longest matching prefix."""
+        best = None
+        for prefix in self.limits:
+            if endpoint.startswith(prefix) and (best is None or len(prefix) > len(best)):
+                best = prefix
+        return self.limits[best] if best is not None else self.default_qps
+
+    def bucket(self, api_key: str, endpoint: str) -> TokenBucket:
+        """Get or create the bucket for a key and endpoint."""
+        bucket = self._buckets.get((api_key, endpoint))
+        if bucket is None:
+            with self._lock:
+                bucket = self._buckets.get((api_key, endpoint))
+                if bucket is None:
+                    bucket = TokenBucket(self.qps_for(endpoint) * self.headroom)
+                    self._buckets[(api_key, endpoint)] = bucket
+        return bucket
+
+    def reserve(self, api_key: str, endpoint: str) -> float:
+        """Reserve one request; returns seconds to wait before sending."""
+        return self.bucket(api_key, endpoint).reserve()
+
+    def acquire(self, api_key: str, endpoint: str) -> None:
+        """Block the current thread until a request may be sent."""
+        self.bucket(api_key, endpoint).acquire()
+
+    async def acquire_async(self, api_key: str, endpoint: str) -> None:
+        """Suspend the current task until a request may be sent."""
+        await self.bucket(api_key, endpoint).acquire_async()
+
+    def snapshot(self) -> dict:
+        """
+        Return the state of every bucket.
+
+        Returns:
+            Dict mapping "key_preview endpoint" to TokenBucket.snapshot()
+        """
+        with self._lock:
+            buckets = list(self._buckets.items())
+        return {f"{key_preview(api_key)} {endpoint}": bucket.snapshot()
+                for (api_key, endpoint), bucket in buckets}
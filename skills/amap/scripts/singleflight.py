@@ -0,0 +1,145 @@
+"""
+Amap Request Coalescing
+
+Deduplicates concurrent identical calls: while a request for a key is in
+flight, later callers with the same key wait for it and share its result
+(or exception) instead of sending their own. Useful when many workers
+geocode the same landmark at the same moment.
+
+SingleFlight serves threads; AsyncSingleFlight serves asyncio tasks.
+"""
+
+import asyncio
+import threading
+from typing import Awaitable, Callable, Hashable
+
+
+class _Call:
+    """An in-flight call and its outcome."""
+
+    __slots__ = ('done', 'result', 'error', 'waiters')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Thread-safe in-flight call deduplication."""
+
+    def __init__(self):
+        self.calls = 0
+        self.coalesced = 0
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key: Hashable, fn: Callable[[], object]):
+        """
+        Run fn unless a call for key is already in flight, then share its outcome.
+
+        Args:
+            key: Identity of the call
+            fn: Function performing the call
+
+        Returns:
+            The result of fn, possibly from another thread's call
+
+        Raises:
+            Whatever fn raised, in every caller sharing the call
+        """
+        # Leadership is decided under the lock: once it is released, other
+        # threads may already be joining this call
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.calls += 1
+            else:
+                call.waiters += 1
+                self.coalesced += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+    def stats(self) -> dict:
+        """Return executed and coalesced call counters."""
+        with self._lock:
+            return {
+                'calls': self.calls,
+                'coalesced': self.coalesced,
+                'in_flight': len(self._calls)
+            }
+
+
+class AsyncSingleFlight:
+    """
+    asyncio in-flight call deduplication.
+
+    The shared call runs as its own task. Cancelling one waiter leaves the
+    call running for the others; it is cancelled only when every waiter has
+    gone away.
+    """
+
+    def __init__(self):
+        self.calls = 0
+        self.coalesced = 0
+        self._calls = {}
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable]):
+        """
+        Await fn() unless a call for key is already in flight, then share its outcome.
+
+        Args:
+            key: Identity of the call
+            fn: Coroutine function performing the call
+
+        Returns:
+            The result of fn()
+
+        Raises:
+            Whatever fn() raised, in every caller sharing the call
+        """
+        entry = self._calls.get(key)
+        if entry is not None:
+            self.coalesced += 1
+        else:
+            task = asyncio.ensure_future(fn())
+            entry = self._calls[key] = [task, 0]
+            self.calls += 1
+            task.add_done_callback(lambda _: self._calls.pop(key, None))
+
+        task = entry[0]
+        entry[1] += 1
+        try:
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            if not task.done() and entry[1] == 1:
+                task.cancel()
+            raise
+        finally:
+            entry[1] -= 1
+
+    def stats(self) -> dict:
+        """Return executed and coalesced call counters."""
+        return {
+            'calls': self.calls,
+            'coalesced': self.coalesced,
+            'in_flight': len(self._calls)
+        }
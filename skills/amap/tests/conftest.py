@@ -0,0 +1,45 @@
+"""
+Shared fixtures for the amap tests.
+
+Tests import the scripts the way the scripts import each other (scripts/
+on sys.path, `from __init__ import ...`) and talk to the bundled stub
+server from benchmarks/, so they need no network access or API key.
+"""
+
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / 'benchmarks'))
+sys.path.insert(0, str(ROOT / 'scripts'))
+
+# Keep the tests off the user's caches, daemon and keys; set before the
+# scripts read them at import time
+os.environ['AMAP_CACHE_DIR'] = tempfile.mkdtemp(prefix='amap-tests-')
+os.environ['AMAP_NO_DAEMON'] = '1'
+os.environ['AMAP_API_KEY'] = 'stub'
+os.environ.pop('AMAP_API_KEYS', None)
+
+from stub_server import serve  # noqa: E402
+
+
+@pytest.fixture(scope='session')
+def stub():
+    """Stub Amap server shared by the whole session."""
+    server = serve()
+    yield server
+    server.shutdown()
+
+
+@pytest.fixture
+def client(stub):
+    """AmapClient against the stub, without caches, retrying quickly."""
+    from __init__ import AmapClient
+
+    with AmapClient(api_key='stub', base_url=stub.base_url, backoff_base=0.001,
+                    backoff_max=0.002) as client:
+        yield client
@@ -0,0 +1,65 @@
+import math
+import random
+
+import pytest
+
+import adcode
+from adcode import AdcodeIndex, build_index
+
+
+def district(adcode_, name, level, center, children=()):
+    return {'adcode': adcode_, 'name': name, 'level': level, 'citycode': '010',
+            'center': center, 'districts': list(children)}
+
+
+@pytest.fixture
+def index(tmp_path):
+    random.seed(0)
+    cities = [district(f'{110100 + i * 100}', f'测试{i}市', 'city',
+                       f'{random.uniform(73, 135):.6f},{random.uniform(18, 53):.6f}',
+                       [district(f'{110101 + i * 100}', f'测试{i}区', 'district',
+                                 f'{random.uniform(73, 135):.6f},{random.uniform(18, 53):.6f}')])
+              for i in range(300)]
+    tree = [district('100000', '中华人民共和国', 'country', '116.3,39.9',
+                     [district('110000', '测试省', 'province', '116.4,39.9', cities)])]
+    path = tmp_path / 'adcode.bin'
+    build_index(tree, path)
+    index = AdcodeIndex(path)
+    yield index
+    index.close()
+
+
+def brute_force_nearest(districts, longitude, latitude, level):
+    scale = max(math.cos(math.radians(latitude)), 1e-3)
+    candidates = [d for d in districts if d.level == level and d.center]
+    return min(candidates, key=lambda d: ((d.center[0] - longitude) * scale) ** 2
+               + (d.center[1] - latitude) ** 2)
+
+
+def test_lookup_and_alias(index):
+    assert index.resolve('测试7').adcode == '110800'
+    assert index.resolve('测试7区').parent == '110800'
+    assert [d.name for d in index.ancestors(index.get('110801'))] == ['测试7市', '测试省']
+
+
+def test_nearest_matches_a_full_scan(index):
+    random.seed(1)
+    districts = [index._district(i) for i in range(len(index))]
+    for _ in range(500):
+        lon, lat = random.uniform(60, 150), random.uniform(5, 60)
+        for level in ('city', 'district', 'province'):
+            assert index.nearest(lon, lat, level) == brute_force_nearest(districts, lon, lat, level)
+
+
+def test_nearest_without_divisions_of_a_level(index):
+    assert index.nearest(116.4, 39.9, 'country') is None
+
+
+def test_missing_index_warns_once(tmp_path, monkeypatch, capsys):
+    monkeypatch.setenv('AMAP_ADCODE_INDEX', str(tmp_path / 'missing.bin'))
+    monkeypatch.setattr(adcode, '_index', None)
+    monkeypatch.setattr(adcode, '_index_loaded', False)
+    assert adcode.resolve_adcode('北京') is None
+    assert adcode.resolve_adcode('上海') is None
+    assert capsys.readouterr().err.count('no adcode index') == 1
+    assert adcode.resolve_adcode('110000') == '110000'
@@ -0,0 +1,62 @@
+"""Address normalization: spellings of one place share one key."""
+
+import pytest
+
+from address import address_key, normalize_address, parse_address
+
+
+@pytest.mark.parametrize('spelling', [
+    '北京市朝阳区阜通东大街6号',
+    '中国 北京 北京市朝阳区阜通东大街６號',
+    '中国北京市朝阳区阜通东大街6号',
+    '北京朝阳区阜通东大街6号',
+    '北京市北京市朝阳区阜通东大街6号',
+    '北京市，朝阳区 阜通东大街 6#',
+    '　北京市朝阳区阜通东大街６号　',
+])
+def test_spellings_share_one_form(spelling):
+    assert normalize_address(spelling) == '北京市朝阳区阜通东大街6号'
+
+
+@pytest.mark.parametrize('address, expected', [
+    ('中国人民大学', '中国人民大学'),
+    ('北京路100号', '北京路100号'),
+    ('广东省深圳市南山区科技园 Tower A', '广东省深圳市南山区科技园Tower A'),
+    ('廣東省廣州市天河區', '广东省广州市天河区'),
+    ('', ''),
+])
+def test_normalization_keeps_distinct_places_apart(address, expected):
+    assert normalize_address(address) == expected
+
+
+def test_parse_splits_administrative_prefixes():
+    assert parse_address('浙江省杭州市西湖区文三路90号') == {
+        'province': '浙江省', 'city': '杭州市', 'district': '西湖区', 'street': '文三路90号'}
+    assert parse_address('新疆维吾尔自治区乌鲁木齐市天山区') == {
+        'province': '新疆维吾尔自治区', 'city': '乌鲁木齐市', 'district': '天山区', 'street': ''}
+    assert parse_address('上海浦东新区世纪大道100号') == {
+        'province': '上海市', 'district': '浦东新区', 'street': '世纪大道100号'}
+
+
+def test_normalization_is_idempotent():
+    for address in ('中国 北京 北京市朝阳区阜通东大街６號', '广东省深圳市南山区科技园 Tower A'):
+        once = normalize_address(address)
+        assert normalize_address(once) == once
+
+
+@pytest.mark.parametrize('address, city, expected', [
+    ('朝阳区阜通东大街6号', '北京', ('朝阳区阜通东大街6号', '北京市')),
+    ('北京市朝阳区阜通东大街6号', '北京', ('北京市朝阳区阜通东大街6号', '')),
+    ('北京市朝阳区阜通东大街6号', None, ('北京市朝阳区阜通东大街6号', '')),
+    ('阜通东大街6号', '北京市', ('阜通东大街6号', '北京市')),
+])
+def test_address_key_drops_redundant_city(address, city, expected):
+    assert address_key(address, city) == expected
+
+
+def test_client_geocodes_each_normalized_address_once(stub, client):
+    stub.requests.clear()
+    results = client.geocode_many(['北京市朝阳区阜通东大街6号', '北京朝阳区阜通东大街６號',
+                                   '中国北京市朝阳区阜通东大街6号'] * 10)
+    assert len(results) == 30 and all(result is results[0] for result in results)
+    assert stub.requests == {'/geocode/geo': 1}
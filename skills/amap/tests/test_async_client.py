@@ -0,0 +1,106 @@
+"""AsyncAmapClient: bounded concurrency, cancellation and off-loop SQLite caches."""
+
+import asyncio
+import threading
+
+import pytest
+
+from async_client import AsyncAmapClient
+from cache import GeocodeCache, RouteCache
+from stub_server import serve
+
+
+@pytest.fixture
+def slow_stub():
+    """Stub whose every response takes 0.2 s."""
+    server = serve(latency=0.2)
+    yield server
+    server.shutdown()
+
+
+def test_semaphore_bounds_requests_in_flight(slow_stub):
+    async def main():
+        async with AsyncAmapClient(api_key='stub', base_url=slow_stub.base_url,
+                                   max_concurrency=3) as client:
+            return await asyncio.gather(*(client.geocode(f'北京市朝阳区{i}号')
+                                          for i in range(9)))
+
+    results = asyncio.run(main())
+
+    assert len(results) == 9
+    assert slow_stub.requests['/geocode/geo'] == 9
+    assert slow_stub.peak_active == 3
+
+
+def test_cancellation_releases_the_slot(slow_stub):
+    async def main():
+        async with AsyncAmapClient(api_key='stub', base_url=slow_stub.base_url,
+                                   max_concurrency=1) as client:
+            first = asyncio.ensure_future(client.geocode('北京市朝阳区1号'))
+            while not slow_stub.active:
+                await asyncio.sleep(0.01)
+            assert client._semaphore.locked()
+
+            first.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await first
+            assert not client._semaphore.locked()
+
+            # The next request gets the slot without waiting for the abandoned one
+            loop = asyncio.get_running_loop()
+            started = loop.time()
+            result = await client.geocode('北京市朝阳区2号')
+            return result, loop.time() - started
+
+    result, elapsed = asyncio.run(main())
+
+    assert result['location']
+    assert elapsed < 0.35
+
+
+def test_cancelling_one_waiter_keeps_the_shared_request(slow_stub):
+    async def main():
+        async with AsyncAmapClient(api_key='stub', base_url=slow_stub.base_url) as client:
+            first = asyncio.ensure_future(client.geocode('北京市朝阳区1号'))
+            second = asyncio.ensure_future(client.geocode('北京市朝阳区1号'))
+            await asyncio.sleep(0.05)
+            first.cancel()
+            return await second, first.cancelled()
+
+    slow_stub.requests.clear()
+    result, cancelled = asyncio.run(main())
+
+    assert cancelled
+    assert result['location']
+    assert slow_stub.requests['/geocode/geo'] == 1
+
+
+def test_sqlite_caches_are_used_off_the_event_loop(stub, tmp_path, monkeypatch):
+    geocode_cache = GeocodeCache(tmp_path / 'geocode.sqlite3')
+    route_cache = RouteCache(tmp_path / 'routes.sqlite3')
+    threads = []
+
+    def record(method):
+        def wrapper(*args, **kwargs):
+            threads.append((method.__name__, threading.current_thread()))
+            return method(*args, **kwargs)
+        return wrapper
+
+    for cache in (geocode_cache, route_cache):
+        for name in ('get', 'get_many', 'put', 'put_many'):
+            if hasattr(cache, name):
+                monkeypatch.setattr(cache, name, record(getattr(cache, name)))
+
+    async def main():
+        async with AsyncAmapClient(api_key='stub', base_url=stub.base_url,
+                                   geocode_cache=geocode_cache,
+                                   route_cache=route_cache) as client:
+            first = await client.plan_route('北京西站', '116.434446,39.90816', 'driving')
+            second = await client.plan_route('北京西站', '116.434446,39.90816', 'driving')
+            return first, second, threading.current_thread()
+
+    first, second, loop_thread = asyncio.run(main())
+
+    assert first == second
+    assert {name for name, _ in threads} >= {'get_many', 'put_many', 'get', 'put'}
+    assert all(thread is not loop_thread for _, thread in threads)
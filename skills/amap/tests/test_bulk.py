@@ -0,0 +1,110 @@
+"""Bulk pipeline: ordering, checkpoints and resuming interrupted jobs."""
+
+import json
+import random
+import time
+
+import pytest
+
+from bulk import Checkpoint, StageMetrics, count_records, iter_records, run_pipeline
+
+
+def records(count: int) -> list:
+    return [{'id': i} for i in range(count)]
+
+
+def slow_double(chunk: list) -> list:
+    time.sleep(random.uniform(0, 0.005))
+    return [{'id': record['id'], 'double': record['id'] * 2} for record in chunk]
+
+
+def read_ids(path) -> list:
+    return [json.loads(line)['id'] for line in path.read_text().splitlines()]
+
+
+class Interrupt(Exception):
+    pass
+
+
+def failing_at(failing_id: int):
+    def process(chunk):
+        if any(record['id'] == failing_id for record in chunk):
+            raise Interrupt()
+        return slow_double(chunk)
+    return process
+
+
+def test_ordered_output_keeps_input_order(tmp_path):
+    output = tmp_path / 'out.jsonl'
+    count = run_pipeline(records(500), slow_double, output=str(output), workers=8,
+                         chunk_size=7, progress=False)
+    assert count == 500
+    assert read_ids(output) == list(range(500))
+
+
+def test_unordered_output_writes_every_record(tmp_path):
+    output = tmp_path / 'out.jsonl'
+    run_pipeline(records(500), slow_double, output=str(output), workers=8, chunk_size=7,
+                 ordered=False, progress=False)
+    assert sorted(read_ids(output)) == list(range(500))
+
+
+@pytest.mark.parametrize('ordered', [True, False])
+def test_interrupted_job_resumes_without_duplicates(tmp_path, ordered):
+    output, checkpoint = tmp_path / 'out.jsonl', tmp_path / 'job.checkpoint'
+    options = dict(output=str(output), workers=4, chunk_size=10, ordered=ordered,
+                   checkpoint=str(checkpoint), progress=False)
+
+    with pytest.raises(Interrupt):
+        run_pipeline(records(300), failing_at(155), **options)
+    state = Checkpoint.load(checkpoint, 10)
+    assert 0 < state.done <= 15
+    assert output.stat().st_size == state.offset
+
+    resumed = run_pipeline(records(300), slow_double, **options)
+    ids = read_ids(output)
+    assert sorted(ids) == list(range(300))
+    if ordered:
+        assert ids == list(range(300))
+    assert resumed == 300 - (state.done + len(state.completed)) * 10
+
+    # A finished job has nothing left to do
+    assert run_pipeline(records(300), slow_double, **options) == 0
+    assert sorted(read_ids(output)) == list(range(300))
+
+
+def test_checkpoint_rejects_another_chunk_size(tmp_path):
+    output, checkpoint = tmp_path / 'out.jsonl', tmp_path / 'job.checkpoint'
+    run_pipeline(records(20), slow_double, output=str(output), chunk_size=5,
+                 checkpoint=str(checkpoint), progress=False)
+    with pytest.raises(ValueError, match='chunk size'):
+        run_pipeline(records(20), slow_double, output=str(output), chunk_size=10,
+                     checkpoint=str(checkpoint), progress=False)
+
+
+def test_checkpoint_requires_an_output_file(tmp_path):
+    with pytest.raises(ValueError, match='output file'):
+        run_pipeline(records(10), slow_double, checkpoint=str(tmp_path / 'job.checkpoint'))
+
+
+def test_metrics_count_every_stage(tmp_path):
+    metrics = StageMetrics({'read': 1, 'process': 4, 'write': 1})
+    run_pipeline(records(100), slow_double, output=str(tmp_path / 'out.jsonl'), workers=4,
+                 chunk_size=10, progress=False, metrics=metrics)
+    assert {stage: s['records'] for stage, s in metrics.snapshot().items()} == {
+        'read': 100, 'process': 100, 'write': 100}
+
+
+def test_records_are_read_from_csv_jsonl_and_text(tmp_path):
+    csv_file, jsonl_file, text_file = (tmp_path / name for name in ('a.csv', 'a.jsonl', 'a.txt'))
+    csv_file.write_text('address,city\n北京西站,北京\n上海虹桥站,上海\n', encoding='utf-8')
+    jsonl_file.write_text('{"address": "北京西站"}\n\n{"address": "上海虹桥站"}\n',
+                          encoding='utf-8')
+    text_file.write_text('北京西站\n  \n上海虹桥站\n', encoding='utf-8')
+
+    assert list(iter_records(str(csv_file))) == [{'address': '北京西站', 'city': '北京'},
+                                                 {'address': '上海虹桥站', 'city': '上海'}]
+    expected = [{'address': '北京西站'}, {'address': '上海虹桥站'}]
+    assert list(iter_records(str(jsonl_file))) == expected
+    assert list(iter_records(str(text_file))) == expected
+    assert count_records(str(csv_file)) == 2
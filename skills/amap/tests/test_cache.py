@@ -0,0 +1,280 @@
+"""Local caches: expiry, eviction and sharing the files between processes."""
+
+import threading
+import time
+
+from cache import GeocodeCache, IPRangeCache, ResponseCache, RouteCache
+
+
+# A weekday noon and 8 am, outside and inside the driving peak
+NOON = time.mktime((2026, 6, 3, 12, 0, 0, 0, 0, -1))
+MORNING = time.mktime((2026, 6, 3, 8, 0, 0, 0, 0, -1))
+
+ROUTE = {'origin': '116.481485,39.990464', 'destination': '116.434446,39.90816',
+         'paths': [{'distance': '12000', 'duration': '1500',
+                    'steps': [{'instruction': '向东行驶500米右转'}]}]}
+
+GEOCODE = {'formatted_address': '北京市朝阳区阜通东大街6号', 'location': '116.481485,39.990464'}
+
+BEIJING = {'province': '北京市', 'city': '北京市', 'adcode': '110000'}
+SHANGHAI = {'province': '上海市', 'city': '上海市', 'adcode': '310000'}
+
+
+def test_geocodes_share_entries_across_spellings(tmp_path):
+    cache = GeocodeCache(tmp_path / 'geocode.sqlite3')
+    cache.put('北京市朝阳区阜通东大街6号', None, GEOCODE)
+
+    assert cache.get('北京市 朝阳区 阜通东大街６号') == GEOCODE
+    assert cache.get('北京市朝阳区阜通东大街6号', '上海') is None
+    assert cache.get('北京市朝阳区阜通东大街8号') is None
+    assert cache.stats()['hits'] == 1 and cache.stats()['misses'] == 2
+
+
+def test_geocodes_expire(tmp_path):
+    cache = GeocodeCache(tmp_path / 'geocode.sqlite3', ttl=0.05)
+    cache.put('北京西站', None, GEOCODE)
+    assert cache.get('北京西站') == GEOCODE
+    time.sleep(0.1)
+    assert cache.get('北京西站') is None
+    assert cache.evict() == 1
+    assert cache.stats()['entries'] == 0
+
+
+def test_geocode_eviction_drops_the_least_recently_used(tmp_path):
+    cache = GeocodeCache(tmp_path / 'geocode.sqlite3', max_entries=2)
+    for address in ('北京西站', '北京南站'):
+        cache.put(address, None, GEOCODE)
+        time.sleep(0.01)
+    cache.get('北京西站')
+    cache.put('北京北站', None, GEOCODE)
+
+    assert cache.evict() == 1
+    assert cache.get('北京南站') is None
+    assert cache.get('北京西站') == GEOCODE and cache.get('北京北站') == GEOCODE
+
+
+def test_geocodes_are_shared_between_connections(tmp_path):
+    path = tmp_path / 'geocode.sqlite3'
+    GeocodeCache(path).put_many([(f'测试路{i}号', None, GEOCODE) for i in range(100)])
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.extend(
+        GeocodeCache(path).get_many([(f'测试路{i}号', None) for i in range(100)])))
+        for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results == [GEOCODE] * 400
+
+
+def test_client_geocodes_from_the_cache(stub, client, tmp_path):
+    client.geocode_cache = GeocodeCache(tmp_path / 'geocode.sqlite3')
+    stub.requests.clear()
+    first = client.geocode('北京市朝阳区阜通东大街6号')
+    assert client.geocode('北京市朝阳区 阜通东大街6号') == first
+    assert client.geocode_many(['北京市朝阳区阜通东大街6号', '北京西站'])[0] == first
+    assert stub.requests == {'/geocode/geo': 2}
+
+    client.refresh_cache = True
+    client.geocode('北京市朝阳区阜通东大街6号')
+    assert stub.requests == {'/geocode/geo': 3}
+
+
+def test_responses_are_keyed_without_the_api_key():
+    cache = ResponseCache()
+    key = ResponseCache.make_key('/geocode/geo', {'address': '北京西站', 'key': 'k1'})
+    assert key == ResponseCache.make_key('/geocode/geo', {'key': 'k2', 'address': '北京西站'})
+
+    cache.put(key, {'status': '1'}, 100)
+    assert cache.get(key) == {'status': '1'}
+    assert cache.get(ResponseCache.make_key('/geocode/geo', {'address': '北京南站'})) is None
+
+
+def test_response_ttls_use_the_longest_prefix():
+    cache = ResponseCache(ttls={'/place/': 60, '/place/around': 5, '/direction/': 0},
+                          default_ttl=1)
+    assert cache.ttl_for('/place/text') == 60
+    assert cache.ttl_for('/place/around') == 5
+    assert cache.ttl_for('/weather/weatherInfo') == 1
+
+    key = ResponseCache.make_key('/direction/driving', {})
+    cache.put(key, {'status': '1'})
+    assert cache.get(key) is None
+
+
+def test_responses_expire():
+    cache = ResponseCache(default_ttl=0.05, ttls={})
+    key = ResponseCache.make_key('/ip', {'ip': '1.2.3.4'})
+    cache.put(key, {'status': '1'}, 10)
+    assert cache.get(key) is not None
+    time.sleep(0.1)
+    assert cache.get(key) is None
+    assert cache.stats()['entries'] == 0 and cache.stats()['bytes'] == 0
+
+
+def test_responses_are_trimmed_by_count_and_size():
+    cache = ResponseCache(max_entries=3, max_bytes=250)
+    keys = [ResponseCache.make_key('/geocode/geo', {'address': str(i)}) for i in range(4)]
+    for key in keys[:3]:
+        cache.put(key, {'address': key}, 50)
+    cache.get(keys[0])
+    cache.put(keys[3], {'address': keys[3]}, 50)
+
+    assert cache.get(keys[1]) is None
+    assert cache.stats()['entries'] == 3
+
+    cache.put(keys[1], {'address': keys[1]}, 200)
+    assert cache.stats()['bytes'] <= 250
+    assert cache.get(keys[1]) is not None and cache.get(keys[2]) is None
+
+
+def test_client_serves_repeat_requests_from_memory(stub, client):
+    client.response_cache = ResponseCache()
+    stub.requests.clear()
+    first = client.search_poi('肯德基', city='北京')
+    assert client.search_poi('肯德基', city='北京') == first
+    client.search_poi('麦当劳', city='北京')
+    assert stub.requests == {'/place/text': 2}
+
+
+def test_ip_ranges_merge_adjacent_networks(tmp_path):
+    cache = IPRangeCache(tmp_path / 'ip.json')
+    cache.put_many([('1.2.3.4', BEIJING), ('1.2.4.4', BEIJING), ('1.2.5.4', SHANGHAI)])
+
+    assert cache.get('1.2.3.200') == {**BEIJING, 'ip': '1.2.3.200'}
+    assert cache.get('1.2.5.1')['city'] == '上海市'
+    assert cache.get('1.2.6.1') is None
+    assert cache.stats()['ranges'] == 2
+
+    cache.put('1.2.3.9', SHANGHAI)
+    assert cache.get('1.2.3.1')['city'] == '上海市'
+    assert cache.get('1.2.4.1')['city'] == '北京市'
+
+
+def test_ip_ranges_expire(tmp_path):
+    cache = IPRangeCache(tmp_path / 'ip.json', ttl=0)
+    cache.put('1.2.3.4', BEIJING)
+    assert cache.get('1.2.3.4') is None
+
+
+def test_ip_saves_merge_with_other_processes(tmp_path):
+    path = tmp_path / 'ip.json'
+    first, second = IPRangeCache(path), IPRangeCache(path)
+    first.put('1.2.3.4', BEIJING)
+    second.put('5.6.7.8', SHANGHAI)
+    first.save()
+    second.save()
+
+    reloaded = IPRangeCache(path)
+    assert reloaded.get('1.2.3.4')['city'] == '北京市'
+    assert reloaded.get('5.6.7.8')['city'] == '上海市'
+    assert second.get('1.2.3.4')['city'] == '北京市'
+
+
+def test_ip_save_keeps_the_newer_result(tmp_path):
+    path = tmp_path / 'ip.json'
+    stale, fresh = IPRangeCache(path), IPRangeCache(path)
+    stale.put('1.2.3.4', BEIJING)
+    fresh.put('1.2.3.4', SHANGHAI)
+    fresh.save()
+    stale.save()
+
+    assert IPRangeCache(path).get('1.2.3.4')['city'] == '上海市'
+
+
+def test_ip_concurrent_saves_lose_nothing(tmp_path):
+    path = tmp_path / 'ip.json'
+
+    def work(n):
+        cache = IPRangeCache(path)
+        for i in range(20):
+            cache.put(f'10.{n}.{i * 2}.1', BEIJING if i % 2 else SHANGHAI)
+            cache.save()
+
+    threads = [threading.Thread(target=work, args=(n,)) for n in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    cache = IPRangeCache(path)
+    assert all(cache.get(f'10.{n}.{i * 2}.9') for n in range(8) for i in range(20))
+    assert not list(tmp_path.glob('*.tmp'))
+
+
+def test_ip_clear_overwrites_the_file(tmp_path):
+    path = tmp_path / 'ip.json'
+    cache = IPRangeCache(path)
+    cache.put('1.2.3.4', BEIJING)
+    cache.save()
+    cache.clear()
+    cache.save()
+    assert IPRangeCache(path).get('1.2.3.4') is None
+
+
+def test_route_endpoints_snap_to_the_grid(tmp_path):
+    cache = RouteCache(tmp_path / 'routes.sqlite3', precision=50)
+    cache.put('walking', '116.481485,39.990464', '116.434446,39.90816', ROUTE)
+
+    # About 5 meters away from both endpoints
+    assert cache.get('walking', '116.481440,39.990490', '116.434400,39.908140') == ROUTE
+    assert cache.get('walking', '116.490000,39.990464', '116.434446,39.90816') is None
+    assert cache.get('walking', '116.434446,39.90816', '116.481485,39.990464') is None
+    assert cache.stats()['hits'] == 1 and cache.stats()['misses'] == 2
+
+
+def test_driving_routes_are_bucketed_by_time_of_day(tmp_path):
+    cache = RouteCache(tmp_path / 'routes.sqlite3')
+    cache.put('driving', ROUTE['origin'], ROUTE['destination'], ROUTE, when=NOON)
+
+    assert cache.get('driving', ROUTE['origin'], ROUTE['destination'], when=NOON + 60) == ROUTE
+    assert cache.get('driving', ROUTE['origin'], ROUTE['destination'], when=MORNING) is None
+    assert cache.ttl_for('driving', MORNING) < cache.ttl_for('driving', NOON)
+
+
+def test_routes_expire(tmp_path):
+    cache = RouteCache(tmp_path / 'routes.sqlite3', ttls={'walking': 0.05, 'bicycling': 0})
+    cache.put('walking', ROUTE['origin'], ROUTE['destination'], ROUTE)
+    cache.put('bicycling', ROUTE['origin'], ROUTE['destination'], ROUTE)
+
+    assert cache.get('walking', ROUTE['origin'], ROUTE['destination']) == ROUTE
+    assert cache.stats()['entries'] == 1
+    time.sleep(0.1)
+    assert cache.get('walking', ROUTE['origin'], ROUTE['destination']) is None
+    assert cache.evict() == 1
+
+
+def test_route_eviction_drops_the_least_recently_used(tmp_path):
+    cache = RouteCache(tmp_path / 'routes.sqlite3', max_entries=2)
+    origins = ['116.40,39.90', '116.41,39.90', '116.42,39.90']
+    for origin in origins[:2]:
+        cache.put('walking', origin, ROUTE['destination'], ROUTE)
+        time.sleep(0.01)
+    cache.get('walking', origins[0], ROUTE['destination'])
+    cache.put('walking', origins[2], ROUTE['destination'], ROUTE)
+
+    assert cache.evict() == 1
+    assert cache.get('walking', origins[1], ROUTE['destination']) is None
+    assert cache.get('walking', origins[0], ROUTE['destination']) == ROUTE
+
+
+def test_summary_only_keeps_steps_callers_asked_for(tmp_path):
+    cache = RouteCache(tmp_path / 'routes.sqlite3', summary_only=True)
+    cache.put('driving', ROUTE['origin'], ROUTE['destination'], ROUTE, when=NOON)
+    assert cache.get('driving', ROUTE['origin'], ROUTE['destination'], when=NOON) == ROUTE
+
+    cache.put('driving', ROUTE['destination'], ROUTE['origin'], ROUTE, when=NOON, steps=False)
+    summary = cache.get('driving', ROUTE['destination'], ROUTE['origin'], steps=False, when=NOON)
+    assert summary['paths'] == [{'distance': '12000', 'duration': '1500'}]
+    assert cache.get('driving', ROUTE['destination'], ROUTE['origin'], when=NOON) is None
+
+
+def test_summary_only_cache_answers_repeated_plan_route(stub, client, tmp_path):
+    client.route_cache = RouteCache(tmp_path / 'routes.sqlite3', summary_only=True)
+    stub.requests.clear()
+    first = client.plan_route('116.481485,39.990464', '116.434446,39.90816', 'driving')
+    second = client.plan_route('116.481485,39.990464', '116.434446,39.90816', 'driving')
+
+    assert second == first and second['paths'][0]['steps']
+    assert stub.requests == {'/direction/driving': 1}
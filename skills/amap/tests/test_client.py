@@ -0,0 +1,48 @@
+"""Pooled keep-alive client behind the module-level helpers."""
+
+import pytest
+
+import __init__
+from __init__ import AmapClient, build_api_url, make_api_request
+
+
+def test_sequential_requests_reuse_one_connection(stub):
+    before = stub.connections
+    with AmapClient(api_key='stub', base_url=stub.base_url) as client:
+        for i in range(5):
+            client.request('/geocode/geo', {'address': f'北京市朝阳区{i}号'})
+    assert stub.connections - before == 1
+
+
+def test_pool_size_bounds_the_adapter(stub):
+    with AmapClient(api_key='stub', base_url=stub.base_url, pool_size=7) as client:
+        adapter = client.session.get_adapter(stub.base_url)
+        assert adapter._pool_maxsize == 7
+        assert client.session is client.session
+
+
+def test_module_helpers_share_the_default_client(stub, client, monkeypatch):
+    monkeypatch.setattr(__init__, '_default_client', client)
+    before = stub.connections
+
+    url = build_api_url('/geocode/geo', {'address': '北京市朝阳区阜通东大街6号'},
+                        base_url=stub.base_url)
+    data = make_api_request(url, 'stub')
+    result = __init__.geocode('北京市朝阳区阜通东大街6号', api_key='stub')
+
+    assert data['geocodes'][0]['location'] == result['location']
+    assert stub.connections - before <= 1
+
+
+def test_closed_client_reconnects(stub):
+    client = AmapClient(api_key='stub', base_url=stub.base_url)
+    client.request('/geocode/geo', {'address': '北京西站'})
+    client.close()
+    assert client.request('/geocode/geo', {'address': '北京西站'})['status'] == '1'
+    client.close()
+
+
+def test_error_responses_raise(stub):
+    with AmapClient(api_key='stub', base_url=stub.base_url) as client:
+        with pytest.raises(ValueError, match='INVALID_REQUEST'):
+            client.request('/no/such/endpoint', {})
@@ -0,0 +1,85 @@
+"""Datum conversion between WGS-84, GCJ-02 and BD-09."""
+
+import copy
+import itertools
+
+import numpy as np
+import pytest
+
+from coords import CRS, transform, transform_location, transform_points, transform_response
+
+# (lon, lat) of one point in each datum
+WGS84 = (116.404, 39.915)
+GCJ02 = (116.41024449916938, 39.91640428150164)
+BD09 = (116.41662724378733, 39.922699552216216)
+POINTS = [(116.404, 39.915), (121.4737, 31.2304), (113.2644, 23.1291), (87.6168, 43.8256)]
+
+
+@pytest.mark.parametrize('src, dst, point, expected', [
+    ('wgs84', 'gcj02', WGS84, GCJ02),
+    ('gcj02', 'bd09', GCJ02, BD09),
+    ('wgs84', 'bd09', WGS84, BD09),
+])
+def test_known_values(src, dst, point, expected):
+    assert transform(*point, src, dst) == pytest.approx(expected, abs=1e-6)
+
+
+@pytest.mark.parametrize('src, dst', list(itertools.permutations(CRS, 2)))
+def test_round_trip_within_a_few_centimetres(src, dst):
+    for lon, lat in POINTS:
+        there = transform(lon, lat, src, dst)
+        back = transform(*there, dst, src)
+        assert back == pytest.approx((lon, lat), abs=1e-6)
+
+
+@pytest.mark.parametrize('src, dst', list(itertools.permutations(CRS, 2)))
+def test_arrays_match_scalars(src, dst):
+    lons, lats = transform(np.array([p[0] for p in POINTS]), [p[1] for p in POINTS], src, dst)
+    assert isinstance(lons, np.ndarray) and isinstance(lats, np.ndarray)
+    for (lon, lat), x, y in zip(POINTS, lons, lats):
+        assert transform(lon, lat, src, dst) == pytest.approx((x, y), abs=1e-9)
+    assert transform_points(POINTS, src, dst) == pytest.approx(
+        list(zip(lons.tolist(), lats.tolist())), abs=1e-9)
+
+
+@pytest.mark.parametrize('point', [(-0.1276, 51.5072), (139.6917, 35.6895), (151.2093, -33.8688)])
+def test_points_outside_china_pass_through_gcj02(point):
+    assert transform(*point, 'wgs84', 'gcj02') == point
+    assert transform(*point, 'gcj02', 'wgs84') == point
+    lons, lats = transform([point[0]], [point[1]], 'wgs84', 'gcj02')
+    assert (lons[0], lats[0]) == point
+
+
+def test_same_datum_and_unknown_datum():
+    assert transform(116, 39, 'gcj02', 'gcj02') == (116.0, 39.0)
+    lons, _ = transform(np.array([116.0]), np.array([39.0]), 'bd09', 'bd09')
+    assert lons.tolist() == [116.0]
+    with pytest.raises(ValueError):
+        transform(116.0, 39.0, 'wgs84', 'utm')
+
+
+def test_transform_location_uses_six_decimals():
+    assert transform_location('116.404,39.915', 'wgs84', 'gcj02') == '116.410244,39.916404'
+
+
+def test_transform_response_converts_a_copy():
+    response = {
+        'status': '1',
+        'geocodes': [{'location': '116.410244,39.916404', 'adcode': '110101'}],
+        'route': {'origin': '116.410244,39.916404',
+                  'paths': [{'steps': [{'polyline': '116.410244,39.916404;121.4737,31.2304'}]}]},
+        'name': '116.410244,39.916404',
+    }
+    original = copy.deepcopy(response)
+
+    result = transform_response(response, 'gcj02', 'wgs84')
+
+    assert response == original
+    assert result['geocodes'][0]['location'] == '116.404000,39.915000'
+    assert result['geocodes'][0]['adcode'] == '110101'
+    assert result['route']['origin'] == '116.404000,39.915000'
+    polyline = result['route']['paths'][0]['steps'][0]['polyline'].split(';')
+    assert polyline[0] == '116.404000,39.915000'
+    assert polyline[1] == transform_location('121.4737,31.2304', 'gcj02', 'wgs84')
+    # Only the coordinate fields are converted
+    assert result['name'] == response['name']
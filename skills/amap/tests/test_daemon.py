@@ -0,0 +1,81 @@
+"""Daemon: socket ownership and falling back to a local client."""
+
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+
+import __init__
+from __init__ import AmapClient
+from amap_daemon import DaemonClient, DaemonServer
+from conftest import ROOT
+
+
+@pytest.fixture
+def daemon(tmp_path, client):
+    server = DaemonServer(tmp_path / 'daemon.sock', client)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+    thread.join()
+
+
+def test_calls_are_forwarded(daemon):
+    client = DaemonClient.connect(daemon.path)
+    assert client.geocode('北京西站')['location']
+    assert client.call('status')['calls'] == 2
+    client.close()
+
+
+def test_live_socket_is_not_replaced(daemon, client):
+    with pytest.raises(OSError, match='already listening'):
+        DaemonServer(daemon.path, client)
+    assert DaemonClient.connect(daemon.path).call('status')['calls'] == 1
+
+
+def test_stale_socket_is_replaced(tmp_path, client):
+    path = tmp_path / 'daemon.sock'
+    stale = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    stale.bind(str(path))
+    stale.close()
+
+    server = DaemonServer(path, client)
+    try:
+        assert path.exists()
+    finally:
+        server.server_close()
+    assert not path.exists()
+
+
+def test_client_falls_back_when_daemon_exits(tmp_path, stub, monkeypatch, capsys):
+    path = tmp_path / 'daemon.sock'
+    process = subprocess.Popen(
+        [sys.executable, str(ROOT / 'scripts' / 'amap_daemon.py'), 'serve', '--socket', str(path)],
+        env={**os.environ, 'AMAP_BASE_URL': stub.base_url}, stderr=subprocess.DEVNULL)
+    try:
+        deadline = time.monotonic() + 30
+        while not path.exists() and time.monotonic() < deadline:
+            time.sleep(0.05)
+        client = DaemonClient.connect(path)
+        client.no_cache = True
+        assert client.geocode('北京西站')['location']
+    finally:
+        process.kill()
+        process.wait()
+
+    local = AmapClient(api_key='stub', base_url=stub.base_url)
+    monkeypatch.setattr(__init__, 'create_default_client', lambda: local)
+    assert client.geocode('北京西站')['location']
+    assert client.geocode('北京南站')['location']
+    assert client._fallback is local and local.geocode_cache is None
+    assert capsys.readouterr().err.count('went away') == 1
+
+    with pytest.raises(ConnectionError):
+        client.call('status')
+    local.close()
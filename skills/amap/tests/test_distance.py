@@ -0,0 +1,99 @@
+"""Distance matrices: tiling into /distance requests and reassembly."""
+
+import asyncio
+import math
+import random
+import sys
+
+import pytest
+
+from __init__ import (
+    DISTANCE_MAX_ORIGINS,
+    assemble_distance_matrix,
+    distance_tiles,
+    split_distance_results
+)
+from async_client import AsyncAmapClient
+
+
+def points(count: int, seed: int) -> list:
+    random.seed(seed)
+    return [f'{random.uniform(116.2, 116.6):.6f},{random.uniform(39.8, 40.05):.6f}'
+            for _ in range(count)]
+
+
+def straight_meters(origin: str, destination: str) -> float:
+    (x, y), (lon, lat) = ((float(v) for v in p.split(',')) for p in (origin, destination))
+    return math.hypot((x - lon) * math.cos(math.radians(lat)), y - lat) * 111_320
+
+
+def test_tiles_cover_each_distinct_pair_once():
+    origins = points(230, 0)
+    origins += origins[:20]
+    destinations = points(2, 1) * 2
+
+    tiles = distance_tiles(origins, destinations)
+    assert len(tiles) == 2 * math.ceil(230 / DISTANCE_MAX_ORIGINS)
+    assert all(len(chunk) <= DISTANCE_MAX_ORIGINS for chunk, _ in tiles)
+    pairs = [(origin, destination) for chunk, destination in tiles for origin in chunk]
+    assert len(pairs) == len(set(pairs)) == 230 * 2
+
+
+def test_split_results_maps_origin_ids():
+    data = {'results': [
+        {'origin_id': '3', 'distance': '300', 'duration': '30'},
+        {'origin_id': '1', 'distance': '100', 'duration': []},
+        {'origin_id': '2', 'code': '1', 'distance': '0', 'duration': '0'},
+        {'origin_id': '9', 'distance': '900', 'duration': '90'},
+        {'origin_id': '4', 'distance': []},
+    ]}
+    assert split_distance_results(data, 4) == [(100.0, 0.0), None, (300.0, 30.0), None]
+    assert split_distance_results({'results': []}, 2) == [None, None]
+
+
+def assemble_example():
+    origins = ['a', 'b', 'a']
+    destinations = ['x', 'y']
+    tiles = distance_tiles(origins, destinations)
+    values = {('a', 'x'): (1.0, 10.0), ('b', 'x'): (2.0, 20.0), ('a', 'y'): (3.0, 30.0)}
+    results = [[values.get((origin, destination)) for origin in chunk]
+               for chunk, destination in tiles]
+    return assemble_distance_matrix(origins, destinations, tiles, results)
+
+
+def test_assemble_fills_repeated_points_and_marks_gaps():
+    np = pytest.importorskip('numpy')
+    result = assemble_example()
+    expected = np.array([[1.0, 3.0], [2.0, np.nan], [1.0, 3.0]])
+    assert np.array_equal(result['distance'], expected, equal_nan=True)
+    assert np.array_equal(result['duration'], expected * 10, equal_nan=True)
+
+
+def test_assemble_without_numpy(monkeypatch):
+    monkeypatch.setitem(sys.modules, 'numpy', None)
+    result = assemble_example()
+    assert result['distance'] == [[1.0, 3.0], [2.0, None], [1.0, 3.0]]
+    assert result['duration'] == [[10.0, 30.0], [20.0, None], [10.0, 30.0]]
+
+
+def test_client_matrix_matches_the_stub(stub, client):
+    origins, destinations = points(150, 2), points(3, 3)
+    stub.requests.clear()
+    result = client.distance_matrix(origins, destinations, 'straight', max_workers=4)
+
+    assert stub.requests == {'/distance': 3 * 2}
+    for i in (0, 99, 100, 149):
+        for j in range(3):
+            assert result['distance'][i][j] == round(straight_meters(origins[i], destinations[j]))
+
+
+def test_async_client_matrix_matches_the_sync_client(stub, client):
+    origins, destinations = points(120, 4), points(2, 5)
+
+    async def main():
+        async with AsyncAmapClient(api_key='stub', base_url=stub.base_url) as async_client:
+            return await async_client.distance_matrix(origins, destinations)
+
+    expected = client.distance_matrix(origins, destinations)
+    result = asyncio.run(main())
+    assert [list(row) for row in result['distance']] == [list(row) for row in expected['distance']]
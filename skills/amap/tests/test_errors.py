@@ -0,0 +1,127 @@
+"""Error taxonomy and retries against the stub server's error responses."""
+
+import random
+import socket
+
+import pytest
+import requests
+
+from __init__ import (
+    AmapAuthError,
+    AmapClient,
+    AmapError,
+    AmapQuotaError,
+    AmapRateLimitError,
+    AmapRequestError,
+    AmapServerError,
+    error_for_infocode,
+    is_retryable
+)
+from keypool import KeyPool
+from stub_server import serve
+
+
+def stub_client(base_url: str, **kwargs) -> AmapClient:
+    kwargs.setdefault('api_key', 'stub')
+    return AmapClient(base_url=base_url, backoff_base=0.001, backoff_max=0.002, **kwargs)
+
+
+@pytest.mark.parametrize('infocode, error_class', [
+    ('10001', AmapAuthError),
+    ('10041', AmapAuthError),
+    ('10003', AmapQuotaError),
+    ('10044', AmapQuotaError),
+    ('10021', AmapRateLimitError),
+    ('10016', AmapServerError),
+    ('30001', AmapServerError),
+    ('20000', AmapRequestError),
+    ('99999', AmapError)
+])
+def test_infocodes_map_to_error_classes(infocode, error_class):
+    error = error_for_infocode(infocode, 'INFO')
+    assert type(error) is error_class
+    assert isinstance(error, ValueError)
+    assert (error.infocode, error.info) == (infocode, 'INFO')
+
+
+def test_retryable_errors():
+    assert is_retryable(AmapRateLimitError('qps'))
+    assert is_retryable(AmapServerError('busy'))
+    assert not is_retryable(AmapAuthError('key'))
+    assert not is_retryable(AmapQuotaError('quota'))
+    assert is_retryable(requests.Timeout(), (requests.Timeout,))
+    assert not is_retryable(requests.Timeout())
+
+    for status, retryable in ((429, True), (503, True), (404, False)):
+        response = requests.Response()
+        response.status_code = status
+        assert is_retryable(requests.HTTPError(response=response)) is retryable
+
+
+@pytest.mark.parametrize('key, error_class', [
+    ('invalid-key', AmapAuthError),
+    ('exhausted-key', AmapQuotaError)
+])
+def test_key_errors_are_not_retried(stub, key, error_class):
+    stub.requests.clear()
+    with stub_client(stub.base_url, api_key=key) as client:
+        with pytest.raises(error_class):
+            client.geocode('北京西站')
+    assert stub.requests == {'/geocode/geo': 1}
+
+
+def test_invalid_params_are_not_retried(stub, client):
+    stub.requests.clear()
+    with pytest.raises(AmapRequestError, match='20000'):
+        client.geocode('非法地址')
+    assert stub.requests == {'/geocode/geo': 1}
+
+
+def test_batch_isolates_invalid_addresses(stub, client):
+    results = client.geocode_many(['北京西站', '非法地址', '上海虹桥站'], return_exceptions=True)
+    assert isinstance(results[1], AmapRequestError)
+    assert results[0]['location'] and results[2]['location']
+
+
+def test_rate_limit_errors_are_retried():
+    random.seed(0)
+    server = serve(fail_rate=0.5)
+    try:
+        with stub_client(server.base_url, max_retries=20) as client:
+            for i in range(10):
+                assert client.geocode(f'北京西站{i}号')['location']
+        assert server.requests['/geocode/geo'] > 10
+
+        server.requests.clear()
+        with stub_client(server.base_url, max_retries=2) as client:
+            with pytest.raises(AmapRateLimitError):
+                for i in range(50):
+                    client.geocode(f'上海虹桥站{i}号')
+    finally:
+        server.shutdown()
+
+
+def test_connection_errors_are_retried_then_raised():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        port = s.getsockname()[1]
+    attempts = []
+    with stub_client(f'http://127.0.0.1:{port}/v3', max_retries=2) as client:
+        get = client.session.get
+        client.session.get = lambda *args, **kwargs: attempts.append(1) or get(*args, **kwargs)
+        with pytest.raises(requests.ConnectionError):
+            client.geocode('北京西站')
+    assert len(attempts) == 3
+
+
+def test_pool_moves_past_ejected_keys(stub):
+    pool = KeyPool(['invalid-key', 'exhausted-key', 'stub'])
+    stub.requests.clear()
+    with stub_client(stub.base_url, api_key=None, key_pool=pool) as client:
+        assert client.geocode('北京西站')['location']
+        assert client.geocode('上海虹桥站')['location']
+
+    health = {row['key']: row for row in pool.snapshot()}
+    assert health['inva...']['auth_errors'] == 1 and not health['inva...']['available']
+    assert health['exha...']['quota_errors'] == 1 and health['exha...']['ejected_until']
+    assert stub.requests == {'/geocode/geo': 4}
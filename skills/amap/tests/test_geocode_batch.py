@@ -0,0 +1,87 @@
+"""Batch geocoding: batch=true chunks, input order and misses within a batch."""
+
+import asyncio
+
+from __init__ import GEOCODE_BATCH_SIZE
+from async_client import AsyncAmapClient
+
+ADDRESSES = [f'北京市朝阳区建国路{i}号' for i in range(25)]
+MISSES = {3, 14, 24}
+
+
+def addresses_with_misses():
+    return [f'不存在的地址{i}' if i in MISSES else address
+            for i, address in enumerate(ADDRESSES)]
+
+
+def record_batches(client, monkeypatch):
+    batches = []
+    request = client.request
+
+    def recording(endpoint, params, api_key=None, *args, **kwargs):
+        if endpoint == '/geocode/geo':
+            assert params['batch'] == 'true'
+            batches.append(params['address'].split('|'))
+        return request(endpoint, params, api_key, *args, **kwargs)
+
+    monkeypatch.setattr(client, 'request', recording)
+    return batches
+
+
+def test_batches_of_ten(stub, client, monkeypatch):
+    batches = record_batches(client, monkeypatch)
+
+    client.geocode_many(ADDRESSES, max_workers=4)
+
+    assert GEOCODE_BATCH_SIZE == 10
+    assert sorted(len(batch) for batch in batches) == [5, 10, 10]
+    assert sorted(address for batch in batches for address in batch) == sorted(ADDRESSES)
+
+
+def test_results_keep_input_order(stub, client):
+    results = client.geocode_many(ADDRESSES, max_workers=4)
+
+    assert [result['formatted_address'] for result in results] == ADDRESSES
+
+
+def test_misses_map_to_their_own_inputs(stub, client, monkeypatch):
+    batches = record_batches(client, monkeypatch)
+    addresses = addresses_with_misses()
+
+    results = client.geocode_many(addresses, max_workers=4)
+
+    assert len(batches) == 3
+    assert [i for i, result in enumerate(results) if result is None] == sorted(MISSES)
+    assert all(result['formatted_address'] == address
+               for address, result in zip(addresses, results) if result is not None)
+
+
+def test_single_batch_and_empty_input(stub, client, monkeypatch):
+    batches = record_batches(client, monkeypatch)
+
+    assert client.geocode_many([]) == []
+    assert [r['formatted_address'] for r in client.geocode_many(ADDRESSES[:2])] == ADDRESSES[:2]
+    assert batches == [ADDRESSES[:2]]
+
+
+def test_async_batches_keep_order_and_misses(stub):
+    addresses = addresses_with_misses()
+    batches = []
+
+    async def main():
+        async with AsyncAmapClient(api_key='stub', base_url=stub.base_url) as client:
+            request = client.request
+
+            async def recording(endpoint, params, api_key=None, *args, **kwargs):
+                batches.append(params['address'].split('|'))
+                return await request(endpoint, params, api_key, *args, **kwargs)
+
+            client.request = recording
+            return await client.geocode_many(addresses)
+
+    results = asyncio.run(main())
+
+    assert sorted(len(batch) for batch in batches) == [5, 10, 10]
+    assert [i for i, result in enumerate(results) if result is None] == sorted(MISSES)
+    assert all(result['formatted_address'] == address
+               for address, result in zip(addresses, results) if result is not None)
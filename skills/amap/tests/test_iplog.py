@@ -0,0 +1,58 @@
+"""Access log IP geolocation: line parsing and the streaming pipeline."""
+
+import json
+import re
+
+import __init__
+from ip_location import WINDOW_SIZE, locate_log_file, parse_log_line
+
+COMBINED = ('203.0.113.7 - alice [10/Oct/2026:13:55:36 +0800] "GET /index.html HTTP/1.1" '
+            '200 2326 "https://example.com/" "Mozilla/5.0 (X11; Linux x86_64)"')
+COMMON = '198.51.100.23 - - [10/Oct/2026:13:55:37 +0800] "POST /api HTTP/1.1" 404 -'
+
+
+def test_combined_and_common_lines_are_split_into_fields():
+    record = parse_log_line(COMBINED)
+    assert record['ip'] == '203.0.113.7'
+    assert record['user'] == 'alice'
+    assert (record['status'], record['bytes']) == (200, 2326)
+    assert record['user_agent'] == 'Mozilla/5.0 (X11; Linux x86_64)'
+    assert 'line' not in record
+
+    record = parse_log_line(COMMON)
+    assert record['ip'] == '198.51.100.23'
+    assert (record['status'], record['bytes'], record['referer']) == (404, None, None)
+
+
+def test_other_lines_fall_back_to_the_first_ipv4_address():
+    assert parse_log_line('2026-10-10T13:55:36 client=192.0.2.44 port=443')['ip'] == '192.0.2.44'
+    assert parse_log_line('version 1.2.3.4.5 only')['ip'] is None
+    assert parse_log_line('no address here') == {'ip': None, 'line': 'no address here'}
+
+
+def test_custom_pattern():
+    pattern = re.compile(r'src=(\S+)')
+    assert parse_log_line('event src=192.0.2.9 dst=192.0.2.1', pattern)['ip'] == '192.0.2.9'
+    named = re.compile(r'dst=(?P<ip>\S+)')
+    assert parse_log_line('event src=192.0.2.9 dst=192.0.2.1', named)['ip'] == '192.0.2.1'
+    assert parse_log_line('unrelated', pattern) == {'ip': None, 'line': 'unrelated'}
+
+
+def test_log_file_is_annotated_in_order(stub, client, monkeypatch, tmp_path):
+    monkeypatch.setattr(__init__, '_default_client', client)
+    log = tmp_path / 'access.log'
+    lines = [COMBINED.replace('203.0.113.7', f'203.0.{i % 7}.{i % 5 + 1}')
+             for i in range(WINDOW_SIZE * 2 + 500)]
+    lines[10] = 'garbage without an address'
+    log.write_text('\n'.join(lines[:20]) + '\n\n' + '\n'.join(lines[20:]) + '\n',
+                   encoding='utf-8')
+    output = tmp_path / 'access.jsonl'
+
+    count = locate_log_file(str(log), output=str(output), max_workers=4)
+
+    rows = [json.loads(line) for line in output.read_text(encoding='utf-8').splitlines()]
+    assert count == len(rows) == len(lines)
+    assert rows[10] == {'ip': None, 'line': lines[10], 'error': 'no IP address'}
+    assert [row['ip'] for row in rows[11:]] == [parse_log_line(line)['ip'] for line in lines[11:]]
+    assert all(row['province'] == '北京市' and row['adcode'] == '110000'
+               for i, row in enumerate(rows) if i != 10)
@@ -0,0 +1,101 @@
+"""PoiTable: columnar storage must round-trip Amap POI dicts."""
+
+import math
+import random
+
+import pytest
+
+from poi import TEXT_BLOCK, PoiTable
+
+
+def make_pois(count: int) -> list:
+    random.seed(0)
+    pois = []
+    for i in range(count):
+        poi = {
+            'id': f'B000{i:06d}',
+            'name': f'餐厅{i}' * random.randint(1, 3),
+            'type': random.choice(['餐饮服务;中餐厅', '餐饮服务;快餐厅', '购物服务;超市']),
+            'typecode': random.choice(['050100', '050300']),
+            'address': random.choice([f'测试路{i}号', []]),
+            'location': f'{random.uniform(116, 117):.6f},{random.uniform(39, 40):.6f}',
+            'tel': [],
+            'pname': '北京市',
+            'cityname': '北京市',
+            'adname': random.choice(['朝阳区', '海淀区']),
+        }
+        if i % 3 == 0:
+            poi['distance'] = str(random.randint(0, 3000))
+        if i % 5 == 0:
+            poi['photos'] = [{'title': [], 'url': f'http://example.com/{i}.jpg'}]
+            poi['biz_ext'] = {'rating': '4.5', 'cost': []}
+        if i % 7 == 0:
+            poi['location'] = []
+        pois.append(poi)
+    return pois
+
+
+def non_empty(poi: dict) -> dict:
+    return {key: value for key, value in poi.items() if value not in ('', [], None)}
+
+
+@pytest.fixture(scope='module')
+def pois():
+    return make_pois(3 * TEXT_BLOCK + 17)
+
+
+def test_rows_round_trip(pois):
+    table = PoiTable(pois)
+    assert len(table) == len(pois)
+    assert list(table.to_dicts()) == [non_empty(poi) for poi in pois]
+
+
+def test_columns_match_rows(pois):
+    table = PoiTable(pois)
+    for field in ('id', 'name', 'address', 'type', 'adname', 'location', 'photos'):
+        assert table.column(field) == [table.value(i, field) for i in range(len(table))]
+    assert table.column('name') == [poi['name'] for poi in pois]
+
+
+def test_poi_views_behave_like_dicts(pois):
+    table = PoiTable(pois)
+    poi = table[-1]
+    assert poi.to_dict() == non_empty(pois[-1])
+    assert table[5]['biz_ext'] == {'rating': '4.5', 'cost': []}
+    assert 'tel' not in table[1] and table[1].get('tel', '-') == '-'
+    with pytest.raises(KeyError):
+        table[1]['tel']
+    with pytest.raises(IndexError):
+        table[len(table)]
+
+    assert math.isnan(table[0].lon) and table[0].get('location') is None
+    assert table[1].lon == float(pois[1]['location'].split(',')[0])
+    assert table[3].distance == float(pois[3]['distance'])
+    assert math.isnan(table[1].distance)
+
+
+def test_table_copies_from_poi_views(pois):
+    table = PoiTable(pois)
+    assert list(PoiTable(table).to_dicts()) == list(table.to_dicts())
+
+
+def test_jsonl_round_trip(pois, tmp_path):
+    path = tmp_path / 'pois.jsonl'
+    PoiTable(pois).write_jsonl(str(path))
+    assert list(PoiTable.from_jsonl(str(path)).to_dicts()) == [non_empty(poi) for poi in pois]
+
+
+def test_coordinates_array(pois):
+    np = pytest.importorskip('numpy')
+    coordinates = PoiTable(pois).coordinates()
+    assert coordinates.shape == (len(pois), 2)
+    assert np.isnan(coordinates[0]).all()
+    assert tuple(coordinates[1]) == tuple(float(v) for v in pois[1]['location'].split(','))
+
+
+def test_table_from_a_crawl(stub, client):
+    from stub_server import POI_COUNT
+
+    table = PoiTable(client.iter_pois('肯德基', '北京'))
+    assert len(table) == POI_COUNT
+    assert len(set(table.column('id'))) == POI_COUNT
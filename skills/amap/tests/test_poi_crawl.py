@@ -0,0 +1,161 @@
+"""Area POI crawling: polygon tests, tile splitting, ownership and resuming."""
+
+import json
+
+import pytest
+
+import __init__
+import poi_crawl
+from poi_crawl import Area, TileCheckpoint, crawl_area, parse_bbox, split_tile, tile_grid
+from stub_server import AROUND_POIS
+
+# A 4x4 square with a 2x2 hole in the middle
+SQUARE = [(0.0, 0.0), (4.0, 0.0), (4.0, 4.0), (0.0, 4.0)]
+HOLE = [(1.0, 1.0), (3.0, 1.0), (3.0, 3.0), (1.0, 3.0)]
+BBOX = '116.40,39.95;116.44,39.98'
+
+
+@pytest.fixture
+def default_client(client, monkeypatch):
+    monkeypatch.setattr(__init__, '_default_client', client)
+    return client
+
+
+def crawl(tmp_path, name='pois.jsonl', **kwargs):
+    output = tmp_path / name
+    stats = crawl_area(Area(parse_bbox(BBOX)), types='050000', output=str(output),
+                       progress=False, **kwargs)
+    return stats, [json.loads(line) for line in output.read_text().splitlines()]
+
+
+@pytest.mark.parametrize('point, inside', [
+    ((0.5, 0.5), True), ((3.5, 2.0), True), ((2.0, 3.9), True),
+    ((2.0, 2.0), False), ((1.5, 2.5), False),
+    ((-0.1, 2.0), False), ((4.5, 2.0), False), ((2.0, 5.0), False),
+])
+def test_contains_with_a_hole(point, inside):
+    assert Area([SQUARE, HOLE], bands=8).contains(*point) is inside
+
+
+def test_contains_concave_polygon():
+    # An L shape: the notch at the top right is outside
+    area = Area([[(0, 0), (2, 0), (2, 1), (1, 1), (1, 2), (0, 2)]])
+    assert area.contains(0.5, 1.5)
+    assert area.contains(1.5, 0.5)
+    assert not area.contains(1.5, 1.5)
+
+
+def test_edges_in_finds_only_crossing_edges():
+    area = Area([SQUARE, HOLE], bands=8)
+    assert area.edges_in((0.2, 0.2, 0.8, 0.8)) == []
+    assert area.edges_in((1.5, 1.5, 2.5, 2.5)) == []
+    assert area.edges_in((5.0, 5.0, 6.0, 6.0)) == []
+    assert area.edges_in((-0.5, 1.5, 0.5, 2.5)) == [(0.0, 4.0, 0.0, 0.0)]
+    crossing = area.edges_in((0.5, 0.5, 1.5, 1.5))
+    assert sorted(crossing) == sorted([(1.0, 3.0, 1.0, 1.0), (1.0, 1.0, 3.0, 1.0)])
+    # Children only test their parent's edges
+    assert area.edges_in((1.2, 0.8, 1.4, 1.2), crossing) == [(1.0, 1.0, 3.0, 1.0)]
+    assert area.edges_in((0.5, 0.5, 0.9, 0.9), crossing) == []
+    assert area.edges_in((3.5, 3.5, 4.5, 4.5), crossing) == []
+
+
+def test_split_tile_quarters_cover_the_tile():
+    tile = (116.40, 39.90, 116.42, 39.94)
+    quarters = split_tile(tile)
+
+    assert quarters == [(116.40, 39.90, 116.41, 39.92), (116.41, 39.90, 116.42, 39.92),
+                        (116.40, 39.92, 116.41, 39.94), (116.41, 39.92, 116.42, 39.94)]
+    assert poi_crawl.tile_size(quarters[0]) == pytest.approx(poi_crawl.tile_size(tile) / 2)
+
+
+def test_tile_grid_covers_bounds():
+    bounds = (116.40, 39.95, 116.44, 39.98)
+    tiles = tile_grid(bounds, 1000)
+
+    assert (tiles[0][0], tiles[0][1]) == bounds[:2]
+    assert max(t[2] for t in tiles) >= bounds[2] and max(t[3] for t in tiles) >= bounds[3]
+    assert all(poi_crawl.tile_size(t) == pytest.approx(1000, rel=1e-3) for t in tiles)
+
+
+def test_pois_on_shared_tile_edges_are_kept_once(default_client, monkeypatch, tmp_path):
+    area = Area(parse_bbox(BBOX))
+    tiles = tile_grid(area.bounds, 1500)
+    first = tiles[0]
+    columns = sum(1 for t in tiles if t[1] == first[1])
+    above = tiles[columns]
+    points = [
+        (first[2], (first[1] + first[3]) / 2),        # edge shared with the tile to the east
+        ((first[0] + first[2]) / 2, first[3]),        # edge shared with the tile to the north
+        (first[2], first[3]),                         # corner of four tiles
+        ((above[0] + above[2]) / 2, (above[1] + above[3]) / 2),
+        (116.39, 39.96),                              # outside the area
+    ]
+    pois = [{'id': f'P{i}', 'location': f'{lon!r},{lat!r}'} for i, (lon, lat) in enumerate(points)]
+
+    def search_around(lon, lat, radius, keywords=None, types=None, api_key=None, page=1,
+                      offset=None):
+        # Every circle overlaps its neighbours; return everything to every tile
+        return {'count': str(len(pois)), 'pois': pois if page == 1 else []}
+
+    monkeypatch.setattr(default_client, 'search_around', search_around)
+    output = tmp_path / 'edges.jsonl'
+    stats = crawl_area(area, types='050000', output=str(output), size=1500, progress=False)
+
+    ids = [json.loads(line)['id'] for line in output.read_text().splitlines()]
+    assert sorted(ids) == ['P0', 'P1', 'P2', 'P3']
+    assert stats['duplicates'] == 0
+    assert stats['outside'] == len(pois) * stats['tiles'] - len(ids)
+
+
+def test_crawl_finds_every_poi_in_the_area_once(stub, default_client, tmp_path):
+    stats, pois = crawl(tmp_path, size=1500, max_results=100, max_workers=4)
+
+    ids = [poi['id'] for poi in pois]
+    area = Area(parse_bbox(BBOX))
+    expected = {poi['id'] for lon, lat, poi in AROUND_POIS
+                if area.contains(*map(float, poi['location'].split(',')))}
+    assert len(ids) == len(set(ids)) == stats['pois']
+    assert set(ids) == expected
+    assert stats['splits'] > 0 and stats['truncated'] == 0
+
+
+def test_resume_from_checkpoint(stub, default_client, monkeypatch, tmp_path):
+    _, full = crawl(tmp_path, name='full.jsonl', size=1500, max_results=100, max_workers=1)
+
+    search_tile = poi_crawl.search_tile
+    calls = []
+
+    def interrupted(*args, **kwargs):
+        calls.append(args[0])
+        if len(calls) == 6:
+            raise KeyboardInterrupt
+        return search_tile(*args, **kwargs)
+
+    checkpoint = tmp_path / 'crawl.ckpt'
+    monkeypatch.setattr(poi_crawl, 'search_tile', interrupted)
+    with pytest.raises(KeyboardInterrupt):
+        crawl(tmp_path, size=1500, max_results=100, max_workers=1, checkpoint=str(checkpoint))
+
+    query = json.loads(checkpoint.read_text())['query']
+    saved = TileCheckpoint.load(str(checkpoint), query)
+    assert calls[-1] in saved.pending
+    assert saved.stats['tiles'] == 5
+    # Bytes written after the checkpoint are discarded on resume
+    with open(tmp_path / 'pois.jsonl', 'a', encoding='utf-8') as f:
+        f.write('{"id": "partial"')
+
+    monkeypatch.setattr(poi_crawl, 'search_tile', search_tile)
+    stats, resumed = crawl(tmp_path, size=1500, max_results=100, max_workers=1,
+                           checkpoint=str(checkpoint))
+
+    assert sorted(poi['id'] for poi in resumed) == sorted(poi['id'] for poi in full)
+    assert stats['pois'] == len(full)
+
+
+def test_checkpoint_of_another_crawl_is_rejected(tmp_path):
+    checkpoint = TileCheckpoint(str(tmp_path / 'crawl.ckpt'), {'area': 'a'})
+    checkpoint.save([(0, 0, 1, 1)], 0, {})
+
+    assert TileCheckpoint.load(str(checkpoint.path), {'area': 'a'}).pending == [(0, 0, 1, 1)]
+    with pytest.raises(ValueError, match='another crawl'):
+        TileCheckpoint.load(str(checkpoint.path), {'area': 'b'})
@@ -0,0 +1,89 @@
+"""Concurrent POI paging: limits, de-duplication and the end of a search."""
+
+import sys
+
+import pytest
+
+from __init__ import POI_PAGE_SIZE, AmapNoResultError
+from stub_server import POI_COUNT
+
+
+def test_iter_pois_yields_every_poi_once(stub, client):
+    stub.requests.clear()
+    pois = list(client.iter_pois('加油站', '上海市', max_workers=4))
+
+    ids = [poi['id'] for poi in pois]
+    assert len(ids) == POI_COUNT == len(set(ids))
+    assert ids == sorted(ids)
+    assert stub.requests['/place/text'] == -(-POI_COUNT // POI_PAGE_SIZE)
+
+
+@pytest.mark.parametrize('limit', [1, POI_PAGE_SIZE, POI_PAGE_SIZE + 1, 60])
+def test_iter_pois_stops_at_limit(stub, client, limit):
+    stub.requests.clear()
+    totals = {}
+    pois = list(client.iter_pois('加油站', '上海市', limit=limit, max_workers=8, totals=totals))
+
+    assert len(pois) == limit == len({poi['id'] for poi in pois})
+    assert stub.requests['/place/text'] == -(-limit // POI_PAGE_SIZE)
+    assert totals == {'count': POI_COUNT}
+
+
+def test_iter_pois_stops_on_a_short_page(client, monkeypatch):
+    # Amap's count overshoots: 200 claimed, 60 real; pages repeat the previous last POI
+    real = [{'id': f'P{i:03d}', 'name': f'poi {i}'} for i in range(60)]
+    requested = []
+
+    def search_poi(keywords, city, *args, page=1, offset=20, **kwargs):
+        requested.append(page)
+        start = (page - 1) * offset
+        return {'count': '200', 'pois': real[max(start - 1, 0):start + offset]}
+
+    monkeypatch.setattr(client, 'search_poi', search_poi)
+    pois = list(client.iter_pois('餐厅', '北京市', max_workers=1))
+
+    assert [poi['id'] for poi in pois] == [poi['id'] for poi in real]
+    assert requested == [1, 2, 3]
+
+
+def test_iter_pois_without_results(client, monkeypatch):
+    def search_poi(*args, **kwargs):
+        raise AmapNoResultError('No results found')
+
+    monkeypatch.setattr(client, 'search_poi', search_poi)
+    totals = {}
+    assert list(client.iter_pois('加油站', '上海市', totals=totals)) == []
+    assert totals == {'count': 0}
+    assert list(client.iter_pois('加油站', '上海市', limit=0)) == []
+
+
+def test_main_reports_the_total(client, monkeypatch, capsys):
+    import __init__
+    import poi_search
+
+    monkeypatch.setattr(__init__, '_default_client', client)
+    monkeypatch.setattr(sys, 'argv', ['poi_search.py', '--keywords', '加油站', '--city', '上海市',
+                                      '--limit', '30'])
+    poi_search.main()
+
+    out = capsys.readouterr().out
+    assert f'Found {POI_COUNT} POIs (showing 30)' in out
+    assert f'{POI_COUNT - 30} more POIs not fetched' in out
+
+
+def test_async_iter_pois_matches_sync(stub, client):
+    import asyncio
+
+    from async_client import AsyncAmapClient
+
+    async def collect():
+        async with AsyncAmapClient(api_key='stub', base_url=stub.base_url) as async_client:
+            totals = {}
+            pois = [poi async for poi in async_client.iter_pois('加油站', '上海市', limit=60,
+                                                                 totals=totals)]
+            return pois, totals
+
+    pois, totals = asyncio.run(collect())
+    assert [poi['id'] for poi in pois] == [poi['id'] for poi in
+                                            client.iter_pois('加油站', '上海市', limit=60)]
+    assert totals == {'count': POI_COUNT}
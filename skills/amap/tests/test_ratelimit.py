@@ -0,0 +1,122 @@
+"""Token bucket pacing and per-key, per-endpoint rate limiting."""
+
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+import ratelimit
+from ratelimit import RateLimiter, TokenBucket
+
+
+class FakeClock:
+    """monotonic() that only moves when the test (or a sleep) advances it."""
+
+    def __init__(self):
+        self.now = 1000.0
+        self.slept = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.slept.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(ratelimit, 'time', SimpleNamespace(monotonic=clock.monotonic,
+                                                           sleep=clock.sleep))
+    return clock
+
+
+def test_burst_then_even_spacing(clock):
+    bucket = TokenBucket(rate=10, capacity=3)
+
+    waits = [bucket.reserve() for _ in range(6)]
+
+    assert waits[:3] == [0, 0, 0]
+    assert waits[3:] == pytest.approx([0.1, 0.2, 0.3])
+    snapshot = bucket.snapshot()
+    assert snapshot['acquired'] == 6 and snapshot['delayed'] == 3
+    assert snapshot['total_wait'] == pytest.approx(0.6)
+    assert snapshot['tokens'] == pytest.approx(-3)
+
+
+def test_refill_is_continuous_and_capped(clock):
+    bucket = TokenBucket(rate=10, capacity=2)
+    bucket.reserve(), bucket.reserve()
+    assert bucket.snapshot()['tokens'] == 0
+
+    clock.now += 0.05
+    assert bucket.snapshot()['tokens'] == pytest.approx(0.5)
+    assert bucket.reserve() == pytest.approx(0.05)
+
+    clock.now += 60
+    snapshot = bucket.snapshot()
+    assert snapshot['tokens'] == 2
+    assert [bucket.reserve() for _ in range(3)] == pytest.approx([0, 0, 0.1])
+
+
+def test_default_capacity_is_a_tenth_of_a_second(clock):
+    assert TokenBucket(rate=90).capacity == 9
+    assert TokenBucket(rate=5).capacity == 1
+
+
+def test_acquire_sleeps_for_the_reservation(clock):
+    bucket = TokenBucket(rate=4, capacity=1)
+    for _ in range(4):
+        bucket.acquire()
+    assert clock.slept == pytest.approx([0.25, 0.25, 0.25])
+
+
+def test_acquire_async_sleeps_for_the_reservation(clock, monkeypatch):
+    slept = []
+
+    async def fake_sleep(seconds):
+        slept.append(seconds)
+
+    monkeypatch.setattr(ratelimit.asyncio, 'sleep', fake_sleep)
+    bucket = TokenBucket(rate=2, capacity=1)
+
+    async def main():
+        await asyncio.gather(*(bucket.acquire_async() for _ in range(3)))
+
+    asyncio.run(main())
+    assert slept == pytest.approx([0.5, 1.0])
+
+
+def test_limiter_uses_longest_prefix_with_headroom(clock):
+    limiter = RateLimiter({'/direction/': 50, '/direction/transit/': 20}, default_qps=100,
+                          headroom=0.5)
+    assert limiter.qps_for('/direction/driving') == 50
+    assert limiter.qps_for('/direction/transit/integrated') == 20
+    assert limiter.qps_for('/geocode/geo') == 100
+    assert limiter.bucket('k1', '/direction/transit/integrated').rate == 10
+    assert limiter.bucket('k1', '/geocode/geo').rate == 50
+
+
+def test_limiter_keeps_keys_and_endpoints_apart(clock):
+    limiter = RateLimiter(default_qps=10, headroom=1.0)
+
+    assert [limiter.reserve('key-one', '/geocode/geo') for _ in range(2)] == [0, 0.1]
+    assert limiter.reserve('key-two', '/geocode/geo') == 0
+    assert limiter.reserve('key-one', '/place/text') == 0
+    assert limiter.bucket('key-one', '/geocode/geo') is limiter.bucket('key-one', '/geocode/geo')
+
+
+def test_limiter_snapshot_hides_keys(clock):
+    limiter = RateLimiter(default_qps=10, headroom=1.0)
+    limiter.acquire('secretkey', '/geocode/geo')
+    limiter.acquire('secretkey', '/geocode/geo')
+    limiter.reserve('otherkey', '/place/text')
+
+    snapshot = limiter.snapshot()
+
+    assert set(snapshot) == {'secr... /geocode/geo', 'othe... /place/text'}
+    assert snapshot['secr... /geocode/geo']['acquired'] == 2
+    assert snapshot['secr... /geocode/geo']['delayed'] == 1
+    assert snapshot['othe... /place/text']['rate'] == 10
+    assert not any('secretkey' in name for name in snapshot)
@@ -0,0 +1,68 @@
+"""Batch reverse geocoding: batch=true chunks, input order and misses within a batch."""
+
+import asyncio
+
+from __init__ import REGEO_BATCH_SIZE
+from async_client import AsyncAmapClient
+
+# Points 0.01 degrees apart, so none shares another's result
+LOCATIONS = [(116.30 + i * 0.01, 39.90) for i in range(45)]
+# Amap returns an empty entry for points it cannot place
+MISSES = {7, 20, 44}
+
+
+def regeo_response(params):
+    points = params['location'].split('|')
+    regeocodes = []
+    for point in points:
+        lon, lat = (float(v) for v in point.split(','))
+        index = round((lon - 116.30) / 0.01)
+        regeocodes.append({'formatted_address': [], 'addressComponent': {}} if index in MISSES
+                          else {'formatted_address': f'地点{index}', 'addressComponent': {}})
+    return {'status': '1', 'info': 'OK', 'infocode': '10000', 'regeocodes': regeocodes}
+
+
+def test_batches_keep_order_and_misses(client, monkeypatch):
+    batches = []
+
+    def request(endpoint, params, api_key=None, *args, **kwargs):
+        assert endpoint == '/geocode/regeo' and params['batch'] == 'true'
+        batches.append(params['location'].split('|'))
+        return regeo_response(params)
+
+    monkeypatch.setattr(client, 'request', request)
+    results = client.reverse_geocode_many(LOCATIONS, max_workers=4)
+
+    assert REGEO_BATCH_SIZE == 20
+    assert sorted(len(batch) for batch in batches) == [5, 20, 20]
+    assert [i for i, result in enumerate(results) if result is None] == sorted(MISSES)
+    assert [result['formatted_address'] for result in results if result is not None] == \
+        [f'地点{i}' for i in range(len(LOCATIONS)) if i not in MISSES]
+
+
+def test_stub_batch_returns_one_result_per_location(stub, client):
+    results = client.reverse_geocode_many(LOCATIONS[:3])
+
+    assert len(results) == 3 and all(result['formatted_address'] for result in results)
+    assert stub.requests['/geocode/regeo'] >= 1
+
+
+def test_async_batches_keep_order_and_misses(stub):
+    batches = []
+
+    async def main():
+        async with AsyncAmapClient(api_key='stub', base_url=stub.base_url) as client:
+            async def request(endpoint, params, api_key=None, *args, **kwargs):
+                batches.append(params['location'].split('|'))
+                await asyncio.sleep(0.01 * (len(batches) % 3))
+                return regeo_response(params)
+
+            client.request = request
+            return await client.reverse_geocode_many(LOCATIONS)
+
+    results = asyncio.run(main())
+
+    assert sorted(len(batch) for batch in batches) == [5, 20, 20]
+    assert [i for i, result in enumerate(results) if result is None] == sorted(MISSES)
+    assert [result['formatted_address'] for result in results if result is not None] == \
+        [f'地点{i}' for i in range(len(LOCATIONS)) if i not in MISSES]
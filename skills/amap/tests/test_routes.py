@@ -0,0 +1,122 @@
+"""Route planning: endpoint resolution and multi-mode comparison."""
+
+import asyncio
+
+import pytest
+import requests
+
+from __init__ import MODES
+from async_client import AsyncAmapClient
+
+
+def test_compare_modes_ranks_every_mode(client):
+    rows = client.compare_modes('北京市朝阳区阜通东大街6号', '116.434446,39.90816')
+
+    assert sorted(row['mode'] for row in rows) == sorted(MODES)
+    durations = [row['duration'] for row in rows]
+    assert durations == sorted(durations)
+    transit = next(row for row in rows if row['mode'] == 'transit')
+    assert transit['cost'] == 5.0 and transit['tolls'] is None
+    assert all(row['error'] is None for row in rows)
+
+
+def test_compare_modes_ranks_transport_failures_last(client, monkeypatch):
+    request = client.request
+
+    def flaky(endpoint, params, api_key=None):
+        if endpoint == MODES['transit']:
+            raise requests.Timeout('read timed out')
+        return request(endpoint, params, api_key)
+
+    monkeypatch.setattr(client, 'request', flaky)
+    rows = client.compare_modes('116.481485,39.990464', '116.434446,39.90816',
+                                ['transit', 'driving', 'walking'])
+
+    assert [row['mode'] for row in rows][-1] == 'transit'
+    assert rows[-1]['error'] == 'read timed out'
+    assert all(row['error'] is None for row in rows[:-1])
+
+
+def test_plan_route_records_keeps_going_after_a_transport_failure(client, monkeypatch):
+    import __init__
+    from path_planning import plan_route_records
+
+    request = client.request
+
+    def flaky(endpoint, params, api_key=None):
+        if params.get('destination') == '116.402,39.9':
+            raise requests.ConnectionError('connection reset')
+        return request(endpoint, params, api_key)
+
+    monkeypatch.setattr(__init__, '_default_client', client)
+    monkeypatch.setattr(client, 'request', flaky)
+    records = [{'origin': '北京西站', 'destination': f'116.{400 + i},39.9'} for i in range(4)]
+    rows = plan_route_records(records, 'driving', {'北京西站': '116.322056,39.89491'})
+
+    assert [row['destination'] for row in rows] == [r['destination'] for r in records]
+    assert rows[2]['error'] == 'connection reset'
+    assert all('error' not in row and row['distance'] for i, row in enumerate(rows) if i != 2)
+
+
+def test_compare_modes_rejects_unknown_mode(client):
+    with pytest.raises(ValueError, match='Invalid mode'):
+        client.compare_modes('116.4,39.9', '116.5,39.9', ['flying'])
+
+
+def test_async_compare_modes_ranks_transport_failures_last(stub):
+    async def main():
+        async with AsyncAmapClient(api_key='stub', base_url=stub.base_url) as client:
+            request = client.request
+
+            async def flaky(endpoint, params, api_key=None, timeout=None):
+                if endpoint == MODES['walking']:
+                    raise asyncio.TimeoutError()
+                return await request(endpoint, params, api_key, timeout)
+
+            client.request = flaky
+            return await client.compare_modes('北京西站', '116.434446,39.90816',
+                                              ['walking', 'driving'])
+
+    rows = asyncio.run(main())
+    assert [row['mode'] for row in rows] == ['driving', 'walking']
+    assert rows[1]['error'] == 'TimeoutError'
+
+
+def test_plan_route_geocodes_both_addresses_in_one_request(stub, client):
+    stub.requests.clear()
+    route = client.plan_route('北京市朝阳区阜通东大街6号', '北京西站', 'driving')
+
+    assert route['paths']
+    assert stub.requests == {'/geocode/geo': 1, '/direction/driving': 1}
+
+
+def test_async_plan_route_geocodes_both_addresses_in_one_request(stub):
+    async def main():
+        async with AsyncAmapClient(api_key='stub', base_url=stub.base_url) as client:
+            return await client.plan_route('北京市朝阳区阜通东大街6号', '北京西站', 'walking')
+
+    stub.requests.clear()
+    assert asyncio.run(main())['paths']
+    assert stub.requests == {'/geocode/geo': 1, '/direction/walking': 1}
+
+
+def test_plan_route_file_reads_stdin_twice(stub, client, monkeypatch, tmp_path):
+    import io
+    import json
+    import tempfile
+
+    import __init__
+    from path_planning import plan_route_file
+
+    trips = [{'origin': '北京西站', 'destination': f'116.{400 + i},39.9'} for i in range(25)]
+    monkeypatch.setattr(__init__, '_default_client', client)
+    monkeypatch.setattr(tempfile, 'tempdir', str(tmp_path))
+    monkeypatch.setattr('sys.stdin', io.StringIO(''.join(json.dumps(t) + '\n' for t in trips)))
+    output = tmp_path / 'routes.jsonl'
+    stub.requests.clear()
+    plan_route_file('-', 'driving', output=str(output))
+
+    rows = [json.loads(line) for line in output.read_text().splitlines()]
+    assert [row['destination'] for row in rows] == [t['destination'] for t in trips]
+    assert stub.requests['/geocode/geo'] == 1
+    assert not list(tmp_path.glob('amap-stdin-*'))
@@ -0,0 +1,148 @@
+"""SingleFlight and AsyncSingleFlight coalescing."""
+
+import asyncio
+import threading
+import time
+
+import pytest
+
+from singleflight import AsyncSingleFlight, SingleFlight
+
+
+def test_concurrent_calls_share_one_execution():
+    flight = SingleFlight()
+    started = threading.Event()
+    release = threading.Event()
+    runs = []
+
+    def fn():
+        runs.append(1)
+        started.set()
+        release.wait(5)
+        return 'result'
+
+    results = []
+    leader = threading.Thread(target=lambda: results.append(flight.do('k', fn)))
+    leader.start()
+    assert started.wait(5)
+    followers = [threading.Thread(target=lambda: results.append(flight.do('k', fn)))
+                 for _ in range(4)]
+    for thread in followers:
+        thread.start()
+    while flight.stats()['coalesced'] < 4:
+        time.sleep(0.001)
+    release.set()
+    for thread in [leader, *followers]:
+        thread.join(5)
+
+    assert results == ['result'] * 5
+    assert runs == [1]
+    assert flight.stats() == {'calls': 1, 'coalesced': 4, 'in_flight': 0}
+
+
+def test_error_is_raised_in_every_caller():
+    flight = SingleFlight()
+
+    def fn():
+        raise ValueError('boom')
+
+    with pytest.raises(ValueError, match='boom'):
+        flight.do('k', fn)
+    # The failed call is not left in flight
+    assert flight.do('k', lambda: 1) == 1
+
+
+class _YieldingLock:
+    """Lock that yields to other threads right after every release."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        self._lock.acquire()
+
+    def __exit__(self, *exc):
+        self._lock.release()
+        time.sleep(0.005)
+
+
+def test_thread_joining_after_lock_release_does_not_deadlock():
+    # Regression: the leader used to check call.waiters after releasing
+    # the lock, so a thread joining in that gap made both wait forever
+    flight = SingleFlight()
+    flight._lock = _YieldingLock()
+    results = []
+
+    def call():
+        results.append(flight.do('k', lambda: 'result'))
+
+    threads = [threading.Thread(target=call, daemon=True) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+
+    assert not any(thread.is_alive() for thread in threads), "SingleFlight.do deadlocked"
+    assert results == ['result', 'result']
+
+
+def test_stress_does_not_deadlock():
+    flight = SingleFlight()
+    errors = []
+
+    def worker(seed):
+        try:
+            for i in range(2000):
+                key = (seed + i) % 7
+                assert flight.do(key, lambda: key * 2) == key * 2
+        except BaseException as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker, args=(n,), daemon=True) for n in range(16)]
+    for thread in threads:
+        thread.start()
+    deadline = time.monotonic() + 60
+    for thread in threads:
+        thread.join(max(0.0, deadline - time.monotonic()))
+
+    assert not any(thread.is_alive() for thread in threads), "SingleFlight.do deadlocked"
+    assert not errors
+    stats = flight.stats()
+    assert stats['calls'] + stats['coalesced'] == 16 * 2000
+    assert stats['in_flight'] == 0
+
+
+def test_async_calls_share_one_execution():
+    flight = AsyncSingleFlight()
+    runs = []
+
+    async def fn():
+        runs.append(1)
+        await asyncio.sleep(0.01)
+        return 'result'
+
+    async def main():
+        return await asyncio.gather(*(flight.do('k', fn) for _ in range(5)))
+
+    assert asyncio.run(main()) == ['result'] * 5
+    assert runs == [1]
+    assert flight.stats() == {'calls': 1, 'coalesced': 4, 'in_flight': 0}
+
+
+def test_async_cancelling_one_waiter_keeps_the_call():
+    flight = AsyncSingleFlight()
+
+    async def fn():
+        await asyncio.sleep(0.05)
+        return 'result'
+
+    async def main():
+        first = asyncio.ensure_future(flight.do('k', fn))
+        second = asyncio.ensure_future(flight.do('k', fn))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return await second
+
+    assert asyncio.run(main()) == 'result'
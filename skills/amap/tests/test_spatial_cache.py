@@ -0,0 +1,112 @@
+"""Nearest-neighbour reverse geocoding cache."""
+
+import math
+
+import pytest
+
+from cache import METERS_PER_DEGREE, SpatialCache
+
+
+def offset(lon, lat, east=0.0, north=0.0):
+    """The point east/north meters away from lon, lat."""
+    return (lon + east / (METERS_PER_DEGREE * math.cos(math.radians(lat))),
+            lat + north / METERS_PER_DEGREE)
+
+
+def address(name):
+    return {'formatted_address': name}
+
+
+@pytest.mark.parametrize('lat', [0.0, 39.9, 60.0, 75.0, 85.0])
+@pytest.mark.parametrize('east, north', [(9, 0), (0, -9), (-6, 6), (9.5, 0)])
+def test_hit_within_tolerance_at_any_latitude(lat, east, north):
+    cache = SpatialCache(tolerance=10)
+    cache.put(116.4, lat, address('here'))
+
+    assert cache.get(*offset(116.4, lat, east, north)) == address('here')
+
+
+@pytest.mark.parametrize('lat', [0.0, 39.9, 75.0])
+@pytest.mark.parametrize('east, north', [(11, 0), (0, 11), (-8, 8), (100, 0)])
+def test_miss_outside_tolerance(lat, east, north):
+    cache = SpatialCache(tolerance=10)
+    cache.put(116.4, lat, address('here'))
+
+    assert cache.get(*offset(116.4, lat, east, north)) is None
+
+
+def test_high_latitude_scans_enough_columns():
+    # At 80 degrees a 10 m cell column is ~6 times narrower than 10 m east-west,
+    # so a point 9.5 m east lies several columns away
+    cache = SpatialCache(tolerance=10)
+    lon, lat = offset(20.0, 80.0, east=0.01)
+    cache.put(lon, lat, address('north'))
+    query = offset(lon, lat, east=9.5)
+    columns = abs(math.floor(query[0] / cache._cell_size) - math.floor(lon / cache._cell_size))
+
+    assert columns > 1
+    assert cache.get(*query) == address('north')
+
+
+def test_nearest_of_several_wins():
+    cache = SpatialCache(tolerance=10)
+    cache.put_many([(*offset(116.4, 39.9, east=8), address('far')),
+                    (*offset(116.4, 39.9, east=-3), address('near')),
+                    (116.5, 39.9, None)])
+
+    assert cache.get(116.4, 39.9) == address('near')
+    assert cache.get_many([(116.4, 39.9), (116.5, 39.9)]) == [address('near'), None]
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses'], stats['points']) == (2, 1, 2)
+
+
+def test_results_sharing_an_address_are_stored_once():
+    cache = SpatialCache(tolerance=10)
+    cache.put_many([(116.4 + i * 0.001, 39.9, address('same')) for i in range(5)])
+
+    assert cache.stats()['results'] == 1
+    assert cache.get(116.404, 39.9) is cache.get(116.4, 39.9)
+
+
+def test_cluster_groups_points_within_tolerance():
+    cache = SpatialCache(tolerance=10)
+    a = (116.4, 39.9)
+    b = (116.41, 39.9)
+    points = [a, offset(*a, east=4), b, offset(*a, north=-7), offset(*b, east=3, north=3), a]
+
+    representatives, owners = cache.cluster(points)
+
+    assert representatives == [a, b]
+    assert owners == [0, 0, 1, 0, 1, 0]
+    assert cache.stats()['hits'] == 4
+    # Clustering uses a scratch index and caches nothing itself
+    assert cache.stats()['points'] == 0
+
+
+def test_cluster_of_distant_points_keeps_them_all():
+    cache = SpatialCache(tolerance=10)
+    points = [(116.4 + i * 0.01, 39.9) for i in range(5)]
+
+    assert cache.cluster(points) == (points, [0, 1, 2, 3, 4])
+
+
+def test_evicts_oldest_cells_when_full():
+    cache = SpatialCache(tolerance=10, max_points=4)
+    for i in range(6):
+        cache.put(116.4 + i * 0.01, 39.9, address(f'point {i}'))
+
+    assert cache.stats()['points'] == 4
+    assert cache.get(116.4, 39.9) is None
+    assert cache.get(116.41, 39.9) is None
+    assert cache.get(116.45, 39.9) == address('point 5')
+    assert cache.get(116.42, 39.9) == address('point 2')
+
+
+def test_clear_and_invalid_tolerance():
+    cache = SpatialCache(tolerance=10)
+    cache.put(116.4, 39.9, address('here'))
+    cache.clear()
+    assert cache.get(116.4, 39.9) is None
+    assert cache.stats()['points'] == 0
+    with pytest.raises(ValueError):
+        SpatialCache(tolerance=0)
@@ -5,12 +5,68 @@ Manages API keys and service configuration for travel planning.
 
 import os
 import json
+import sys
+import importlib
+import threading
 from pathlib import Path
 
+# The amap skill's scripts, for its key pool and infocode table. The amap
+# plugin is installed separately; without it only the first key is used.
+AMAP_SCRIPTS = Path(__file__).resolve().parents[2] / "amap" / "scripts"
+
 # Default config file location
 CONFIG_DIR = Path.home() / ".config" / "travel-planner"
 CONFIG_FILE = CONFIG_DIR / "config.json"
 
+# Environment variables consulted for each service, in addition to the config file
+ENV_KEYS = {
+    "amap": ("AMAP_API_KEYS", "AMAP_API_KEY"),
+}
+
+_lock = threading.Lock()
+_config = None
+_config_mtime = None
+_pools = {}
+_amap = None
+
+
+def _load_amap():
+    """
+    The amap skill's key pool and error classes, or None if unavailable.
+
+    The amap scripts are imported as top-level modules (their package is
+    named __init__), so the import is only trusted when the modules found
+    actually live in AMAP_SCRIPTS; anything else falls back to a single key.
+    """
+    global _amap
+    with _lock:
+        if _amap is None:
+            _amap = _import_amap() or False
+        return _amap or None
+
+
+def _import_amap():
+    if not (AMAP_SCRIPTS / "keypool.py").is_file():
+        return None
+    if str(AMAP_SCRIPTS) not in sys.path:
+        sys.path.insert(0, str(AMAP_SCRIPTS))
+    try:
+        amap = importlib.import_module("__init__")
+        keypool = importlib.import_module("keypool")
+    except ImportError:
+        return None
+    for module in (amap, keypool):
+        if Path(getattr(module, "__file__", "") or "").resolve().parent != AMAP_SCRIPTS:
+            return None
+    if not hasattr(amap, "error_for_infocode"):
+        return None
+    return {
+        "KeyPool": keypool.KeyPool,
+        "error_for_infocode": amap.error_for_infocode,
+        "disabling_errors": (amap.AmapAuthError, amap.AmapQuotaError),
+        "AmapQuotaError": amap.AmapQuotaError,
+    }
+
 
 def ensure_config_dir():
     """Ensure config directory exists."""
@@ -26,17 +82,105 @@ def load_config():
     return {}
 
 
+def cached_config():
+    """Configuration, re-read only when the config file has changed."""
+    global _config, _config_mtime
+    try:
+        mtime = CONFIG_FILE.stat().st_mtime_ns
+    except OSError:
+        mtime = None
+    with _lock:
+        if _config is None or mtime != _config_mtime:
+            _config, _config_mtime = load_config(), mtime
+        return _config
+
+
 def save_config(config):
     """Save configuration to file."""
+    global _config
     ensure_config_dir()
     with open(CONFIG_FILE, 'w', encoding='utf-8') as f:
         json.dump(config, f, indent=2, ensure_ascii=False)
+    with _lock:
+        _config = None
+
+
+def get_api_keys(service: str) -> list:
+    """
+    Get all configured API keys for a service.
+
+    The config entry may be a single key or a list of keys; keys from the
+    service's environment variables (comma-separated) are appended.
+    """
+    value = cached_config().get(service, "")
+    candidates = list(value) if isinstance(value, list) else [value]
+    for env_name in ENV_KEYS.get(service, ()):
+        candidates.extend(os.environ.get(env_name, "").split(","))
+
+    keys = []
+    for key in candidates:
+        key = key.strip()
+        if key and key not in keys:
+            keys.append(key)
+    return keys
+
+
+def get_key_pool(service: str):
+    """
+    The amap KeyPool rotating a service's keys.
+
+    The pool is rebuilt when the configured keys change. Returns None if no
+    keys are configured or the amap skill is not installed.
+    """
+    keys = get_api_keys(service)
+    amap = _load_amap()
+    if not keys or amap is None:
+        return None
+    with _lock:
+        pool = _pools.get(service)
+        if pool is None or pool.keys != keys:
+            pool = _pools[service] = amap["KeyPool"](keys)
+        return pool
 
 
 def get_api_key(service: str) -> str:
-    """Get API key for a service."""
-    config = load_config()
-    return config.get(service, "")
+    """
+    Get API key for a service.
+
+    With several keys configured and the amap skill installed, successive
+    calls rotate through the keys that have not been disabled by
+    report_key_error; otherwise the first configured key is returned.
+    """
+    pool = get_key_pool(service)
+    if pool is None:
+        keys = get_api_keys(service)
+        return keys[0] if keys else ""
+    try:
+        return pool.acquire()
+    except _load_amap()["AmapQuotaError"]:
+        return ""
+
+
+def report_key_error(key: str, infocode: str) -> bool:
+    """
+    Record an Amap error for a key and disable it if the error is key-specific.
+
+    Infocodes are classified with the amap skill's table: quota errors
+    disable the key until the next daily reset, authentication errors for
+    the rest of the process. Without the amap skill nothing is recorded.
+
+    Returns:
+        True if the key was disabled
+    """
+    amap = _load_amap()
+    if amap is None:
+        return False
+    error = amap["error_for_infocode"](infocode, "")
+    with _lock:
+        pools = [pool for pool in _pools.values() if key in pool.keys]
+    for pool in pools:
+        pool.report_failure(key, error)
+    return bool(pools) and isinstance(error, amap["disabling_errors"])
 
 
 def set_api_key(service: str, key: str) -> None:
@@ -46,20 +190,30 @@ def set_api_key(service: str, key: str) -> None:
     save_config(config)
 
 
+def set_api_keys(service: str, keys: list) -> None:
+    """Set several API keys for a service to rotate through."""
+    config = load_config()
+    config[service] = list(keys)
+    save_config(config)
+
+
 def check_api_keys() -> dict:
     """Check which API keys are configured."""
-    config = load_config()
     services = {
         "amap": "高德地图 (POI搜索、路线规划、地理编码)",
         "weather": "高德天气 (天气预报)",
     }
     status = {}
     for service, description in services.items():
-        key = config.get(service, "")
+        keys = get_api_keys(service)
+        pool = get_key_pool(service)
+        key = keys[0] if keys else ""
         status[service] = {
             "name": description,
             "configured": bool(key),
-            "key_preview": key[:4] + "..." if key else ""
+            "key_preview": key[:4] + "..." if key else "",
+            "key_count": len(keys),
+            "keys_available": sum(1 for k in pool.snapshot() if k["available"]) if pool else len(keys)
         }
     return status
 
@@ -100,9 +254,10 @@ def get_endpoint(service: str, params: dict = None) -> str:
     if not params:
         return base_url
 
-    key = get_api_key("amap")
-    if key:
-        params["key"] = key
+    if "key" not in params:
+        key = get_api_key("amap")
+        if key:
+            params["key"] = key
 
     query = "&".join([f"{k}={v}" for k, v in params.items()])
     return f"{base_url}?{query}"
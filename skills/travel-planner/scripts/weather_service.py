@@ -4,15 +4,40 @@ Fetches weather forecasts for travel destinations.
 """
 
 import json
+import sys
 import urllib.request
+from pathlib import Path
 from typing import Optional
-from .api_config import get_api_key, get_endpoint
+from .api_config import get_api_key, get_endpoint, report_key_error
+
+# The amap skill's scripts, for its offline adcode index
+AMAP_SCRIPTS = Path(__file__).resolve().parents[2] / "amap" / "scripts"
+
+
+def resolve_city_adcode(city: str) -> Optional[str]:
+    """
+    Look up a city's adcode offline with the amap skill's adcode index.
+
+    Returns:
+        Adcode, or None if the amap skill or its index is unavailable or
+        does not know the city
+    """
+    if str(AMAP_SCRIPTS) not in sys.path:
+        sys.path.append(str(AMAP_SCRIPTS))
+    try:
+        from adcode import resolve_adcode
+    except ImportError:
+        return None
+    return resolve_adcode(city)
 
 
 def get_weather(city: str, city_adcode: str = None) -> dict:
     """
     Get current weather and forecast for a city.
 
+    The weather API takes an adcode; city names are resolved offline when
+    city_adcode is not given, and sent as-is if they cannot be.
+
     Args:
         city: City name
         city_adcode: City administrative code (optional)
@@ -25,19 +50,19 @@ def get_weather(city: str, city_adcode: str = None) -> dict:
         return {"error": "API key not configured"}
 
     params = {
-        "city": city,
+        "city": city_adcode or resolve_city_adcode(city) or city,
         "extensions": "all",  # Get forecast too
-        "output": "json"
+        "output": "json",
+        "key": key
     }
 
-    if city_adcode:
-        params["city_adcode"] = city_adcode
-
     url = get_endpoint("amap_weather", params)
 
     try:
         with urllib.request.urlopen(url, timeout=10) as response:
             data = json.loads(response.read().decode('utf-8'))
+            if data.get("status") != "1":
+                report_key_error(key, str(data.get("infocode", "")))
             return parse_weather_response(data)
     except Exception as e:
         return {"error": str(e)}
@@ -111,7 +136,7 @@ def format_weather_summary(weather_data: dict) -> str:
         lines.append("")
         lines.append("#### 天气预报")
         for day in forecast[:7]:
-            lines.append(f"- **{day['date']} ({day['week']})}**: "
+            lines.append(f"- **{day['date']} ({day['week']})**: "
                         f"{day['day_weather']} → {day['night_weather']}, "
                         f"{day['night_temp']}°C ~ {day['day_temp']}°C")
 
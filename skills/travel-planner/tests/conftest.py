@@ -0,0 +1,29 @@
+"""
+Shared fixtures for the travel-planner tests.
+
+Tests import the scripts as the `scripts` package, the way SKILL.md does,
+and keep each test's config file and API keys in a temporary directory.
+"""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from scripts import api_config  # noqa: E402
+
+
+@pytest.fixture
+def config(tmp_path, monkeypatch):
+    """api_config with an empty config file, no key env vars and fresh pools."""
+    monkeypatch.setattr(api_config, 'CONFIG_DIR', tmp_path)
+    monkeypatch.setattr(api_config, 'CONFIG_FILE', tmp_path / 'config.json')
+    for env_name in ('AMAP_API_KEYS', 'AMAP_API_KEY'):
+        monkeypatch.delenv(env_name, raising=False)
+    monkeypatch.setattr(api_config, '_config', None)
+    monkeypatch.setattr(api_config, '_config_mtime', None)
+    monkeypatch.setattr(api_config, '_pools', {})
+    yield api_config
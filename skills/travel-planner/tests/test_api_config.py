@@ -0,0 +1,96 @@
+"""API key configuration and rotation through the amap key pool."""
+
+import sys
+
+import pytest
+
+
+def test_keys_from_config_and_environment_deduplicated(config, monkeypatch):
+    config.set_api_keys('amap', ['k1', ' k2 ', ''])
+    monkeypatch.setenv('AMAP_API_KEYS', 'k2,k3')
+    monkeypatch.setenv('AMAP_API_KEY', 'k1')
+    assert config.get_api_keys('amap') == ['k1', 'k2', 'k3']
+
+
+def test_single_key_config_and_unknown_service(config):
+    config.set_api_key('amap', 'only')
+    assert config.get_api_keys('amap') == ['only']
+    assert config.get_api_keys('weather') == []
+    assert config.get_key_pool('weather') is None
+    assert config.get_api_key('weather') == ''
+
+
+def test_config_edits_are_picked_up(config):
+    config.set_api_key('amap', 'old')
+    assert config.get_api_keys('amap') == ['old']
+    config.set_api_key('amap', 'new')
+    assert config.get_api_keys('amap') == ['new']
+
+
+def test_key_pool_rotates_and_is_rebuilt_on_change(config):
+    config.set_api_keys('amap', ['k1', 'k2'])
+    pool = config.get_key_pool('amap')
+    assert pool.keys == ['k1', 'k2']
+    assert config.get_key_pool('amap') is pool
+    assert [config.get_api_key('amap') for _ in range(4)] == ['k1', 'k2', 'k1', 'k2']
+
+    config.set_api_keys('amap', ['k1', 'k2', 'k3'])
+    rebuilt = config.get_key_pool('amap')
+    assert rebuilt is not pool
+    assert rebuilt.keys == ['k1', 'k2', 'k3']
+
+
+@pytest.mark.parametrize('infocode', ['10003', '10044'])
+def test_quota_error_disables_key(config, infocode):
+    config.set_api_keys('amap', ['k1', 'k2'])
+    config.get_key_pool('amap')
+    assert config.report_key_error('k1', infocode) is True
+    assert {config.get_api_key('amap') for _ in range(3)} == {'k2'}
+    assert config.check_api_keys()['amap']['keys_available'] == 1
+
+
+def test_auth_error_disables_key(config):
+    config.set_api_keys('amap', ['k1', 'k2'])
+    config.get_key_pool('amap')
+    assert config.report_key_error('k2', '10001') is True
+    assert {config.get_api_key('amap') for _ in range(3)} == {'k1'}
+
+
+def test_other_errors_and_unknown_keys_do_not_disable(config):
+    config.set_api_keys('amap', ['k1', 'k2'])
+    config.get_key_pool('amap')
+    assert config.report_key_error('k1', '10021') is False
+    assert config.report_key_error('k1', '20000') is False
+    assert config.report_key_error('elsewhere', '10003') is False
+    assert config.check_api_keys()['amap']['keys_available'] == 2
+
+
+def test_all_keys_exhausted_returns_empty_key(config):
+    config.set_api_key('amap', 'k1')
+    config.get_key_pool('amap')
+    config.report_key_error('k1', '10003')
+    assert config.get_api_key('amap') == ''
+
+
+def test_without_amap_skill_falls_back_to_first_key(config, monkeypatch, tmp_path):
+    monkeypatch.setattr(config, 'AMAP_SCRIPTS', tmp_path / 'missing')
+    monkeypatch.setattr(config, '_amap', None)
+    config.set_api_keys('amap', ['k1', 'k2'])
+    assert config.get_key_pool('amap') is None
+    assert [config.get_api_key('amap') for _ in range(3)] == ['k1', 'k1', 'k1']
+    assert config.report_key_error('k1', '10003') is False
+    status = config.check_api_keys()['amap']
+    assert (status['key_count'], status['keys_available']) == (2, 2)
+
+
+def test_modules_from_elsewhere_are_not_trusted(config, monkeypatch, tmp_path):
+    # An __init__/keypool found on sys.path but outside AMAP_SCRIPTS
+    decoy = tmp_path / 'amap' / 'scripts'
+    decoy.mkdir(parents=True)
+    (decoy / 'keypool.py').write_text('')
+    monkeypatch.setattr(config, 'AMAP_SCRIPTS', decoy)
+    monkeypatch.setattr(config, '_amap', None)
+    monkeypatch.setattr(sys, 'path', list(sys.path))
+    config.set_api_key('amap', 'k1')
+    assert config.get_key_pool('amap') is None
+    assert config.get_api_key('amap') == 'k1'